@@ -0,0 +1,532 @@
+"""
+Uproszczone granice krajów europejskich.
+
+Zawiera wielokąty granic państw (zewnętrzne pierścienie, współrzędne
+(lon, lat) zaokrąglone do 0.001°) na podstawie Natural Earth 1:110m
+(domena publiczna). Dokładność wystarcza do podziału dystansu trasy
+na kraje - nie nadaje się do precyzyjnego wyznaczania przebiegu granic.
+Mikropaństwa (AD, LI, MC, SM) nie występują w tej skali.
+"""
+
+# Kod ISO 3166-1 alpha-2 -> lista pierścieni [(lon, lat), ...]
+COUNTRY_BOUNDARIES = {
+    'AL': [
+        [
+            (21.02, 40.843), (21.0, 40.58), (20.675, 40.435), (20.615, 40.11), (20.15, 39.625),
+            (19.98, 39.695), (19.96, 39.915), (19.406, 40.251), (19.319, 40.727), (19.404, 41.41),
+            (19.54, 41.72), (19.372, 41.878), (19.372, 41.878), (19.304, 42.196), (19.738, 42.688),
+            (19.802, 42.5), (20.071, 42.589), (20.284, 42.32), (20.523, 42.218), (20.59, 41.855),
+            (20.59, 41.855), (20.463, 41.515), (20.605, 41.086), (21.02, 40.843)
+        ],
+    ],
+    'AT': [
+        [
+            (16.98, 48.123), (16.904, 47.715), (16.341, 47.713), (16.534, 47.496), (16.202, 46.852),
+            (16.012, 46.684), (15.137, 46.659), (14.632, 46.432), (13.806, 46.509), (12.376, 46.768),
+            (12.153, 47.115), (11.165, 46.942), (11.049, 46.751), (10.443, 46.894), (9.932, 46.921),
+            (9.48, 47.103), (9.633, 47.348), (9.594, 47.525), (9.896, 47.58), (10.402, 47.302),
+            (10.545, 47.566), (11.426, 47.524), (12.141, 47.703), (12.621, 47.672), (12.933, 47.468),
+            (13.026, 47.638), (12.884, 48.289), (13.243, 48.416), (13.596, 48.877), (14.339, 48.555),
+            (14.901, 48.964), (15.253, 49.039), (16.03, 48.734), (16.499, 48.786), (16.96, 48.597),
+            (16.88, 48.47), (16.98, 48.123)
+        ],
+    ],
+    'BA': [
+        [
+            (18.56, 42.65), (17.675, 43.029), (17.297, 43.446), (16.916, 43.668), (16.456, 44.041),
+            (16.24, 44.351), (15.75, 44.819), (15.959, 45.234), (16.318, 45.004), (16.535, 45.212),
+            (17.002, 45.234), (17.862, 45.068), (18.553, 45.082), (19.005, 44.86), (19.005, 44.86),
+            (19.368, 44.863), (19.118, 44.423), (19.6, 44.038), (19.454, 43.568), (19.219, 43.524),
+            (19.032, 43.433), (18.706, 43.2), (18.56, 42.65)
+        ],
+    ],
+    'BE': [
+        [
+            (6.157, 50.804), (6.043, 50.128), (5.782, 50.09), (5.674, 49.529), (4.799, 49.985),
+            (4.286, 49.907), (3.588, 50.379), (3.123, 50.78), (2.658, 50.797), (2.514, 51.149),
+            (3.315, 51.346), (3.315, 51.346), (3.315, 51.346), (4.047, 51.267), (4.974, 51.475),
+            (5.607, 51.037), (6.157, 50.804)
+        ],
+    ],
+    'BG': [
+        [
+            (22.657, 44.235), (22.945, 43.824), (23.332, 43.897), (24.101, 43.741), (25.569, 43.688),
+            (26.065, 43.943), (27.242, 44.176), (27.97, 43.812), (28.558, 43.707), (28.039, 43.293),
+            (27.674, 42.578), (27.997, 42.007), (27.136, 42.141), (26.117, 41.827), (26.106, 41.329),
+            (25.197, 41.234), (24.493, 41.584), (23.692, 41.309), (22.952, 41.338), (22.881, 41.999),
+            (22.381, 42.32), (22.545, 42.461), (22.437, 42.58), (22.605, 42.899), (22.986, 43.211),
+            (22.5, 43.643), (22.41, 44.008), (22.657, 44.235)
+        ],
+    ],
+    'BY': [
+        [
+            (28.177, 56.169), (29.23, 55.918), (29.372, 55.67), (29.896, 55.789), (30.874, 55.551),
+            (30.972, 55.082), (30.758, 54.812), (31.384, 54.157), (31.791, 53.975), (31.731, 53.794),
+            (32.406, 53.618), (32.694, 53.351), (32.305, 53.133), (31.498, 53.167), (31.305, 53.074),
+            (31.54, 52.742), (31.786, 52.102), (31.786, 52.102), (30.928, 52.042), (30.619, 51.823),
+            (30.555, 51.32), (30.157, 51.416), (29.255, 51.368), (28.993, 51.602), (28.618, 51.428),
+            (28.242, 51.572), (27.454, 51.592), (26.338, 51.832), (25.328, 51.911), (24.553, 51.888),
+            (24.005, 51.617), (23.527, 51.578), (23.508, 52.024), (23.199, 52.487), (23.799, 52.691),
+            (23.805, 53.09), (23.528, 53.47), (23.484, 53.912), (24.451, 53.906), (25.536, 54.282),
+            (25.768, 54.847), (26.588, 55.167), (26.494, 55.615), (27.102, 55.783), (28.177, 56.169)
+        ],
+    ],
+    'CH': [
+        [
+            (9.594, 47.525), (9.633, 47.348), (9.48, 47.103), (9.932, 46.921), (10.443, 46.894),
+            (10.363, 46.484), (9.923, 46.315), (9.183, 46.44), (8.966, 46.037), (8.49, 46.005),
+            (8.317, 46.164), (7.756, 45.824), (7.274, 45.777), (6.844, 45.991), (6.5, 46.43),
+            (6.023, 46.273), (6.037, 46.726), (6.769, 47.288), (6.737, 47.542), (7.192, 47.45),
+            (7.467, 47.621), (8.317, 47.614), (8.523, 47.831), (9.594, 47.525)
+        ],
+    ],
+    'CY': [
+        [
+            (32.732, 35.14), (32.92, 35.088), (33.191, 35.173), (33.384, 35.163), (33.456, 35.101),
+            (33.476, 35.0), (33.526, 35.039), (33.675, 35.018), (33.866, 35.094), (33.974, 35.059),
+            (34.005, 34.978), (32.98, 34.572), (32.49, 34.702), (32.257, 35.103), (32.732, 35.14)
+        ],
+    ],
+    'CZ': [
+        [
+            (15.017, 51.107), (15.491, 50.785), (16.239, 50.698), (16.176, 50.423), (16.719, 50.216),
+            (16.869, 50.474), (17.555, 50.362), (17.649, 50.049), (18.393, 49.989), (18.853, 49.496),
+            (18.555, 49.495), (18.4, 49.315), (18.17, 49.272), (18.105, 49.044), (17.914, 48.996),
+            (17.886, 48.903), (17.545, 48.8), (17.102, 48.817), (16.96, 48.597), (16.499, 48.786),
+            (16.03, 48.734), (15.253, 49.039), (14.901, 48.964), (14.339, 48.555), (13.596, 48.877),
+            (13.031, 49.307), (12.521, 49.547), (12.415, 49.969), (12.24, 50.266), (12.967, 50.484),
+            (13.338, 50.733), (14.056, 50.927), (14.307, 51.117), (14.571, 51.002), (15.017, 51.107)
+        ],
+    ],
+    'DE': [
+        [
+            (14.12, 53.757), (14.353, 53.248), (14.075, 52.981), (14.438, 52.625), (14.685, 52.09),
+            (14.607, 51.745), (15.017, 51.107), (14.571, 51.002), (14.307, 51.117), (14.056, 50.927),
+            (13.338, 50.733), (12.967, 50.484), (12.24, 50.266), (12.415, 49.969), (12.521, 49.547),
+            (13.031, 49.307), (13.596, 48.877), (13.243, 48.416), (12.884, 48.289), (13.026, 47.638),
+            (12.933, 47.468), (12.621, 47.672), (12.141, 47.703), (11.426, 47.524), (10.545, 47.566),
+            (10.402, 47.302), (9.896, 47.58), (9.594, 47.525), (8.523, 47.831), (8.317, 47.614),
+            (7.467, 47.621), (7.594, 48.333), (8.099, 49.018), (6.658, 49.202), (6.186, 49.464),
+            (6.243, 49.902), (6.043, 50.128), (6.157, 50.804), (5.989, 51.852), (6.589, 51.852),
+            (6.843, 52.228), (7.092, 53.144), (6.905, 53.482), (7.1, 53.694), (7.936, 53.748),
+            (8.122, 53.528), (8.801, 54.021), (8.572, 54.396), (8.526, 54.963), (9.282, 54.831),
+            (9.922, 54.983), (9.94, 54.597), (10.95, 54.364), (10.939, 54.009), (11.956, 54.196),
+            (12.518, 54.47), (13.647, 54.076), (14.12, 53.757)
+        ],
+    ],
+    'DK': [
+        [
+            (9.922, 54.983), (9.282, 54.831), (8.526, 54.963), (8.12, 55.518), (8.09, 56.54),
+            (8.257, 56.81), (8.543, 57.11), (9.424, 57.172), (9.776, 57.448), (10.58, 57.73),
+            (10.546, 57.216), (10.25, 56.89), (10.37, 56.61), (10.912, 56.459), (10.668, 56.081),
+            (10.37, 56.19), (9.65, 55.47), (9.922, 54.983)
+        ],
+        [
+            (12.371, 56.111), (12.69, 55.61), (12.09, 54.8), (11.044, 55.365), (10.904, 55.78),
+            (12.371, 56.111)
+        ],
+    ],
+    'EE': [
+        [
+            (27.981, 59.475), (27.981, 59.475), (28.132, 59.301), (27.42, 58.725), (27.717, 57.792),
+            (27.288, 57.475), (26.464, 57.476), (25.603, 57.848), (25.165, 57.97), (24.313, 57.793),
+            (24.429, 58.383), (24.061, 58.257), (23.427, 58.613), (23.34, 59.187), (24.604, 59.466),
+            (25.864, 59.611), (26.949, 59.446), (27.981, 59.475), (27.981, 59.475)
+        ],
+    ],
+    'ES': [
+        [
+            (-7.454, 37.098), (-7.537, 37.429), (-7.167, 37.804), (-7.029, 38.076), (-7.374, 38.373),
+            (-7.098, 39.03), (-7.499, 39.63), (-7.067, 39.712), (-7.026, 40.185), (-6.864, 40.331),
+            (-6.851, 41.111), (-6.389, 41.382), (-6.669, 41.883), (-7.251, 41.918), (-7.423, 41.792),
+            (-8.013, 41.791), (-8.264, 42.28), (-8.672, 42.135), (-9.035, 41.881), (-8.984, 42.593),
+            (-9.393, 43.027), (-7.978, 43.748), (-6.754, 43.568), (-5.412, 43.574), (-4.348, 43.403),
+            (-3.518, 43.456), (-1.901, 43.423), (-1.503, 43.034), (0.338, 42.58), (0.702, 42.796),
+            (1.827, 42.343), (2.986, 42.473), (3.039, 41.892), (2.092, 41.226), (0.811, 41.015),
+            (0.721, 40.678), (0.107, 40.124), (-0.279, 39.31), (0.111, 38.739), (-0.467, 38.292),
+            (-0.683, 37.642), (-1.438, 37.443), (-2.146, 36.674), (-3.416, 36.659), (-4.369, 36.678),
+            (-4.995, 36.325), (-5.377, 35.947), (-5.866, 36.03), (-6.237, 36.368), (-6.52, 36.943),
+            (-7.454, 37.098)
+        ],
+    ],
+    'FI': [
+        [
+            (28.592, 69.065), (28.446, 68.365), (29.977, 67.698), (29.055, 66.944), (30.218, 65.806),
+            (29.544, 64.949), (30.445, 64.204), (30.036, 63.553), (31.516, 62.868), (31.14, 62.358),
+            (30.211, 61.78), (28.07, 60.504), (28.07, 60.504), (28.07, 60.504), (26.255, 60.424),
+            (24.497, 60.057), (22.87, 59.846), (22.291, 60.392), (21.322, 60.72), (21.545, 61.705),
+            (21.059, 62.607), (21.536, 63.19), (22.443, 63.818), (24.731, 64.902), (25.398, 65.111),
+            (25.294, 65.534), (23.903, 66.007), (23.566, 66.396), (23.539, 67.936), (21.979, 68.617),
+            (20.646, 69.106), (21.245, 69.37), (22.356, 68.842), (23.662, 68.891), (24.736, 68.65),
+            (25.689, 69.092), (26.18, 69.825), (27.732, 70.164), (29.016, 69.766), (28.592, 69.065)
+        ],
+    ],
+    'FR': [
+        [
+            (6.186, 49.464), (6.658, 49.202), (8.099, 49.018), (7.594, 48.333), (7.467, 47.621),
+            (7.192, 47.45), (6.737, 47.542), (6.769, 47.288), (6.037, 46.726), (6.023, 46.273),
+            (6.5, 46.43), (6.844, 45.991), (6.802, 45.709), (7.097, 45.333), (6.75, 45.029),
+            (7.008, 44.255), (7.55, 44.128), (7.435, 43.694), (6.529, 43.129), (4.557, 43.4),
+            (3.1, 43.075), (2.986, 42.473), (1.827, 42.343), (0.702, 42.796), (0.338, 42.58),
+            (-1.503, 43.034), (-1.901, 43.423), (-1.384, 44.023), (-1.194, 46.015), (-2.226, 47.064),
+            (-2.963, 47.57), (-4.492, 47.955), (-4.592, 48.684), (-3.296, 48.902), (-1.617, 48.644),
+            (-1.933, 49.776), (-0.989, 49.347), (1.339, 50.127), (1.639, 50.947), (2.514, 51.149),
+            (2.658, 50.797), (3.123, 50.78), (3.588, 50.379), (4.286, 49.907), (4.799, 49.985),
+            (5.674, 49.529), (5.898, 49.443), (6.186, 49.464)
+        ],
+        [
+            (8.746, 42.628), (9.39, 43.01), (9.56, 42.152), (9.23, 41.38), (8.776, 41.584),
+            (8.544, 42.257), (8.746, 42.628)
+        ],
+    ],
+    'GB': [
+        [
+            (-6.198, 53.868), (-6.954, 54.074), (-7.572, 54.06), (-7.366, 54.596), (-7.572, 55.132),
+            (-6.734, 55.173), (-5.662, 54.555), (-6.198, 53.868)
+        ],
+        [
+            (-3.094, 53.405), (-3.092, 53.404), (-2.945, 53.985), (-3.615, 54.601), (-3.63, 54.615),
+            (-4.844, 54.791), (-5.083, 55.062), (-4.719, 55.508), (-5.048, 55.784), (-5.586, 55.311),
+            (-5.645, 56.275), (-6.15, 56.785), (-5.787, 57.819), (-5.01, 58.63), (-4.211, 58.551),
+            (-3.005, 58.635), (-4.074, 57.553), (-3.055, 57.69), (-1.959, 57.685), (-2.22, 56.87),
+            (-3.119, 55.974), (-2.085, 55.91), (-2.006, 55.805), (-1.115, 54.625), (-0.43, 54.464),
+            (0.185, 53.325), (0.47, 52.93), (1.682, 52.74), (1.56, 52.1), (1.051, 51.807), (1.45, 51.289),
+            (0.55, 50.766), (-0.788, 50.775), (-2.49, 50.5), (-2.956, 50.697), (-3.617, 50.228),
+            (-4.543, 50.342), (-5.245, 49.96), (-5.777, 50.16), (-4.31, 51.21), (-3.415, 51.426),
+            (-3.423, 51.427), (-4.984, 51.593), (-5.267, 51.991), (-4.222, 52.301), (-4.77, 52.84),
+            (-4.58, 53.495), (-3.094, 53.405)
+        ],
+    ],
+    'GE': [
+        [
+            (39.955, 43.435), (40.077, 43.553), (40.922, 43.382), (42.394, 43.22), (43.756, 42.741),
+            (43.931, 42.555), (44.538, 42.712), (45.47, 42.503), (45.776, 42.092), (46.405, 41.861),
+            (46.145, 41.723), (46.638, 41.182), (46.502, 41.064), (45.963, 41.124), (45.217, 41.411),
+            (44.972, 41.248), (43.583, 41.092), (42.62, 41.583), (41.554, 41.536), (41.703, 41.963),
+            (41.453, 42.645), (40.875, 43.014), (40.321, 43.129), (39.955, 43.435)
+        ],
+    ],
+    'GR': [
+        [
+            (26.29, 35.3), (26.165, 35.005), (24.725, 34.92), (24.735, 35.085), (23.515, 35.28),
+            (23.7, 35.705), (24.247, 35.368), (25.025, 35.425), (25.769, 35.354), (25.745, 35.18),
+            (26.29, 35.3)
+        ],
+        [
+            (22.952, 41.338), (23.692, 41.309), (24.493, 41.584), (25.197, 41.234), (26.106, 41.329),
+            (26.117, 41.827), (26.604, 41.562), (26.295, 40.936), (26.057, 40.824), (25.448, 40.853),
+            (24.926, 40.947), (23.715, 40.687), (24.408, 40.125), (23.9, 39.962), (23.343, 39.961),
+            (22.814, 40.476), (22.626, 40.257), (22.85, 39.659), (23.35, 39.19), (22.973, 38.971),
+            (23.53, 38.51), (24.025, 38.22), (24.04, 37.655), (23.115, 37.92), (23.41, 37.41),
+            (22.775, 37.305), (23.154, 36.423), (22.49, 36.41), (21.67, 36.845), (21.295, 37.645),
+            (21.12, 38.31), (20.73, 38.77), (20.218, 39.34), (20.15, 39.625), (20.615, 40.11),
+            (20.675, 40.435), (21.0, 40.58), (21.02, 40.843), (21.674, 40.931), (22.055, 41.15),
+            (22.597, 41.13), (22.762, 41.305), (22.952, 41.338)
+        ],
+    ],
+    'HR': [
+        [
+            (16.565, 46.504), (16.883, 46.381), (17.63, 45.952), (18.456, 45.759), (18.83, 45.909),
+            (19.073, 45.522), (19.39, 45.237), (19.005, 44.86), (18.553, 45.082), (17.862, 45.068),
+            (17.002, 45.234), (16.535, 45.212), (16.318, 45.004), (15.959, 45.234), (15.75, 44.819),
+            (16.24, 44.351), (16.456, 44.041), (16.916, 43.668), (17.297, 43.446), (17.675, 43.029),
+            (18.56, 42.65), (18.45, 42.48), (18.45, 42.48), (17.51, 42.85), (16.93, 43.21),
+            (16.015, 43.507), (15.174, 44.243), (15.376, 44.318), (14.92, 44.738), (14.902, 45.076),
+            (14.259, 45.234), (13.952, 44.802), (13.657, 45.137), (13.679, 45.484), (13.715, 45.5),
+            (14.412, 45.466), (14.595, 45.635), (14.935, 45.472), (15.328, 45.452), (15.324, 45.732),
+            (15.672, 45.834), (15.769, 46.238), (16.565, 46.504)
+        ],
+    ],
+    'HU': [
+        [
+            (22.086, 48.422), (22.641, 48.15), (22.711, 47.882), (22.1, 47.672), (21.627, 46.994),
+            (21.022, 46.316), (20.22, 46.127), (19.596, 46.172), (18.83, 45.909), (18.83, 45.909),
+            (18.456, 45.759), (17.63, 45.952), (16.883, 46.381), (16.565, 46.504), (16.371, 46.841),
+            (16.202, 46.852), (16.534, 47.496), (16.341, 47.713), (16.904, 47.715), (16.98, 48.123),
+            (17.488, 47.867), (17.857, 47.758), (18.697, 47.881), (18.777, 48.082), (19.174, 48.111),
+            (19.661, 48.267), (19.769, 48.203), (20.239, 48.328), (20.474, 48.563), (20.801, 48.624),
+            (21.872, 48.32), (22.086, 48.422)
+        ],
+    ],
+    'IE': [
+        [
+            (-6.198, 53.868), (-6.033, 53.153), (-6.789, 52.26), (-8.562, 51.669), (-9.977, 51.82),
+            (-9.166, 52.865), (-9.689, 53.881), (-8.328, 54.665), (-7.572, 55.132), (-7.366, 54.596),
+            (-7.572, 54.06), (-6.954, 54.074), (-6.198, 53.868)
+        ],
+    ],
+    'IS': [
+        [
+            (-14.509, 66.456), (-14.74, 65.809), (-13.61, 65.127), (-14.91, 64.364), (-17.794, 63.679),
+            (-18.656, 63.496), (-19.973, 63.644), (-22.763, 63.96), (-21.778, 64.402), (-23.955, 64.891),
+            (-22.184, 65.085), (-22.227, 65.379), (-24.326, 65.611), (-23.651, 66.263), (-22.135, 66.41),
+            (-20.576, 65.732), (-19.057, 66.277), (-17.799, 65.994), (-16.168, 66.527), (-14.509, 66.456)
+        ],
+    ],
+    'IT': [
+        [
+            (10.443, 46.894), (11.049, 46.751), (11.165, 46.942), (12.153, 47.115), (12.376, 46.768),
+            (13.806, 46.509), (13.698, 46.017), (13.938, 45.591), (13.142, 45.737), (12.329, 45.382),
+            (12.384, 44.885), (12.261, 44.6), (12.589, 44.091), (13.527, 43.588), (14.03, 42.761),
+            (15.143, 41.955), (15.926, 41.961), (16.17, 41.74), (15.889, 41.541), (16.785, 41.18),
+            (17.519, 40.877), (18.377, 40.356), (18.48, 40.169), (18.293, 39.811), (17.738, 40.278),
+            (16.87, 40.442), (16.449, 39.795), (17.171, 39.425), (17.053, 38.903), (16.635, 38.844),
+            (16.101, 37.986), (15.684, 37.909), (15.688, 38.215), (15.892, 38.751), (16.109, 38.965),
+            (15.719, 39.544), (15.414, 40.048), (14.998, 40.173), (14.703, 40.605), (14.061, 40.786),
+            (13.628, 41.188), (12.888, 41.253), (12.107, 41.705), (11.192, 42.355), (10.512, 42.931),
+            (10.2, 43.92), (9.702, 44.036), (8.889, 44.366), (8.429, 44.231), (7.851, 43.767),
+            (7.435, 43.694), (7.55, 44.128), (7.008, 44.255), (6.75, 45.029), (7.097, 45.333),
+            (6.802, 45.709), (6.844, 45.991), (7.274, 45.777), (7.756, 45.824), (8.317, 46.164),
+            (8.49, 46.005), (8.966, 46.037), (9.183, 46.44), (9.923, 46.315), (10.363, 46.484),
+            (10.443, 46.894)
+        ],
+        [
+            (14.761, 38.144), (15.52, 38.231), (15.16, 37.444), (15.31, 37.134), (15.1, 36.62),
+            (14.335, 36.997), (13.827, 37.105), (12.431, 37.613), (12.571, 38.126), (13.741, 38.035),
+            (14.761, 38.144)
+        ],
+        [
+            (8.71, 40.9), (9.21, 41.21), (9.81, 40.5), (9.67, 39.177), (9.215, 39.24), (8.807, 38.907),
+            (8.428, 39.172), (8.388, 40.378), (8.16, 40.95), (8.71, 40.9)
+        ],
+    ],
+    'LT': [
+        [
+            (26.494, 55.615), (26.588, 55.167), (25.768, 54.847), (25.536, 54.282), (24.451, 53.906),
+            (23.484, 53.912), (23.244, 54.221), (22.731, 54.328), (22.651, 54.583), (22.758, 54.857),
+            (22.316, 55.015), (21.268, 55.19), (21.056, 56.031), (22.201, 56.338), (23.878, 56.274),
+            (24.861, 56.373), (25.001, 56.165), (25.533, 56.1), (26.494, 55.615)
+        ],
+    ],
+    'LU': [
+        [
+            (6.043, 50.128), (6.243, 49.902), (6.186, 49.464), (5.898, 49.443), (5.674, 49.529),
+            (5.782, 50.09), (6.043, 50.128)
+        ],
+    ],
+    'LV': [
+        [
+            (27.288, 57.475), (27.77, 57.244), (27.855, 56.759), (28.177, 56.169), (27.102, 55.783),
+            (26.494, 55.615), (25.533, 56.1), (25.001, 56.165), (24.861, 56.373), (23.878, 56.274),
+            (22.201, 56.338), (21.056, 56.031), (21.09, 56.784), (21.582, 57.412), (22.524, 57.753),
+            (23.318, 57.006), (24.121, 57.026), (24.313, 57.793), (25.165, 57.97), (25.603, 57.848),
+            (26.464, 57.476), (27.288, 57.475)
+        ],
+    ],
+    'MD': [
+        [
+            (26.619, 48.221), (26.858, 48.368), (27.523, 48.467), (28.26, 48.156), (28.671, 48.118),
+            (29.123, 47.849), (29.051, 47.51), (29.415, 47.347), (29.56, 46.929), (29.909, 46.674),
+            (29.838, 46.525), (30.025, 46.424), (29.76, 46.35), (29.171, 46.379), (29.072, 46.518),
+            (28.863, 46.438), (28.934, 46.259), (28.66, 45.94), (28.485, 45.597), (28.234, 45.488),
+            (28.054, 45.945), (28.16, 46.372), (28.128, 46.81), (27.551, 47.405), (27.234, 47.827),
+            (26.924, 48.123), (26.619, 48.221)
+        ],
+    ],
+    'ME': [
+        [
+            (20.071, 42.589), (19.802, 42.5), (19.738, 42.688), (19.304, 42.196), (19.372, 41.878),
+            (19.162, 41.955), (18.882, 42.282), (18.45, 42.48), (18.56, 42.65), (18.706, 43.2),
+            (19.032, 43.433), (19.219, 43.524), (19.484, 43.352), (19.63, 43.214), (19.959, 43.106),
+            (20.34, 42.899), (20.258, 42.813), (20.071, 42.589)
+        ],
+    ],
+    'MK': [
+        [
+            (22.381, 42.32), (22.881, 41.999), (22.952, 41.338), (22.762, 41.305), (22.597, 41.13),
+            (22.055, 41.15), (21.674, 40.931), (21.02, 40.843), (20.605, 41.086), (20.463, 41.515),
+            (20.59, 41.855), (20.59, 41.855), (20.717, 41.847), (20.762, 42.052), (21.353, 42.207),
+            (21.577, 42.245), (21.917, 42.304), (22.381, 42.32)
+        ],
+    ],
+    'NL': [
+        [
+            (6.905, 53.482), (7.092, 53.144), (6.843, 52.228), (6.589, 51.852), (5.989, 51.852),
+            (6.157, 50.804), (5.607, 51.037), (4.974, 51.475), (4.047, 51.267), (3.315, 51.346),
+            (3.315, 51.346), (3.83, 51.621), (4.706, 53.092), (6.074, 53.51), (6.905, 53.482)
+        ],
+    ],
+    'NO': [
+        [
+            (15.143, 79.674), (15.523, 80.016), (16.991, 80.051), (18.252, 79.702), (21.544, 78.956),
+            (19.027, 78.563), (18.472, 77.827), (17.594, 77.638), (17.118, 76.809), (15.913, 76.77),
+            (13.763, 77.38), (14.67, 77.736), (13.171, 78.025), (11.222, 78.869), (10.445, 79.652),
+            (13.171, 80.01), (13.719, 79.66), (15.143, 79.674)
+        ],
+        [
+            (31.101, 69.558), (29.4, 69.157), (28.592, 69.065), (29.016, 69.766), (27.732, 70.164),
+            (26.18, 69.825), (25.689, 69.092), (24.736, 68.65), (23.662, 68.891), (22.356, 68.842),
+            (21.245, 69.37), (20.646, 69.106), (20.025, 69.065), (19.879, 68.407), (17.994, 68.567),
+            (17.729, 68.011), (16.769, 68.014), (16.109, 67.302), (15.108, 66.194), (13.556, 64.787),
+            (13.92, 64.445), (13.572, 64.049), (12.58, 64.066), (11.931, 63.128), (11.992, 61.8),
+            (12.631, 61.294), (12.3, 60.118), (11.468, 59.432), (11.027, 58.856), (10.357, 59.47),
+            (8.382, 58.313), (7.049, 58.079), (5.666, 58.588), (5.308, 59.663), (4.992, 61.971),
+            (5.913, 62.614), (8.553, 63.454), (10.528, 64.486), (12.358, 65.88), (14.761, 67.811),
+            (16.436, 68.563), (19.184, 69.817), (21.378, 70.255), (23.024, 70.202), (24.547, 71.03),
+            (26.37, 70.986), (28.166, 71.185), (31.293, 70.454), (30.005, 70.186), (31.101, 69.558)
+        ],
+        [
+            (27.408, 80.056), (25.925, 79.518), (23.024, 79.4), (20.075, 79.567), (19.897, 79.842),
+            (18.462, 79.86), (17.368, 80.319), (20.456, 80.598), (21.908, 80.358), (22.919, 80.657),
+            (25.448, 80.407), (27.408, 80.056)
+        ],
+        [
+            (24.724, 77.854), (22.49, 77.445), (20.726, 77.677), (21.416, 77.935), (20.812, 78.255),
+            (22.884, 78.455), (23.281, 78.08), (24.724, 77.854)
+        ],
+    ],
+    'PL': [
+        [
+            (23.484, 53.912), (23.528, 53.47), (23.805, 53.09), (23.799, 52.691), (23.199, 52.487),
+            (23.508, 52.024), (23.527, 51.578), (24.03, 50.705), (23.923, 50.425), (23.427, 50.309),
+            (22.518, 49.477), (22.776, 49.027), (22.558, 49.086), (21.608, 49.47), (20.888, 49.329),
+            (20.416, 49.431), (19.825, 49.217), (19.321, 49.572), (18.91, 49.436), (18.853, 49.496),
+            (18.393, 49.989), (17.649, 50.049), (17.555, 50.362), (16.869, 50.474), (16.719, 50.216),
+            (16.176, 50.423), (16.239, 50.698), (15.491, 50.785), (15.017, 51.107), (14.607, 51.745),
+            (14.685, 52.09), (14.438, 52.625), (14.075, 52.981), (14.353, 53.248), (14.12, 53.757),
+            (14.803, 54.051), (16.363, 54.513), (17.623, 54.852), (18.621, 54.683), (18.696, 54.439),
+            (19.661, 54.426), (20.892, 54.313), (22.731, 54.328), (23.244, 54.221), (23.484, 53.912)
+        ],
+    ],
+    'PT': [
+        [
+            (-9.035, 41.881), (-8.672, 42.135), (-8.264, 42.28), (-8.013, 41.791), (-7.423, 41.792),
+            (-7.251, 41.918), (-6.669, 41.883), (-6.389, 41.382), (-6.851, 41.111), (-6.864, 40.331),
+            (-7.026, 40.185), (-7.067, 39.712), (-7.499, 39.63), (-7.098, 39.03), (-7.374, 38.373),
+            (-7.029, 38.076), (-7.167, 37.804), (-7.537, 37.429), (-7.454, 37.098), (-7.856, 36.838),
+            (-8.383, 36.979), (-8.899, 36.869), (-8.746, 37.651), (-8.84, 38.266), (-9.287, 38.358),
+            (-9.527, 38.737), (-9.447, 39.392), (-9.048, 39.755), (-8.977, 40.159), (-8.769, 40.761),
+            (-8.791, 41.184), (-8.991, 41.543), (-9.035, 41.881)
+        ],
+    ],
+    'RO': [
+        [
+            (28.234, 45.488), (28.68, 45.304), (29.15, 45.465), (29.603, 45.293), (29.627, 45.035),
+            (29.142, 44.82), (28.838, 44.914), (28.558, 43.707), (27.97, 43.812), (27.242, 44.176),
+            (26.065, 43.943), (25.569, 43.688), (24.101, 43.741), (23.332, 43.897), (22.945, 43.824),
+            (22.657, 44.235), (22.474, 44.409), (22.706, 44.578), (22.459, 44.703), (22.145, 44.478),
+            (21.562, 44.769), (21.484, 45.181), (20.874, 45.416), (20.762, 45.735), (20.22, 46.127),
+            (21.022, 46.316), (21.627, 46.994), (22.1, 47.672), (22.711, 47.882), (23.142, 48.096),
+            (23.761, 47.986), (24.402, 47.982), (24.866, 47.738), (25.208, 47.891), (25.946, 47.987),
+            (26.197, 48.221), (26.619, 48.221), (26.924, 48.123), (27.234, 47.827), (27.551, 47.405),
+            (28.128, 46.81), (28.16, 46.372), (28.054, 45.945), (28.234, 45.488)
+        ],
+    ],
+    'RS': [
+        [
+            (18.83, 45.909), (18.83, 45.909), (19.596, 46.172), (20.22, 46.127), (20.762, 45.735),
+            (20.874, 45.416), (21.484, 45.181), (21.562, 44.769), (22.145, 44.478), (22.459, 44.703),
+            (22.706, 44.578), (22.474, 44.409), (22.657, 44.235), (22.41, 44.008), (22.5, 43.643),
+            (22.986, 43.211), (22.605, 42.899), (22.437, 42.58), (22.545, 42.461), (22.381, 42.32),
+            (21.917, 42.304), (21.577, 42.245), (21.543, 42.32), (21.663, 42.439), (21.775, 42.683),
+            (21.633, 42.677), (21.439, 42.863), (21.274, 42.91), (21.143, 43.069), (20.957, 43.131),
+            (20.814, 43.272), (20.635, 43.217), (20.497, 42.885), (20.258, 42.813), (20.34, 42.899),
+            (19.959, 43.106), (19.63, 43.214), (19.484, 43.352), (19.219, 43.524), (19.454, 43.568),
+            (19.6, 44.038), (19.118, 44.423), (19.368, 44.863), (19.005, 44.86), (19.005, 44.86),
+            (19.39, 45.237), (19.073, 45.522), (18.83, 45.909)
+        ],
+    ],
+    'RU': [
+        [
+            (46.799, 80.772), (48.318, 80.784), (48.523, 80.515), (49.097, 80.754), (50.04, 80.919),
+            (51.523, 80.7), (51.136, 80.547), (49.794, 80.415), (48.894, 80.34), (48.755, 80.175),
+            (47.586, 80.01), (46.503, 80.247), (47.072, 80.559), (44.847, 80.59), (46.799, 80.772)
+        ],
+        [
+            (20.892, 54.313), (19.661, 54.426), (19.888, 54.866), (21.268, 55.19), (22.316, 55.015),
+            (22.758, 54.857), (22.651, 54.583), (22.731, 54.328), (20.892, 54.313)
+        ],
+        [
+            (55.902, 74.627), (55.632, 75.081), (57.869, 75.609), (61.17, 76.252), (64.498, 76.439),
+            (66.211, 76.81), (68.157, 76.94), (68.852, 76.545), (68.181, 76.234), (64.637, 75.738),
+            (61.584, 75.261), (58.477, 74.309), (56.987, 73.333), (55.419, 72.371), (55.623, 71.541),
+            (57.536, 70.72), (56.945, 70.633), (53.677, 70.763), (53.412, 71.207), (51.602, 71.475),
+            (51.456, 72.015), (52.478, 72.229), (52.444, 72.775), (54.428, 73.628), (53.508, 73.75),
+            (55.902, 74.627)
+        ],
+    ],
+    'SE': [
+        [
+            (11.027, 58.856), (11.468, 59.432), (12.3, 60.118), (12.631, 61.294), (11.992, 61.8),
+            (11.931, 63.128), (12.58, 64.066), (13.572, 64.049), (13.92, 64.445), (13.556, 64.787),
+            (15.108, 66.194), (16.109, 67.302), (16.769, 68.014), (17.729, 68.011), (17.994, 68.567),
+            (19.879, 68.407), (20.025, 69.065), (20.646, 69.106), (21.979, 68.617), (23.539, 67.936),
+            (23.566, 66.396), (23.903, 66.007), (22.183, 65.724), (21.214, 65.026), (21.37, 64.414),
+            (19.779, 63.61), (17.848, 62.749), (17.12, 61.341), (17.831, 60.637), (18.788, 60.082),
+            (17.869, 58.954), (16.829, 58.72), (16.448, 57.041), (15.88, 56.104), (14.667, 56.201),
+            (14.101, 55.408), (12.943, 55.362), (12.625, 56.307), (11.788, 57.442), (11.027, 58.856)
+        ],
+    ],
+    'SI': [
+        [
+            (13.806, 46.509), (14.632, 46.432), (15.137, 46.659), (16.012, 46.684), (16.202, 46.852),
+            (16.371, 46.841), (16.565, 46.504), (15.769, 46.238), (15.672, 45.834), (15.324, 45.732),
+            (15.328, 45.452), (14.935, 45.472), (14.595, 45.635), (14.412, 45.466), (13.715, 45.5),
+            (13.938, 45.591), (13.698, 46.017), (13.806, 46.509)
+        ],
+    ],
+    'SK': [
+        [
+            (22.558, 49.086), (22.281, 48.825), (22.086, 48.422), (21.872, 48.32), (20.801, 48.624),
+            (20.474, 48.563), (20.239, 48.328), (19.769, 48.203), (19.661, 48.267), (19.174, 48.111),
+            (18.777, 48.082), (18.697, 47.881), (17.857, 47.758), (17.488, 47.867), (16.98, 48.123),
+            (16.88, 48.47), (16.96, 48.597), (17.102, 48.817), (17.545, 48.8), (17.886, 48.903),
+            (17.914, 48.996), (18.105, 49.044), (18.17, 49.272), (18.4, 49.315), (18.555, 49.495),
+            (18.853, 49.496), (18.91, 49.436), (19.321, 49.572), (19.825, 49.217), (20.416, 49.431),
+            (20.888, 49.329), (21.608, 49.47), (22.558, 49.086)
+        ],
+    ],
+    'TR': [
+        [
+            (44.773, 37.17), (44.293, 37.002), (43.942, 37.256), (42.779, 37.385), (42.35, 37.23),
+            (41.212, 37.074), (40.673, 37.091), (39.523, 36.716), (38.7, 36.713), (38.168, 36.901),
+            (37.067, 36.623), (36.739, 36.818), (36.685, 36.26), (36.418, 36.041), (36.15, 35.822),
+            (35.782, 36.275), (36.161, 36.651), (35.551, 36.565), (34.715, 36.796), (34.027, 36.22),
+            (32.509, 36.108), (31.7, 36.644), (30.622, 36.678), (30.391, 36.263), (29.7, 36.144),
+            (28.733, 36.677), (27.641, 36.659), (27.049, 37.653), (26.318, 38.208), (26.805, 38.986),
+            (26.171, 39.464), (27.28, 40.42), (28.82, 40.46), (29.24, 41.22), (31.146, 41.088),
+            (32.348, 41.736), (33.513, 42.019), (35.168, 42.04), (36.913, 41.335), (38.348, 40.949),
+            (39.513, 41.103), (40.373, 41.014), (41.554, 41.536), (42.62, 41.583), (43.583, 41.092),
+            (43.753, 40.74), (43.656, 40.254), (44.4, 40.005), (44.794, 39.713), (44.109, 39.428),
+            (44.421, 38.281), (44.226, 37.972), (44.773, 37.17), (44.773, 37.17)
+        ],
+        [
+            (26.117, 41.827), (27.136, 42.141), (27.997, 42.007), (28.116, 41.623), (28.988, 41.3),
+            (28.806, 41.055), (27.619, 41.0), (27.192, 40.691), (26.358, 40.152), (26.043, 40.618),
+            (26.057, 40.824), (26.295, 40.936), (26.604, 41.562), (26.117, 41.827)
+        ],
+    ],
+    'UA': [
+        [
+            (32.159, 52.061), (32.412, 52.289), (32.716, 52.238), (33.753, 52.335), (34.392, 51.769),
+            (34.142, 51.566), (34.225, 51.256), (35.022, 51.208), (35.378, 50.774), (35.356, 50.577),
+            (36.626, 50.226), (37.393, 50.384), (38.011, 49.916), (38.595, 49.926), (40.069, 49.601),
+            (40.081, 49.307), (39.675, 48.784), (39.896, 48.232), (39.738, 47.899), (38.771, 47.826),
+            (38.255, 47.546), (38.224, 47.102), (37.425, 47.022), (36.76, 46.699), (35.824, 46.646),
+            (34.962, 46.273), (35.013, 45.738), (35.021, 45.651), (35.51, 45.41), (36.53, 45.47),
+            (36.335, 45.113), (35.24, 44.94), (33.883, 44.361), (33.326, 44.565), (33.547, 45.035),
+            (32.454, 45.327), (32.631, 45.519), (33.588, 45.852), (33.436, 45.972), (33.299, 46.081),
+            (31.744, 46.333), (31.675, 46.706), (30.749, 46.583), (30.378, 46.032), (29.603, 45.293),
+            (29.15, 45.465), (28.68, 45.304), (28.234, 45.488), (28.485, 45.597), (28.66, 45.94),
+            (28.934, 46.259), (28.863, 46.438), (29.072, 46.518), (29.171, 46.379), (29.76, 46.35),
+            (30.025, 46.424), (29.838, 46.525), (29.909, 46.674), (29.56, 46.929), (29.415, 47.347),
+            (29.051, 47.51), (29.123, 47.849), (28.671, 48.118), (28.26, 48.156), (27.523, 48.467),
+            (26.858, 48.368), (26.619, 48.221), (26.197, 48.221), (25.946, 47.987), (25.208, 47.891),
+            (24.866, 47.738), (24.402, 47.982), (23.761, 47.986), (23.142, 48.096), (22.711, 47.882),
+            (22.641, 48.15), (22.086, 48.422), (22.281, 48.825), (22.558, 49.086), (22.776, 49.027),
+            (22.518, 49.477), (23.427, 50.309), (23.923, 50.425), (24.03, 50.705), (23.527, 51.578),
+            (24.005, 51.617), (24.553, 51.888), (25.328, 51.911), (26.338, 51.832), (27.454, 51.592),
+            (28.242, 51.572), (28.618, 51.428), (28.993, 51.602), (29.255, 51.368), (30.157, 51.416),
+            (30.555, 51.32), (30.619, 51.823), (30.928, 52.042), (31.786, 52.102), (32.159, 52.061)
+        ],
+    ],
+    'XK': [
+        [
+            (20.59, 41.855), (20.523, 42.218), (20.284, 42.32), (20.071, 42.589), (20.258, 42.813),
+            (20.497, 42.885), (20.635, 43.217), (20.814, 43.272), (20.957, 43.131), (21.143, 43.069),
+            (21.274, 42.91), (21.439, 42.863), (21.633, 42.677), (21.775, 42.683), (21.663, 42.439),
+            (21.543, 42.32), (21.577, 42.245), (21.353, 42.207), (20.762, 42.052), (20.717, 41.847),
+            (20.59, 41.855)
+        ],
+    ],
+}
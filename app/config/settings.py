@@ -14,6 +14,13 @@ PTV_API_KEY = os.environ.get(
     "RVVfZmQ1YTcyY2E4ZjNiNDhmOTlhYjE5NjRmNGZhYTdlNTc6NGUyM2VhMmEtZTc2YS00YmVkLWIyMTMtZDc2YjE0NWZjZjE1"
 )
 
+# Adres bazowy PTV API (np. lokalny serwer-zaślepka w benchmarkach)
+PTV_API_BASE_URL = os.environ.get('PTV_API_BASE_URL', 'https://api.myptv.com').rstrip('/')
+
+# Serwer Nominatim (OpenStreetMap): domena i protokół
+NOMINATIM_DOMAIN = os.environ.get('NOMINATIM_DOMAIN', 'nominatim.openstreetmap.org')
+NOMINATIM_SCHEME = os.environ.get('NOMINATIM_SCHEME', 'https')
+
 # === USTAWIENIA ROUTINGU ===
 # Tryb wyznaczania trasy: FAST, ECO, SHORT
 DEFAULT_ROUTING_MODE = os.environ.get('DEFAULT_ROUTING_MODE', "FAST")
@@ -29,17 +36,87 @@ DEFAULT_DRIVER_COST = float(os.environ.get('DEFAULT_DRIVER_COST', '0'))
 # Maksymalny czas życia sesji użytkownika [godziny]
 SESSION_MAX_AGE_HOURS = int(os.environ.get('SESSION_MAX_AGE_HOURS', '24'))
 
+# === USTAWIENIA KOLEJKI ZADAŃ ===
+# Backend kolejki: 'sqlite' (trwały) lub 'memory' (testy, praca lokalna)
+JOB_QUEUE_BACKEND = os.environ.get('JOB_QUEUE_BACKEND', 'sqlite')
+# Ścieżka do bazy SQLite z zadaniami
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', 'jobs.db')
+# Liczba równolegle przetwarzanych przetargów
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+# Ścieżka do bazy SQLite z wynikami wierszy (checkpointy do wznawiania zadań)
+CHECKPOINT_DB_PATH = os.environ.get('CHECKPOINT_DB_PATH', 'job_checkpoints.db')
+# Czas przechowywania zakończonych zadań i ich checkpointów [godziny]
+JOB_RETENTION_HOURS = int(os.environ.get('JOB_RETENTION_HOURS', '48'))
+
+# === USTAWIENIA LICZNIKA ZAPYTAŃ PTV ===
+# Ścieżka do bazy SQLite z dziennymi licznikami zapytań PTV (backend jak kolejka zadań)
+API_USAGE_DB_PATH = os.environ.get('API_USAGE_DB_PATH', 'api_usage.db')
+# Co ile sekund liczniki zapisywane są do bazy
+API_USAGE_FLUSH_SECONDS = float(os.environ.get('API_USAGE_FLUSH_SECONDS', '10'))
+# Limit płatnych zapytań PTV na jedno zadanie - po przekroczeniu zadanie jest przerywane (0 - bez limitu)
+PTV_CALLS_PER_JOB_LIMIT = int(os.environ.get('PTV_CALLS_PER_JOB_LIMIT', '0'))
+
 # === USTAWIENIA CACHE ===
 # Ścieżki do katalogów cache
 GEO_CACHE_DIR = os.environ.get('GEO_CACHE_DIR', 'geo_cache')
 ROUTE_CACHE_DIR = os.environ.get('ROUTE_CACHE_DIR', 'route_cache')
 LOCATIONS_CACHE_DIR = os.environ.get('LOCATIONS_CACHE_DIR', 'locations_cache')
+# Plik kopii zapasowej cache tras PTV (zwarte rekordy tras)
+PTV_ROUTE_CACHE_FILE = os.environ.get('PTV_ROUTE_CACHE_FILE', 'ptv_route_cache.bin')
+# Liczba zdekodowanych polyline trzymanych w pamięci (współdzielone przez mapy, GB, podział na kraje)
+POLYLINE_CACHE_SIZE = int(os.environ.get('POLYLINE_CACHE_SIZE', '256'))
+# Trasy na tyle godzin przed wygaśnięciem (7 dni) są odświeżane w tle przy odczycie
+ROUTE_CACHE_REFRESH_AHEAD_HOURS = float(os.environ.get('ROUTE_CACHE_REFRESH_AHEAD_HOURS', '24'))
+# Przez tyle dni po wygaśnięciu trasa zwracana jest jako nieaktualna ('stale') i odświeżana w tle
+ROUTE_CACHE_STALE_DAYS = float(os.environ.get('ROUTE_CACHE_STALE_DAYS', '7'))
+# Limit odświeżeń tras w tle na godzinę (0 - bez limitu)
+ROUTE_CACHE_REFRESH_BUDGET_PER_HOUR = int(os.environ.get('ROUTE_CACHE_REFRESH_BUDGET_PER_HOUR', '200'))
+# Maksymalna liczba odświeżeń oczekujących w kolejce PTV - nie opóźniają zapytań użytkowników
+ROUTE_CACHE_REFRESH_MAX_PENDING = int(os.environ.get('ROUTE_CACHE_REFRESH_MAX_PENDING', '2'))
+# Liczba relacji, dla których pamiętane są wyniki stawek historycznych i regionalnych (wspólne dla zadań)
+RATES_MEMO_SIZE = int(os.environ.get('RATES_MEMO_SIZE', '20000'))
+# Katalog kolumnowych kopii plików stawek historycznych (.npy, jedna na wersję pliku)
+RATES_SIDECAR_DIR = os.environ.get('RATES_SIDECAR_DIR', 'rates_cache')
+
+# === USTAWIENIA BAZY STAWEK ===
+# Backend stawek historycznych: 'excel' (tabele z plików xlsx w pamięci) lub 'sqlite' (zapytania z indeksami)
+RATES_BACKEND = os.environ.get('RATES_BACKEND', 'excel')
+# Ścieżka do bazy SQLite ze stawkami (import z plików xlsx przy zmianie ich zawartości)
+RATES_DB_PATH = os.environ.get('RATES_DB_PATH', 'historical_rates.db')
+
+# === USTAWIENIA ROZGRZEWANIA CACHE ===
+# Codzienne rozgrzewanie cache tras dla najczęstszych relacji historycznych
+CACHE_WARMUP_ENABLED = os.environ.get('CACHE_WARMUP_ENABLED', 'true').lower() == 'true'
+# Godzina uruchomienia (czas lokalny serwera, poza godzinami pracy)
+CACHE_WARMUP_HOUR = int(os.environ.get('CACHE_WARMUP_HOUR', '3'))
+# Liczba relacji z historical_rates.xlsx (według liczby zleceń)
+CACHE_WARMUP_TOP_LANES = int(os.environ.get('CACHE_WARMUP_TOP_LANES', '300'))
+# Limit płatnych zapytań PTV na jedno rozgrzewanie (0 - bez limitu)
+CACHE_WARMUP_API_BUDGET = int(os.environ.get('CACHE_WARMUP_API_BUDGET', '1000'))
+
+# === USTAWIENIA MODELU OPŁAT DROGOWYCH ===
+# Minimalna liczba tras w cache, z których wyliczana jest stawka kraju / udziały korytarza
+TOLL_MODEL_MIN_SAMPLES = int(os.environ.get('TOLL_MODEL_MIN_SAMPLES', '5'))
+# Maksymalny współczynnik zmienności stawki EUR/km kraju dla szacunku o wysokiej pewności
+TOLL_MODEL_MAX_CV = float(os.environ.get('TOLL_MODEL_MAX_CV', '0.25'))
+
+# === USTAWIENIA WYCENY DWUETAPOWEJ ===
+# Co ile sekund plik wynikowy odbudowywany jest z dokładnymi wynikami PTV (tryb 'two_phase')
+TWO_PHASE_EXPORT_SECONDS = float(os.environ.get('TWO_PHASE_EXPORT_SECONDS', '30'))
 
 # === USTAWIENIA LOGOWANIA ===
-# Poziom logowania: DEBUG, INFO, WARNING, ERROR, CRITICAL
-LOG_LEVEL = os.environ.get('LOG_LEVEL', 'ERROR')
+# Profil logowania: 'quiet' (produkcja - tylko błędy), 'info' lub 'debug'
+LOG_PROFILE = os.environ.get('LOG_PROFILE', 'quiet')
+# Poziom logowania: DEBUG, INFO, WARNING, ERROR, CRITICAL (pusty - poziom z profilu)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', '')
+# Poziomy modułów, np. 'ptv_api_manager=INFO,appGPT.geocoding=DEBUG'
+LOG_MODULE_LEVELS = os.environ.get('LOG_MODULE_LEVELS', '')
 LOG_FILE = os.environ.get('LOG_FILE', 'app.log')
 
+# === USTAWIENIA METRYK ===
+# Liczba ostatnich zadań, dla których trzymane są czasy etapów (/admin/metrics, /jobs/<id>)
+METRICS_MAX_JOBS = int(os.environ.get('METRICS_MAX_JOBS', '100'))
+
 # === USTAWIENIA FLASK ===
 # Klucz sekretny dla sesji Flask
 FLASK_SECRET_KEY = os.environ.get(
@@ -6,12 +6,29 @@ używane w całej aplikacji.
 """
 
 from app.models.waypoint import WaypointData, RouteRequest
-from app.models.exceptions import GeocodeException, LocationVerificationRequired
+from app.models.route_record import (
+    RouteRecord,
+    serialize_route_record,
+    deserialize_route_record,
+)
+from app.models.exceptions import (
+    GeocodeException,
+    LocationVerificationRequired,
+    JobCancelledException,
+    RatesUnavailableException,
+    ApiQuotaExceededException,
+)
 
 __all__ = [
     'WaypointData',
     'RouteRequest',
+    'RouteRecord',
+    'serialize_route_record',
+    'deserialize_route_record',
     'GeocodeException',
     'LocationVerificationRequired',
+    'JobCancelledException',
+    'RatesUnavailableException',
+    'ApiQuotaExceededException',
 ]
 
@@ -36,3 +36,55 @@ class LocationVerificationRequired(Exception):
         self.locations_to_verify = locations_to_verify
         super().__init__("Znaleziono lokalizacje wymagające weryfikacji")
 
+
+
+class JobCancelledException(Exception):
+    """
+    Wyjątek sygnalizujący anulowanie zadania w kolejce.
+    
+    Rzucany przez handler zadania, gdy użytkownik lub administrator
+    zażądał przerwania przetwarzania.
+    
+    Attributes:
+        job_id: Identyfikator anulowanego zadania
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        super().__init__(f"Zadanie {job_id} zostało anulowane")
+
+
+class RatesUnavailableException(Exception):
+    """
+    Wyjątek sygnalizujący błąd wczytywania plików stawek historycznych.
+    
+    Rzucany przy wyliczaniu stawek relacji - wynik bez danych stawek
+    nie trafia do rates_memo, więc kolejny wiersz ponawia wczytanie.
+    
+    Attributes:
+        error: Pierwotny błąd wczytywania
+    """
+
+    def __init__(self, error):
+        self.error = error
+        super().__init__(f"Nie udało się wczytać stawek historycznych: {error}")
+
+
+class ApiQuotaExceededException(Exception):
+    """
+    Wyjątek sygnalizujący przekroczenie limitu zapytań PTV przez zadanie.
+    
+    Rzucany w trakcie przetwarzania przetargu, gdy liczba płatnych
+    zapytań zadania przekroczy PTV_CALLS_PER_JOB_LIMIT.
+    
+    Attributes:
+        job_id: Identyfikator zadania
+        calls: Liczba wykonanych zapytań
+        limit: Limit zapytań
+    """
+
+    def __init__(self, job_id, calls, limit):
+        self.job_id = job_id
+        self.calls = calls
+        self.limit = limit
+        super().__init__(f"Zadanie {job_id} przekroczyło limit zapytań PTV ({calls} > {limit})")
@@ -0,0 +1,200 @@
+"""
+Zwarta reprezentacja wyniku trasy.
+
+Wynik trasy z PTVRouteManager to słownik z pełnym polyline, szczegółami
+opłat, systemami specjalnymi i promami. W cache tras (7 dni) oraz w pliku
+kopii zapasowej przechowywany jest zamiast niego RouteRecord:
+- liczby jako float,
+- polyline zapisany raz (oraz opcjonalnie uproszczony polyline do linków),
+- opłaty, promy i dystanse w krajach jako małe krotki.
+
+Słownik odtwarzany jest dopiero przy odczycie z cache (to_dict), więc kod
+korzystający z wyników tras nie wymaga zmian.
+"""
+
+import pickle
+import sys
+import zlib
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional, Tuple
+
+# Wersja formatu serializacji - zmiana pól wymaga jej podniesienia
+ROUTE_RECORD_VERSION = 1
+
+
+@dataclass
+class RouteRecord:
+    """
+    Wynik trasy przechowywany w cache.
+
+    Attributes:
+        distance: Całkowity dystans [km] (zgodność wsteczna)
+        total_distance_km: Całkowity dystans [km]
+        road_distance_km: Dystans na kołach [km]
+        ferry_distance_km: Dystans promowy [km]
+        toll_cost: Suma opłat [EUR]
+        road_toll: Opłaty drogowe, tunele i mosty [EUR]
+        other_toll: Promy i pozostałe opłaty [EUR]
+        polyline: Polyline z API
+        simplified_polyline: Uproszczony polyline do linków map (opcjonalny)
+        toll_details: Opłaty w krajach ((kraj, EUR), ...)
+        special_systems: Systemy specjalne (((klucz, wartość), ...), ...)
+        ferry_segments: Promy ((nazwa, km, godziny), ...)
+        country_distances_km: Dystans w krajach ((kraj, km), ...)
+        legs: Odcinki trasy ((dystans_m, czas_s), ...) lub None
+        ferry_ports: Porty promu obowiązkowego ((lat, lon), (lat, lon)) lub None
+        ferry_used: Nazwa promu obowiązkowego
+    """
+
+    # Jawne __slots__ zamiast dataclass(slots=True) (Python 3.10+) - pola bez
+    # wartości domyślnych, bo atrybut klasy koliduje ze slotem o tej samej nazwie
+    __slots__ = (
+        'distance', 'total_distance_km', 'road_distance_km', 'ferry_distance_km',
+        'toll_cost', 'road_toll', 'other_toll', 'polyline', 'simplified_polyline',
+        'toll_details', 'special_systems', 'ferry_segments', 'country_distances_km',
+        'legs', 'ferry_ports', 'ferry_used',
+    )
+
+    distance: float
+    total_distance_km: float
+    road_distance_km: float
+    ferry_distance_km: float
+    toll_cost: float
+    road_toll: float
+    other_toll: float
+    polyline: str
+    simplified_polyline: Optional[str]
+    toll_details: Tuple[Tuple[str, float], ...]
+    special_systems: Tuple[Tuple[Tuple[str, Any], ...], ...]
+    ferry_segments: Tuple[Tuple[str, float, float], ...]
+    country_distances_km: Tuple[Tuple[str, float], ...]
+    legs: Optional[Tuple[Tuple[float, float], ...]]
+    ferry_ports: Optional[Tuple[Tuple[float, float], Tuple[float, float]]]
+    ferry_used: Optional[str]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RouteRecord':
+        """
+        Tworzy rekord ze słownika wyniku trasy.
+
+        Args:
+            data: Słownik zwracany przez PTVRouteManager
+
+        Returns:
+            RouteRecord
+        """
+        distance = float(data.get('distance') or 0.0)
+        ferry_ports = data.get('ferry_ports')
+        legs = data.get('legs')
+        return cls(
+            distance=distance,
+            total_distance_km=float(data.get('total_distance_km', distance) or 0.0),
+            road_distance_km=float(data.get('road_distance_km', distance) or 0.0),
+            ferry_distance_km=float(data.get('ferry_distance_km') or 0.0),
+            toll_cost=float(data.get('toll_cost') or 0.0),
+            road_toll=float(data.get('road_toll') or 0.0),
+            other_toll=float(data.get('other_toll') or 0.0),
+            polyline=data.get('polyline') or '',
+            simplified_polyline=data.get('simplified_polyline'),
+            toll_details=tuple(
+                (country, float(cost)) for country, cost in (data.get('toll_details') or {}).items()
+            ),
+            special_systems=tuple(
+                tuple(system.items()) for system in (data.get('special_systems') or [])
+            ),
+            ferry_segments=tuple(
+                (segment.get('name', ''), float(segment.get('distance_km', 0.0)),
+                 float(segment.get('duration_hours', 0.0)))
+                for segment in (data.get('ferry_segments') or [])
+            ),
+            country_distances_km=tuple(
+                (country, float(km)) for country, km in (data.get('country_distances_km') or {}).items()
+            ),
+            legs=None if legs is None else tuple(
+                (float(leg.get('distance', 0)), float(leg.get('duration', 0))) for leg in legs
+            ),
+            ferry_ports=None if not ferry_ports else (
+                tuple(ferry_ports['start']), tuple(ferry_ports['end'])
+            ),
+            ferry_used=data.get('ferry_used'),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Odtwarza słownik wyniku trasy w formacie PTVRouteManager.
+
+        Returns:
+            Nowy słownik (bezpieczny do modyfikacji przez wywołującego)
+        """
+        result = {
+            'distance': self.distance,
+            'total_distance_km': self.total_distance_km,
+            'road_distance_km': self.road_distance_km,
+            'ferry_distance_km': self.ferry_distance_km,
+            'ferry_segments': [
+                {'name': name, 'distance_km': km, 'duration_hours': hours}
+                for name, km, hours in self.ferry_segments
+            ],
+            'country_distances_km': dict(self.country_distances_km),
+            'polyline': self.polyline,
+            'toll_cost': self.toll_cost,
+            'road_toll': self.road_toll,
+            'other_toll': self.other_toll,
+            'toll_details': dict(self.toll_details),
+            'special_systems': [dict(system) for system in self.special_systems],
+        }
+        if self.simplified_polyline is not None:
+            result['simplified_polyline'] = self.simplified_polyline
+        if self.legs is not None:
+            result['legs'] = [{'distance': distance, 'duration': duration} for distance, duration in self.legs]
+        if self.ferry_ports is not None:
+            result['ferry_ports'] = {'start': self.ferry_ports[0], 'end': self.ferry_ports[1]}
+        if self.ferry_used is not None or self.legs is not None:
+            result['ferry_used'] = self.ferry_used
+        return result
+
+    def nbytes(self) -> int:
+        """Przybliżony rozmiar rekordu w pamięci [bajty]."""
+        # Pola odczytywane bezpośrednio - astuple kopiowałby cały rekord przy każdym pomiarze
+        return sys.getsizeof(self) + sum(_deep_sizeof(getattr(self, name)) for name in _FIELD_NAMES)
+
+
+def _deep_sizeof(value: Any) -> int:
+    """Rozmiar obiektu razem z zawartością krotek."""
+    size = sys.getsizeof(value)
+    if isinstance(value, tuple):
+        size += sum(_deep_sizeof(item) for item in value)
+    return size
+
+
+_FIELD_NAMES = tuple(field.name for field in fields(RouteRecord))
+
+
+def serialize_route_record(record: RouteRecord) -> bytes:
+    """
+    Serializuje rekord do zapisu na dysk (pickle krotki pól + zlib).
+
+    Args:
+        record: Rekord trasy
+
+    Returns:
+        Skompresowane bajty
+    """
+    payload = (ROUTE_RECORD_VERSION, tuple(getattr(record, name) for name in _FIELD_NAMES))
+    return zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def deserialize_route_record(blob: bytes) -> Optional[RouteRecord]:
+    """
+    Odtwarza rekord z bajtów zapisanych przez serialize_route_record.
+
+    Args:
+        blob: Skompresowane bajty
+
+    Returns:
+        RouteRecord lub None dla niezgodnej wersji formatu
+    """
+    version, values = pickle.loads(zlib.decompress(blob))
+    if version != ROUTE_RECORD_VERSION:
+        return None
+    return RouteRecord(*values)
@@ -9,12 +9,15 @@ Zawiera endpointy:
 - /clear_luxembourg_cache (czyszczenie cache Luksemburga)
 - /clear_locations_cache (czyszczenie cache lokalizacji)
 - /ptv_stats (statystyki PTV API)
+- /admin/metrics (czasy etapów w formacie Prometheusa)
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, Response
 import logging
 import time
 
+from app.services.metrics import metrics
+
 # Blueprint dla tras administracyjnych
 admin_bp = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
@@ -136,3 +139,7 @@ def register_admin_routes(
         stats = ptv_manager.get_stats()
         return jsonify(stats)
 
+    @app.route("/admin/metrics")
+    def admin_metrics():
+        """Endpoint z czasami etapów przetwarzania w formacie Prometheusa."""
+        return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
@@ -9,7 +9,6 @@ Zawiera endpointy:
 
 from flask import Blueprint, request, render_template, send_file, jsonify
 import logging
-import threading
 
 # Blueprint dla głównych tras
 main_bp = Blueprint('main', __name__)
@@ -19,7 +18,7 @@ logger = logging.getLogger(__name__)
 def register_main_routes(
     app,
     get_user_session,
-    background_processing,
+    submit_tender_job,
     set_margin_matrix,
     get_margin_matrix_info,
     DEFAULT_FUEL_COST,
@@ -35,7 +34,7 @@ def register_main_routes(
     Args:
         app: Instancja Flask
         get_user_session: Funkcja pobierająca sesję użytkownika
-        background_processing: Funkcja przetwarzania w tle
+        submit_tender_job: Funkcja dodająca przetwarzanie do kolejki zadań
         set_margin_matrix: Funkcja ustawiająca macierz marży
         get_margin_matrix_info: Funkcja pobierająca info o macierzy
         DEFAULT_FUEL_COST: Domyślny koszt paliwa
@@ -77,18 +76,12 @@ def register_main_routes(
 
                 # Czytaj plik w kontekście żądania
                 user_data.file_bytes = file.read()
+                priority = int(request.form.get("priority", 0))
                 
                 logger.info(f"[{user_data.session_id[:8]}] Rozpoczynam przetwarzanie (fuel={user_data.fuel_cost}, driver={user_data.driver_cost}, matrix={user_data.matrix_type})")
 
-                # Uruchom przetwarzanie w tle z session_id
-                thread = threading.Thread(
-                    target=background_processing,
-                    args=(user_data.session_id,),
-                    daemon=True,
-                    name=f"BgProcess-{user_data.session_id[:8]}"
-                )
-                thread.start()
-                user_data.thread = thread
+                # Dodaj zadanie do kolejki zamiast uruchamiać osobny wątek
+                submit_tender_job(user_data, priority)
                 
                 return render_template("processing.html")
                 
@@ -175,7 +168,8 @@ def register_main_routes(
                 'processing_complete': user_data.processing_complete,
                 'matrix_name': matrix_name,
                 'matrix_file': matrix_file,
-                'session_id': user_data.session_id[:8]  # Dla debugowania
+                'session_id': user_data.session_id[:8],  # Dla debugowania
+                'job_id': user_data.job_id
             }
             return jsonify(response_data)
             
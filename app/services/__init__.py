@@ -4,5 +4,147 @@ Moduł serwisów aplikacji.
 Zawiera logikę biznesową podzieloną na wyspecjalizowane serwisy.
 """
 
-# Serwisy będą dodawane w miarę refaktoryzacji
+from app.services.job_queue import (
+    Job,
+    JobStatus,
+    JobQueue,
+    InMemoryJobStore,
+    SQLiteJobStore,
+    create_job_queue,
+    get_current_job_id,
+)
 
+from app.services.checkpoints import (
+    RowCheckpoint,
+    JobCheckpoint,
+    InMemoryCheckpointStore,
+    SQLiteCheckpointStore,
+    create_checkpoint_store,
+    row_fingerprint,
+)
+
+from app.services.api_usage import (
+    ApiUsageTracker,
+    InMemoryUsageStore,
+    SQLiteUsageStore,
+    create_api_usage_tracker,
+    usage_scope,
+)
+
+from app.services.cache_warmup import (
+    Lane,
+    CacheWarmup,
+    CacheWarmupScheduler,
+    top_historical_lanes,
+    load_top_lanes,
+)
+
+from app.services.toll_model import (
+    CountryTollRate,
+    TollEstimate,
+    TollRateModel,
+)
+
+from app.services.quick_quote import (
+    DetourFactorModel,
+    QuickQuoteEstimator,
+    PRICING_MODE_PRECISE,
+    PRICING_MODE_ESTIMATE,
+    PRICING_MODE_TWO_PHASE,
+)
+
+from app.services.rates_memo import (
+    WorkbookVersion,
+    RatesMemo,
+)
+
+from app.services.historical_rates import (
+    HistoricalRatesStore,
+    read_rates_workbook,
+    add_lane_columns,
+    LANE_COLUMNS,
+)
+
+from app.services.margin_matrix import (
+    MarginMatrix,
+    RegionIndex,
+    UNKNOWN_REGION_ID,
+)
+
+from app.services.rates_db import (
+    RatesDatabase,
+    LaneStats,
+    ColumnStats,
+    create_rates_database,
+    SOURCE_CLIENT,
+    SOURCE_EXCHANGE,
+)
+
+from app.services.metrics import (
+    Histogram,
+    MetricsRegistry,
+    metrics,
+)
+
+__all__ = [
+    # Kolejka zadań
+    'Job',
+    'JobStatus',
+    'JobQueue',
+    'InMemoryJobStore',
+    'SQLiteJobStore',
+    'create_job_queue',
+    'get_current_job_id',
+    # Checkpointy wierszy
+    'RowCheckpoint',
+    'JobCheckpoint',
+    'InMemoryCheckpointStore',
+    'SQLiteCheckpointStore',
+    'create_checkpoint_store',
+    'row_fingerprint',
+    # Licznik zapytań PTV
+    'ApiUsageTracker',
+    'InMemoryUsageStore',
+    'SQLiteUsageStore',
+    'create_api_usage_tracker',
+    'usage_scope',
+    # Rozgrzewanie cache
+    'Lane',
+    'CacheWarmup',
+    'CacheWarmupScheduler',
+    'top_historical_lanes',
+    'load_top_lanes',
+    # Model stawek opłat drogowych
+    'CountryTollRate',
+    'TollEstimate',
+    'TollRateModel',
+    # Szybka wycena (tryb 'estimate')
+    'DetourFactorModel',
+    'QuickQuoteEstimator',
+    'PRICING_MODE_PRECISE',
+    'PRICING_MODE_ESTIMATE',
+    'PRICING_MODE_TWO_PHASE',
+    # Pamięć wyników stawek relacji
+    'WorkbookVersion',
+    'RatesMemo',
+    # Tabele stawek historycznych (sidecar .npy)
+    'HistoricalRatesStore',
+    'read_rates_workbook',
+    'add_lane_columns',
+    'LANE_COLUMNS',
+    # Macierze marży (NumPy)
+    'MarginMatrix',
+    'RegionIndex',
+    'UNKNOWN_REGION_ID',
+    # Baza stawek historycznych (SQLite)
+    'RatesDatabase',
+    'LaneStats',
+    'ColumnStats',
+    'create_rates_database',
+    'SOURCE_CLIENT',
+    'SOURCE_EXCHANGE',
+    # Metryki czasów etapów
+    'Histogram',
+    'MetricsRegistry',
+    'metrics',
+]
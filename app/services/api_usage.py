@@ -0,0 +1,322 @@
+"""
+Licznik zapytań do PTV API (koszty transakcji).
+
+Każde wychodzące zapytanie PTV (routing, batch, geokodowanie by-address
+i by-text, dodatkowa trasa w GB) oraz każde zapytanie zaoszczędzone przez
+cache zapisywane jest z etykietami:
+- endpoint (ENDPOINT_*),
+- wynik (OUTCOME_*): 'api' - płatne wywołanie, 'cache' / 'shared' /
+  'local' - wywołanie zaoszczędzone,
+- zadanie z kolejki i sesja użytkownika (odczytywane z kontekstu wątku).
+
+Liczniki buforowane są w pamięci i co API_USAGE_FLUSH_SECONDS zapisywane
+w SQLite jako sumy dzienne - zapis nie spowalnia wierszy trafiających
+w cache.
+
+Example:
+    >>> api_usage.record(ENDPOINT_ROUTING)                 # płatne zapytanie
+    >>> api_usage.record(ENDPOINT_ROUTING, OUTCOME_CACHE)  # trafienie w cache
+"""
+
+import contextvars
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.models.exceptions import ApiQuotaExceededException
+from app.services.job_queue import get_current_job_id
+
+logger = logging.getLogger(__name__)
+
+# Endpointy PTV
+ENDPOINT_ROUTING = 'routing'
+ENDPOINT_BATCH = 'batch'
+ENDPOINT_GEOCODING_ADDRESS = 'geocoding_by_address'
+ENDPOINT_GEOCODING_TEXT = 'geocoding_by_text'
+ENDPOINT_GB_SUBROUTE = 'gb_subroute'
+
+# Wynik zapytania
+OUTCOME_API = 'api'          # płatne wywołanie PTV
+OUTCOME_CACHE = 'cache'      # wynik z cache
+OUTCOME_SHARED = 'shared'    # wynik współdzielony z równoczesnym zapytaniem (single-flight)
+OUTCOME_LOCAL = 'local'      # wynik wyliczony lokalnie (np. dystans w GB z polyline)
+
+SAVED_OUTCOMES = (OUTCOME_CACHE, OUTCOME_SHARED, OUTCOME_LOCAL)
+
+# Sesja użytkownika, na rzecz której wykonywane są zapytania w bieżącym kontekście
+current_session_id: contextvars.ContextVar = contextvars.ContextVar('current_session_id', default=None)
+
+# Klucz licznika: (dzień, endpoint, job_id, session_id, wynik)
+UsageKey = Tuple[str, str, str, str, str]
+
+
+@contextmanager
+def usage_scope(session_id: Optional[str]):
+    """
+    Przypisuje zapytania wykonywane w bloku do sesji użytkownika.
+
+    Args:
+        session_id: Identyfikator sesji (None - bez przypisania)
+    """
+    token = current_session_id.set(session_id)
+    try:
+        yield
+    finally:
+        current_session_id.reset(token)
+
+
+class InMemoryUsageStore:
+    """Magazyn liczników w pamięci (testy, praca lokalna)."""
+
+    def __init__(self):
+        self._counts: Dict[UsageKey, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, counts: Dict[UsageKey, int]) -> None:
+        with self._lock:
+            for key, count in counts.items():
+                self._counts[key] += count
+
+    def query(self, job_id: Optional[str] = None, session_id: Optional[str] = None,
+              since: Optional[str] = None) -> List[Tuple[UsageKey, int]]:
+        with self._lock:
+            items = list(self._counts.items())
+        return [
+            (key, count) for key, count in items
+            if (job_id is None or key[2] == job_id)
+            and (session_id is None or key[3] == session_id)
+            and (since is None or key[0] >= since)
+        ]
+
+
+class SQLiteUsageStore:
+    """Trwały magazyn dziennych liczników zapytań oparty o SQLite."""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Ścieżka do pliku bazy SQLite
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS api_usage (
+                day TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                job_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                outcome TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (day, endpoint, job_id, session_id, outcome)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_api_usage_job ON api_usage (job_id)")
+
+    def add(self, counts: Dict[UsageKey, int]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO api_usage VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (day, endpoint, job_id, session_id, outcome) "
+                "DO UPDATE SET count = count + excluded.count",
+                [key + (count,) for key, count in counts.items()]
+            )
+            self._conn.execute("COMMIT")
+
+    def query(self, job_id: Optional[str] = None, session_id: Optional[str] = None,
+              since: Optional[str] = None) -> List[Tuple[UsageKey, int]]:
+        conditions, params = [], []
+        if job_id is not None:
+            conditions.append("job_id = ?")
+            params.append(job_id)
+        if session_id is not None:
+            conditions.append("session_id = ?")
+            params.append(session_id)
+        if since is not None:
+            conditions.append("day >= ?")
+            params.append(since)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT day, endpoint, job_id, session_id, outcome, count FROM api_usage{where}", params
+            ).fetchall()
+        return [(tuple(row[:5]), row[5]) for row in rows]
+
+
+class ApiUsageTracker:
+    """
+    Licznik zapytań PTV z buforem w pamięci.
+
+    Thread-safe - zapytania rejestrują wątki kolejki zadań, wątek PTV
+    i wątki żądań Flask.
+    """
+
+    def __init__(self, store, flush_interval: float = 10.0, job_limit: int = 0):
+        """
+        Args:
+            store: Magazyn liczników (InMemoryUsageStore / SQLiteUsageStore)
+            flush_interval: Co ile sekund bufor zapisywany jest do magazynu
+            job_limit: Limit płatnych zapytań na zadanie (0 - bez limitu)
+        """
+        self.store = store
+        self.flush_interval = flush_interval
+        self.job_limit = job_limit
+        self._pending: Dict[UsageKey, int] = defaultdict(int)
+        # Płatne zapytania zadań w tym procesie - do kontroli limitu bez zapytań do bazy
+        self._job_calls: Dict[str, int] = defaultdict(int)
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, outcome: str = OUTCOME_API, count: int = 1,
+               job_id: Optional[str] = None, session_id: Optional[str] = None) -> None:
+        """
+        Rejestruje zapytanie PTV lub zapytanie zaoszczędzone przez cache.
+
+        Args:
+            endpoint: Endpoint PTV (ENDPOINT_*)
+            outcome: Wynik (OUTCOME_*)
+            count: Liczba zapytań
+            job_id: Zadanie (domyślnie zadanie bieżącego wątku)
+            session_id: Sesja (domyślnie sesja bieżącego kontekstu)
+        """
+        job_id = job_id or get_current_job_id() or ''
+        session_id = session_id or current_session_id.get() or ''
+        key = (date.today().isoformat(), endpoint, job_id, session_id, outcome)
+        with self._lock:
+            self._pending[key] += count
+            if job_id and outcome == OUTCOME_API:
+                self._job_calls[job_id] += count
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Zapisuje zbuforowane liczniki do magazynu."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            self.store.add(pending)
+        except Exception as e:
+            logger.warning(f"Nie udało się zapisać liczników zapytań PTV: {e}")
+            with self._lock:
+                for key, count in pending.items():
+                    self._pending[key] += count
+
+    def check_job_limit(self, job_id: Optional[str]) -> None:
+        """
+        Przerywa zadanie, które przekroczyło limit płatnych zapytań.
+
+        Raises:
+            ApiQuotaExceededException: gdy limit (job_limit) został przekroczony
+        """
+        if not job_id or not self.job_limit:
+            return
+        with self._lock:
+            calls = self._job_calls.get(job_id, 0)
+        if calls > self.job_limit:
+            raise ApiQuotaExceededException(job_id, calls, self.job_limit)
+
+    def get_job_calls(self, job_id: str) -> int:
+        """Zwraca liczbę płatnych zapytań zadania wykonanych w tym procesie."""
+        with self._lock:
+            return self._job_calls.get(job_id, 0)
+
+    def get_usage(self, job_id: Optional[str] = None, session_id: Optional[str] = None) -> Dict:
+        """
+        Zwraca liczbę płatnych i zaoszczędzonych zapytań według endpointów.
+
+        Args:
+            job_id: Tylko zapytania zadania
+            session_id: Tylko zapytania sesji
+
+        Returns:
+            {'calls': {endpoint: n}, 'saved': {endpoint: n}, 'total_calls', 'total_saved'}
+        """
+        self.flush()
+        calls, saved = defaultdict(int), defaultdict(int)
+        for (_, endpoint, _, _, outcome), count in self.store.query(job_id=job_id, session_id=session_id):
+            if outcome == OUTCOME_API:
+                calls[endpoint] += count
+            elif outcome in SAVED_OUTCOMES:
+                saved[endpoint] += count
+        return {
+            'calls': dict(calls),
+            'saved': dict(saved),
+            'total_calls': sum(calls.values()),
+            'total_saved': sum(saved.values()),
+        }
+
+    def get_daily(self, days: int = 30) -> List[Dict]:
+        """
+        Zwraca dzienne sumy zapytań według endpointu i wyniku.
+
+        Args:
+            days: Liczba ostatnich dni
+
+        Returns:
+            Lista {'day', 'endpoint', 'outcome', 'count'} posortowana po dniu
+        """
+        self.flush()
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        totals = defaultdict(int)
+        for (day, endpoint, _, _, outcome), count in self.store.query(since=since):
+            totals[(day, endpoint, outcome)] += count
+        return [
+            {'day': day, 'endpoint': endpoint, 'outcome': outcome, 'count': count}
+            for (day, endpoint, outcome), count in sorted(totals.items())
+        ]
+
+    def get_jobs(self, days: int = 30) -> Dict[str, Dict[str, int]]:
+        """
+        Zwraca sumy płatnych i zaoszczędzonych zapytań dla zadań z ostatnich dni.
+
+        Returns:
+            Słownik job_id -> {'session_id', 'calls', 'saved'}
+        """
+        self.flush()
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        jobs = {}
+        for (_, _, job_id, session_id, outcome), count in self.store.query(since=since):
+            if not job_id:
+                continue
+            job = jobs.setdefault(job_id, {'session_id': session_id, 'calls': 0, 'saved': 0})
+            if outcome == OUTCOME_API:
+                job['calls'] += count
+            elif outcome in SAVED_OUTCOMES:
+                job['saved'] += count
+        return jobs
+
+
+def create_api_usage_tracker(backend: str = 'sqlite', db_path: str = 'api_usage.db',
+                             flush_interval: float = 10.0, job_limit: int = 0) -> ApiUsageTracker:
+    """
+    Tworzy licznik zapytań PTV z wybranym backendem.
+
+    Args:
+        backend: 'sqlite' (trwały) lub 'memory' (testy, praca lokalna)
+        db_path: Ścieżka do bazy SQLite
+        flush_interval: Co ile sekund bufor zapisywany jest do magazynu
+        job_limit: Limit płatnych zapytań na zadanie (0 - bez limitu)
+
+    Returns:
+        Instancja ApiUsageTracker
+    """
+    if backend == 'memory':
+        store = InMemoryUsageStore()
+    elif backend == 'sqlite':
+        store = SQLiteUsageStore(db_path)
+    else:
+        raise ValueError(f"Nieznany backend licznika zapytań: {backend}")
+    return ApiUsageTracker(store, flush_interval=flush_interval, job_limit=job_limit)
@@ -0,0 +1,282 @@
+"""
+Rozgrzewanie cache dla powtarzających się relacji.
+
+Większość przetargów powtarza relacje z historical_rates.xlsx. Zadanie
+rozgrzewania uruchamiane poza godzinami pracy (APScheduler, jak czyszczenie
+sesji):
+- wybiera N relacji z największą liczbą zleceń,
+- geokoduje punkty załadunku i rozładunku,
+- pobiera trasy i opłaty do trwałego cache tras,
+- kończy pracę po wyczerpaniu budżetu płatnych zapytań PTV.
+
+Zapytania rozgrzewania liczone są w ApiUsageTracker pod własnym
+identyfikatorem zadania ('warmup-<data>'), więc widać je osobno
+w /admin/api_usage. Budżet sprawdzany jest przed każdą relacją - może
+zostać przekroczony najwyżej o zapytania jednej relacji.
+
+Sposób rozgrzania pojedynczej relacji (geokodowanie i routing z tymi samymi
+parametrami co wycena wiersza) dostarcza aplikacja jako funkcję warm_lane.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from app.services.job_queue import current_job_id
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Wynik rozgrzewania relacji
+WARMUP_CACHED = 'cached'    # trasa była już w cache
+WARMUP_FETCHED = 'fetched'  # trasa pobrana z PTV
+WARMUP_FAILED = 'failed'    # nie udało się zgeokodować lub wyznaczyć trasy
+
+# Kolumny historical_rates.xlsx
+LANE_COLUMNS = ['kraj zaladunku', 'kod pocztowy zaladunku', 'kraj rozladunku', 'kod pocztowy rozladunku']
+ORDERS_COLUMN = 'Liczba zlecen'
+
+
+@dataclass(frozen=True)
+class Lane:
+    """Relacja historyczna (kraj i prefiks kodu pocztowego obu końców)."""
+
+    loading_country: str
+    loading_postal: str
+    unloading_country: str
+    unloading_postal: str
+    orders: int = 0
+
+
+def top_historical_lanes(df: pd.DataFrame, limit: int) -> List[Lane]:
+    """
+    Zwraca relacje z największą liczbą zleceń.
+
+    Args:
+        df: Dane historical_rates.xlsx
+        limit: Liczba relacji
+
+    Returns:
+        Lista Lane posortowana malejąco po liczbie zleceń
+    """
+    if df.empty or not set(LANE_COLUMNS) <= set(df.columns):
+        return []
+    data = df[LANE_COLUMNS].astype(str).apply(lambda column: column.str.strip())
+    if ORDERS_COLUMN in df.columns:
+        data[ORDERS_COLUMN] = pd.to_numeric(df[ORDERS_COLUMN], errors='coerce').fillna(0)
+    else:
+        data[ORDERS_COLUMN] = 1
+    orders = data.groupby(LANE_COLUMNS, sort=False)[ORDERS_COLUMN].sum()
+    orders = orders.sort_values(ascending=False, kind='stable').head(limit)
+    return [Lane(*key, orders=int(count)) for key, count in orders.items()]
+
+
+def load_top_lanes(path: str, limit: int) -> List[Lane]:
+    """
+    Wczytuje plik stawek historycznych i zwraca najczęstsze relacje.
+
+    Args:
+        path: Ścieżka do historical_rates.xlsx
+        limit: Liczba relacji
+
+    Returns:
+        Lista Lane (pusta, gdy pliku nie da się wczytać)
+    """
+    try:
+        df = pd.read_excel(path, dtype={'kod pocztowy zaladunku': str, 'kod pocztowy rozladunku': str})
+    except Exception as e:
+        logger.warning(f"Nie udało się wczytać relacji do rozgrzewania cache z {path}: {e}")
+        return []
+    return top_historical_lanes(df, limit)
+
+
+class CacheWarmup:
+    """
+    Zadanie rozgrzewania cache z budżetem zapytań PTV.
+
+    Jednocześnie wykonywane jest najwyżej jedno rozgrzewanie.
+    """
+
+    def __init__(self, warm_lane: Callable[[Lane], str], lanes_source: Callable[[int], List[Lane]],
+                 usage_tracker, top_lanes: int = 300, api_budget: int = 1000,
+                 on_complete: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            warm_lane: Rozgrzewa relację, zwraca WARMUP_CACHED / WARMUP_FETCHED / WARMUP_FAILED
+            lanes_source: Zwraca N najczęstszych relacji
+            usage_tracker: Licznik zapytań PTV (ApiUsageTracker)
+            top_lanes: Liczba relacji do rozgrzania
+            api_budget: Limit płatnych zapytań PTV na jedno rozgrzewanie
+            on_complete: Wywoływane po rozgrzewaniu (np. zapis cache na dysk)
+        """
+        self.warm_lane = warm_lane
+        self.lanes_source = lanes_source
+        self.usage_tracker = usage_tracker
+        self.top_lanes = top_lanes
+        self.api_budget = api_budget
+        self.on_complete = on_complete
+        self.last_run: Optional[Dict] = None
+        self._running = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._running.locked()
+
+    def run(self) -> Optional[Dict]:
+        """
+        Rozgrzewa cache dla najczęstszych relacji.
+
+        Returns:
+            Podsumowanie przebiegu lub None, gdy rozgrzewanie już trwa
+        """
+        if not self._running.acquire(blocking=False):
+            logger.info("Rozgrzewanie cache już trwa - pomijam")
+            return None
+        try:
+            return self._run()
+        finally:
+            self._running.release()
+
+    def _run(self) -> Dict:
+        job_id = f"warmup-{datetime.now():%Y%m%d-%H%M%S}"
+        summary = {
+            'job_id': job_id,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'lanes': 0,
+            WARMUP_CACHED: 0,
+            WARMUP_FETCHED: 0,
+            WARMUP_FAILED: 0,
+            'api_calls': 0,
+            'api_budget': self.api_budget,
+            'budget_exhausted': False,
+        }
+        start = time.monotonic()
+        token = current_job_id.set(job_id)
+        try:
+            lanes = self.lanes_source(self.top_lanes)
+            logger.info(f"Rozgrzewanie cache: {len(lanes)} relacji, budżet {self.api_budget} zapytań PTV")
+            with metrics.span('cache_warmup'):
+                for lane in lanes:
+                    if self.api_budget and self.usage_tracker.get_job_calls(job_id) >= self.api_budget:
+                        summary['budget_exhausted'] = True
+                        break
+                    try:
+                        outcome = self.warm_lane(lane)
+                    except Exception as e:
+                        logger.warning(f"Rozgrzewanie relacji {asdict(lane)} nie powiodło się: {e}")
+                        outcome = WARMUP_FAILED
+                    summary['lanes'] += 1
+                    summary[outcome] = summary.get(outcome, 0) + 1
+        finally:
+            current_job_id.reset(token)
+            summary['api_calls'] = self.usage_tracker.get_job_calls(job_id)
+            summary['duration_s'] = round(time.monotonic() - start, 1)
+            self.usage_tracker.flush()
+            self.last_run = summary
+
+        if self.on_complete:
+            try:
+                self.on_complete()
+            except Exception as e:
+                logger.error(f"Błąd po rozgrzewaniu cache: {e}", exc_info=True)
+        logger.info(
+            f"Rozgrzewanie cache zakończone: {summary['lanes']} relacji "
+            f"({summary[WARMUP_FETCHED]} pobranych, {summary[WARMUP_CACHED]} w cache, "
+            f"{summary[WARMUP_FAILED]} błędów), {summary['api_calls']} zapytań PTV"
+        )
+        return summary
+
+
+class CacheWarmupScheduler:
+    """
+    Harmonogram rozgrzewania cache.
+
+    Uruchamia rozgrzewanie codziennie o zadanej godzinie (poza godzinami
+    pracy) w tle.
+    """
+
+    def __init__(self, warmup: CacheWarmup, hour: int = 3, minute: int = 0):
+        """
+        Args:
+            warmup: Zadanie rozgrzewania
+            hour: Godzina uruchomienia (czas lokalny serwera)
+            minute: Minuta uruchomienia
+        """
+        self.warmup = warmup
+        self.hour = hour
+        self.minute = minute
+        self.scheduler = None
+
+    def _warmup_job(self):
+        """Zadanie rozgrzewania uruchamiane przez scheduler."""
+        try:
+            self.warmup.run()
+        except Exception as e:
+            logger.error(f"Błąd podczas rozgrzewania cache: {e}", exc_info=True)
+
+    def start(self):
+        """Uruchamia scheduler rozgrzewania."""
+        try:
+            from apscheduler.schedulers.background import BackgroundScheduler
+
+            self.scheduler = BackgroundScheduler()
+            self.scheduler.add_job(
+                func=self._warmup_job,
+                trigger="cron",
+                hour=self.hour,
+                minute=self.minute,
+                id='cache_warmup',
+                name='Cache Warmup Job',
+                replace_existing=True
+            )
+            self.scheduler.start()
+            logger.info(f"Scheduler rozgrzewania cache uruchomiony (codziennie {self.hour:02d}:{self.minute:02d})")
+
+        except ImportError:
+            logger.warning(
+                "APScheduler nie jest zainstalowany. "
+                "Automatyczne rozgrzewanie cache nie będzie działać. "
+                "Zainstaluj: pip install APScheduler"
+            )
+        except Exception as e:
+            logger.error(f"Błąd podczas uruchamiania schedulera rozgrzewania: {e}", exc_info=True)
+
+    def stop(self):
+        """Zatrzymuje scheduler rozgrzewania."""
+        if self.scheduler:
+            self.scheduler.shutdown()
+            self.scheduler = None
+            logger.info("Scheduler rozgrzewania cache zatrzymany")
+
+    def trigger_now(self) -> bool:
+        """
+        Uruchamia rozgrzewanie natychmiast w tle.
+
+        Returns:
+            False, jeśli rozgrzewanie już trwa
+        """
+        if self.warmup.is_running:
+            return False
+        threading.Thread(target=self._warmup_job, daemon=True, name='CacheWarmup').start()
+        return True
+
+    def get_status(self) -> Dict:
+        """Zwraca konfigurację, stan i wynik ostatniego rozgrzewania."""
+        next_run = None
+        if self.scheduler:
+            job = self.scheduler.get_job('cache_warmup')
+            if job is not None and job.next_run_time is not None:
+                next_run = job.next_run_time.isoformat(timespec='seconds')
+        return {
+            'schedule': f'{self.hour:02d}:{self.minute:02d}',
+            'next_run': next_run,
+            'running': self.warmup.is_running,
+            'top_lanes': self.warmup.top_lanes,
+            'api_budget': self.warmup.api_budget,
+            'last_run': self.warmup.last_run,
+        }
@@ -0,0 +1,238 @@
+"""
+Punkty kontrolne (checkpointy) wyników przetwarzania przetargów.
+
+Zawiera magazyn wyników pojedynczych wierszy zapisywanych na dysk
+w trakcie przetwarzania. Wznowione lub ponownie uruchomione zadanie
+pomija wiersze już wycenione i ponawia tylko te, które się nie powiodły,
+co oszczędza czas i limit zapytań PTV przy największych plikach.
+
+Wiersz identyfikowany jest parą (job_id, indeks wiersza) oraz odciskiem
+danych wejściowych - zmiana danych lub parametrów kosztów unieważnia wynik.
+"""
+
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RowCheckpoint:
+    """
+    Zapisany wynik pojedynczego wiersza.
+
+    Attributes:
+        row_index: Indeks wiersza w pliku
+        fingerprint: Odcisk danych wejściowych wiersza
+        result: Słownik wyniku (wiersz pliku Excel)
+        preview: Wiersz podglądu w interfejsie
+        created_at: Timestamp zapisu
+    """
+
+    row_index: int
+    fingerprint: str
+    result: Dict[str, Any]
+    preview: Dict[str, Any]
+    created_at: float = 0.0
+
+
+def row_fingerprint(values: Iterable[Any], *params: Any) -> str:
+    """
+    Oblicza odcisk danych wejściowych wiersza.
+
+    Args:
+        values: Wartości komórek wiersza
+        *params: Dodatkowe parametry wpływające na wynik (np. koszt paliwa)
+
+    Returns:
+        Skrót SHA-1 w postaci heksadecymalnej
+    """
+    payload = json.dumps([[str(v) for v in values], [str(p) for p in params]], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class InMemoryCheckpointStore:
+    """Magazyn checkpointów w pamięci procesu (testy, praca lokalna)."""
+
+    def __init__(self):
+        self._rows: Dict[str, Dict[int, RowCheckpoint]] = {}
+        self._lock = threading.Lock()
+
+    def save(self, job_id: str, row_index: int, fingerprint: str,
+             result: Dict[str, Any], preview: Dict[str, Any]) -> None:
+        with self._lock:
+            self._rows.setdefault(job_id, {})[row_index] = RowCheckpoint(
+                row_index, fingerprint, result, preview, time.time()
+            )
+
+    def load(self, job_id: str) -> Dict[int, RowCheckpoint]:
+        with self._lock:
+            return dict(self._rows.get(job_id, {}))
+
+    def count(self, job_id: str) -> int:
+        with self._lock:
+            return len(self._rows.get(job_id, {}))
+
+    def delete_job(self, job_id: str) -> int:
+        with self._lock:
+            return len(self._rows.pop(job_id, {}))
+
+    def purge(self, older_than_seconds: float) -> int:
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            stale = [
+                job_id for job_id, rows in self._rows.items()
+                if rows and max(cp.created_at for cp in rows.values()) < cutoff
+            ]
+            for job_id in stale:
+                del self._rows[job_id]
+            return len(stale)
+
+
+class SQLiteCheckpointStore:
+    """
+    Trwały magazyn checkpointów oparty o SQLite.
+
+    Wynik wiersza zapisywany jest od razu po wycenie (autocommit),
+    więc przetrwa zarówno błąd zadania, jak i restart procesu.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Ścieżka do pliku bazy SQLite
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS row_checkpoints (
+                job_id TEXT NOT NULL,
+                row_index INTEGER NOT NULL,
+                fingerprint TEXT NOT NULL,
+                result BLOB NOT NULL,
+                preview BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, row_index)
+            )
+            """
+        )
+
+    def save(self, job_id: str, row_index: int, fingerprint: str,
+             result: Dict[str, Any], preview: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO row_checkpoints VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, row_index, fingerprint, pickle.dumps(result),
+                 pickle.dumps(preview), time.time())
+            )
+
+    def load(self, job_id: str) -> Dict[int, RowCheckpoint]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row_index, fingerprint, result, preview, created_at "
+                "FROM row_checkpoints WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {
+            row_index: RowCheckpoint(row_index, fingerprint, pickle.loads(result),
+                                     pickle.loads(preview), created_at)
+            for row_index, fingerprint, result, preview, created_at in rows
+        }
+
+    def count(self, job_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM row_checkpoints WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+
+    def delete_job(self, job_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM row_checkpoints WHERE job_id = ?", (job_id,)
+            ).rowcount
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Usuwa checkpointy zadań nieaktualizowanych dłużej niż podany czas."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM row_checkpoints WHERE job_id IN ("
+                "SELECT job_id FROM row_checkpoints GROUP BY job_id HAVING MAX(created_at) < ?)",
+                (cutoff,)
+            ).rowcount
+
+
+class JobCheckpoint:
+    """
+    Checkpointy jednego zadania w trakcie przetwarzania.
+
+    Wczytuje zapisane wiersze raz na początku przetwarzania i zapisuje
+    kolejne wyniki. Wiersze z niezgodnym odciskiem traktowane są jako nowe.
+    """
+
+    def __init__(self, store, job_id: Optional[str]):
+        """
+        Args:
+            store: Magazyn checkpointów
+            job_id: Identyfikator zadania (None wyłącza checkpointy)
+        """
+        self.store = store
+        self.job_id = job_id
+        self._saved = store.load(job_id) if job_id else {}
+        self.restored_count = 0
+        if self._saved:
+            logger.info(f"[job {job_id[:8]}] Znaleziono {len(self._saved)} zapisanych wierszy")
+
+    def restore(self, row_index: int, fingerprint: str) -> Optional[RowCheckpoint]:
+        """
+        Zwraca zapisany wynik wiersza, jeśli odcisk danych się zgadza.
+
+        Args:
+            row_index: Indeks wiersza
+            fingerprint: Odcisk aktualnych danych wiersza
+
+        Returns:
+            RowCheckpoint lub None jeśli wiersz trzeba wycenić
+        """
+        checkpoint = self._saved.get(row_index)
+        if checkpoint is None or checkpoint.fingerprint != fingerprint:
+            return None
+        self.restored_count += 1
+        return checkpoint
+
+    def save(self, row_index: int, fingerprint: str,
+             result: Dict[str, Any], preview: Dict[str, Any]) -> None:
+        """Zapisuje wynik wycenionego wiersza (błędy zapisu nie przerywają wyceny)."""
+        if not self.job_id:
+            return
+        try:
+            self.store.save(self.job_id, row_index, fingerprint, result, preview)
+        except Exception as e:
+            logger.warning(f"[job {self.job_id[:8]}] Nie udało się zapisać checkpointu wiersza {row_index}: {e}")
+
+
+def create_checkpoint_store(backend: str = 'sqlite', db_path: str = 'job_checkpoints.db'):
+    """
+    Tworzy magazyn checkpointów z wybranym backendem.
+
+    Args:
+        backend: 'sqlite' (trwały) lub 'memory' (testy, praca lokalna)
+        db_path: Ścieżka do bazy SQLite
+
+    Returns:
+        Instancja magazynu checkpointów
+    """
+    if backend == 'memory':
+        return InMemoryCheckpointStore()
+    if backend == 'sqlite':
+        return SQLiteCheckpointStore(db_path)
+    raise ValueError(f"Nieznany backend checkpointów: {backend}")
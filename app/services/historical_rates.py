@@ -0,0 +1,370 @@
+"""
+Wczytywanie plików stawek historycznych przez kolumnowy plik pomocniczy (sidecar).
+
+openpyxl jest najwolniejszym czytnikiem pandas, a historical_rates.xlsx
+i historical_rates_gielda.xlsx czytane były przy każdej wycenie relacji.
+Każda wersja pliku (skrót SHA-1 zawartości) konwertowana jest raz do
+katalogu <sidecar_dir>/<nazwa>-<skrót>/ z plikiem .npy na kolumnę i meta.json:
+- kolumny liczbowe zapisywane są wprost,
+- kolumny tekstowe jako kategorie - kody int32 w .npy, kategorie w meta.json,
+- dodawane są kolumny znormalizowane (LANE_COLUMNS): kraj według
+  normalize_country i prefiksy kodów pocztowych (2 znaki i 1 znak).
+
+Kolejne wczytania (start workera, podmiana pliku stawek) mapują pliki .npy
+w pamięć (np.load(mmap_mode='r')) zamiast parsować xlsx. Format NumPy
+zamiast Parquet/Feather - nie wymaga pyarrow.
+
+Struktury wyliczane z tabeli (np. tablice podlotu i odjazdu według kraju
+i prefiksu kodu - build_podlot_table, build_odjazd_table) budowane są raz
+na wersję pliku przez HistoricalRatesStore.derived().
+
+Example:
+    >>> store = HistoricalRatesStore(sidecar_dir='rates_cache')
+    >>> df = store.get('historical_rates.xlsx')
+    >>> df[df[COL_LOAD_COUNTRY] == 'Poland']
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.config.countries import COUNTRY_MAPPING, normalize_country
+from app.services.rates_memo import WorkbookVersion
+
+logger = logging.getLogger(__name__)
+
+# Wersja formatu katalogu sidecar - zmiana wymusza ponowną konwersję
+SIDECAR_FORMAT = 1
+
+# Kolumny kodów pocztowych czytane jako tekst (zachowanie zer wiodących)
+POSTAL_COLUMNS = ('kod pocztowy zaladunku', 'kod pocztowy rozladunku')
+
+# Kolumny znormalizowane dodawane przy konwersji
+COL_LOAD_COUNTRY = '_kraj_zaladunku'      # normalize_country(kraj zaladunku)
+COL_UNLOAD_COUNTRY = '_kraj_rozladunku'   # normalize_country(kraj rozladunku)
+COL_LOAD_POSTAL_2 = '_kod_zaladunku_2'    # kod załadunku .zfill(2)
+COL_LOAD_POSTAL_1 = '_kod_zaladunku_1'    # pierwszy znak kodu załadunku
+COL_UNLOAD_POSTAL_2 = '_kod_rozladunku_2'
+COL_UNLOAD_POSTAL_1 = '_kod_rozladunku_1'
+LANE_COLUMNS = (COL_LOAD_COUNTRY, COL_UNLOAD_COUNTRY, COL_LOAD_POSTAL_2, COL_LOAD_POSTAL_1,
+                COL_UNLOAD_POSTAL_2, COL_UNLOAD_POSTAL_1)
+
+# Skrót mapowania krajów - zmiana normalize_country unieważnia kolumny znormalizowane
+_NORMALIZATION_DIGEST = hashlib.sha1(
+    json.dumps(COUNTRY_MAPPING, sort_keys=True, ensure_ascii=False).encode('utf-8')
+).hexdigest()[:8]
+
+
+def read_rates_workbook(path: str) -> pd.DataFrame:
+    """Czyta plik stawek z Excela (kody pocztowe jako tekst)."""
+    return pd.read_excel(path, dtype={column: str for column in POSTAL_COLUMNS})
+
+
+def add_lane_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Dodaje kolumny znormalizowane (LANE_COLUMNS) - te same wyrażenia, którymi
+    filtrowane były stawki relacji.
+    """
+    df = df.copy()
+    for country_column, postal_column, country_key, postal_2, postal_1 in (
+        ('kraj zaladunku', 'kod pocztowy zaladunku', COL_LOAD_COUNTRY, COL_LOAD_POSTAL_2, COL_LOAD_POSTAL_1),
+        ('kraj rozladunku', 'kod pocztowy rozladunku', COL_UNLOAD_COUNTRY, COL_UNLOAD_POSTAL_2, COL_UNLOAD_POSTAL_1),
+    ):
+        if country_column in df.columns:
+            df[country_key] = df[country_column].apply(normalize_country)
+        if postal_column in df.columns:
+            postal = df[postal_column].astype(str)
+            df[postal_2] = postal.str.zfill(2)
+            df[postal_1] = postal.str[0]
+    return df
+
+
+def fallback_key(country: str, postal_code) -> Tuple[str, str]:
+    """Klucz tablic podlotu i odjazdu: (znormalizowany kraj, 2-znakowy prefiks kodu)."""
+    return country, str(postal_code).zfill(2)[:2]
+
+
+def build_group_fallback_table(df: pd.DataFrame, country_column: str, postal_column: str,
+                               value_column: str, orders_column: str, group_column: str,
+                               min_orders: int = 20, default_value: float = 200) -> Dict[Tuple[str, str], Tuple[Any, str]]:
+    """
+    Buduje tablicę (kraj, prefiks kodu) -> (dystans, źródło) z fallbackiem do grupy koordynatów.
+
+    Logika dla każdego prefiksu (wiersze z niepustym dystansem):
+    1. Suma zleceń > min_orders: średnia ważona liczbą zleceń rekordów prefiksu
+    2. W przeciwnym razie średnia ważona całej grupy koordynatów (pierwsza grupa
+       prefiksu); gdy grupa ma mniej niż min_orders zleceń, brakujące zlecenia
+       uzupełniane są wartością domyślną
+    3. Brak kolumny grupy lub grupy prefiksu - średnia z rekordów prefiksu
+
+    Args:
+        df: Tabela stawek z kolumnami znormalizowanymi (add_lane_columns)
+        country_column: Kolumna znormalizowanego kraju (COL_LOAD_COUNTRY / COL_UNLOAD_COUNTRY)
+        postal_column: Kolumna kodu pocztowego
+        value_column: Kolumna dystansu ('dystans' / 'ODJAZD')
+        orders_column: Kolumna liczby zleceń (wagi)
+        group_column: Kolumna grupy koordynatów
+        min_orders: Minimalny próg liczby zleceń
+        default_value: Dystans uzupełniający grupy z małą liczbą zleceń [km]
+
+    Returns:
+        Słownik (kraj, prefiks) -> (dystans, opis źródła); brak klucza - brak danych
+    """
+    table = {}
+    if df.empty or value_column not in df.columns:
+        return table
+    has_orders = orders_column in df.columns
+    has_group = group_column in df.columns
+    valid = df.dropna(subset=[value_column])
+
+    def orders_sum(records):
+        return records[orders_column].fillna(0).sum() if has_orders else 0
+
+    def weighted(records, total_orders):
+        if total_orders > 0:
+            weights = records[orders_column].fillna(0) / total_orders
+            return (records[value_column] * weights).sum()
+        return records[value_column].mean()
+
+    groups = {}
+
+    def group_stats(grupa):
+        # Grupa obejmuje wiele prefiksów - liczona raz
+        if grupa not in groups:
+            records = valid[valid[group_column] == grupa]
+            total = orders_sum(records)
+            groups[grupa] = (len(records), total, weighted(records, total) if len(records) else None)
+        return groups[grupa]
+
+    prefixes = valid[postal_column].astype(str).str.zfill(2).str[:2]
+    for (country, prefix), records in valid.groupby([valid[country_column], prefixes], sort=False, observed=True):
+        try:
+            count = len(records)
+            total_orders = orders_sum(records)
+            label = f"kod pocztowy {country} {prefix}"
+            if total_orders > min_orders:
+                table[(country, prefix)] = (weighted(records, total_orders),
+                                            f"{label} (n={count}, zlecenia={int(total_orders)})")
+                continue
+            if not has_group:
+                table[(country, prefix)] = (weighted(records, total_orders),
+                                            f"{label} (n={count}, zlecenia={int(total_orders)}, brak grupy)")
+                continue
+            prefix_groups = records[group_column].dropna()
+            if prefix_groups.empty:
+                table[(country, prefix)] = (weighted(records, total_orders), f"{label} (n={count}, brak grupy)")
+                continue
+
+            grupa = prefix_groups.iloc[0]
+            group_count, group_orders, from_data = group_stats(grupa)
+            if group_count == 0:
+                table[(country, prefix)] = (weighted(records, total_orders), f"{label} (n={count}, grupa pusta)")
+            elif group_orders < min_orders:
+                missing_orders = min_orders - group_orders
+                value = (from_data * group_orders + default_value * missing_orders) / min_orders
+                table[(country, prefix)] = (value, (
+                    f"grupa {grupa} (n={group_count}, zlecenia={int(group_orders)}, uzupełniono "
+                    f"{int(missing_orders)} do {min_orders}, fallback z {country} {prefix})"))
+            else:
+                table[(country, prefix)] = (from_data, (
+                    f"grupa {grupa} (n={group_count}, zlecenia={int(group_orders)}, fallback z {country} {prefix})"))
+        except Exception as e:
+            logger.warning(f"Błąd obliczania {value_column} dla {country} {prefix}: {e}")
+    return table
+
+
+def build_podlot_table(df: pd.DataFrame, min_orders: int = 20) -> Dict[Tuple[str, str], Tuple[Any, str]]:
+    """Tablica podlotu według kraju i prefiksu kodu załadunku (grupa: grupa_koordynatow)."""
+    return build_group_fallback_table(df, COL_LOAD_COUNTRY, 'kod pocztowy zaladunku', 'dystans',
+                                      'Liczba zlecen', 'grupa_koordynatow', min_orders=min_orders)
+
+
+def build_odjazd_table(df: pd.DataFrame, min_orders: int = 20) -> Dict[Tuple[str, str], Tuple[Any, str]]:
+    """Tablica odjazdu według kraju i prefiksu kodu rozładunku (grupa: _KOORDYNATY_ODJAZD)."""
+    return build_group_fallback_table(df, COL_UNLOAD_COUNTRY, 'kod pocztowy rozladunku', 'ODJAZD',
+                                      'LICZBA_ZLECEN_ODJAZD', '_KOORDYNATY_ODJAZD', min_orders=min_orders)
+
+
+def write_sidecar(df: pd.DataFrame, directory: str, source: str) -> None:
+    """
+    Zapisuje DataFrame jako katalog sidecar (zapis atomowy przez katalog tymczasowy).
+
+    Raises:
+        ValueError: gdy kolumna nie jest liczbowa ani tekstowa (np. daty)
+    """
+    parent = os.path.dirname(directory) or '.'
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=parent)
+    try:
+        columns = []
+        for position, name in enumerate(df.columns):
+            series = df[name]
+            file_name = f'{position}.npy'
+            if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+                np.save(os.path.join(tmp_dir, file_name), series.to_numpy())
+                columns.append({'name': name, 'kind': 'numeric', 'file': file_name})
+                continue
+            categorical = pd.Categorical(series)
+            categories = categorical.categories.tolist()
+            if not all(isinstance(value, str) for value in categories):
+                raise ValueError(f"Kolumna '{name}' nie jest liczbowa ani tekstowa")
+            np.save(os.path.join(tmp_dir, file_name), categorical.codes.astype(np.int32))
+            columns.append({'name': name, 'kind': 'category', 'file': file_name, 'categories': categories})
+
+        meta = {'format': SIDECAR_FORMAT, 'source': source, 'rows': len(df), 'columns': columns,
+                'created_at': time.time()}
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # Inny proces zapisał tę samą wersję pierwszy
+            if not os.path.isdir(directory):
+                raise
+    finally:
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def read_sidecar(directory: str) -> pd.DataFrame:
+    """Wczytuje katalog sidecar (kolumny mapowane w pamięć)."""
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    data = {}
+    for column in meta['columns']:
+        values = np.load(os.path.join(directory, column['file']), mmap_mode='r')
+        if column['kind'] == 'category':
+            data[column['name']] = pd.Categorical.from_codes(values, categories=column['categories'])
+        else:
+            data[column['name']] = values
+    return pd.DataFrame(data, index=pd.RangeIndex(meta['rows']))
+
+
+class HistoricalRatesStore:
+    """
+    Tabele stawek historycznych w pamięci, przeładowywane po zmianie pliku.
+
+    get() sprawdza wersję pliku (stat, a skrót zawartości tylko po zmianie
+    mtime/rozmiaru) i przy nowej wersji wczytuje sidecar - konwertując plik,
+    jeśli sidecar tej wersji jeszcze nie istnieje.
+    """
+
+    def __init__(self, sidecar_dir: str = 'rates_cache',
+                 prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None):
+        """
+        Args:
+            sidecar_dir: Katalog plików sidecar
+            prepare: Opcjonalne przetworzenie tabeli po wczytaniu (kolumny zależne
+                     od konfiguracji aplikacji, np. regiony - nie są zapisywane w sidecar)
+        """
+        self.sidecar_dir = sidecar_dir
+        self.prepare = prepare
+        self._versions: Dict[str, WorkbookVersion] = {}
+        self._tables: Dict[str, Tuple[str, pd.DataFrame]] = {}
+        self._derived: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'loads': 0, 'conversions': 0, 'load_ms': 0.0}
+
+    def _sidecar_path(self, path: str, digest: str) -> str:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.sidecar_dir, f'{stem}-{digest}-{_NORMALIZATION_DIGEST}-v{SIDECAR_FORMAT}')
+
+    def _remove_old_sidecars(self, path: str, current: str) -> None:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        try:
+            entries = os.listdir(self.sidecar_dir)
+        except OSError:
+            return
+        for entry in entries:
+            full_path = os.path.join(self.sidecar_dir, entry)
+            if entry.startswith(f'{stem}-') and full_path != current and os.path.isdir(full_path):
+                shutil.rmtree(full_path, ignore_errors=True)
+
+    def _load(self, path: str, digest: str) -> pd.DataFrame:
+        start = time.perf_counter()
+        sidecar = self._sidecar_path(path, digest)
+        df = None
+        if os.path.isdir(sidecar):
+            try:
+                df = read_sidecar(sidecar)
+            except Exception as e:
+                logger.warning(f"Uszkodzony sidecar {sidecar}: {e} - konwertuję ponownie")
+                shutil.rmtree(sidecar, ignore_errors=True)
+        if df is None:
+            df = add_lane_columns(read_rates_workbook(path))
+            try:
+                write_sidecar(df, sidecar, source=path)
+                self.stats['conversions'] += 1
+                self._remove_old_sidecars(path, sidecar)
+                df = read_sidecar(sidecar)
+            except Exception as e:
+                # Bez sidecara tabela działa jak wczytana z Excela
+                logger.warning(f"Nie udało się zapisać sidecar dla {path}: {e}")
+        if self.prepare is not None:
+            df = self.prepare(df)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats['loads'] += 1
+        self.stats['load_ms'] = round(elapsed_ms, 2)
+        logger.info(f"Wczytano stawki {path} ({len(df)} wierszy) w {elapsed_ms:.1f} ms")
+        return df
+
+    def get(self, path: str) -> pd.DataFrame:
+        """
+        Zwraca tabelę stawek dla bieżącej wersji pliku.
+
+        Tabela jest współdzielona - nie wolno jej modyfikować.
+
+        Raises:
+            Exception: błąd odczytu pliku xlsx (np. brak pliku)
+        """
+        with self._lock:
+            return self._current(path)[1]
+
+    def derived(self, path: str, name: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+        """
+        Zwraca strukturę wyliczoną z tabeli (np. tablicę podlotu), budowaną raz na wersję pliku.
+
+        Args:
+            path: Ścieżka pliku stawek
+            name: Nazwa struktury
+            build: Funkcja budująca strukturę z tabeli
+        """
+        with self._lock:
+            digest, df = self._current(path)
+            built = self._derived.get((path, name))
+            if built is not None and built[0] == digest:
+                return built[1]
+            start = time.perf_counter()
+            value = build(df)
+            self._derived[(path, name)] = (digest, value)
+            logger.info(f"Zbudowano {name} dla {path} w {(time.perf_counter() - start) * 1000:.1f} ms")
+            return value
+
+    def _current(self, path: str) -> Tuple[str, pd.DataFrame]:
+        version = self._versions.get(path)
+        if version is None:
+            version = self._versions[path] = WorkbookVersion([path])
+        digest = version.current()
+        loaded = self._tables.get(path)
+        if loaded is None or loaded[0] != digest:
+            loaded = self._tables[path] = (digest, self._load(path, digest))
+        return loaded
+
+    def get_stats(self) -> Dict:
+        """Zwraca wersje wczytanych plików i czasy ładowania."""
+        with self._lock:
+            return dict(self.stats,
+                        tables={path: {'version': digest, 'rows': len(df)}
+                                for path, (digest, df) in self._tables.items()},
+                        derived={f'{path}:{name}': {'version': digest,
+                                                    'size': len(value) if hasattr(value, '__len__') else None}
+                                 for (path, name), (digest, value) in self._derived.items()})
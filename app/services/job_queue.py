@@ -0,0 +1,570 @@
+"""
+Kolejka zadań przetwarzania przetargów.
+
+Zawiera trwałą kolejkę zadań z ograniczoną pulą wątków roboczych.
+Zastępuje uruchamianie osobnego wątku dla każdego uploadu:
+- liczba równolegle przetwarzanych plików jest stała (JOB_WORKERS),
+- zadania są zapisywane w SQLite i wznawiane po restarcie procesu,
+- identyfikator zadania jest niezależny od sesji przeglądarki,
+- każde zadanie ma status, priorytet i może zostać anulowane.
+
+Backend w pamięci (InMemoryJobStore) wystarcza do testów i pracy lokalnej.
+"""
+
+import contextvars
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.models.exceptions import JobCancelledException
+
+logger = logging.getLogger(__name__)
+
+# Identyfikator zadania wykonywanego w bieżącym wątku roboczym
+current_job_id: contextvars.ContextVar = contextvars.ContextVar('current_job_id', default=None)
+
+
+def get_current_job_id() -> Optional[str]:
+    """
+    Zwraca identyfikator zadania przetwarzanego w bieżącym wątku.
+
+    Returns:
+        job_id lub None poza wątkiem roboczym kolejki
+    """
+    return current_job_id.get()
+
+
+class JobStatus:
+    """Możliwe stany zadania."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    """
+    Pojedyncze zadanie w kolejce.
+
+    Attributes:
+        job_id: Unikalny identyfikator zadania (niezależny od sesji)
+        kind: Typ zadania - wybiera handler
+        payload: Parametry zadania (serializowalne do JSON)
+        data: Dane binarne zadania (np. bajty pliku Excel)
+        priority: Priorytet - wyższa wartość jest obsługiwana wcześniej
+        status: Aktualny stan zadania (JobStatus)
+        session_id: Sesja, która zleciła zadanie (opcjonalna)
+        created_at: Timestamp dodania do kolejki
+        started_at: Timestamp rozpoczęcia przetwarzania
+        finished_at: Timestamp zakończenia
+        error: Opis błędu dla zadań zakończonych niepowodzeniem
+        cancel_requested: Czy zażądano anulowania
+        attempts: Liczba dotychczasowych uruchomień zadania
+    """
+
+    job_id: str
+    kind: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+    data: Optional[bytes] = None
+    priority: int = 0
+    status: str = JobStatus.QUEUED
+    session_id: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    attempts: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Konwertuje zadanie do słownika (bez danych binarnych).
+
+        Returns:
+            Słownik gotowy do serializacji JSON
+        """
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'payload': self.payload,
+            'priority': self.priority,
+            'status': self.status,
+            'session_id': self.session_id[:8] if self.session_id else None,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested,
+            'attempts': self.attempts,
+            'data_size': len(self.data) if self.data else 0,
+        }
+
+
+class InMemoryJobStore:
+    """
+    Magazyn zadań w pamięci procesu.
+
+    Nie przetrwa restartu - przeznaczony do testów i pracy lokalnej.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.RLock()
+
+    def add(self, job: Job) -> None:
+        with self._lock:
+            self._jobs[job.job_id] = job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def update(self, job: Job) -> None:
+        with self._lock:
+            self._jobs[job.job_id] = job
+
+    def claim_next(self) -> Optional[Job]:
+        """Pobiera zadanie o najwyższym priorytecie i oznacza je jako uruchomione."""
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j.status == JobStatus.QUEUED]
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: (-j.priority, j.created_at))
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            job.attempts += 1
+            return job
+
+    def cancel_queued(self, job_id: str) -> bool:
+        """Anuluje zadanie tylko jeśli nadal czeka w kolejce (atomowo względem claim_next)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != JobStatus.QUEUED:
+                return False
+            job.status = JobStatus.CANCELLED
+            job.cancel_requested = True
+            job.finished_at = time.time()
+            return True
+
+    def list(self, limit: int = 100) -> List[Job]:
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+            return jobs[:limit]
+
+    def requeue_running(self) -> int:
+        """Przywraca do kolejki zadania przerwane w trakcie przetwarzania."""
+        with self._lock:
+            count = 0
+            for job in self._jobs.values():
+                if job.status == JobStatus.RUNNING:
+                    job.status = JobStatus.QUEUED
+                    count += 1
+            return count
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        """Usuwa zakończone zadania starsze niż podany wiek."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            to_delete = [
+                job_id for job_id, job in self._jobs.items()
+                if job.status in JobStatus.FINISHED and (job.finished_at or 0) < cutoff
+            ]
+            for job_id in to_delete:
+                del self._jobs[job_id]
+            return len(to_delete)
+
+
+class SQLiteJobStore:
+    """
+    Trwały magazyn zadań oparty o SQLite.
+
+    Zadania (razem z bajtami pliku) przetrwają restart procesu,
+    dzięki czemu przerwane przetwarzanie może zostać wznowione.
+    """
+
+    _COLUMNS = (
+        'job_id', 'kind', 'payload', 'data', 'priority', 'status', 'session_id',
+        'created_at', 'started_at', 'finished_at', 'error', 'cancel_requested', 'attempts'
+    )
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Ścieżka do pliku bazy SQLite
+        """
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                data BLOB,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                session_id TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, created_at)"
+        )
+
+    def _row_to_job(self, row) -> Job:
+        values = dict(zip(self._COLUMNS, row))
+        values['payload'] = json.loads(values['payload']) if values['payload'] else {}
+        values['cancel_requested'] = bool(values['cancel_requested'])
+        return Job(**values)
+
+    def _job_to_row(self, job: Job) -> tuple:
+        return (
+            job.job_id, job.kind, json.dumps(job.payload), job.data, job.priority,
+            job.status, job.session_id, job.created_at, job.started_at,
+            job.finished_at, job.error, int(job.cancel_requested), job.attempts
+        )
+
+    def add(self, job: Job) -> None:
+        placeholders = ', '.join('?' for _ in self._COLUMNS)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(self._COLUMNS)}) VALUES ({placeholders})",
+                self._job_to_row(job)
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def update(self, job: Job) -> None:
+        assignments = ', '.join(f"{col} = ?" for col in self._COLUMNS[1:])
+        row = self._job_to_row(job)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                row[1:] + (job.job_id,)
+            )
+
+    def claim_next(self) -> Optional[Job]:
+        """Pobiera zadanie o najwyższym priorytecie i oznacza je jako uruchomione."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE status = ? "
+                f"ORDER BY priority DESC, created_at ASC LIMIT 1",
+                (JobStatus.QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            job = self._row_to_job(row)
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            job.attempts += 1
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = ? WHERE job_id = ?",
+                (job.status, job.started_at, job.attempts, job.job_id)
+            )
+            return job
+
+    def cancel_queued(self, job_id: str) -> bool:
+        """Anuluje zadanie tylko jeśli nadal czeka w kolejce (atomowo względem claim_next)."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (JobStatus.CANCELLED, time.time(), job_id, JobStatus.QUEUED)
+            )
+            return cursor.rowcount == 1
+
+    def list(self, limit: int = 100) -> List[Job]:
+        # Bez kolumny data - lista służy tylko do podglądu
+        columns = ', '.join('NULL' if col == 'data' else col for col in self._COLUMNS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def requeue_running(self) -> int:
+        """Przywraca do kolejki zadania przerwane w trakcie przetwarzania."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ?",
+                (JobStatus.QUEUED, JobStatus.RUNNING)
+            )
+            return cursor.rowcount
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        """Usuwa zakończone zadania starsze niż podany wiek."""
+        cutoff = time.time() - older_than_seconds
+        placeholders = ', '.join('?' for _ in JobStatus.FINISHED)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                JobStatus.FINISHED + (cutoff,)
+            )
+            return cursor.rowcount
+
+
+class JobQueue:
+    """
+    Kolejka zadań z ograniczoną pulą wątków roboczych.
+
+    Handlery rejestrowane są per typ zadania i wywoływane jako handler(job).
+    Anulowanie jest kooperacyjne - handler powinien wywoływać
+    check_cancelled(job_id), które rzuca JobCancelledException.
+    """
+
+    def __init__(self, store, max_workers: int = 2, poll_interval: float = 1.0):
+        """
+        Args:
+            store: Magazyn zadań (InMemoryJobStore lub SQLiteJobStore)
+            max_workers: Maksymalna liczba równolegle przetwarzanych zadań
+            poll_interval: Co ile sekund wątki sprawdzają kolejkę bez powiadomienia
+        """
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.poll_interval = poll_interval
+        self._handlers: Dict[str, Callable[[Job], Any]] = {}
+        self._cancel_requested = set()
+        self._cancel_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._running = False
+        logger.info(f"JobQueue zainicjalizowana (workers={self.max_workers}, store={type(store).__name__})")
+
+    def register_handler(self, kind: str, handler: Callable[[Job], Any]) -> None:
+        """
+        Rejestruje funkcję obsługującą dany typ zadania.
+
+        Args:
+            kind: Typ zadania
+            handler: Funkcja przyjmująca obiekt Job
+        """
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        """Uruchamia wątki robocze i wznawia zadania przerwane restartem."""
+        if self._running:
+            return
+        requeued = self.store.requeue_running()
+        if requeued:
+            logger.warning(f"Wznowiono {requeued} zadań przerwanych restartem procesu")
+        self._running = True
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, daemon=True, name=f"JobWorker-{i}")
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Uruchomiono {self.max_workers} wątków kolejki zadań")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Zatrzymuje wątki robocze (zadania w toku dokończą bieżący krok)."""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+        self._workers = []
+        logger.info("Kolejka zadań zatrzymana")
+
+    def submit(
+        self,
+        kind: str,
+        payload: Optional[Dict[str, Any]] = None,
+        data: Optional[bytes] = None,
+        priority: int = 0,
+        session_id: Optional[str] = None
+    ) -> str:
+        """
+        Dodaje zadanie do kolejki.
+
+        Args:
+            kind: Typ zadania (musi mieć zarejestrowany handler)
+            payload: Parametry zadania
+            data: Dane binarne (np. plik Excel)
+            priority: Priorytet - wyższy jest obsługiwany wcześniej
+            session_id: Sesja zlecająca zadanie
+
+        Returns:
+            Identyfikator nowego zadania
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Brak handlera dla typu zadania: {kind}")
+        job = Job(
+            job_id=uuid.uuid4().hex,
+            kind=kind,
+            payload=payload or {},
+            data=data,
+            priority=priority,
+            session_id=session_id
+        )
+        self.store.add(job)
+        logger.info(f"[job {job.job_id[:8]}] Dodano zadanie '{kind}' (priority={priority})")
+        with self._condition:
+            self._condition.notify()
+        return job.job_id
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Zwraca zadanie o podanym identyfikatorze."""
+        return self.store.get(job_id)
+
+    def list_jobs(self, limit: int = 100) -> List[Job]:
+        """Zwraca ostatnie zadania (bez danych binarnych)."""
+        return self.store.list(limit)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Anuluje zadanie.
+
+        Zadanie oczekujące jest anulowane od razu (warunkowo w magazynie,
+        więc nie ściga się z claim_next), uruchomione - przy najbliższym
+        wywołaniu check_cancelled przez handler.
+
+        Returns:
+            True jeśli zadanie istniało i nie było zakończone
+        """
+        if self.store.cancel_queued(job_id):
+            logger.info(f"[job {job_id[:8]}] Anulowano oczekujące zadanie")
+            return True
+
+        job = self.store.get(job_id)
+        if job is None or job.status in JobStatus.FINISHED:
+            return False
+        # Zadanie zostało już pobrane przez workera - flaga trafi do magazynu
+        # razem z wynikiem zadania w _run_job
+        with self._cancel_lock:
+            self._cancel_requested.add(job_id)
+        job = self.store.get(job_id)
+        if job is None or job.status in JobStatus.FINISHED:
+            with self._cancel_lock:
+                self._cancel_requested.discard(job_id)
+            return False
+        logger.info(f"[job {job_id[:8]}] Zażądano anulowania zadania")
+        return True
+
+    def resume(self, job_id: str) -> bool:
+        """
+        Ponownie kolejkuje zakończone zadanie.
+
+        Zadanie zachowuje swój identyfikator, więc handler może wykorzystać
+        zapisane checkpointy i ponowić tylko nieudane elementy.
+
+        Returns:
+            True jeśli zadanie zostało dodane ponownie do kolejki
+        """
+        job = self.store.get(job_id)
+        if job is None or job.status not in JobStatus.FINISHED:
+            return False
+        job.status = JobStatus.QUEUED
+        job.cancel_requested = False
+        job.error = None
+        job.finished_at = None
+        self.store.update(job)
+        logger.info(f"[job {job_id[:8]}] Zadanie wznowione")
+        with self._condition:
+            self._condition.notify()
+        return True
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        """Sprawdza czy zażądano anulowania uruchomionego zadania."""
+        with self._cancel_lock:
+            return job_id in self._cancel_requested
+
+    def check_cancelled(self, job_id: Optional[str]) -> None:
+        """
+        Rzuca JobCancelledException jeśli zadanie zostało anulowane.
+
+        Args:
+            job_id: Identyfikator zadania (None jest ignorowane)
+        """
+        if job_id and self.is_cancel_requested(job_id):
+            raise JobCancelledException(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Zwraca statystyki kolejki."""
+        counts: Dict[str, int] = {}
+        for job in self.store.list(limit=1000):
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            'workers': self.max_workers,
+            'running': self._running,
+            'jobs_by_status': counts,
+        }
+
+    def purge_finished(self, older_than_hours: float = 24) -> int:
+        """Usuwa zakończone zadania starsze niż podana liczba godzin."""
+        return self.store.purge_finished(older_than_hours * 3600)
+
+    def _worker_loop(self) -> None:
+        while self._running:
+            job = self.store.claim_next()
+            if job is None:
+                with self._condition:
+                    self._condition.wait(timeout=self.poll_interval)
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job: Job) -> None:
+        handler = self._handlers.get(job.kind)
+        token = current_job_id.set(job.job_id)
+        logger.info(f"[job {job.job_id[:8]}] Start zadania '{job.kind}' (próba {job.attempts})")
+        try:
+            if handler is None:
+                raise ValueError(f"Brak handlera dla typu zadania: {job.kind}")
+            handler(job)
+            job.status = JobStatus.COMPLETED
+        except JobCancelledException:
+            job.status = JobStatus.CANCELLED
+            logger.info(f"[job {job.job_id[:8]}] Zadanie anulowane")
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            logger.error(f"[job {job.job_id[:8]}] Błąd zadania: {e}", exc_info=True)
+        finally:
+            current_job_id.reset(token)
+            job.finished_at = time.time()
+            with self._cancel_lock:
+                if job.job_id in self._cancel_requested:
+                    job.cancel_requested = True
+                self._cancel_requested.discard(job.job_id)
+            self.store.update(job)
+
+
+def create_job_queue(backend: str = 'sqlite', db_path: str = 'jobs.db', max_workers: int = 2) -> JobQueue:
+    """
+    Tworzy kolejkę zadań z wybranym backendem.
+
+    Args:
+        backend: 'sqlite' (trwały) lub 'memory' (testy, praca lokalna)
+        db_path: Ścieżka do bazy SQLite
+        max_workers: Rozmiar puli wątków roboczych
+
+    Returns:
+        Nieuruchomiona instancja JobQueue
+    """
+    if backend == 'memory':
+        store = InMemoryJobStore()
+    elif backend == 'sqlite':
+        store = SQLiteJobStore(db_path)
+    else:
+        raise ValueError(f"Nieznany backend kolejki zadań: {backend}")
+    return JobQueue(store, max_workers=max_workers)
@@ -0,0 +1,140 @@
+"""
+Macierze marży jako gęste tablice NumPy indeksowane identyfikatorami regionów.
+
+Regiony (nazwy z mapowania regionów i z nagłówków macierzy) dostają stałe
+identyfikatory całkowite w RegionIndex wspólnym dla wszystkich macierzy.
+Macierz marży to tablica float [region załadunku, region rozładunku]
+z NaN tam, gdzie marża nie jest określona - marża relacji to jeden odczyt
+tablicy, a marże całego przetargu jedno indeksowanie tablicami ID.
+
+Example:
+    >>> regions = RegionIndex(['PL ZACHÓD', 'DE PÓŁNOC'])
+    >>> matrix = MarginMatrix.from_excel('Matrix.xlsx', regions)
+    >>> matrix.margin(regions.get('PL ZACHÓD'), regions.get('DE PÓŁNOC'))
+    >>> matrix.margins(np.array([0, 0]), np.array([1, 0]))
+"""
+
+import logging
+import threading
+from typing import Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Identyfikator regionu spoza indeksu (brak marży)
+UNKNOWN_REGION_ID = -1
+
+
+class RegionIndex:
+    """Stałe identyfikatory całkowite nazw regionów (tylko dopisywane)."""
+
+    def __init__(self, names: Iterable[Hashable] = ()):
+        """
+        Args:
+            names: Początkowe nazwy regionów
+        """
+        self._ids: Dict[Hashable, int] = {}
+        self.names: List[Hashable] = []
+        self._lock = threading.Lock()
+        for name in names:
+            self.add(name)
+
+    def add(self, name: Hashable) -> int:
+        """Zwraca identyfikator regionu, nadając nowy dla nieznanej nazwy."""
+        with self._lock:
+            region_id = self._ids.get(name)
+            if region_id is None:
+                region_id = self._ids[name] = len(self.names)
+                self.names.append(name)
+            return region_id
+
+    def get(self, name: Optional[Hashable]) -> int:
+        """Zwraca identyfikator regionu lub UNKNOWN_REGION_ID."""
+        if name is None:
+            return UNKNOWN_REGION_ID
+        return self._ids.get(name, UNKNOWN_REGION_ID)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class MarginMatrix:
+    """Macierz marży [EUR/dzień] dla par regionów (załadunek, rozładunek)."""
+
+    def __init__(self, source: str, values: np.ndarray):
+        """
+        Args:
+            source: Plik, z którego wczytano macierz
+            values: Tablica float [ID regionu załadunku, ID regionu rozładunku] (NaN - brak marży)
+        """
+        self.source = source
+        self.values = values
+
+    @classmethod
+    def from_excel(cls, matrix_file: str, regions: RegionIndex) -> Optional['MarginMatrix']:
+        """
+        Wczytuje macierz z pliku Excel (arkusz Sheet1).
+
+        Układ pliku: regiony rozładunku w pierwszym wierszu od trzeciej kolumny,
+        regiony załadunku w pierwszej kolumnie od trzeciego wiersza. Powtórzona
+        nazwa regionu - obowiązuje pierwsze wystąpienie.
+
+        Returns:
+            MarginMatrix lub None, gdy plik jest pusty lub ma nieprawidłowe wymiary
+        """
+        df = pd.read_excel(matrix_file, sheet_name='Sheet1', header=None)
+        if df.empty or df.shape[0] < 3 or df.shape[1] < 3:
+            logger.error(f"Macierz marży z pliku {matrix_file} jest pusta lub ma nieprawidłowe wymiary")
+            return None
+
+        regions_columns = df.iloc[0, 2:].dropna().tolist()
+        regions_rows = df.iloc[2:, 0].dropna().tolist()
+        margin_data = df.iloc[2:len(regions_rows) + 2, 2:len(regions_columns) + 2]
+        margin_data = margin_data.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+        rows = cls._first_occurrences(regions_rows[:margin_data.shape[0]])
+        columns = cls._first_occurrences(regions_columns[:margin_data.shape[1]])
+        row_ids = [regions.add(regions_rows[position]) for position in rows]
+        column_ids = [regions.add(regions_columns[position]) for position in columns]
+        values = np.full((len(regions), len(regions)), np.nan)
+        values[np.ix_(row_ids, column_ids)] = margin_data[np.ix_(rows, columns)]
+        return cls(matrix_file, values)
+
+    @staticmethod
+    def _first_occurrences(names: List[Hashable]) -> List[int]:
+        seen = set()
+        positions = []
+        for position, name in enumerate(names):
+            if name not in seen:
+                seen.add(name)
+                positions.append(position)
+        return positions
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def margin(self, loading_id: int, unloading_id: int) -> Optional[float]:
+        """Marża relacji lub None (region spoza macierzy, brak wartości)."""
+        rows, columns = self.values.shape
+        if not (0 <= loading_id < rows and 0 <= unloading_id < columns):
+            return None
+        margin = self.values[loading_id, unloading_id]
+        return None if np.isnan(margin) else float(margin)
+
+    def margins(self, loading_ids: np.ndarray, unloading_ids: np.ndarray) -> np.ndarray:
+        """
+        Marże wielu relacji jednym indeksowaniem.
+
+        Returns:
+            Tablica float (NaN - brak marży lub region spoza macierzy)
+        """
+        loading_ids = np.asarray(loading_ids, dtype=np.int64)
+        unloading_ids = np.asarray(unloading_ids, dtype=np.int64)
+        rows, columns = self.values.shape
+        known = (loading_ids >= 0) & (loading_ids < rows) & (unloading_ids >= 0) & (unloading_ids < columns)
+        result = np.full(loading_ids.shape, np.nan)
+        result[known] = self.values[loading_ids[known], unloading_ids[known]]
+        return result
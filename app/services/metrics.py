@@ -0,0 +1,285 @@
+"""
+Pomiar czasu etapów przetwarzania przetargów.
+
+Zawiera lekkie spany czasowe (MetricsRegistry.span) wokół kosztownych
+etapów: wczytania pliku, geokodowania (według źródła), weryfikacji,
+cache tras i zapytań PTV, stawek, wyceny i eksportu do Excela.
+
+Pomiary agregowane są jako histogramy:
+- dla całego procesu (wszystkie zadania i zapytania testowe),
+- dla zadania z kolejki, w którego wątku wykonano pomiar
+  (get_current_job_id) - ostatnie METRICS_MAX_JOBS zadań.
+
+Obok czasów zadanie może zapisać wartości liczbowe (set_gauge), np. udział
+zduplikowanych relacji w przetargu.
+
+render_prometheus() zwraca metryki w formacie tekstowym Prometheusa
+(endpoint /admin/metrics).
+
+Example:
+    >>> with metrics.span('geocoding', tier='nominatim'):
+    ...     location = geolocator.geocode(query)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config.settings import METRICS_MAX_JOBS
+from app.services.job_queue import get_current_job_id
+
+# Nazwa rodziny metryk w formacie Prometheusa
+METRIC_PREFIX = 'systemwycen'
+
+# Granice kubełków histogramu [s] - od trafień w cache do zapytań PTV z ponowieniami
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Klucz serii: (nazwa spanu, ((etykieta, wartość), ...))
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """Histogram czasów z kubełkami skumulowanymi przy renderowaniu."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Dodaje pomiar [s]."""
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> List[int]:
+        """Zwraca skumulowane liczności kubełków (bez +Inf)."""
+        total = 0
+        result = []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class Span:
+    """
+    Pojedynczy pomiar czasu.
+
+    Może być użyty jako context manager albo zatrzymany jawnie metodą
+    stop() - np. dla etapu, który kończy się w środku dłuższego bloku.
+    """
+
+    __slots__ = ('registry', 'name', 'labels', 'job_id', 'start', 'elapsed')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.job_id = get_current_job_id()
+        self.start = time.perf_counter()
+        self.elapsed = None
+
+    def stop(self) -> float:
+        """Kończy pomiar (kolejne wywołania nic nie zmieniają) i zwraca czas [s]."""
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.start
+            self.registry.observe(self.name, self.elapsed, job_id=self.job_id, **self.labels)
+        return self.elapsed
+
+    def __enter__(self) -> 'Span':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+class MetricsRegistry:
+    """
+    Rejestr histogramów czasów etapów.
+
+    Thread-safe - pomiary zapisują wątki kolejki zadań, wątek PTV
+    i wątki żądań Flask.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, max_jobs: int = METRICS_MAX_JOBS):
+        """
+        Args:
+            buckets: Granice kubełków histogramu [s]
+            max_jobs: Liczba ostatnich zadań, dla których trzymane są pomiary
+        """
+        self.buckets = buckets
+        self.max_jobs = max_jobs
+        self._series: Dict[SeriesKey, Histogram] = {}
+        self._jobs: 'OrderedDict[str, Dict[SeriesKey, Histogram]]' = OrderedDict()
+        self._gauges: Dict[str, float] = {}
+        self._job_gauges: 'OrderedDict[str, Dict[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **labels: str) -> Span:
+        """
+        Rozpoczyna pomiar etapu.
+
+        Args:
+            name: Nazwa etapu, np. 'geocoding', 'ptv_request'
+            **labels: Dodatkowe etykiety, np. tier='cache'
+
+        Returns:
+            Span (context manager lub stop())
+        """
+        return Span(self, name, labels)
+
+    def observe(self, name: str, seconds: float, job_id: Optional[str] = None, **labels: str) -> None:
+        """
+        Zapisuje zmierzony czas etapu.
+
+        Args:
+            name: Nazwa etapu
+            seconds: Czas [s]
+            job_id: Zadanie, do którego należy pomiar (None - tylko agregat procesu)
+            **labels: Dodatkowe etykiety
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._series.get(key)
+            if histogram is None:
+                histogram = self._series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+            if job_id is None:
+                return
+            job_series = self._jobs.get(job_id)
+            if job_series is None:
+                job_series = self._jobs[job_id] = {}
+                while len(self._jobs) > self.max_jobs:
+                    self._jobs.popitem(last=False)
+            else:
+                self._jobs.move_to_end(job_id)
+            histogram = job_series.get(key)
+            if histogram is None:
+                histogram = job_series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def set_gauge(self, name: str, value: float, job_id: Optional[str] = None) -> None:
+        """
+        Zapisuje wartość liczbową (ostatnia wartość zastępuje poprzednią).
+
+        Args:
+            name: Nazwa wartości, np. 'lane_dedupe_ratio'
+            value: Wartość
+            job_id: Zadanie (domyślnie zadanie bieżącego wątku)
+        """
+        job_id = job_id if job_id is not None else get_current_job_id()
+        with self._lock:
+            self._gauges[name] = value
+            if job_id is None:
+                return
+            job_gauges = self._job_gauges.get(job_id)
+            if job_gauges is None:
+                job_gauges = self._job_gauges[job_id] = {}
+                while len(self._job_gauges) > self.max_jobs:
+                    self._job_gauges.popitem(last=False)
+            job_gauges[name] = value
+
+    def get_job_gauges(self, job_id: str) -> Dict[str, float]:
+        """Zwraca wartości zapisane przez zadanie (set_gauge)."""
+        with self._lock:
+            return dict(self._job_gauges.get(job_id, {}))
+
+    def get_job_summary(self, job_id: str) -> Dict[str, Dict[str, float]]:
+        """
+        Zwraca podsumowanie czasów etapów zadania.
+
+        Args:
+            job_id: Identyfikator zadania
+
+        Returns:
+            Słownik 'etap{etykiety}' -> {'count', 'total_s', 'avg_ms'}
+        """
+        with self._lock:
+            job_series = dict(self._jobs.get(job_id, {}))
+            summary = {}
+            for (name, labels), histogram in sorted(job_series.items()):
+                summary[_series_name(name, labels)] = {
+                    'count': histogram.count,
+                    'total_s': round(histogram.sum, 4),
+                    'avg_ms': round(histogram.sum / histogram.count * 1000, 3) if histogram.count else 0.0,
+                }
+        return summary
+
+    def render_prometheus(self) -> str:
+        """
+        Renderuje metryki w formacie tekstowym Prometheusa.
+
+        - <prefix>_span_seconds - histogramy dla całego procesu,
+        - <prefix>_job_span_seconds_sum/_count - sumy dla ostatnich zadań.
+        """
+        family = f'{METRIC_PREFIX}_span_seconds'
+        job_family = f'{METRIC_PREFIX}_job_span_seconds'
+        lines = [
+            f'# HELP {family} Czas etapów przetwarzania w sekundach.',
+            f'# TYPE {family} histogram',
+        ]
+        with self._lock:
+            for (name, labels), histogram in sorted(self._series.items()):
+                base = (('span', name),) + labels
+                for bound, count in zip(histogram.buckets, histogram.cumulative()):
+                    lines.append(f'{family}_bucket{_format_labels(base + (("le", repr(bound)),))} {count}')
+                lines.append(f'{family}_bucket{_format_labels(base + (("le", "+Inf"),))} {histogram.count}')
+                lines.append(f'{family}_sum{_format_labels(base)} {histogram.sum:.6f}')
+                lines.append(f'{family}_count{_format_labels(base)} {histogram.count}')
+
+            lines.append(f'# HELP {job_family} Czas etapów ostatnich zadań w sekundach.')
+            lines.append(f'# TYPE {job_family} summary')
+            for job_id, job_series in self._jobs.items():
+                for (name, labels), histogram in sorted(job_series.items()):
+                    base = (('job_id', job_id), ('span', name)) + labels
+                    lines.append(f'{job_family}_sum{_format_labels(base)} {histogram.sum:.6f}')
+                    lines.append(f'{job_family}_count{_format_labels(base)} {histogram.count}')
+
+            gauge_family = f'{METRIC_PREFIX}_value'
+            job_gauge_family = f'{METRIC_PREFIX}_job_value'
+            lines.append(f'# HELP {gauge_family} Ostatnie wartości zapisane przez zadania.')
+            lines.append(f'# TYPE {gauge_family} gauge')
+            for name, value in sorted(self._gauges.items()):
+                lines.append(f'{gauge_family}{_format_labels((("name", name),))} {value}')
+            lines.append(f'# HELP {job_gauge_family} Wartości zapisane przez ostatnie zadania.')
+            lines.append(f'# TYPE {job_gauge_family} gauge')
+            for job_id, job_gauges in self._job_gauges.items():
+                for name, value in sorted(job_gauges.items()):
+                    lines.append(f'{job_gauge_family}{_format_labels((("job_id", job_id), ("name", name)))} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        """Usuwa wszystkie pomiary."""
+        with self._lock:
+            self._series.clear()
+            self._jobs.clear()
+            self._gauges.clear()
+            self._job_gauges.clear()
+
+
+def _series_name(name: str, labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}={value}' for key, value in labels) + '}'
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+# Rejestr współdzielony przez całą aplikację
+metrics = MetricsRegistry()
@@ -0,0 +1,204 @@
+"""
+Szybka wycena przetargu bez zapytań o trasy do PTV (tryb 'estimate').
+
+Dla handlowców, którzy potrzebują orientacyjnej ceny tysięcy relacji
+w ciągu minuty:
+- dystans = odległość w linii prostej (haversine) × współczynnik objazdu
+  pary krajów, wyliczony z tras w cache (mediana dystans PTV / linia prosta),
+- opłaty drogowe z modelu stawek krajów (TollRateModel).
+
+Wiersze wycenione szacunkowo są oznaczane w wyniku, a dokładnie wycenia
+się (tryb 'precise') dopiero wybrane relacje. Tryb 'two_phase' robi to
+automatycznie: po szacunku doprecyzowuje w tle wszystkie szacowane wiersze.
+
+Example:
+    >>> estimator = QuickQuoteEstimator(DetourFactorModel(), toll_model)
+    >>> estimator.refit(ptv_manager.cache_manager.route_endpoints())
+    >>> estimator.estimate_route([(52.23, 21.01), (52.52, 13.40)], ['PL', 'DE'])
+"""
+
+import logging
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.models.route_record import RouteRecord
+from app.services.toll_model import TollRateModel
+from app.utils.geo import haversine
+from app.utils.route_geometry import OFFSHORE_KEY
+
+logger = logging.getLogger(__name__)
+
+# Tryb wyceny przetargu
+PRICING_MODE_PRECISE = 'precise'    # trasy z PTV (domyślny)
+PRICING_MODE_ESTIMATE = 'estimate'  # trasy z cache lub szacunek bez zapytań PTV
+PRICING_MODE_TWO_PHASE = 'two_phase'  # najpierw szacunek, potem dokładne trasy PTV w tle
+PRICING_MODES = (PRICING_MODE_PRECISE, PRICING_MODE_ESTIMATE, PRICING_MODE_TWO_PHASE)
+
+# Współczynnik objazdu, gdy w cache nie ma tras pary krajów
+DEFAULT_DETOUR_FACTOR = 1.25
+
+Coordinates = Tuple[float, float]
+
+
+@dataclass
+class DetourFactor:
+    """Współczynnik objazdu pary krajów (dystans drogowy / linia prosta)."""
+
+    factor: float
+    samples: int
+
+
+def route_countries(record: RouteRecord) -> Optional[Tuple[str, str]]:
+    """Zwraca (kraj startu, kraj końca) trasy z kolejności przejazdu lub None."""
+    countries = [country for country, km in record.country_distances_km if country != OFFSHORE_KEY and km > 0]
+    if not countries:
+        return None
+    return countries[0], countries[-1]
+
+
+class DetourFactorModel:
+    """
+    Współczynniki objazdu według par krajów wyliczane z tras w cache.
+
+    fit() buduje model od nowa i podmienia go atomowo.
+    """
+
+    def __init__(self, min_samples: int = 5, min_straight_km: float = 20.0,
+                 default_factor: float = DEFAULT_DETOUR_FACTOR):
+        """
+        Args:
+            min_samples: Minimalna liczba tras pary krajów dla szacunku o wysokiej pewności
+            min_straight_km: Krótsze relacje są pomijane (duży rozrzut współczynnika)
+            default_factor: Współczynnik, gdy brak jakichkolwiek tras
+        """
+        self.min_samples = min_samples
+        self.min_straight_km = min_straight_km
+        self.default_factor = default_factor
+        self.pairs: Dict[Tuple[str, str], DetourFactor] = {}
+        self.overall = DetourFactor(default_factor, 0)
+        self.fitted_at: Optional[float] = None
+
+    def fit(self, routes: Iterable[Tuple[Coordinates, Coordinates, RouteRecord]]) -> 'DetourFactorModel':
+        """
+        Wylicza mediany współczynników objazdu.
+
+        Args:
+            routes: Trasy z cache jako (start, koniec, RouteRecord)
+
+        Returns:
+            self
+        """
+        factors = defaultdict(list)
+        all_factors = []
+        for start, end, record in routes:
+            pair = route_countries(record)
+            straight = haversine(start, end)
+            if pair is None or not straight or straight < self.min_straight_km or record.total_distance_km <= 0:
+                continue
+            factor = record.total_distance_km / straight
+            factors[pair].append(factor)
+            all_factors.append(factor)
+
+        self.pairs = {
+            pair: DetourFactor(round(statistics.median(values), 4), len(values))
+            for pair, values in factors.items()
+        }
+        self.overall = DetourFactor(
+            round(statistics.median(all_factors), 4) if all_factors else self.default_factor, len(all_factors)
+        )
+        self.fitted_at = time.time()
+        logger.info(f"Współczynniki objazdu: {len(self.pairs)} par krajów z {len(all_factors)} tras")
+        return self
+
+    def factor(self, country_from: Optional[str], country_to: Optional[str]) -> Tuple[float, bool]:
+        """
+        Zwraca współczynnik objazdu pary krajów.
+
+        Returns:
+            (współczynnik, czy wysoka pewność) - dla nieznanej pary mediana wszystkich tras
+        """
+        detour = self.pairs.get((country_from, country_to))
+        if detour is None:
+            return self.overall.factor, False
+        return detour.factor, detour.samples >= self.min_samples
+
+    def get_stats(self) -> Dict:
+        """Zwraca współczynniki par krajów."""
+        return {
+            'fitted_at': self.fitted_at,
+            'overall': self.overall.factor,
+            'routes': self.overall.samples,
+            'pairs': {
+                f"{start}-{end}": {'factor': detour.factor, 'samples': detour.samples}
+                for (start, end), detour in sorted(self.pairs.items())
+            },
+        }
+
+
+class QuickQuoteEstimator:
+    """Szacunek trasy relacji (dystans i opłaty) bez zapytań do PTV."""
+
+    def __init__(self, detour_model: DetourFactorModel, toll_model: TollRateModel):
+        self.detour_model = detour_model
+        self.toll_model = toll_model
+
+    def refit(self, routes: List[Tuple[Coordinates, Coordinates, RouteRecord]]) -> None:
+        """Przelicza współczynniki objazdu i stawki opłat z tras w cache."""
+        self.detour_model.fit(routes)
+        self.toll_model.fit(record for _, _, record in routes)
+
+    def estimate_route(self, points: Sequence[Coordinates], countries: Sequence[Optional[str]]) -> Dict:
+        """
+        Szacuje trasę przez kolejne punkty.
+
+        Args:
+            points: Współrzędne punktów (start, punkty pośrednie, koniec)
+            countries: Kody ISO krajów punktów (None - nieznany)
+
+        Returns:
+            Słownik w formacie wyniku trasy PTV z polami 'estimated'
+            i 'estimate_confident' (polyline pusty, bez promów)
+        """
+        distance_km = 0.0
+        toll_details: Dict[str, float] = defaultdict(float)
+        confident = True
+        for (start, end), (country_from, country_to) in zip(zip(points, points[1:]), zip(countries, countries[1:])):
+            straight = haversine(start, end) or 0.0
+            factor, factor_confident = self.detour_model.factor(country_from, country_to)
+            leg_km = straight * factor
+            distance_km += leg_km
+            toll = self.toll_model.estimate_corridor(country_from, country_to, leg_km)
+            if toll is None and country_from and country_to:
+                # Brak tras korytarza - połowa dystansu w kraju startu, połowa w kraju końca
+                split = defaultdict(float)
+                split[country_from] += leg_km / 2
+                split[country_to] += leg_km / 2
+                toll = self.toll_model.estimate(split)
+                toll.confident = False
+            if toll is None:
+                confident = False
+                continue
+            for country, cost in toll.country_costs.items():
+                toll_details[country] += cost
+            confident = confident and factor_confident and toll.confident
+
+        distance_km = round(distance_km, 1)
+        road_toll = round(sum(toll_details.values()), 2)
+        return {
+            'distance': distance_km,
+            'total_distance_km': distance_km,
+            'road_distance_km': distance_km,
+            'ferry_distance_km': 0.0,
+            'ferry_segments': [],
+            'polyline': '',
+            'toll_cost': road_toll,
+            'road_toll': road_toll,
+            'other_toll': 0.0,
+            'toll_details': {country: round(cost, 2) for country, cost in toll_details.items()},
+            'special_systems': [],
+            'estimated': True,
+            'estimate_confident': confident,
+        }
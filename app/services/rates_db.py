@@ -0,0 +1,458 @@
+"""
+Baza stawek historycznych w SQLite (opcjonalny backend stawek).
+
+Wiersze historical_rates.xlsx (źródło 'klient') i historical_rates_gielda.xlsx
+(źródło 'gielda') importowane są do jednej tabeli z kolumnami znormalizowanymi
+(kraj, prefiksy kodów pocztowych, regiony) i indeksami na:
+- relację (kraj i prefiks kodu załadunku, kraj i prefiks kodu rozładunku),
+- kraj i prefiks kodu załadunku / rozładunku (podlot i odjazd),
+- grupę koordynatów (grupa_koordynatow, _KOORDYNATY_ODJAZD),
+- parę regionów.
+
+Zapytania zwracają agregaty liczone w SQL (sumy zleceń, średnie ważone
+liczbą zleceń) zamiast filtrowania całych tabel w pandas - koszt zapytania
+zależy od liczby pasujących wierszy, nie od rozmiaru pliku stawek.
+
+Import (zastępuje całą zawartość bazy w jednej transakcji):
+    python -m app.services.rates_db
+    python -m app.services.rates_db --db historical_rates.db --klient historical_rates.xlsx \\
+        --gielda historical_rates_gielda.xlsx
+
+Example:
+    >>> db = RatesDatabase('historical_rates.db')
+    >>> db.import_workbooks({SOURCE_CLIENT: 'historical_rates.xlsx', SOURCE_EXCHANGE: 'historical_rates_gielda.xlsx'})
+    >>> db.lane_stats(SOURCE_CLIENT, 'Poland', '50', 'Germany', '10').rows
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.config.countries import normalize_country
+from app.config.regions import REGION_DATA_RAW, get_region_for_location, parse_region_data
+from app.services.historical_rates import (
+    COL_LOAD_COUNTRY,
+    COL_LOAD_POSTAL_1,
+    COL_LOAD_POSTAL_2,
+    COL_UNLOAD_COUNTRY,
+    COL_UNLOAD_POSTAL_1,
+    COL_UNLOAD_POSTAL_2,
+    add_lane_columns,
+    read_rates_workbook,
+)
+from app.services.rates_memo import WorkbookVersion
+
+logger = logging.getLogger(__name__)
+
+# Źródła stawek
+SOURCE_CLIENT = 'klient'
+SOURCE_EXCHANGE = 'gielda'
+
+# Kolumny pliku stawek -> kolumny tabeli (brak kolumny w pliku - NULL)
+VALUE_COLUMNS = {
+    'dystans': 'distance',
+    'stawka_3m': 'rate_3m',
+    'stawka_6m': 'rate_6m',
+    'stawka_12m': 'rate_12m',
+    'fracht_3m': 'freight_3m',
+    'Liczba zlecen': 'orders',
+    'grupa_koordynatow': 'load_group',
+    'ODJAZD': 'departure',
+    'LICZBA_ZLECEN_ODJAZD': 'departure_orders',
+    '_KOORDYNATY_ODJAZD': 'departure_group',
+}
+
+# Kolumny tabeli -> kolumny pliku stawek
+WORKBOOK_COLUMNS = {column: name for name, column in VALUE_COLUMNS.items()}
+
+# Kolumny stawek agregowane dla relacji i pary regionów
+RATE_COLUMNS = ('rate_3m', 'rate_6m', 'rate_12m', 'freight_3m')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rates (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    load_country TEXT,
+    load_postal TEXT,
+    load_postal_1 TEXT,
+    load_prefix TEXT,
+    unload_country TEXT,
+    unload_postal TEXT,
+    unload_postal_1 TEXT,
+    unload_prefix TEXT,
+    load_region TEXT,
+    unload_region TEXT,
+    distance REAL,
+    rate_3m REAL,
+    rate_6m REAL,
+    rate_12m REAL,
+    freight_3m REAL,
+    orders INTEGER,
+    load_group TEXT,
+    departure REAL,
+    departure_orders INTEGER,
+    departure_group TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rates_lane
+    ON rates (source, load_country, load_postal, unload_country, unload_postal);
+CREATE INDEX IF NOT EXISTS idx_rates_lane_1
+    ON rates (source, load_country, load_postal_1, unload_country, unload_postal_1);
+CREATE INDEX IF NOT EXISTS idx_rates_load_prefix ON rates (source, load_country, load_prefix);
+CREATE INDEX IF NOT EXISTS idx_rates_unload_prefix ON rates (source, unload_country, unload_prefix);
+CREATE INDEX IF NOT EXISTS idx_rates_load_group ON rates (source, load_group);
+CREATE INDEX IF NOT EXISTS idx_rates_departure_group ON rates (source, departure_group);
+CREATE INDEX IF NOT EXISTS idx_rates_regions ON rates (source, load_region, unload_region);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_INSERT_COLUMNS = (
+    'source', 'load_country', 'load_postal', 'load_postal_1', 'load_prefix',
+    'unload_country', 'unload_postal', 'unload_postal_1', 'unload_prefix',
+    'load_region', 'unload_region',
+) + tuple(VALUE_COLUMNS.values())
+
+
+@dataclass
+class ColumnStats:
+    """
+    Agregat kolumny wartości dla pasujących wierszy.
+
+    Attributes:
+        count: Liczba wierszy z wartością
+        orders: Suma zleceń wierszy z wartością (0, gdy brak)
+        weighted: Średnia ważona liczbą zleceń (None, gdy suma zleceń to 0)
+        mean: Średnia arytmetyczna
+        value: Wartość, gdy pasuje dokładnie jeden wiersz
+    """
+
+    count: int = 0
+    orders: float = 0
+    weighted: Optional[float] = None
+    mean: Optional[float] = None
+    value: Optional[float] = None
+
+    def distance(self) -> Optional[float]:
+        """Dystans jak calculate_podlot_from_data: wartość, średnia ważona lub zwykła."""
+        if self.count == 0:
+            return None
+        if self.count == 1:
+            return float(self.value)
+        if self.orders > 0:
+            return self.weighted
+        return self.mean
+
+
+@dataclass
+class LaneStats:
+    """
+    Agregaty stawek relacji (lub pary regionów) z jednego źródła.
+
+    Attributes:
+        rows: Liczba pasujących wierszy
+        orders: Suma zleceń pasujących wierszy
+        single_orders: Liczba zleceń, gdy pasuje dokładnie jeden wiersz
+        columns: Agregaty kolumn stawek i dystansu (klucze jak w tabeli rates)
+    """
+
+    rows: int = 0
+    orders: float = 0
+    single_orders: Optional[float] = None
+    columns: Dict[str, ColumnStats] = field(default_factory=dict)
+
+
+def _column_aggregates(column: str, weight: str = 'orders') -> str:
+    return (
+        f"COUNT({column}), "
+        f"COALESCE(SUM(CASE WHEN {column} IS NOT NULL THEN {weight} END), 0), "
+        f"SUM({column} * {weight}) / SUM(CASE WHEN {column} IS NOT NULL THEN {weight} END), "
+        f"AVG({column}), MAX({column})"
+    )
+
+
+def default_region_resolver() -> Callable[[str, str], Optional[str]]:
+    """Regiony z app.config.regions (jak get_region w aplikacji)."""
+    mapping = parse_region_data(REGION_DATA_RAW, normalize_country)
+    return lambda country, postal_code: get_region_for_location(mapping, country, postal_code, normalize_country)
+
+
+class RatesDatabase:
+    """
+    Stawki historyczne w SQLite z zapytaniami dla wyceny relacji.
+
+    Odczyty i import serializowane są blokadą połączenia; import
+    podmienia zawartość w jednej transakcji.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Ścieżka do pliku bazy SQLite
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # Wersje zestawów plików - zawartość haszowana tylko po zmianie mtime/rozmiaru
+        self._versions: Dict[Tuple[str, ...], WorkbookVersion] = {}
+        self.stats = {'queries': 0, 'imports': 0}
+
+    # --- Import ---
+
+    def import_workbooks(self, workbooks: Dict[str, str],
+                         region_of: Optional[Callable[[str, str], Optional[str]]] = None) -> Dict[str, int]:
+        """
+        Importuje pliki stawek, zastępując poprzednią zawartość bazy.
+
+        Args:
+            workbooks: Źródło (SOURCE_CLIENT / SOURCE_EXCHANGE) -> ścieżka pliku xlsx
+            region_of: Funkcja (kraj, kod pocztowy) -> region (domyślnie default_region_resolver)
+
+        Returns:
+            Liczba zaimportowanych wierszy według źródła
+        """
+        region_of = region_of or default_region_resolver()
+        rows = []
+        counts = {}
+        columns = {}
+        for source, path in workbooks.items():
+            df = add_lane_columns(read_rates_workbook(path))
+            columns[source] = [name for name in VALUE_COLUMNS if name in df.columns]
+            counts[source] = len(df)
+            rows.extend(self._workbook_rows(source, df, region_of))
+
+        version = self._version(workbooks.values())
+        placeholders = ', '.join('?' for _ in _INSERT_COLUMNS)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM rates")
+                self._conn.executemany(
+                    f"INSERT INTO rates ({', '.join(_INSERT_COLUMNS)}) VALUES ({placeholders})", rows
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [('version', version), ('imported_at', str(time.time())),
+                     ('workbooks', json.dumps(workbooks)), ('columns', json.dumps(columns))]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.stats['imports'] += 1
+        logger.info(f"Zaimportowano stawki do {self.db_path}: {counts}")
+        return counts
+
+    @staticmethod
+    def _workbook_rows(source: str, df: pd.DataFrame, region_of):
+        if df.empty:
+            return []
+        postal_prefix = {
+            side: df[f'kod pocztowy {side}'].astype(str).str.zfill(2).str[:2]
+            for side in ('zaladunku', 'rozladunku')
+        }
+        table = pd.DataFrame({
+            'source': source,
+            'load_country': df[COL_LOAD_COUNTRY],
+            'load_postal': df[COL_LOAD_POSTAL_2],
+            'load_postal_1': df[COL_LOAD_POSTAL_1],
+            'load_prefix': postal_prefix['zaladunku'],
+            'unload_country': df[COL_UNLOAD_COUNTRY],
+            'unload_postal': df[COL_UNLOAD_POSTAL_2],
+            'unload_postal_1': df[COL_UNLOAD_POSTAL_1],
+            'unload_prefix': postal_prefix['rozladunku'],
+            'load_region': [region_of(normalize_country(c), p)
+                            for c, p in zip(df['kraj zaladunku'], df['kod pocztowy zaladunku'])],
+            'unload_region': [region_of(normalize_country(c), p)
+                              for c, p in zip(df['kraj rozladunku'], df['kod pocztowy rozladunku'])],
+        }, index=df.index)
+        for name, column in VALUE_COLUMNS.items():
+            table[column] = df[name] if name in df.columns else None
+        table = table[list(_INSERT_COLUMNS)].astype(object)
+        table = table.where(table.notna(), None)
+        return [
+            tuple(value.item() if hasattr(value, 'item') else value for value in row)
+            for row in table.itertuples(index=False, name=None)
+        ]
+
+    def is_current(self, paths) -> bool:
+        """Czy baza zawiera bieżącą wersję plików stawek."""
+        return self.get_meta('version') == self._version(paths)
+
+    def _version(self, paths) -> str:
+        paths = tuple(paths)
+        version = self._versions.get(paths)
+        if version is None:
+            version = self._versions[paths] = WorkbookVersion(paths)
+        return version.current()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def has_column(self, source: str, column: str) -> bool:
+        """Czy importowany plik źródła miał kolumnę (nazwa z pliku xlsx)."""
+        return column in json.loads(self.get_meta('columns') or '{}').get(source, [])
+
+    # --- Zapytania ---
+
+    def _query(self, sql: str, params) -> list:
+        with self._lock:
+            self.stats['queries'] += 1
+            return self._conn.execute(sql, params).fetchall()
+
+    def _stats(self, where: str, params) -> LaneStats:
+        aggregates = ', '.join(_column_aggregates(column) for column in RATE_COLUMNS + ('distance',))
+        row = self._query(
+            f"SELECT COUNT(*), COALESCE(SUM(orders), 0), MAX(orders), {aggregates} FROM rates WHERE {where}",
+            params
+        )[0]
+        stats = LaneStats(rows=row[0], orders=row[1], single_orders=row[2])
+        for position, column in enumerate(RATE_COLUMNS + ('distance',)):
+            stats.columns[column] = ColumnStats(*row[3 + position * 5:8 + position * 5])
+        return stats
+
+    def lane_stats(self, source: str, load_country: str, load_postal: str,
+                   unload_country: str, unload_postal: str) -> LaneStats:
+        """
+        Agregaty stawek relacji jak filtr compute_all_rates.
+
+        Kody 2-znakowe porównywane są z kodem dopełnionym zerem (zfill(2)),
+        kody 1-znakowe z pierwszym znakiem kodu.
+        """
+        load_column = 'load_postal' if len(load_postal) >= 2 else 'load_postal_1'
+        unload_column = 'unload_postal' if len(unload_postal) >= 2 else 'unload_postal_1'
+        return self._stats(
+            f"source = ? AND load_country = ? AND {load_column} = ? "
+            f"AND unload_country = ? AND {unload_column} = ?",
+            (source, load_country, load_postal, unload_country, unload_postal)
+        )
+
+    def region_stats(self, source: str, load_region: str, unload_region: str) -> LaneStats:
+        """Agregaty stawek pary regionów."""
+        return self._stats("source = ? AND load_region = ? AND unload_region = ?",
+                           (source, load_region, unload_region))
+
+    def podlot_with_group_fallback(self, norm_lc: str, norm_lp: str,
+                                   min_orders: int = 20) -> Tuple[Optional[float], Optional[str]]:
+        """Podlot jak tablica build_podlot_table (dane klienta)."""
+        return self._group_fallback(
+            side='load', value='distance', orders='orders', group='load_group',
+            group_column='grupa_koordynatow', country=norm_lc, postal=norm_lp, min_orders=min_orders,
+        )
+
+    def odjazd_with_group_fallback(self, norm_uc: str, norm_up: str,
+                                   min_orders: int = 20) -> Tuple[Optional[float], Optional[str]]:
+        """Odjazd jak tablica build_odjazd_table (dane klienta)."""
+        if not self.has_column(SOURCE_CLIENT, 'ODJAZD'):
+            return None, None
+        return self._group_fallback(
+            side='unload', value='departure', orders='departure_orders', group='departure_group',
+            group_column='_KOORDYNATY_ODJAZD', country=norm_uc, postal=norm_up, min_orders=min_orders,
+        )
+
+    def _group_fallback(self, side, value, orders, group, group_column, country, postal, min_orders):
+        prefix = str(postal).zfill(2)[:2]
+        exact_where = f"source = ? AND {side}_country = ? AND {side}_prefix = ? AND {value} IS NOT NULL"
+        exact_params = (SOURCE_CLIENT, country, prefix)
+        count, total_orders, weighted_sum, mean = self._query(
+            f"SELECT COUNT(*), COALESCE(SUM({orders}), 0), SUM({value} * COALESCE({orders}, 0)), AVG({value}) "
+            f"FROM rates WHERE {exact_where}", exact_params
+        )[0]
+        if count == 0:
+            return None, None
+
+        def exact_value():
+            return weighted_sum / total_orders if total_orders > 0 else mean
+
+        if total_orders > min_orders:
+            return exact_value(), f"kod pocztowy {country} {prefix} (n={count}, zlecenia={int(total_orders)})"
+
+        if not self.has_column(SOURCE_CLIENT, group_column):
+            return exact_value(), (f"kod pocztowy {country} {prefix} (n={count}, zlecenia={int(total_orders)}, "
+                                   f"brak grupy)")
+
+        first_group = self._query(
+            f"SELECT {group} FROM rates WHERE {exact_where} AND {group} IS NOT NULL ORDER BY id LIMIT 1",
+            exact_params
+        )
+        if not first_group:
+            return exact_value(), f"kod pocztowy {country} {prefix} (n={count}, brak grupy)"
+        grupa = first_group[0][0]
+
+        group_count, group_orders, group_weighted_sum, group_mean = self._query(
+            f"SELECT COUNT(*), COALESCE(SUM({orders}), 0), SUM({value} * COALESCE({orders}, 0)), AVG({value}) "
+            f"FROM rates WHERE source = ? AND {group} = ? AND {value} IS NOT NULL",
+            (SOURCE_CLIENT, grupa)
+        )[0]
+        if group_count == 0:
+            return exact_value(), f"kod pocztowy {country} {prefix} (n={count}, grupa pusta)"
+
+        default_value = 200
+        from_data = group_weighted_sum / group_orders if group_orders > 0 else group_mean
+        if group_orders < min_orders:
+            missing_orders = min_orders - group_orders
+            blended = (from_data * group_orders + default_value * missing_orders) / min_orders
+            return blended, (f"grupa {grupa} (n={group_count}, zlecenia={int(group_orders)}, uzupełniono "
+                             f"{int(missing_orders)} do {min_orders}, fallback z {country} {prefix})")
+        return from_data, (f"grupa {grupa} (n={group_count}, zlecenia={int(group_orders)}, "
+                           f"fallback z {country} {prefix})")
+
+    def get_stats(self) -> Dict:
+        """Zwraca liczbę wierszy według źródła, wersję importu i liczbę zapytań."""
+        with self._lock:
+            rows = dict(self._conn.execute("SELECT source, COUNT(*) FROM rates GROUP BY source").fetchall())
+            meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+            return {
+                'db_path': self.db_path,
+                'rows': rows,
+                'version': meta.get('version'),
+                'imported_at': float(meta['imported_at']) if 'imported_at' in meta else None,
+                'queries': self.stats['queries'],
+                'imports': self.stats['imports'],
+            }
+
+
+def create_rates_database(backend: str = 'excel', db_path: str = 'historical_rates.db') -> Optional[RatesDatabase]:
+    """
+    Tworzy backend stawek historycznych.
+
+    Args:
+        backend: 'excel' (tabele z plików xlsx w pamięci) lub 'sqlite'
+        db_path: Ścieżka do bazy SQLite
+
+    Returns:
+        RatesDatabase lub None dla backendu 'excel'
+    """
+    if backend == 'excel':
+        return None
+    if backend == 'sqlite':
+        return RatesDatabase(db_path)
+    raise ValueError(f"Nieznany backend stawek: {backend}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import stawek historycznych z plików xlsx do SQLite')
+    parser.add_argument('--db', default='historical_rates.db', help='Ścieżka do bazy SQLite')
+    parser.add_argument('--klient', default='historical_rates.xlsx', help='Plik stawek klienta')
+    parser.add_argument('--gielda', default='historical_rates_gielda.xlsx', help='Plik stawek giełdowych')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    counts = RatesDatabase(args.db).import_workbooks({SOURCE_CLIENT: args.klient, SOURCE_EXCHANGE: args.gielda})
+    print(json.dumps(counts))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Pamięć wyników stawek relacji (LRU) współdzielona przez sesje i zadania.
+
+get_all_rates i get_region_based_rates zależą wyłącznie od relacji
+(kraj i prefiks kodu pocztowego załadunku/rozładunku albo para regionów)
+oraz od zawartości plików stawek historycznych. Wyniki pamiętane są
+w LRU z kluczem (wersja plików, relacja):
+- wersja to skrót SHA-1 zawartości historical_rates*.xlsx, przeliczany
+  tylko po zmianie czasu modyfikacji lub rozmiaru pliku,
+- po podmianie pliku wszystkie wpisy są usuwane,
+- równoczesne wyliczenia tej samej relacji łączone są przez SingleFlight.
+
+Example:
+    >>> memo = RatesMemo(WorkbookVersion(['historical_rates.xlsx', 'historical_rates_gielda.xlsx']))
+    >>> rates = memo.get_or_compute(('lane', 'PL', '50', 'DE', '10'), compute_rates)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Stan pliku: (mtime_ns, rozmiar) lub None, gdy plik nie istnieje
+FileStamp = Optional[Tuple[int, int]]
+
+
+class WorkbookVersion:
+    """Wersja zestawu plików jako skrót ich zawartości."""
+
+    def __init__(self, paths: Iterable[str]):
+        """
+        Args:
+            paths: Ścieżki plików (brak pliku to też wersja)
+        """
+        self.paths = tuple(paths)
+        self._stamps: Optional[Tuple[FileStamp, ...]] = None
+        self._digest: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path: str) -> FileStamp:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _hash(self) -> str:
+        digest = hashlib.sha1()
+        for path in self.paths:
+            digest.update(path.encode('utf-8'))
+            try:
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(chunk)
+            except OSError:
+                digest.update(b'\0missing')
+        return digest.hexdigest()[:16]
+
+    def current(self) -> str:
+        """Zwraca skrót wersji (zawartość czytana tylko po zmianie mtime/rozmiaru)."""
+        stamps = tuple(self._stamp(path) for path in self.paths)
+        with self._lock:
+            if stamps != self._stamps:
+                self._digest = self._hash()
+                self._stamps = stamps
+            return self._digest
+
+
+class RatesMemo:
+    """
+    LRU wyników stawek relacji zależnych od wersji plików stawek.
+
+    Zwracane są kopie słowników - wywołujący mogą je modyfikować.
+    """
+
+    def __init__(self, version: WorkbookVersion, max_entries: int = 20000):
+        """
+        Args:
+            version: Wersja plików, od których zależą wyniki
+            max_entries: Maksymalna liczba pamiętanych relacji
+        """
+        self.version = version
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, Hashable], Dict[str, Any]]' = OrderedDict()
+        self._digest: Optional[str] = None
+        self._flight = SingleFlight('rates')
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Zwraca zapamiętany wynik relacji lub wylicza go i zapamiętuje.
+
+        Args:
+            key: Znormalizowany klucz relacji
+            compute: Funkcja wyliczająca wynik (słownik)
+
+        Returns:
+            Kopia wyniku
+        """
+        version = self.version.current()
+        full_key = (version, key)
+        with self._lock:
+            if version != self._digest:
+                if self._digest is not None:
+                    self.stats['invalidations'] += 1
+                    logger.info(f"Zmiana plików stawek - usuwam {len(self._entries)} zapamiętanych relacji")
+                self._entries.clear()
+                self._digest = version
+            value = self._entries.get(full_key)
+            if value is not None:
+                self._entries.move_to_end(full_key)
+                self.stats['hits'] += 1
+                return dict(value)
+            self.stats['misses'] += 1
+
+        return dict(self._flight.do(full_key, self._compute_and_store, full_key, compute))
+
+    def _compute_and_store(self, full_key: Tuple[str, Hashable], compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        value = compute()
+        with self._lock:
+            # Pliki mogły zmienić się w trakcie wyliczania - wynik starej wersji nie trafia do pamięci
+            if full_key[0] == self._digest:
+                self._entries[full_key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Usuwa wszystkie zapamiętane wyniki."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Zwraca liczbę wpisów, trafień i unieważnień."""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'version': self._digest,
+                'hits': self.stats['hits'],
+                'misses': self.stats['misses'],
+                'hit_rate': round(self.stats['hits'] / lookups * 100, 2) if lookups else 0.0,
+                'invalidations': self.stats['invalidations'],
+                'single_flight': self._flight.get_stats(),
+            }
@@ -0,0 +1,216 @@
+"""
+Model stawek opłat drogowych [EUR/km] według krajów.
+
+Trasy w cache PTV zawierają opłaty w krajach (toll_details) i dystans
+w krajach (country_distances_km). Z nich model wylicza dla każdego kraju:
+- stawkę EUR/km (suma opłat / suma km w kraju),
+- rozrzut stawek między trasami (współczynnik zmienności ważony km),
+oraz dla każdego korytarza (kraj startu, kraj końca) średni udział km
+w krajach przejazdu.
+
+Opłatę relacji bez zapytania do PTV można wtedy oszacować jako
+sum(udział_kraju * dystans * stawka_kraju). Szacunek ma wysoką pewność,
+gdy każdy kraj (i korytarz) ma dość tras i mały rozrzut stawek - w innym
+przypadku wycena powinna użyć PTV.
+
+Example:
+    >>> routes = ptv_manager.cache_manager.route_endpoints()
+    >>> model = TollRateModel().fit(record for _, _, record in routes)
+    >>> estimate = model.estimate_corridor('PL', 'DE', 850.0)
+    >>> estimate.toll_cost, estimate.confident
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.models.route_record import RouteRecord
+from app.utils.route_geometry import OFFSHORE_KEY
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CountryTollRate:
+    """Stawka opłat w kraju wyliczona z tras w cache."""
+
+    country: str
+    rate_eur_km: float
+    samples: int
+    km: float
+    cv: float
+
+
+@dataclass
+class TollEstimate:
+    """
+    Szacunek opłat relacji.
+
+    Attributes:
+        toll_cost: Szacowana suma opłat [EUR]
+        confident: Czy szacunek ma wysoką pewność
+        country_costs: Szacowane opłaty w krajach [EUR]
+        unknown_countries: Kraje bez wiarygodnej stawki
+    """
+
+    toll_cost: float
+    confident: bool
+    country_costs: Dict[str, float] = field(default_factory=dict)
+    unknown_countries: List[str] = field(default_factory=list)
+
+
+class TollRateModel:
+    """
+    Model stawek opłat według krajów i udziałów krajów w korytarzach.
+
+    fit() buduje model od nowa i podmienia go atomowo - odczyty
+    z innych wątków nie wymagają blokady.
+    """
+
+    def __init__(self, min_samples: int = 5, max_cv: float = 0.25, min_country_km: float = 20.0):
+        """
+        Args:
+            min_samples: Minimalna liczba tras dla kraju / korytarza
+            max_cv: Maksymalny współczynnik zmienności stawki kraju
+            min_country_km: Krótsze odcinki w kraju są pomijane (szum przy granicy)
+        """
+        self.min_samples = min_samples
+        self.max_cv = max_cv
+        self.min_country_km = min_country_km
+        self.rates: Dict[str, CountryTollRate] = {}
+        # (kraj startu, kraj końca) -> (liczba tras, {kraj: udział km})
+        self.corridors: Dict[Tuple[str, str], Tuple[int, Dict[str, float]]] = {}
+        self.routes = 0
+        self.fitted_at: Optional[float] = None
+        self._fit_lock = threading.Lock()
+
+    def fit(self, records: Iterable[RouteRecord]) -> 'TollRateModel':
+        """
+        Wylicza stawki i udziały krajów z tras.
+
+        Args:
+            records: Trasy z cache (RouteRecord)
+
+        Returns:
+            self
+        """
+        with self._fit_lock:
+            # kraj -> [trasy, suma km, suma opłat, suma km * stawka^2]
+            totals = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+            corridor_km = defaultdict(lambda: defaultdict(float))
+            corridor_routes = defaultdict(int)
+            routes = 0
+            for record in records:
+                countries = [
+                    (country, km) for country, km in record.country_distances_km
+                    if country != OFFSHORE_KEY and km > 0
+                ]
+                if not countries:
+                    continue
+                routes += 1
+                costs = dict(record.toll_details)
+                for country, km in countries:
+                    if km < self.min_country_km:
+                        continue
+                    cost = costs.get(country, 0.0)
+                    entry = totals[country]
+                    entry[0] += 1
+                    entry[1] += km
+                    entry[2] += cost
+                    entry[3] += km * (cost / km) ** 2
+                corridor = (countries[0][0], countries[-1][0])
+                corridor_routes[corridor] += 1
+                route_km = sum(km for _, km in countries)
+                for country, km in countries:
+                    corridor_km[corridor][country] += km / route_km
+
+            rates = {}
+            for country, (samples, km, cost, weighted_sq) in totals.items():
+                rate = cost / km
+                variance = max(weighted_sq / km - rate ** 2, 0.0)
+                cv = math.sqrt(variance) / rate if rate > 0 else 0.0
+                rates[country] = CountryTollRate(country, round(rate, 4), samples, round(km, 1), round(cv, 3))
+            corridors = {
+                corridor: (count, {country: share / count for country, share in corridor_km[corridor].items()})
+                for corridor, count in corridor_routes.items()
+            }
+
+            self.rates = rates
+            self.corridors = corridors
+            self.routes = routes
+            self.fitted_at = time.time()
+        logger.info(f"Model stawek opłat: {len(rates)} krajów, {len(corridors)} korytarzy z {routes} tras")
+        return self
+
+    def is_confident(self, country: str) -> bool:
+        """Czy stawka kraju jest wiarygodna (dość tras, mały rozrzut)."""
+        rate = self.rates.get(country)
+        return rate is not None and rate.samples >= self.min_samples and rate.cv <= self.max_cv
+
+    def estimate(self, country_distances_km: Dict[str, float]) -> TollEstimate:
+        """
+        Szacuje opłaty dla znanego podziału dystansu na kraje.
+
+        Args:
+            country_distances_km: Kod kraju -> dystans [km]
+
+        Returns:
+            TollEstimate (bez pewności, gdy któryś kraj nie ma wiarygodnej stawki)
+        """
+        country_costs = {}
+        unknown = []
+        for country, km in country_distances_km.items():
+            if country == OFFSHORE_KEY or km <= 0:
+                continue
+            rate = self.rates.get(country)
+            if rate is not None:
+                country_costs[country] = round(rate.rate_eur_km * km, 2)
+            if km >= self.min_country_km and not self.is_confident(country):
+                unknown.append(country)
+        return TollEstimate(
+            toll_cost=round(sum(country_costs.values()), 2),
+            confident=not unknown,
+            country_costs=country_costs,
+            unknown_countries=unknown,
+        )
+
+    def estimate_corridor(self, country_from: str, country_to: str, distance_km: float) -> Optional[TollEstimate]:
+        """
+        Szacuje opłaty relacji na podstawie udziałów krajów w korytarzu.
+
+        Args:
+            country_from: Kod ISO kraju załadunku
+            country_to: Kod ISO kraju rozładunku
+            distance_km: Dystans drogowy relacji [km]
+
+        Returns:
+            TollEstimate lub None, gdy w cache nie ma tras tego korytarza
+        """
+        corridor = self.corridors.get((country_from, country_to))
+        if corridor is None:
+            return None
+        count, shares = corridor
+        estimate = self.estimate({country: share * distance_km for country, share in shares.items()})
+        if count < self.min_samples:
+            estimate.confident = False
+        return estimate
+
+    def get_stats(self) -> Dict:
+        """Zwraca stawki krajów i liczbę tras korytarzy."""
+        return {
+            'routes': self.routes,
+            'fitted_at': self.fitted_at,
+            'min_samples': self.min_samples,
+            'max_cv': self.max_cv,
+            'countries': {
+                country: dict(asdict(rate), confident=self.is_confident(country))
+                for country, rate in sorted(self.rates.items())
+            },
+            'corridors': {
+                f"{start}-{end}": count for (start, end), (count, _) in sorted(self.corridors.items())
+            },
+        }
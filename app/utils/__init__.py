@@ -15,11 +15,40 @@ from app.utils.geo import (
     haversine,
 )
 
+from app.utils.single_flight import SingleFlight
+
+from app.utils.logging_config import (
+    configure_logging,
+    LazyPayload,
+    lazy_json,
+)
+
+from app.utils.route_geometry import (
+    RouteGeometry,
+    CountryIndex,
+    decode_polyline,
+    decode_polyline_array,
+    polyline_cache,
+    cumulative_distances_km,
+    distance_by_country,
+)
+
 __all__ = [
     'safe_float',
     'format_currency',
     'format_coordinates',
     'clean_text',
     'haversine',
+    'SingleFlight',
+    'configure_logging',
+    'LazyPayload',
+    'lazy_json',
+    'RouteGeometry',
+    'CountryIndex',
+    'decode_polyline',
+    'decode_polyline_array',
+    'polyline_cache',
+    'cumulative_distances_km',
+    'distance_by_country',
 ]
 
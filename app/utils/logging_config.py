@@ -0,0 +1,143 @@
+"""
+Konfiguracja logowania aplikacji.
+
+Zawiera:
+- profile logowania ('quiet' - produkcja, 'info', 'debug'),
+- poziomy dla poszczególnych modułów z ustawień (LOG_MODULE_LEVELS),
+- leniwe payloady debugowe - kosztowne formatowanie (np. zrzut JSON
+  odpowiedzi API) wykonywane jest tylko, gdy komunikat faktycznie
+  zostanie zapisany.
+
+Przykład:
+    >>> logger.debug("Struktura toll_data:\\n%s", lazy_json(toll_data))
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from app.config.settings import LOG_LEVEL, LOG_FILE, LOG_PROFILE, LOG_MODULE_LEVELS
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Poziomy według profilu: '' oznacza logger główny
+LOG_PROFILES: Dict[str, Dict[str, str]] = {
+    # Produkcja: tylko błędy, bez logów bibliotek i zapytań HTTP
+    'quiet': {
+        '': 'ERROR',
+        'urllib3': 'ERROR',
+        'werkzeug': 'WARNING',
+        'apscheduler': 'WARNING',
+    },
+    'info': {
+        '': 'INFO',
+        'urllib3': 'WARNING',
+        'werkzeug': 'INFO',
+        'apscheduler': 'WARNING',
+    },
+    # Pełne logi diagnostyczne (wolne przy dużych plikach)
+    'debug': {
+        '': 'DEBUG',
+        'urllib3': 'INFO',
+        'werkzeug': 'INFO',
+        'apscheduler': 'INFO',
+    },
+}
+
+_configured_handlers = []
+
+
+def parse_module_levels(spec: str) -> Dict[str, str]:
+    """
+    Parsuje poziomy modułów w formacie 'moduł=POZIOM,moduł=POZIOM'.
+
+    Args:
+        spec: Np. 'ptv_api_manager=INFO,appGPT.geocoding=DEBUG'
+
+    Returns:
+        Słownik nazwa loggera -> poziom
+    """
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        name, level = item.split('=', 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(profile: str = LOG_PROFILE, level: Optional[str] = LOG_LEVEL,
+                      module_levels: str = LOG_MODULE_LEVELS, log_file: Optional[str] = LOG_FILE) -> None:
+    """
+    Konfiguruje logowanie całej aplikacji (wywołanie ponowne podmienia konfigurację).
+
+    Args:
+        profile: Profil logowania: 'quiet', 'info' lub 'debug'
+        level: Poziom loggera głównego (pusty - z profilu)
+        module_levels: Poziomy modułów 'moduł=POZIOM,...' (nadpisują profil)
+        log_file: Plik logów (pusty - tylko konsola)
+    """
+    if profile not in LOG_PROFILES:
+        raise ValueError(f"Nieznany profil logowania: {profile}")
+
+    levels = dict(LOG_PROFILES[profile])
+    if level:
+        levels[''] = level.upper()
+    levels.update(parse_module_levels(module_levels))
+
+    root = logging.getLogger()
+    for handler in _configured_handlers:
+        root.removeHandler(handler)
+        handler.close()
+    _configured_handlers.clear()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+        _configured_handlers.append(handler)
+
+    for name, name_level in levels.items():
+        logging.getLogger(name or None).setLevel(name_level)
+
+
+class LazyPayload:
+    """
+    Wartość obliczana dopiero przy formatowaniu komunikatu logu.
+
+    Przekazywana jako argument loggera (styl '%s'), więc przy wyłączonym
+    poziomie funkcja nie jest w ogóle wywoływana.
+    """
+
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func: Callable[..., Any], *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args, **self.kwargs))
+
+    __repr__ = __str__
+
+
+def _json_dump(data: Any, limit: int) -> str:
+    return json.dumps(data, indent=2, default=str, ensure_ascii=False)[:limit]
+
+
+def lazy_json(data: Any, limit: int = 5000) -> LazyPayload:
+    """
+    Leniwy zrzut JSON (np. odpowiedzi API) do logów debugowych.
+
+    Args:
+        data: Dane do zrzutu
+        limit: Maksymalna długość tekstu
+
+    Returns:
+        LazyPayload do przekazania jako argument loggera
+    """
+    return LazyPayload(_json_dump, data, limit)
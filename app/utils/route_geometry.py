@@ -0,0 +1,576 @@
+"""
+Lokalna geometria tras na podstawie polyline z PTV API.
+
+Zawiera wektorowe (NumPy) funkcje do:
+- dekodowania polyline (GeoJSON lub encoded polyline) do tablicy punktów,
+  z pamięcią podręczną współdzieloną przez wszystkich odbiorców,
+- liczenia skumulowanych odległości haversine wzdłuż trasy,
+- upraszczania trasy (Douglas-Peucker) do linków map,
+- przypisywania punktów do krajów (point-in-polygon z indeksem siatkowym)
+  na podstawie uproszczonych granic z app/config/country_boundaries.py,
+- podziału dystansu trasy na kraje bez dodatkowych zapytań do API.
+"""
+
+import heapq
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import polyline as polyline_codec
+
+from app.config.country_boundaries import COUNTRY_BOUNDARIES
+from app.config.settings import POLYLINE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Promień Ziemi w kilometrach (jak w app.utils.geo.haversine)
+EARTH_RADIUS_KM = 6371.0
+
+# Rozmiar komórki indeksu przestrzennego [stopnie]
+GRID_CELL_DEG = 1.0
+
+# Odcinki poza granicami krajów krótsze niż ten próg przypisywane są sąsiednim
+# krajom (uproszczone granice gubią drogi nadbrzeżne); dłuższe traktowane są
+# jako przeprawa morska [km]
+SEA_GAP_KM = 25.0
+
+# Klucz dystansu poza lądem (przeprawy promowe) w podziale na kraje
+OFFSHORE_KEY = 'SEA'
+
+# Maksymalna liczba punktów uproszczonej trasy (link Google Maps)
+SIMPLIFIED_MAX_POINTS = 15
+
+# Tolerancja upraszczania - punkty bliżej linii niż próg są pomijane [km]
+SIMPLIFY_TOLERANCE_KM = 0.5
+
+# Separator fragmentów uproszczonej trasy (spacja nie występuje w encoded polyline)
+SIMPLIFIED_PART_SEPARATOR = ' '
+
+# Wartości indeksu kraju dla punktów nieprzypisanych
+_UNKNOWN = -1
+_OFFSHORE = -2
+
+
+def decode_polyline_array(polyline_str: str) -> np.ndarray:
+    """
+    Dekoduje polyline z PTV API do tablicy punktów [lat, lon].
+
+    Obsługuje GeoJSON LineString (parsowany jako JSON), zakodowany polyline
+    oraz połączone separatorem '|' fragmenty GeoJSON (trasy z promem
+    obowiązkowym).
+
+    Args:
+        polyline_str: Polyline z odpowiedzi API
+
+    Returns:
+        Tablica o kształcie (N, 2); pusta (0, 2) dla błędnych danych
+    """
+    empty = np.empty((0, 2), dtype=np.float64)
+    if not polyline_str or not isinstance(polyline_str, str):
+        return empty
+
+    try:
+        if polyline_str.lstrip().startswith('{'):
+            parts = []
+            for fragment in polyline_str.split('|'):
+                if not fragment.strip():
+                    continue
+                coordinates = json.loads(fragment).get('coordinates') or []
+                if coordinates:
+                    # GeoJSON przechowuje pary [lon, lat]
+                    parts.append(np.asarray(coordinates, dtype=np.float64)[:, 1::-1])
+            return np.concatenate(parts) if parts else empty
+
+        points = polyline_codec.decode(polyline_str)
+        return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    except Exception as e:
+        logger.warning(f"Nie udało się zdekodować polyline: {e}")
+        return empty
+
+
+class PolylineCache:
+    """
+    Pamięć podręczna LRU zdekodowanych polyline.
+
+    Ten sam polyline dekodowany jest raz - kolejne wywołania (link do mapy,
+    dystans w GB, podział na kraje) otrzymują tę samą tablicę float32
+    tylko do odczytu. Kluczem jest sam polyline - ten sam obiekt, który
+    przechowuje wynik trasy w cache, więc klucz nie zajmuje dodatkowej
+    pamięci, a hash napisu liczony jest tylko raz.
+    """
+
+    def __init__(self, max_size: int = POLYLINE_CACHE_SIZE):
+        """
+        Args:
+            max_size: Maksymalna liczba przechowywanych tras
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, polyline_str: str) -> np.ndarray:
+        """
+        Zwraca zdekodowane punkty polyline (dekoduje przy pierwszym użyciu).
+
+        Args:
+            polyline_str: Polyline z odpowiedzi API
+
+        Returns:
+            Tablica float32 (N, 2) punktów [lat, lon] tylko do odczytu
+        """
+        if not polyline_str or not isinstance(polyline_str, str):
+            return _EMPTY_POINTS
+        with self._lock:
+            points = self._entries.get(polyline_str)
+            if points is not None:
+                self._entries.move_to_end(polyline_str)
+                self.stats['hits'] += 1
+                return points
+            self.stats['misses'] += 1
+
+        points = decode_polyline_array(polyline_str).astype(np.float32)
+        points.setflags(write=False)
+
+        with self._lock:
+            self._entries[polyline_str] = points
+            self._entries.move_to_end(polyline_str)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return points
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Zwraca liczbę trafień, chybień i rozmiar pamięci podręcznej."""
+        with self._lock:
+            return {
+                'hits': self.stats['hits'],
+                'misses': self.stats['misses'],
+                'entries': len(self._entries),
+                'bytes': sum(points.nbytes for points in self._entries.values()),
+            }
+
+
+_EMPTY_POINTS = np.empty((0, 2), dtype=np.float32)
+_EMPTY_POINTS.setflags(write=False)
+
+polyline_cache = PolylineCache()
+
+
+def decode_polyline(polyline_str: str) -> np.ndarray:
+    """
+    Dekoduje polyline z użyciem współdzielonej pamięci podręcznej.
+
+    Jedyny dekoder polyline w aplikacji - używają go linki do map,
+    dystans w GB i podział trasy na kraje.
+
+    Args:
+        polyline_str: Polyline z odpowiedzi API
+
+    Returns:
+        Tablica float32 (N, 2) punktów [lat, lon] tylko do odczytu
+    """
+    return polyline_cache.get(polyline_str)
+
+
+def split_polyline_parts(polyline_str: str) -> List[str]:
+    """
+    Dzieli polyline trasy z promem obowiązkowym ('|' między fragmentami GeoJSON).
+
+    Encoded polyline może zawierać znak '|', więc dzielony jest tylko GeoJSON.
+    """
+    if not polyline_str:
+        return []
+    if polyline_str.lstrip().startswith('{'):
+        return [part for part in polyline_str.split('|') if part.strip()]
+    return [polyline_str]
+
+
+def _project_km(points: np.ndarray) -> np.ndarray:
+    """Rzut równoodległościowy punktów [lat, lon] na płaszczyznę [km]."""
+    points = np.asarray(points, dtype=np.float64)
+    cos_lat = np.cos(np.radians(points[:, 0].mean()))
+    return np.column_stack((points[:, 1] * 111.320 * cos_lat, points[:, 0] * 110.574))
+
+
+def _distances_to_chord(xy: np.ndarray, start: int, end: int) -> np.ndarray:
+    """Odległości punktów między start i end od odcinka start-end [km]."""
+    inner = xy[start + 1:end]
+    a, b = xy[start], xy[end]
+    ab = b - a
+    length_sq = float(ab @ ab)
+    if length_sq == 0.0:
+        return np.hypot(*(inner - a).T)
+    t = np.clip((inner - a) @ ab / length_sq, 0.0, 1.0)
+    return np.hypot(*(inner - (a + t[:, None] * ab)).T)
+
+
+def simplify_points(points: np.ndarray, max_points: Optional[int] = SIMPLIFIED_MAX_POINTS,
+                    tolerance_km: float = SIMPLIFY_TOLERANCE_KM) -> np.ndarray:
+    """
+    Upraszcza trasę algorytmem Douglasa-Peuckera.
+
+    Odcinki dzielone są w kolejności największego odchylenia, więc przy
+    limicie punktów zachowane zostają najważniejsze zakręty trasy.
+    Odległości od cięciwy liczone są wektorowo dla całego odcinka.
+
+    Args:
+        points: Tablica (N, 2) punktów [lat, lon]
+        max_points: Maksymalna liczba punktów (None - bez limitu)
+        tolerance_km: Minimalne odchylenie punktu, który warto zachować [km]
+
+    Returns:
+        Tablica punktów uproszczonej trasy (z punktem początkowym i końcowym)
+    """
+    points = np.asarray(points)
+    n = len(points)
+    if n <= 2 or (max_points is not None and max_points <= 2):
+        return points[[0, -1]] if n > 2 else points.copy()
+
+    xy = _project_km(points)
+    keep = [0, n - 1]
+    heap = []
+
+    def push(start, end):
+        if end - start < 2:
+            return
+        distances = _distances_to_chord(xy, start, end)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_km:
+            heapq.heappush(heap, (-float(distances[farthest]), start, end, start + 1 + farthest))
+
+    push(0, n - 1)
+    while heap and (max_points is None or len(keep) < max_points):
+        _, start, end, split = heapq.heappop(heap)
+        keep.append(split)
+        push(start, split)
+        push(split, end)
+
+    return points[np.sort(keep)]
+
+
+def simplify_polyline(polyline_str: str, max_points: Optional[int] = SIMPLIFIED_MAX_POINTS,
+                      tolerance_km: float = SIMPLIFY_TOLERANCE_KM) -> str:
+    """
+    Tworzy uproszczoną trasę do przechowania razem z wynikiem trasy.
+
+    Każdy fragment (trasy z promem obowiązkowym) upraszczany jest osobno
+    i kodowany jako encoded polyline; fragmenty rozdziela
+    SIMPLIFIED_PART_SEPARATOR.
+
+    Args:
+        polyline_str: Polyline z odpowiedzi API
+        max_points: Maksymalna liczba punktów na fragment
+        tolerance_km: Tolerancja upraszczania [km]
+
+    Returns:
+        Uproszczona trasa ('' gdy brak punktów)
+    """
+    encoded_parts = []
+    for part in split_polyline_parts(polyline_str):
+        points = decode_polyline(part)
+        if len(points) == 0:
+            continue
+        simplified = simplify_points(points, max_points, tolerance_km)
+        encoded_parts.append(polyline_codec.encode(np.round(simplified.astype(np.float64), 5).tolist()))
+    return SIMPLIFIED_PART_SEPARATOR.join(encoded_parts)
+
+
+def decode_simplified_polyline(simplified: str) -> List[np.ndarray]:
+    """
+    Dekoduje uproszczoną trasę z simplify_polyline.
+
+    Returns:
+        Lista tablic punktów [lat, lon] - po jednej na fragment trasy
+    """
+    if not simplified:
+        return []
+    return [decode_polyline(part) for part in simplified.split(SIMPLIFIED_PART_SEPARATOR) if part]
+
+
+def segment_lengths_km(points: np.ndarray) -> np.ndarray:
+    """
+    Zwraca długości kolejnych odcinków trasy (haversine) w kilometrach.
+
+    Args:
+        points: Tablica (N, 2) punktów [lat, lon]
+
+    Returns:
+        Tablica (N-1,) długości odcinków
+    """
+    if len(points) < 2:
+        return np.zeros(0, dtype=np.float64)
+    lat = np.radians(points[:, 0].astype(np.float64))
+    lon = np.radians(points[:, 1].astype(np.float64))
+    dlat = np.diff(lat)
+    dlon = np.diff(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def cumulative_distances_km(points: np.ndarray) -> np.ndarray:
+    """
+    Zwraca skumulowany dystans od początku trasy do każdego punktu [km].
+
+    Args:
+        points: Tablica (N, 2) punktów [lat, lon]
+
+    Returns:
+        Tablica (N,) zaczynająca się od 0
+    """
+    return np.concatenate(([0.0], np.cumsum(segment_lengths_km(points))))
+
+
+def points_in_polygon(lat: np.ndarray, lon: np.ndarray,
+                      ring_lon: np.ndarray, ring_lat: np.ndarray) -> np.ndarray:
+    """
+    Wektorowy test point-in-polygon (ray casting).
+
+    Args:
+        lat, lon: Współrzędne testowanych punktów
+        ring_lon, ring_lat: Wierzchołki pierścienia wielokąta
+
+    Returns:
+        Tablica bool - czy punkt leży wewnątrz
+    """
+    inside = np.zeros(len(lat), dtype=bool)
+    x1, y1 = ring_lon[-1], ring_lat[-1]
+    for x2, y2 in zip(ring_lon, ring_lat):
+        if y1 != y2:
+            crosses = (y2 > lat) != (y1 > lat)
+            x_cross = x2 + (lat - y2) * (x1 - x2) / (y1 - y2)
+            inside ^= crosses & (lon < x_cross)
+        x1, y1 = x2, y2
+    return inside
+
+
+class CountryIndex:
+    """
+    Indeks przestrzenny granic krajów.
+
+    Każdy pierścień granicy trafia do komórek siatki pokrywanych przez
+    jego prostokąt ograniczający; test point-in-polygon wykonywany jest
+    tylko dla pierścieni z komórki, w której leży punkt.
+    """
+
+    def __init__(self, boundaries: Dict[str, List] = None, cell_deg: float = GRID_CELL_DEG):
+        """
+        Args:
+            boundaries: Słownik kod kraju -> lista pierścieni [(lon, lat), ...]
+            cell_deg: Rozmiar komórki siatki w stopniach
+        """
+        boundaries = COUNTRY_BOUNDARIES if boundaries is None else boundaries
+        self.cell_deg = cell_deg
+        self.codes: List[str] = sorted(boundaries)
+        self._rings = []  # (indeks kraju, lon, lat)
+        self._grid: Dict[tuple, List[int]] = {}
+
+        for code_index, code in enumerate(self.codes):
+            for ring in boundaries[code]:
+                ring_arr = np.asarray(ring, dtype=np.float64)
+                ring_id = len(self._rings)
+                self._rings.append((code_index, ring_arr[:, 0], ring_arr[:, 1]))
+                min_lon, min_lat = ring_arr.min(axis=0)
+                max_lon, max_lat = ring_arr.max(axis=0)
+                for ix in range(int(np.floor(min_lon / cell_deg)), int(np.floor(max_lon / cell_deg)) + 1):
+                    for iy in range(int(np.floor(min_lat / cell_deg)), int(np.floor(max_lat / cell_deg)) + 1):
+                        self._grid.setdefault((ix, iy), []).append(ring_id)
+
+    def locate(self, points: np.ndarray) -> np.ndarray:
+        """
+        Przypisuje punkty do krajów.
+
+        Args:
+            points: Tablica (N, 2) punktów [lat, lon]
+
+        Returns:
+            Tablica (N,) indeksów w self.codes; -1 dla punktów poza granicami
+        """
+        result = np.full(len(points), _UNKNOWN, dtype=np.int32)
+        if len(points) == 0:
+            return result
+
+        lat = points[:, 0].astype(np.float64)
+        lon = points[:, 1].astype(np.float64)
+        cell_x = np.floor(lon / self.cell_deg).astype(np.int64)
+        cell_y = np.floor(lat / self.cell_deg).astype(np.int64)
+        cells, inverse = np.unique(np.stack([cell_x, cell_y], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        for cell_index, (ix, iy) in enumerate(cells):
+            ring_ids = self._grid.get((int(ix), int(iy)))
+            if not ring_ids:
+                continue
+            members = np.flatnonzero(inverse == cell_index)
+            for ring_id in ring_ids:
+                pending = members[result[members] == _UNKNOWN]
+                if len(pending) == 0:
+                    break
+                code_index, ring_lon, ring_lat = self._rings[ring_id]
+                inside = points_in_polygon(lat[pending], lon[pending], ring_lon, ring_lat)
+                result[pending[inside]] = code_index
+        return result
+
+    def code(self, index: int) -> Optional[str]:
+        """Zwraca kod kraju dla indeksu (None dla punktów poza lądem)."""
+        if index < 0:
+            return None
+        return self.codes[index]
+
+
+_default_index: Optional[CountryIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_country_index() -> CountryIndex:
+    """Zwraca współdzielony indeks granic (budowany przy pierwszym użyciu)."""
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = CountryIndex()
+    return _default_index
+
+
+def _fill_gaps(country_ids: np.ndarray, cumulative_km: np.ndarray, sea_gap_km: float) -> np.ndarray:
+    """
+    Uzupełnia punkty poza granicami na podstawie sąsiednich krajów.
+
+    Krótkie luki (uproszczone linie brzegowe, mikropaństwa) przypisywane są
+    krajowi przed i po luce - przy zmianie kraju luka dzielona jest w połowie
+    dystansu. Długie luki między różnymi krajami oznaczane są jako morze.
+    """
+    ids = country_ids.copy()
+    n = len(ids)
+    unknown = ids == _UNKNOWN
+    if not unknown.any():
+        return ids
+
+    # Granice ciągów nieprzypisanych punktów
+    edges = np.diff(np.concatenate(([0], unknown.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    for start, end in zip(starts, ends):
+        prev_id = ids[start - 1] if start > 0 else _UNKNOWN
+        next_id = ids[end] if end < n else _UNKNOWN
+        gap_from = cumulative_km[start - 1] if start > 0 else cumulative_km[start]
+        gap_to = cumulative_km[end] if end < n else cumulative_km[end - 1]
+        gap_km = gap_to - gap_from
+
+        if prev_id == _UNKNOWN and next_id == _UNKNOWN:
+            continue
+        if prev_id == _UNKNOWN or next_id == _UNKNOWN or prev_id == next_id:
+            ids[start:end] = next_id if prev_id == _UNKNOWN else prev_id
+        elif gap_km > sea_gap_km:
+            ids[start:end] = _OFFSHORE
+        else:
+            midpoint = gap_from + gap_km / 2
+            first_half = cumulative_km[start:end] < midpoint
+            ids[start:end] = np.where(first_half, prev_id, next_id)
+    return ids
+
+
+class RouteGeometry:
+    """
+    Geometria pojedynczej trasy - dekodowana raz, używana wielokrotnie.
+
+    Attributes:
+        points: Tablica (N, 2) punktów [lat, lon]
+        cumulative_km: Skumulowany dystans do każdego punktu [km]
+    """
+
+    def __init__(self, points, index: Optional[CountryIndex] = None, sea_gap_km: float = SEA_GAP_KM):
+        """
+        Args:
+            points: Polyline z API (str) lub tablica punktów [lat, lon]
+            index: Indeks granic (domyślnie współdzielony)
+            sea_gap_km: Próg długości luki traktowanej jako morze [km]
+        """
+        if isinstance(points, str):
+            points = decode_polyline(points)
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.cumulative_km = cumulative_distances_km(self.points)
+        self._index = index
+        self._sea_gap_km = sea_gap_km
+        self._country_ids = None
+
+    @property
+    def total_km(self) -> float:
+        """Długość trasy wzdłuż polyline [km]."""
+        return float(self.cumulative_km[-1]) if len(self.cumulative_km) else 0.0
+
+    @property
+    def index(self) -> CountryIndex:
+        if self._index is None:
+            self._index = get_country_index()
+        return self._index
+
+    @property
+    def country_ids(self) -> np.ndarray:
+        """Indeks kraju dla każdego punktu (po uzupełnieniu luk)."""
+        if self._country_ids is None:
+            raw_ids = self.index.locate(self.points)
+            self._country_ids = _fill_gaps(raw_ids, self.cumulative_km, self._sea_gap_km)
+        return self._country_ids
+
+    def distance_by_country(self) -> Dict[str, float]:
+        """
+        Dzieli dystans trasy na kraje.
+
+        Odcinek przypisywany jest do kraju jego punktu początkowego.
+        Przeprawy morskie raportowane są pod kluczem OFFSHORE_KEY.
+
+        Returns:
+            Słownik kod kraju -> dystans [km], w kolejności przejazdu
+        """
+        if len(self.points) < 2:
+            return {}
+        segments = np.diff(self.cumulative_km)
+        segment_ids = self.country_ids[:-1]
+        result: Dict[str, float] = {}
+        for country_id in self._ordered_ids(segment_ids):
+            key = OFFSHORE_KEY if country_id == _OFFSHORE else self.index.code(country_id)
+            if key is None:
+                continue
+            result[key] = result.get(key, 0.0) + float(segments[segment_ids == country_id].sum())
+        return result
+
+    def distance_in_country(self, country_code: str) -> float:
+        """Zwraca dystans trasy w danym kraju [km]."""
+        return self.distance_by_country().get(country_code.upper(), 0.0)
+
+    def countries(self) -> List[str]:
+        """Zwraca listę krajów w kolejności przejazdu (bez przepraw morskich)."""
+        return [
+            self.index.code(country_id)
+            for country_id in self._ordered_ids(self.country_ids)
+            if country_id >= 0
+        ]
+
+    @staticmethod
+    def _ordered_ids(ids: np.ndarray) -> List[int]:
+        """Unikalne wartości w kolejności pierwszego wystąpienia."""
+        if len(ids) == 0:
+            return []
+        unique, first_seen = np.unique(ids, return_index=True)
+        return [int(v) for v in unique[np.argsort(first_seen)]]
+
+
+def distance_by_country(polyline_str: str) -> Dict[str, float]:
+    """
+    Skrót: podział dystansu polyline na kraje [km].
+
+    Args:
+        polyline_str: Polyline z odpowiedzi API
+
+    Returns:
+        Słownik kod kraju -> dystans [km]
+    """
+    return RouteGeometry(polyline_str).distance_by_country()
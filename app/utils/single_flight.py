@@ -0,0 +1,111 @@
+"""
+Łączenie równoczesnych, identycznych zapytań (single-flight).
+
+Zawiera klasę SingleFlight, która dla danego klucza (np. klucza cache)
+dopuszcza tylko jedno wykonanie kosztownej operacji naraz. Kolejni
+wywołujący z tym samym kluczem czekają na wynik pierwszego zamiast
+wysyłać duplikat zapytania do API.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Operacja w toku - wynik współdzielony przez oczekujących."""
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Koalescencja równoczesnych wywołań z tym samym kluczem.
+
+    Pierwszy wywołujący (lider) wykonuje funkcję, pozostali czekają
+    na jej zakończenie i otrzymują ten sam wynik lub ten sam wyjątek.
+    Po zakończeniu klucz jest zwalniany - kolejne wywołania trafiają
+    już do właściwego cache.
+
+    Example:
+        >>> flight = SingleFlight('routing')
+        >>> flight.do(cache_key, fetch_route, coord_from, coord_to)
+    """
+
+    def __init__(self, name: str = 'default', on_shared: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            name: Nazwa grupy (do logów i statystyk)
+            on_shared: Wywoływana w wątku oczekującego, który dołączył do
+                trwającego wykonania (np. licznik zaoszczędzonych zapytań)
+        """
+        self.name = name
+        self.on_shared = on_shared
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {'executed': 0, 'shared': 0}
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Wykonuje func(*args, **kwargs) lub dołącza do trwającego wykonania.
+
+        Args:
+            key: Klucz operacji (np. klucz cache)
+            func: Funkcja do wykonania przez lidera
+
+        Returns:
+            Wynik funkcji (współdzielony między wszystkich oczekujących)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+                self.stats['executed'] += 1
+            else:
+                call.waiters += 1
+                leader = False
+                self.stats['shared'] += 1
+
+        if not leader:
+            logger.debug("[%s] Dołączam do trwającego zapytania dla klucza %s", self.name, key)
+            if self.on_shared is not None:
+                self.on_shared()
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self) -> int:
+        """Zwraca liczbę operacji aktualnie w toku."""
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Zwraca liczbę wykonanych i współdzielonych wywołań."""
+        with self._lock:
+            return {
+                'executed': self.stats['executed'],
+                'shared': self.stats['shared'],
+                'in_flight': len(self._calls),
+            }
@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 from flask import (
     Flask, 
     request, 
@@ -8,7 +9,9 @@ from flask import (
     render_template,
     redirect,
     url_for,
-    session
+    session,
+    Response,
+    g
 )
 import io
 import time
@@ -21,8 +24,6 @@ from diskcache import Cache
 import logging
 import os
 import joblib
-import polyline
-from polyline import decode as decode_polyline
 import json
 from functools import wraps
 import re
@@ -48,9 +49,35 @@ from user_session_data import UserSessionData
 # Konfiguracja - stałe i ustawienia
 from app.config.settings import (
     PTV_API_KEY,
+    PTV_API_BASE_URL,
+    NOMINATIM_DOMAIN,
+    NOMINATIM_SCHEME,
+    GEO_CACHE_DIR,
+    ROUTE_CACHE_DIR,
+    LOCATIONS_CACHE_DIR,
     DEFAULT_ROUTING_MODE,
     DEFAULT_FUEL_COST,
     DEFAULT_DRIVER_COST,
+    JOB_QUEUE_BACKEND,
+    JOB_DB_PATH,
+    JOB_WORKERS,
+    JOB_RETENTION_HOURS,
+    CHECKPOINT_DB_PATH,
+    PTV_ROUTE_CACHE_FILE,
+    API_USAGE_DB_PATH,
+    API_USAGE_FLUSH_SECONDS,
+    PTV_CALLS_PER_JOB_LIMIT,
+    CACHE_WARMUP_ENABLED,
+    CACHE_WARMUP_HOUR,
+    CACHE_WARMUP_TOP_LANES,
+    CACHE_WARMUP_API_BUDGET,
+    TOLL_MODEL_MIN_SAMPLES,
+    TOLL_MODEL_MAX_CV,
+    TWO_PHASE_EXPORT_SECONDS,
+    RATES_MEMO_SIZE,
+    RATES_SIDECAR_DIR,
+    RATES_BACKEND,
+    RATES_DB_PATH,
 )
 
 # Mapowania krajów - używamy bezpośrednio z modułu
@@ -65,6 +92,8 @@ from app.config.countries import (
 from app.models.exceptions import (
     GeocodeException,
     LocationVerificationRequired,
+    JobCancelledException,
+    RatesUnavailableException,
 )
 
 # Modele danych - dataclasses dla tras
@@ -90,6 +119,68 @@ from app.utils.formatting import (
     calculate_fracht,
 )
 from app.utils.geo import haversine
+from app.utils.single_flight import SingleFlight
+from app.utils.logging_config import configure_logging, LazyPayload
+from app.utils.route_geometry import (
+    decode_polyline,
+    decode_simplified_polyline,
+    polyline_cache,
+    simplify_points,
+    split_polyline_parts,
+)
+
+# Kolejka zadań przetwarzania przetargów
+from app.services.job_queue import create_job_queue, JobStatus
+from app.services.checkpoints import create_checkpoint_store, JobCheckpoint, row_fingerprint
+from app.services.metrics import metrics
+from app.services.cache_warmup import (
+    CacheWarmup,
+    CacheWarmupScheduler,
+    load_top_lanes,
+    WARMUP_CACHED,
+    WARMUP_FETCHED,
+    WARMUP_FAILED,
+)
+from app.services.toll_model import TollRateModel
+from app.services.rates_memo import RatesMemo, WorkbookVersion
+from app.services.margin_matrix import MarginMatrix, RegionIndex
+from app.services.historical_rates import (
+    HistoricalRatesStore,
+    COL_LOAD_COUNTRY,
+    COL_UNLOAD_COUNTRY,
+    COL_LOAD_POSTAL_2,
+    COL_LOAD_POSTAL_1,
+    COL_UNLOAD_POSTAL_2,
+    COL_UNLOAD_POSTAL_1,
+    fallback_key,
+    build_podlot_table,
+    build_odjazd_table,
+)
+from app.services.rates_db import (
+    create_rates_database,
+    SOURCE_CLIENT,
+    SOURCE_EXCHANGE,
+    RATE_COLUMNS,
+    WORKBOOK_COLUMNS,
+)
+from app.services.quick_quote import (
+    QuickQuoteEstimator,
+    DetourFactorModel,
+    PRICING_MODE_PRECISE,
+    PRICING_MODE_ESTIMATE,
+    PRICING_MODE_TWO_PHASE,
+    PRICING_MODES,
+)
+from app.services.api_usage import (
+    create_api_usage_tracker,
+    usage_scope,
+    current_session_id,
+    ENDPOINT_GEOCODING_ADDRESS,
+    ENDPOINT_GEOCODING_TEXT,
+    ENDPOINT_ROUTING,
+    OUTCOME_CACHE,
+    OUTCOME_SHARED,
+)
 
 # Blokada dla bezpiecznej aktualizacji zmiennych globalnych (używana przez starszy kod)
 # TODO: Stopniowo usunąć po pełnej migracji do SessionManager
@@ -104,19 +195,11 @@ REGION_MAPPING = {}
 # Stałe ISO_CODES, PTV_API_KEY, DEFAULT_ROUTING_MODE, DEFAULT_FUEL_COST, DEFAULT_DRIVER_COST
 # są teraz importowane z app.config.settings i app.config.countries
 
-# Konfiguracja loggera - zmiana poziomu na ERROR aby ograniczyć logi
-logging.basicConfig(
-    level=logging.ERROR,  # Zmieniono z INFO na ERROR
-    format='%(message)s',  # Uproszczony format bez timestampów
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+# Konfiguracja logowania - profil i poziomy modułów z ustawień (LOG_PROFILE, LOG_LEVEL, LOG_MODULE_LEVELS)
+configure_logging()
 logger = logging.getLogger(__name__)
-
-# Wyłączenie debugowych logów urllib3
-logging.getLogger('urllib3').setLevel(logging.ERROR)
+# Osobny logger geokodowania - pozwala włączyć jego logi bez reszty aplikacji
+geo_logger = logging.getLogger(__name__ + '.geocoding')
 
 
 # ============================================================================
@@ -136,23 +219,28 @@ class FilterProgress(logging.Filter):
 
 logger.addFilter(FilterProgress())
 
-# Ustawienie poziomu ERROR dla logów związanych z punktami trasy
+# Logi związane z punktami trasy (linki do map)
 route_logger = logging.getLogger(__name__ + '.route')
-route_logger.setLevel(logging.ERROR)
-route_logger.handlers = []  # Usuwamy domyślne handlery
-route_logger.addHandler(logging.StreamHandler())
-route_logger.propagate = False  # Zapobiegamy propagacji logów do rodzica
 
 # Inicjalizacja geolokatora
-geolocator = Nominatim(user_agent="wycena_transportu", timeout=15)
+geolocator = Nominatim(user_agent="wycena_transportu", timeout=15, domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
 
 # Inicjalizacja pamięci podręcznych
-geo_cache = Cache("geo_cache")
-route_cache = Cache("route_cache")
-locations_cache = Cache("locations_cache")
+geo_cache = Cache(GEO_CACHE_DIR)
+route_cache = Cache(ROUTE_CACHE_DIR)
+locations_cache = Cache(LOCATIONS_CACHE_DIR)
+
+# Licznik zapytań PTV - dzienne sumy według endpointu, zadania i sesji
+api_usage = create_api_usage_tracker(
+    backend=JOB_QUEUE_BACKEND,
+    db_path=API_USAGE_DB_PATH,
+    flush_interval=API_USAGE_FLUSH_SECONDS,
+    job_limit=PTV_CALLS_PER_JOB_LIMIT
+)
+atexit.register(lambda: api_usage.flush())
 
 # Inicjalizacja menedżera PTV
-ptv_manager = PTVRouteManager(PTV_API_KEY)
+ptv_manager = PTVRouteManager(PTV_API_KEY, usage_tracker=api_usage)
 
 # === ZMIENNE GLOBALNE - TYLKO DLA LEGACY MODE DEKORATORA ===
 GEOCODING_TOTAL = 0
@@ -191,15 +279,89 @@ def get_region(country, postal_code):
 # USUNIĘTO: Stare dane regionów inline - przeniesione do app/config/regions.py
 
 
-# Funkcja pobierająca stawki na podstawie relacji region-region
+# Pliki stawek historycznych - wyniki stawek relacji pamiętane są do zmiany ich zawartości
+HISTORICAL_RATES_FILE = "historical_rates.xlsx"
+HISTORICAL_RATES_GIELDA_FILE = "historical_rates_gielda.xlsx"
+HISTORICAL_RATES_FILES = (HISTORICAL_RATES_FILE, HISTORICAL_RATES_GIELDA_FILE)
+rates_memo = RatesMemo(WorkbookVersion(HISTORICAL_RATES_FILES), max_entries=RATES_MEMO_SIZE)
+
+
+def add_region_columns(df):
+    """Dodaje regiony załadunku i rozładunku do tabeli stawek (raz na wersję pliku)."""
+    df = df.copy()
+    if df.empty:
+        df['region_zaladunku'] = pd.Series(dtype=object)
+        df['region_rozladunku'] = pd.Series(dtype=object)
+        return df
+    df['region_zaladunku'] = df.apply(
+        lambda r: get_region(normalize_country(r['kraj zaladunku']), r['kod pocztowy zaladunku']), axis=1)
+    df['region_rozladunku'] = df.apply(
+        lambda r: get_region(normalize_country(r['kraj rozladunku']), r['kod pocztowy rozladunku']), axis=1)
+    return df
+
+
+# Tabele stawek historycznych - xlsx konwertowany raz na wersję pliku do kolumnowego sidecar (.npy)
+rates_store = HistoricalRatesStore(sidecar_dir=RATES_SIDECAR_DIR, prepare=add_region_columns)
+
+
+def get_fallback_tables():
+    """
+    Tablice podlotu i odjazdu (kraj, prefiks kodu) -> (dystans, źródło) dla bieżącej
+    wersji historical_rates.xlsx - budowane raz przy wczytaniu pliku.
+    """
+    return (rates_store.derived(HISTORICAL_RATES_FILE, 'podlot', build_podlot_table),
+            rates_store.derived(HISTORICAL_RATES_FILE, 'odjazd', build_odjazd_table))
+
+
+# Opcjonalna baza stawek SQLite (RATES_BACKEND='sqlite') - import z plików xlsx po zmianie ich zawartości
+rates_db = create_rates_database(RATES_BACKEND, RATES_DB_PATH)
+rates_db_lock = threading.Lock()
+
+
+def get_rates_database():
+    """Zwraca bazę stawek zgodną z bieżącymi plikami xlsx (None dla backendu 'excel')."""
+    if rates_db is None:
+        return None
+    with rates_db_lock:
+        if not rates_db.is_current(HISTORICAL_RATES_FILES):
+            rates_db.import_workbooks(
+                {SOURCE_CLIENT: HISTORICAL_RATES_FILE, SOURCE_EXCHANGE: HISTORICAL_RATES_GIELDA_FILE},
+                region_of=get_region,
+            )
+    return rates_db
+
+
+def preload_historical_rates():
+    """Wczytuje tabele stawek przy starcie (konwersja do sidecar lub import do bazy, jeśli pliki się zmieniły)."""
+    if rates_db is not None:
+        try:
+            get_rates_database()
+        except Exception as e:
+            logger.warning(f"Nie udało się zaimportować stawek do {RATES_DB_PATH}: {e}")
+        return
+    for path in HISTORICAL_RATES_FILES:
+        try:
+            rates_store.get(path)
+        except Exception as e:
+            logger.warning(f"Nie udało się wczytać stawek {path}: {e}")
+    try:
+        get_fallback_tables()
+    except Exception as e:
+        logger.warning(f"Nie udało się zbudować tablic podlotu i odjazdu: {e}")
+
+
 def get_region_based_rates(lc, lp, uc, up):
-    """Pobiera stawki na podstawie relacji region–region oraz sumę zleceń."""
-    # Określ regiony dla kodów pocztowych
+    """Stawki relacji region–region - wynik pamiętany w rates_memo według pary regionów."""
     lc_region = get_region(normalize_country(lc), lp)
     uc_region = get_region(normalize_country(uc), up)
-
     if not lc_region or not uc_region:
-        # Nie można określić regionów
+        # Bez regionów wynik nie zależy od plików stawek
+        return compute_region_based_rates(lc, lp, uc, up)
+    try:
+        return rates_memo.get_or_compute(('region', lc_region, uc_region),
+                                         lambda: compute_region_based_rates(lc, lp, uc, up))
+    except RatesUnavailableException as e:
+        # Wynik błędu nie jest zapamiętywany - kolejny wiersz ponowi wczytanie plików stawek
         return {
             'region_gielda_stawka_3m': None,
             'region_gielda_stawka_6m': None,
@@ -207,18 +369,28 @@ def get_region_based_rates(lc, lp, uc, up):
             'region_klient_stawka_3m': None,
             'region_klient_stawka_6m': None,
             'region_klient_stawka_12m': None,
-            'region_relacja': f"{lc_region or lc} - {uc_region or uc}",
-            'region_dopasowanie': "Brak dopasowania regionalnego",
+            'region_podlot': None,  # Dodane pole dla regionalnego podlotu
+            'region_relacja': f"{lc_region} - {uc_region}",
+            'region_dopasowanie': f"Błąd: {e.error}",
             'region_gielda_dopasowanie': None,
             'region_klient_dopasowanie': None
         }
 
-    try:
-        hist_df = pd.read_excel("historical_rates.xlsx",
-                                dtype={'kod pocztowy zaladunku': str, 'kod pocztowy rozladunku': str})
-        gielda_df = pd.read_excel("historical_rates_gielda.xlsx",
-                                  dtype={'kod pocztowy zaladunku': str, 'kod pocztowy rozladunku': str})
-    except Exception as e:
+
+# Funkcja pobierająca stawki na podstawie relacji region-region
+def compute_region_based_rates(lc, lp, uc, up):
+    """
+    Pobiera stawki na podstawie relacji region–region oraz sumę zleceń.
+
+    Raises:
+        RatesUnavailableException: Nie udało się wczytać plików stawek
+    """
+    # Określ regiony dla kodów pocztowych
+    lc_region = get_region(normalize_country(lc), lp)
+    uc_region = get_region(normalize_country(uc), up)
+
+    if not lc_region or not uc_region:
+        # Nie można określić regionów
         return {
             'region_gielda_stawka_3m': None,
             'region_gielda_stawka_6m': None,
@@ -226,23 +398,23 @@ def get_region_based_rates(lc, lp, uc, up):
             'region_klient_stawka_3m': None,
             'region_klient_stawka_6m': None,
             'region_klient_stawka_12m': None,
-            'region_podlot': None,  # Dodane pole dla regionalnego podlotu
-            'region_relacja': f"{lc_region} - {uc_region}",
-            'region_dopasowanie': f"Błąd: {e}",
+            'region_relacja': f"{lc_region or lc} - {uc_region or uc}",
+            'region_dopasowanie': "Brak dopasowania regionalnego",
             'region_gielda_dopasowanie': None,
             'region_klient_dopasowanie': None
         }
 
-    # Dodaj kolumny regionów
-    hist_df['region_zaladunku'] = hist_df.apply(
-        lambda r: get_region(normalize_country(r['kraj zaladunku']), r['kod pocztowy zaladunku']), axis=1)
-    hist_df['region_rozladunku'] = hist_df.apply(
-        lambda r: get_region(normalize_country(r['kraj rozladunku']), r['kod pocztowy rozladunku']), axis=1)
+    try:
+        database = get_rates_database()
+        if database is None:
+            # Tabele z regionami wyliczonymi przy wczytaniu pliku (add_region_columns)
+            hist_df = rates_store.get(HISTORICAL_RATES_FILE)
+            gielda_df = rates_store.get(HISTORICAL_RATES_GIELDA_FILE)
+    except Exception as e:
+        raise RatesUnavailableException(e) from e
 
-    gielda_df['region_zaladunku'] = gielda_df.apply(
-        lambda r: get_region(normalize_country(r['kraj zaladunku']), r['kod pocztowy zaladunku']), axis=1)
-    gielda_df['region_rozladunku'] = gielda_df.apply(
-        lambda r: get_region(normalize_country(r['kraj rozladunku']), r['kod pocztowy rozladunku']), axis=1)
+    if database is not None:
+        return compute_region_based_rates_db(database, lc_region, uc_region)
 
     # Filtruj po regionach
     hist_matches = hist_df[
@@ -332,6 +504,44 @@ def get_region_based_rates(lc, lp, uc, up):
     return result
 
 
+def compute_region_based_rates_db(database, lc_region, uc_region):
+    """compute_region_based_rates na agregatach z bazy stawek SQLite (średnie ważone liczone w SQL)."""
+    result = {
+        'region_gielda_stawka_3m': None,
+        'region_gielda_stawka_6m': None,
+        'region_gielda_stawka_12m': None,
+        'region_klient_stawka_3m': None,
+        'region_klient_stawka_6m': None,
+        'region_klient_stawka_12m': None,
+        'region_podlot': None,
+        'region_relacja': f"{lc_region} - {uc_region}",
+        'region_dopasowanie': "Brak dopasowań",
+        'region_gielda_dopasowanie': None,
+        'region_klient_dopasowanie': None
+    }
+
+    for source, label in ((SOURCE_CLIENT, 'klient'), (SOURCE_EXCHANGE, 'giełda')):
+        stats = database.region_stats(source, lc_region, uc_region)
+        if not stats.rows:
+            continue
+        if result['region_dopasowanie'] == "Brak dopasowań":
+            result['region_dopasowanie'] = f"Dopasowano {stats.orders} zleceń ({label})"
+        else:
+            result['region_dopasowanie'] += f", {stats.orders} zleceń ({label})"
+        result[f'region_{source}_dopasowanie'] = stats.orders
+
+        for period in ('3m', '6m', '12m'):
+            rate = stats.columns[f'rate_{period}']
+            if rate.count and rate.orders:
+                result[f'region_{source}_stawka_{period}'] = rate.weighted
+
+        # Regionalny podlot z giełdy tylko, gdy brak go w danych klienta
+        if result['region_podlot'] is None:
+            result['region_podlot'] = stats.columns['distance'].distance()
+
+    return result
+
+
 # Funkcja wczytująca dane z global_data.csv – klucze tworzymy jako stringi, np. "Poland_36"
 def load_global_data(filepath):
     with open(filepath, newline='', encoding='utf-8') as csvfile:
@@ -425,7 +635,25 @@ def generate_query_variants(country, postal_code, city=None):
         return variants
 
 
+# Równoczesne geokodowanie tej samej lokalizacji współdzieli jedno wywołanie API
+geocode_flight = SingleFlight(
+    'geocoding', on_shared=lambda: api_usage.record(ENDPOINT_GEOCODING_ADDRESS, OUTCOME_SHARED))
+structured_geocode_flight = SingleFlight(
+    'structured_geocoding', on_shared=lambda: api_usage.record(ENDPOINT_GEOCODING_ADDRESS, OUTCOME_SHARED))
+
+
 def ptv_geocode_by_address(country, postal_code=None, city=None, api_key=None, language="pl"):
+    """
+    Geokodowanie strukturyzowane z łączeniem równoczesnych, identycznych zapytań.
+    Szczegóły w _ptv_geocode_by_address.
+    """
+    key = (country, str(postal_code).strip() if postal_code else None,
+           str(city).strip() if isinstance(city, str) else None, language)
+    with metrics.span('geocoding', tier='ptv_structured'):
+        return structured_geocode_flight.do(key, _ptv_geocode_by_address, country, postal_code, city, api_key, language)
+
+
+def _ptv_geocode_by_address(country, postal_code=None, city=None, api_key=None, language="pl"):
     """
     Geokodowanie używając strukturyzowanego endpoint locations/by-address PTV API
     Z logiką fallback:
@@ -435,7 +663,7 @@ def ptv_geocode_by_address(country, postal_code=None, city=None, api_key=None, l
     
     Eliminuje problem z "STREET" poprzez użycie strukturyzowanych parametrów
     """
-    endpoint = "https://api.myptv.com/geocoding/v1/locations/by-address"
+    endpoint = f"{PTV_API_BASE_URL}/geocoding/v1/locations/by-address"
     logger = logging.getLogger("ptv_api_manager")
     
     # Sprawdź czy miasto jest prawidłowe (nie "nan")
@@ -497,6 +725,7 @@ def ptv_geocode_by_address(country, postal_code=None, city=None, api_key=None, l
         logger.info(f"PTV API (by-address) próba {i+1}/{len(attempts)}: {attempt['description']}")
         
         try:
+            api_usage.record(ENDPOINT_GEOCODING_ADDRESS)
             response = requests.get(endpoint, params=params, timeout=10)
             time.sleep(0.1)  # Rate limiting
             
@@ -566,7 +795,16 @@ def ptv_geocode_by_address(country, postal_code=None, city=None, api_key=None, l
 
 
 def ptv_geocode_by_text(search_text, api_key, language="pl", country_code=None):
-    endpoint = "https://api.myptv.com/geocoding/v1/locations/by-text"
+    """
+    Geokodowanie tekstowe (endpoint locations/by-text PTV API) z pomiarem czasu.
+    Szczegóły w _ptv_geocode_by_text.
+    """
+    with metrics.span('geocoding', tier='ptv_text'):
+        return _ptv_geocode_by_text(search_text, api_key, language, country_code)
+
+
+def _ptv_geocode_by_text(search_text, api_key, language="pl", country_code=None):
+    endpoint = f"{PTV_API_BASE_URL}/geocoding/v1/locations/by-text"
     params = {
         "searchText": search_text,
         "apiKey": api_key,
@@ -582,6 +820,7 @@ def ptv_geocode_by_text(search_text, api_key, language="pl", country_code=None):
     
     try:
         # Dodajemy timeout 10 sekund
+        api_usage.record(ENDPOINT_GEOCODING_TEXT)
         response = requests.get(endpoint, params=params, timeout=10)
         time.sleep(0.1)  # Rate limiting
         
@@ -667,34 +906,16 @@ def ptv_geocode_by_text(search_text, api_key, language="pl", country_code=None):
 # FUNKCJE POMOCNICZE - Obsługa tras z punktami pośrednimi
 # ============================================================================
 
-def calculate_multi_waypoint_route(route_request: RouteRequest):
+def geocode_route_points(all_points):
     """
-    Oblicza trasę z punktami pośrednimi.
-    
+    Geokoduje punkty trasy (start, punkty pośrednie, koniec).
+
     Args:
-        route_request: Obiekt RouteRequest z wszystkimi danymi trasy
-    
+        all_points: Lista WaypointData w kolejności trasy
+
     Returns:
-        Dict z wynikami:
-        {
-            'success': bool,
-            'distance': float (km),
-            'legs': List[Dict],
-            'segments_info': List[str],  # Opisy segmentów
-            'toll_cost': float,
-            'road_toll': float,
-            'other_toll': float,
-            'polyline': str,
-            'toll_details': Dict,
-            'special_systems': List,
-            'error_message': str (jeśli success=False),
-            'failed_points': List[WaypointData] (jeśli success=False)
-        }
+        (lista współrzędnych, None) lub (None, słownik błędu jak w calculate_multi_waypoint_route)
     """
-    logger.info(f"Rozpoczynam obliczanie trasy z waypoints: {route_request}")
-    
-    # KROK 1: Geokodowanie wszystkich punktów (jeśli potrzebne)
-    all_points = route_request.get_all_points_ordered()
     geocoded_coords = []
     failed_points = []
     
@@ -728,12 +949,47 @@ def calculate_multi_waypoint_route(route_request: RouteRequest):
             f"Sprawdź poprawność kodów pocztowych, nazw miast lub koordynat."
         )
         logger.error(error_msg)
-        return {
+        return None, {
             'success': False,
             'error_message': error_msg,
             'failed_points': failed_points
         }
     
+    return geocoded_coords, None
+
+
+def calculate_multi_waypoint_route(route_request: RouteRequest):
+    """
+    Oblicza trasę z punktami pośrednimi.
+    
+    Args:
+        route_request: Obiekt RouteRequest z wszystkimi danymi trasy
+    
+    Returns:
+        Dict z wynikami:
+        {
+            'success': bool,
+            'distance': float (km),
+            'legs': List[Dict],
+            'segments_info': List[str],  # Opisy segmentów
+            'toll_cost': float,
+            'road_toll': float,
+            'other_toll': float,
+            'polyline': str,
+            'toll_details': Dict,
+            'special_systems': List,
+            'error_message': str (jeśli success=False),
+            'failed_points': List[WaypointData] (jeśli success=False)
+        }
+    """
+    logger.info(f"Rozpoczynam obliczanie trasy z waypoints: {route_request}")
+    
+    # KROK 1: Geokodowanie wszystkich punktów (jeśli potrzebne)
+    all_points = route_request.get_all_points_ordered()
+    geocoded_coords, error_result = geocode_route_points(all_points)
+    if error_result:
+        return error_result
+    
     logger.info(f"Przygotowanie punktów zakończone: {len(geocoded_coords)} punktów gotowych")
     
     # KROK 2: Wywołanie PTV API z wieloma waypoints
@@ -758,7 +1014,18 @@ def calculate_multi_waypoint_route(route_request: RouteRequest):
             'error_message': error_msg
         }
     
-    # KROK 3: Analiza segmentów
+    # KROK 3-4: Analiza segmentów i wynik
+    return build_multi_waypoint_result(ptv_result, all_points)
+
+
+def build_multi_waypoint_result(ptv_result, all_points):
+    """
+    Wynik trasy z punktami pośrednimi (format calculate_multi_waypoint_route) z odpowiedzi PTV lub cache.
+
+    Args:
+        ptv_result: Trasa z get_route_with_waypoints lub z cache tras z waypoints
+        all_points: Punkty trasy w kolejności (RouteRequest.get_all_points_ordered)
+    """
     segments_info = []
     legs = ptv_result.get('legs', [])
     
@@ -776,7 +1043,6 @@ def calculate_multi_waypoint_route(route_request: RouteRequest):
             segments_info.append(segment_desc)
             logger.debug(segment_desc)
     
-    # KROK 4: Zwróć wyniki
     result = {
         'success': True,
         'distance': ptv_result.get('distance', 0.0),  # Zgodność wsteczna
@@ -790,6 +1056,7 @@ def calculate_multi_waypoint_route(route_request: RouteRequest):
         'road_toll': ptv_result.get('road_toll', 0.0),
         'other_toll': ptv_result.get('other_toll', 0.0),
         'polyline': ptv_result.get('polyline', ''),
+        'simplified_polyline': ptv_result.get('simplified_polyline'),
         'toll_details': ptv_result.get('toll_details', {}),
         'special_systems': ptv_result.get('special_systems', [])
     }
@@ -803,6 +1070,39 @@ def calculate_multi_waypoint_route(route_request: RouteRequest):
     return result
 
 
+def estimate_multi_waypoint_route(route_request: RouteRequest):
+    """
+    Trasa z punktami pośrednimi w trybie szybkiej wyceny: z cache PTV, a gdy jej brak -
+    szacunek bez zapytania do PTV.
+    
+    Klucz cache jak w calculate_multi_waypoint_route (avoid_serbia domyślne; trasy z obowiązkowym
+    promem zapisywane są jako osobne segmenty - dla nich zawsze liczony jest szacunek).
+    
+    Returns:
+        Dict w formacie calculate_multi_waypoint_route; szacunek z polami 'estimated' i 'estimate_confident'
+    """
+    all_points = route_request.get_all_points_ordered()
+    geocoded_coords, error_result = geocode_route_points(all_points)
+    if error_result:
+        return error_result
+    
+    cached = ptv_manager.cache_manager.get_waypoints_route(
+        geocoded_coords, route_request.avoid_switzerland, route_request.avoid_eurotunnel,
+        route_request.routing_mode, True
+    )
+    if cached is not None:
+        api_usage.record(ENDPOINT_ROUTING, OUTCOME_CACHE)
+        return build_multi_waypoint_result(cached, all_points)
+    
+    countries = [
+        COUNTRY_TO_ISO.get(normalize_country(point.country).upper()) if point.country else None
+        for point in all_points
+    ]
+    result = quick_quote.estimate_route(geocoded_coords, countries)
+    result['success'] = True
+    return result
+
+
 def parse_waypoints_from_form(form_data):
     """
     Parsuje punkty pośrednie z danych formularza Flask.
@@ -944,6 +1244,23 @@ def parse_waypoints_from_excel_row(row, column_name='Punkty_posrednie'):
 
 
 def get_coordinates(country, postal_code, city=None):
+    """
+    Zwraca współrzędne lokalizacji (lat, lon, jakość, źródło).
+    
+    Przy braku w cache równoczesne wywołania dla tego samego klucza cache
+    (kraj + kod pocztowy) czekają na jedno geokodowanie.
+    """
+    standard_key = f"{normalize_country(country)}_{str(postal_code).strip()}"
+    with metrics.span('geocoding', tier='cache'):
+        cached = geo_cache.get(standard_key)
+    if cached is not None and cached[0] is not None:
+        # Trafienie w cache oszczędza co najmniej zapytanie by-address
+        api_usage.record(ENDPOINT_GEOCODING_ADDRESS, OUTCOME_CACHE)
+        return cached
+    return geocode_flight.do(standard_key, _get_coordinates_uncached, country, postal_code, city)
+
+
+def _get_coordinates_uncached(country, postal_code, city=None):
     global GEOCODING_CURRENT, GEOCODING_TOTAL
     
     norm_postal = str(postal_code).strip()
@@ -959,7 +1276,7 @@ def get_coordinates(country, postal_code, city=None):
             city = str(city).strip()
         except Exception:
             city = ""
-    print(">>> get_coordinates wywołane dla:", country, norm_postal, city)
+    geo_logger.debug(">>> get_coordinates wywołane dla: %s %s %s", country, norm_postal, city)
 
     norm_country = normalize_country(country)
     standard_key = f"{norm_country}_{norm_postal}"
@@ -969,10 +1286,10 @@ def get_coordinates(country, postal_code, city=None):
     
     # Sprawdź czy mamy kod ISO dla danego kraju
     if not iso_code:
-        print(f"UWAGA: Brak kodu ISO dla kraju '{norm_country}'. Geokodowanie może być nieprecyzyjne!")
-        print(f"Dostępne kraje w ISO_CODES: {list(ISO_CODES.keys())}")
+        geo_logger.warning("UWAGA: Brak kodu ISO dla kraju '%s'. Geokodowanie może być nieprecyzyjne!", norm_country)
+        geo_logger.debug("Dostępne kraje w ISO_CODES: %s", list(ISO_CODES.keys()))
     else:
-        print(f"Znaleziono kod ISO dla kraju '{norm_country}': '{iso_code}'")
+        geo_logger.debug("Znaleziono kod ISO dla kraju '%s': '%s'", norm_country, iso_code)
 
 
 
@@ -980,15 +1297,15 @@ def get_coordinates(country, postal_code, city=None):
     if standard_key in geo_cache:
         cached = geo_cache[standard_key]
         if cached[0] is not None:
-            print(f"Znaleziono wynik w cache dla klucza: {standard_key}: {cached}")
+            geo_logger.debug("Znaleziono wynik w cache dla klucza: %s: %s", standard_key, cached)
             return cached
 
     # NOWA STRATEGIA GEOKODOWANIA:
     # 1. PTV API (structured) -> 2. PTV API (text) -> 3. LOOKUP_DICT -> 4. Nominatim
     
     # 1. Próba geokodowania przez PTV API (structured) - NAJWYŻSZY PRIORYTET
-    print(f"1. Rozpoczynam geokodowanie przez PTV API (structured)...")
-    print(f"Kraj: {norm_country}, Kod ISO: '{iso_code}', Kod pocztowy: {norm_postal}, Miasto: {city}")
+    geo_logger.debug("1. Rozpoczynam geokodowanie przez PTV API (structured)...")
+    geo_logger.debug("Kraj: %s, Kod ISO: '%s', Kod pocztowy: %s, Miasto: %s", norm_country, iso_code, norm_postal, city)
     
     ptv_structured_result = ptv_geocode_by_address(
         country=norm_country,
@@ -999,16 +1316,16 @@ def get_coordinates(country, postal_code, city=None):
     )
     
     if ptv_structured_result[0] is not None:
-        print(f"PTV API (structured) - zwrócił wynik: {ptv_structured_result}")
+        geo_logger.debug("PTV API (structured) - zwrócił wynik: %s", ptv_structured_result)
         geo_cache[standard_key] = ptv_structured_result
-        print(f"Zapisano do geo_cache: {standard_key} -> {ptv_structured_result}")
+        geo_logger.debug("Zapisano do geo_cache: %s -> %s", standard_key, ptv_structured_result)
         return ptv_structured_result
 
     # Różne ścieżki dla dwucyfrowych i nie-dwucyfrowych kodów (fallback)
     if len(norm_postal) == 2:
         # DLA KODÓW DWUCYFROWYCH - KOLEJNOŚĆ FALLBACK:
         # 2. PTV API (text) -> 3. LOOKUP_DICT -> 4. Nominatim
-        print("2. PTV API (structured) nie zwróciło wyniku, próbuję PTV API (text)...")
+        geo_logger.debug("2. PTV API (structured) nie zwróciło wyniku, próbuję PTV API (text)...")
 
         # Generujemy warianty zapytań
         query_variants = [(f"{norm_country} postal code {norm_postal}", standard_key)]
@@ -1019,41 +1336,43 @@ def get_coordinates(country, postal_code, city=None):
                                    f"{norm_country}_postal_{norm_postal}_{clean_city}"))
 
         for query_string, variant_key in query_variants:
-            print(f"PTV API (text) - wysyłam zapytanie: '{query_string}' z country_code='{iso_code}'")
+            geo_logger.debug("PTV API (text) - wysyłam zapytanie: '%s' z country_code='%s'", query_string, iso_code)
             ptv_result = ptv_geocode_by_text(query_string, PTV_API_KEY, language="pl", country_code=iso_code)
             if ptv_result[0] is not None:
-                print(f"PTV API (text) - wariant '{query_string}' zwrócił wynik: {ptv_result}")
+                geo_logger.debug("PTV API (text) - wariant '%s' zwrócił wynik: %s", query_string, ptv_result)
                 geo_cache[variant_key] = ptv_result
                 # Zapisz wynik również pod standardowym kluczem
                 key = f"{norm_country}_{norm_postal}"
                 if key != variant_key:
                     geo_cache[key] = ptv_result
-                print(f"Zapisano do geo_cache: {variant_key} -> {ptv_result}")
+                geo_logger.debug("Zapisano do geo_cache: %s -> %s", variant_key, ptv_result)
                 return ptv_result
 
         # 3. Sprawdzamy LOOKUP_DICT
         key = standard_key
-        print(f"3. PTV API (text) nie zwróciło wyniku, sprawdzam klucz '{key}' w LOOKUP_DICT")
-        if key in LOOKUP_DICT:
-            lat, lon = LOOKUP_DICT[key]
-            result = (lat, lon, "lookup", "lookup")
-            print(f"LOOKUP: Znaleziono współrzędne dla {key}: {result}")
-            geo_cache[key] = result
-            return result
+        geo_logger.debug("3. PTV API (text) nie zwróciło wyniku, sprawdzam klucz '%s' w LOOKUP_DICT", key)
+        with metrics.span('geocoding', tier='lookup'):
+            if key in LOOKUP_DICT:
+                lat, lon = LOOKUP_DICT[key]
+                result = (lat, lon, "lookup", "lookup")
+                geo_logger.debug("LOOKUP: Znaleziono współrzędne dla %s: %s", key, result)
+                geo_cache[key] = result
+                return result
 
         # 4. Jeśli wszystkie metody PTV i LOOKUP_DICT nie znalazły lokalizacji, próbujemy Nominatim
-        print("4. LOOKUP_DICT nie zwrócił wyniku, wywołuję Nominatim...")
+        geo_logger.debug("4. LOOKUP_DICT nie zwrócił wyniku, wywołuję Nominatim...")
         for query_string, variant_key in query_variants:
-            print(f"Nominatim - próba zapytania: '{query_string}' (klucz: {variant_key}) z country_codes={iso_code}")
+            geo_logger.debug("Nominatim - próba zapytania: '%s' (klucz: %s) z country_codes=%s", query_string, variant_key, iso_code)
             try:
                 extra_params = {}  # Dla kodów nie-dwucyfrowych nie potrzebujemy polygon_geojson
-                location = geolocator.geocode(query_string, exactly_one=True, country_codes=iso_code, **extra_params)
+                with metrics.span('geocoding', tier='nominatim'):
+                    location = geolocator.geocode(query_string, exactly_one=True, country_codes=iso_code, **extra_params)
                 time.sleep(0.1)
                 if location:
                     # Sprawdź czy Nominatim zwrócił kod pocztowy
                     returned_postal = location.raw.get('address', {}).get('postcode', '')
                     if not returned_postal:
-                        print(f"Nominatim: Brak kodu pocztowego w odpowiedzi")
+                        geo_logger.debug("Nominatim: Brak kodu pocztowego w odpowiedzi")
                         continue
                     
                     # Sprawdź czy pierwsza cyfra kodu pocztowego się zgadza
@@ -1061,7 +1380,7 @@ def get_coordinates(country, postal_code, city=None):
                     returned_first_digit = ''.join(c for c in returned_postal if c.isdigit())[0]
                     
                     if requested_first_digit != returned_first_digit:
-                        print(f"Nominatim: Pierwsza cyfra kodu ({returned_first_digit}) nie zgadza się z szukaną ({requested_first_digit})")
+                        geo_logger.debug("Nominatim: Pierwsza cyfra kodu (%s) nie zgadza się z szukaną (%s)", returned_first_digit, requested_first_digit)
                         continue
                     
                     if "geojson" in location.raw and location.raw["geojson"]:
@@ -1096,28 +1415,29 @@ def get_coordinates(country, postal_code, city=None):
                     elif "italy" in display or "italia" in display:
                         source = 'Italy (Nominatim)'
                     result = (lat, lon, quality, source)
-                    print(f"Nominatim - znaleziono wynik: {result}")
+                    geo_logger.debug("Nominatim - znaleziono wynik: %s", result)
                     geo_cache[variant_key] = result
                     # Zapisz wynik również pod standardowym kluczem
                     key = f"{norm_country}_{norm_postal}"
                     if key != variant_key:
                         geo_cache[key] = result
-                    print(f"Zapisano do geo_cache: {variant_key} -> {result}")
+                    geo_logger.debug("Zapisano do geo_cache: %s -> %s", variant_key, result)
                     return result
             except Exception as e:
-                print(f"Błąd Nominatim przy zapytaniu '{query_string}': {e}")
+                geo_logger.warning("Błąd Nominatim przy zapytaniu '%s': %s", query_string, e)
 
         # 4. Dla kodów nie-dwucyfrowych, na końcu sprawdzamy LOOKUP_DICT
         key = f"{norm_country}_{norm_postal}"
-        if key in LOOKUP_DICT:
-            lat, lon = LOOKUP_DICT[key]
-            result = (lat, lon, "lookup (ostatnia opcja)", "lookup")
-            print(f"LOOKUP (ostatnia opcja): Znaleziono współrzędne dla {key}: {result}")
-            geo_cache[key] = result
-            return result
+        with metrics.span('geocoding', tier='lookup'):
+            if key in LOOKUP_DICT:
+                lat, lon = LOOKUP_DICT[key]
+                result = (lat, lon, "lookup (ostatnia opcja)", "lookup")
+                geo_logger.debug("LOOKUP (ostatnia opcja): Znaleziono współrzędne dla %s: %s", key, result)
+                geo_cache[key] = result
+                return result
     else:
         # DLA KODÓW NIE-DWUCYFROWYCH - PRIORYTET MA PTV, POTEM NOMINATIM
-        print("Priorytetowe użycie PTV API, potem Nominatim dla kodu nie-dwucyfrowego")
+        geo_logger.debug("Priorytetowe użycie PTV API, potem Nominatim dla kodu nie-dwucyfrowego")
 
         # Generujemy warianty zapytań
         query_variants = generate_query_variants(country, norm_postal, city)
@@ -1128,7 +1448,7 @@ def get_coordinates(country, postal_code, city=None):
         if variant_key in geo_cache:
             cached = geo_cache[variant_key]
             if cached[0] is not None:
-                print(f"Znaleziono wynik w cache dla klucza: {variant_key}: {cached}")
+                geo_logger.debug("Znaleziono wynik w cache dla klucza: %s: %s", variant_key, cached)
                 # Zapisz wynik również pod standardowym kluczem
                 key = f"{norm_country}_{norm_postal}"
                 if key != variant_key:
@@ -1141,43 +1461,45 @@ def get_coordinates(country, postal_code, city=None):
         # 2. PTV API (text) -> 3. LOOKUP_DICT -> 4. Nominatim
 
         # 2. Próba geokodowania przez PTV API (text) - fallback
-        print("2. PTV API (structured) nie zwróciło wyniku, próbuję PTV API (text)...")
+        geo_logger.debug("2. PTV API (structured) nie zwróciło wyniku, próbuję PTV API (text)...")
         query_variants = generate_query_variants(norm_country, norm_postal, city)
         for query_string, variant_key in query_variants:
             ptv_result = ptv_geocode_by_text(query_string, PTV_API_KEY, language="pl", country_code=iso_code)
             if ptv_result[0] is not None:
-                print(f"PTV API (text) - wariant '{query_string}' zwrócił wynik: {ptv_result}")
+                geo_logger.debug("PTV API (text) - wariant '%s' zwrócił wynik: %s", query_string, ptv_result)
                 geo_cache[variant_key] = ptv_result
                 # Zapisz wynik również pod standardowym kluczem
                 key = f"{norm_country}_{norm_postal}"
                 if key != variant_key:
                     geo_cache[key] = ptv_result
-                print(f"Zapisano do geo_cache: {variant_key} -> {ptv_result}")
+                geo_logger.debug("Zapisano do geo_cache: %s -> %s", variant_key, ptv_result)
                 return ptv_result
 
         # 3. Sprawdzamy LOOKUP_DICT
         key = f"{norm_country}_{norm_postal}"
-        print(f"3. PTV API (text) nie zwróciło wyniku, sprawdzam klucz '{key}' w LOOKUP_DICT")
-        if key in LOOKUP_DICT:
-            lat, lon = LOOKUP_DICT[key]
-            result = (lat, lon, "lookup", "lookup")
-            print(f"LOOKUP: Znaleziono współrzędne dla {key}: {result}")
-            geo_cache[key] = result
-            return result
+        geo_logger.debug("3. PTV API (text) nie zwróciło wyniku, sprawdzam klucz '%s' w LOOKUP_DICT", key)
+        with metrics.span('geocoding', tier='lookup'):
+            if key in LOOKUP_DICT:
+                lat, lon = LOOKUP_DICT[key]
+                result = (lat, lon, "lookup", "lookup")
+                geo_logger.debug("LOOKUP: Znaleziono współrzędne dla %s: %s", key, result)
+                geo_cache[key] = result
+                return result
 
         # 4. Jeśli PTV i LOOKUP_DICT nie zwróciły wyników, próbujemy przez Nominatim
-        print("4. LOOKUP_DICT nie zwrócił wyniku, wywołuję Nominatim...")
+        geo_logger.debug("4. LOOKUP_DICT nie zwrócił wyniku, wywołuję Nominatim...")
         for query_string, variant_key in query_variants:
-            print(f"Nominatim - próba zapytania: '{query_string}' (klucz: {variant_key}) z country_codes={iso_code}")
+            geo_logger.debug("Nominatim - próba zapytania: '%s' (klucz: %s) z country_codes=%s", query_string, variant_key, iso_code)
             try:
                 extra_params = {}  # Dla kodów nie-dwucyfrowych nie potrzebujemy polygon_geojson
-                location = geolocator.geocode(query_string, exactly_one=True, country_codes=iso_code, **extra_params)
+                with metrics.span('geocoding', tier='nominatim'):
+                    location = geolocator.geocode(query_string, exactly_one=True, country_codes=iso_code, **extra_params)
                 time.sleep(0.1)
                 if location:
                     # Sprawdź czy Nominatim zwrócił kod pocztowy
                     returned_postal = location.raw.get('address', {}).get('postcode', '')
                     if not returned_postal:
-                        print(f"Nominatim: Brak kodu pocztowego w odpowiedzi")
+                        geo_logger.debug("Nominatim: Brak kodu pocztowego w odpowiedzi")
                         continue
                     
                     # Sprawdź czy pierwsza cyfra kodu pocztowego się zgadza
@@ -1185,7 +1507,7 @@ def get_coordinates(country, postal_code, city=None):
                     returned_first_digit = ''.join(c for c in returned_postal if c.isdigit())[0]
                     
                     if requested_first_digit != returned_first_digit:
-                        print(f"Nominatim: Pierwsza cyfra kodu ({returned_first_digit}) nie zgadza się z szukaną ({requested_first_digit})")
+                        geo_logger.debug("Nominatim: Pierwsza cyfra kodu (%s) nie zgadza się z szukaną (%s)", returned_first_digit, requested_first_digit)
                         continue
                     
                     if "geojson" in location.raw and location.raw["geojson"]:
@@ -1220,16 +1542,16 @@ def get_coordinates(country, postal_code, city=None):
                     elif "italy" in display or "italia" in display:
                         source = 'Italy (Nominatim)'
                     result = (lat, lon, quality, source)
-                    print(f"Nominatim - znaleziono wynik: {result}")
+                    geo_logger.debug("Nominatim - znaleziono wynik: %s", result)
                     geo_cache[variant_key] = result
                     # Zapisz wynik również pod standardowym kluczem
                     key = f"{norm_country}_{norm_postal}"
                     if key != variant_key:
                         geo_cache[key] = result
-                    print(f"Zapisano do geo_cache: {variant_key} -> {result}")
+                    geo_logger.debug("Zapisano do geo_cache: %s -> %s", variant_key, result)
                     return result
             except Exception as e:
-                print(f"Błąd Nominatim przy zapytaniu '{query_string}': {e}")
+                geo_logger.warning("Błąd Nominatim przy zapytaniu '%s': %s", query_string, e)
 
 
     else:
@@ -1237,26 +1559,27 @@ def get_coordinates(country, postal_code, city=None):
         # PTV API -> Nominatim (po LOOKUP_DICT, który był sprawdzany wcześniej)
 
         # Próba geokodowania przez PTV API
-        print("Rozpoczynam geokodowanie przez PTV API dla kodów dwucyfrowych...")
+        geo_logger.debug("Rozpoczynam geokodowanie przez PTV API dla kodów dwucyfrowych...")
         for query_string, variant_key in query_variants:
             ptv_result = ptv_geocode_by_text(query_string, PTV_API_KEY, language="pl", country_code=iso_code)
             if ptv_result[0] is not None:
-                print(f"PTV API - wariant '{query_string}' zwrócił wynik: {ptv_result}")
+                geo_logger.debug("PTV API - wariant '%s' zwrócił wynik: %s", query_string, ptv_result)
                 geo_cache[variant_key] = ptv_result
                 # Zapisz wynik również pod standardowym kluczem
                 key = f"{norm_country}_{norm_postal}"
                 if key != variant_key:
                     geo_cache[key] = ptv_result
-                print(f"Zapisano do geo_cache: {variant_key} -> {ptv_result}")
+                geo_logger.debug("Zapisano do geo_cache: %s -> %s", variant_key, ptv_result)
                 return ptv_result
 
         # Jeśli PTV API nie znalazło lokalizacji, próbujemy Nominatim
-        print("PTV API nie zwróciło odpowiedniego wyniku, wywołuję Nominatim...")
+        geo_logger.debug("PTV API nie zwróciło odpowiedniego wyniku, wywołuję Nominatim...")
         for query_string, variant_key in query_variants:
-            print(f"Nominatim - próba zapytania: '{query_string}' (klucz: {variant_key}) z country_codes={iso_code}")
+            geo_logger.debug("Nominatim - próba zapytania: '%s' (klucz: %s) z country_codes=%s", query_string, variant_key, iso_code)
             try:
                 extra_params = {"polygon_geojson": 1}  # Dla kodów dwucyfrowych używamy polygon_geojson
-                location = geolocator.geocode(query_string, exactly_one=True, country_codes=iso_code, **extra_params)
+                with metrics.span('geocoding', tier='nominatim'):
+                    location = geolocator.geocode(query_string, exactly_one=True, country_codes=iso_code, **extra_params)
                 time.sleep(0.1)
                 if location:
                     if "geojson" in location.raw and location.raw["geojson"]:
@@ -1291,16 +1614,16 @@ def get_coordinates(country, postal_code, city=None):
                     elif "italy" in display or "italia" in display:
                         source = 'Italy (Nominatim)'
                     result = (lat, lon, quality, source)
-                    print(f"Nominatim - znaleziono wynik: {result}")
+                    geo_logger.debug("Nominatim - znaleziono wynik: %s", result)
                     geo_cache[variant_key] = result
                     # Zapisz wynik również pod standardowym kluczem
                     key = f"{norm_country}_{norm_postal}"
                     if key != variant_key:
                         geo_cache[key] = result
-                    print(f"Zapisano do geo_cache: {variant_key} -> {result}")
+                    geo_logger.debug("Zapisano do geo_cache: %s -> %s", variant_key, result)
                     return result
             except Exception as e:
-                print(f"Błąd Nominatim przy zapytaniu '{query_string}': {e}")
+                geo_logger.warning("Błąd Nominatim przy zapytaniu '%s': %s", query_string, e)
 
     # Jeśli żadna metoda nie znalazła lokalizacji
     if query_variants:
@@ -1311,7 +1634,7 @@ def get_coordinates(country, postal_code, city=None):
         key = f"{norm_country}_{norm_postal}"
         if key != variant_key:
             geo_cache[key] = result
-        print(f"Brak wyników, zapisano do geo_cache: {variant_key} -> {result}")
+        geo_logger.debug("Brak wyników, zapisano do geo_cache: %s -> %s", variant_key, result)
         return result
 
     return (None, None, 'nieznane', 'brak danych')
@@ -1321,7 +1644,7 @@ def get_ungeocoded_locations(df):
     ungeocoded_locations = []
     unique_locations = set()
 
-    print("Zbieranie unikalnych lokalizacji z pliku...")
+    geo_logger.debug("Zbieranie unikalnych lokalizacji z pliku...")
     for _, row in df.iterrows():
         try:
             # Sprawdź czy to nie jest wiersz nagłówka
@@ -1352,10 +1675,10 @@ def get_ungeocoded_locations(df):
             if kraj_rozl and kod_rozl:
                 unique_locations.add((kraj_rozl, kod_rozl, miasto_rozl))
         except Exception as e:
-            print(f"Błąd podczas zbierania lokalizacji z wiersza: {str(e)}")
+            geo_logger.warning("Błąd podczas zbierania lokalizacji z wiersza: %s", str(e))
             continue
 
-    print(f"Zebrano {len(unique_locations)} unikalnych lokalizacji do sprawdzenia")
+    geo_logger.debug("Zebrano %s unikalnych lokalizacji do sprawdzenia", len(unique_locations))
 
     for loc in unique_locations:
         country, postal_code, city = loc
@@ -1368,7 +1691,7 @@ def get_ungeocoded_locations(df):
         # Zachowaj dokładnie taki kod pocztowy, jaki jest w pliku
         norm_postal = str(postal_code) if postal_code is not None else ''
 
-        print(f"Sprawdzanie geokodowania dla: {norm_country}, {norm_postal}, {city}")
+        geo_logger.debug("Sprawdzanie geokodowania dla: %s, %s, %s", norm_country, norm_postal, city)
 
         # Sprawdzamy czy lokalizacja jest już zgeokodowana
         is_geocoded = False
@@ -1380,12 +1703,12 @@ def get_ungeocoded_locations(df):
         if std_key in geo_cache:
             cached = geo_cache[std_key]
             if cached[0] is not None and cached[1] is not None:
-                print(f"Znaleziono w geo_cache: {std_key} -> {cached}")
+                geo_logger.debug("Znaleziono w geo_cache: %s -> %s", std_key, cached)
                 is_geocoded = True
 
         # Sprawdź w LOOKUP_DICT dla dwucyfrowych kodów
         if not is_geocoded and len(norm_postal) == 2 and std_key in LOOKUP_DICT:
-            print(f"Znaleziono w LOOKUP_DICT: {std_key}")
+            geo_logger.debug("Znaleziono w LOOKUP_DICT: %s", std_key)
             is_geocoded = True
 
         # Sprawdź inne warianty kluczy w geo_cache
@@ -1395,7 +1718,7 @@ def get_ungeocoded_locations(df):
                 if variant_key in geo_cache:
                     cached = geo_cache[variant_key]
                     if cached[0] is not None and cached[1] is not None:
-                        print(f"Znaleziono w geo_cache dla wariantu: {variant_key} -> {cached}")
+                        geo_logger.debug("Znaleziono w geo_cache dla wariantu: %s -> %s", variant_key, cached)
                         # Synchronizuj ze standardowym kluczem
                         geo_cache[std_key] = cached
                         is_geocoded = True
@@ -1407,10 +1730,10 @@ def get_ungeocoded_locations(df):
             try:
                 result = get_coordinates(country, postal_code, city)
                 if result[0] is not None and result[1] is not None:
-                    print(f"Udało się zgeokodować: {country}, {postal_code}, {city} -> {result}")
+                    geo_logger.debug("Udało się zgeokodować: %s, %s, %s -> %s", country, postal_code, city, result)
                     is_geocoded = True
             except Exception as e:
-                print(f"Błąd przy próbie geokodowania: {e}")
+                geo_logger.warning("Błąd przy próbie geokodowania: %s", e)
 
         # Jeśli nadal nie udało się zgeokodować, dodaj do nierozpoznanych
         if not is_geocoded:
@@ -1423,7 +1746,7 @@ def get_ungeocoded_locations(df):
                 'query_variants': variants
             })
 
-    print(f"Znaleziono {len(ungeocoded_locations)} nierozpoznanych lokalizacji")
+    geo_logger.debug("Znaleziono %s nierozpoznanych lokalizacji", len(ungeocoded_locations))
 
     return ungeocoded_locations
 
@@ -1439,7 +1762,7 @@ def get_all_locations_status(df):
     geocoded_locations = []
     unique_locations = set()
 
-    print("Zbieranie unikalnych lokalizacji z pliku...")
+    geo_logger.debug("Zbieranie unikalnych lokalizacji z pliku...")
     for _, row in df.iterrows():
         try:
             # Sprawdź czy to nie jest wiersz nagłówka
@@ -1460,10 +1783,10 @@ def get_all_locations_status(df):
             if kraj_rozl and kod_rozl:
                 unique_locations.add((kraj_rozl, kod_rozl, miasto_rozl))
         except Exception as e:
-            print(f"Błąd podczas zbierania lokalizacji z wiersza: {str(e)}")
+            geo_logger.warning("Błąd podczas zbierania lokalizacji z wiersza: %s", str(e))
             continue
 
-    print(f"Zebrano {len(unique_locations)} unikalnych lokalizacji do sprawdzenia")
+    geo_logger.debug("Zebrano %s unikalnych lokalizacji do sprawdzenia", len(unique_locations))
 
     # Inicjalizuj zmienne postępu
     GEOCODING_TOTAL = len(unique_locations)
@@ -1480,7 +1803,7 @@ def get_all_locations_status(df):
         norm_country = normalize_country(country)
         norm_postal = str(postal_code).strip()
 
-        print(f"Sprawdzanie geokodowania dla: {norm_country}, {norm_postal}, {city}")
+        geo_logger.debug("Sprawdzanie geokodowania dla: %s, %s, %s", norm_country, norm_postal, city)
 
         # Sprawdzamy czy lokalizacja jest już zgeokodowana
         is_geocoded = False
@@ -1493,7 +1816,7 @@ def get_all_locations_status(df):
         if std_key in geo_cache:
             cached = geo_cache[std_key]
             if cached[0] is not None and cached[1] is not None:
-                print(f"Znaleziono w geo_cache: {std_key} -> {cached}")
+                geo_logger.debug("Znaleziono w geo_cache: %s -> %s", std_key, cached)
                 is_geocoded = True
                 coords = f"{cached[0]},{cached[1]}"
 
@@ -1504,7 +1827,7 @@ def get_all_locations_status(df):
                 if variant_key in geo_cache:
                     cached = geo_cache[variant_key]
                     if cached[0] is not None and cached[1] is not None:
-                        print(f"Znaleziono w geo_cache dla wariantu: {variant_key} -> {cached}")
+                        geo_logger.debug("Znaleziono w geo_cache dla wariantu: %s -> %s", variant_key, cached)
                         # Synchronizuj ze standardowym kluczem
                         geo_cache[std_key] = cached
                         is_geocoded = True
@@ -1517,11 +1840,11 @@ def get_all_locations_status(df):
             try:
                 result = get_coordinates(country, postal_code, city)
                 if result[0] is not None and result[1] is not None:
-                    print(f"Udało się zgeokodować: {country}, {postal_code}, {city} -> {result}")
+                    geo_logger.debug("Udało się zgeokodować: %s, %s, %s -> %s", country, postal_code, city, result)
                     is_geocoded = True
                     coords = f"{result[0]},{result[1]}"
             except Exception as e:
-                print(f"Błąd przy próbie geokodowania: {e}")
+                geo_logger.warning("Błąd przy próbie geokodowania: %s", e)
 
         # Sprawdź weryfikację zgodności miasta i kodu pocztowego
         verification_status = "N/A"
@@ -1536,14 +1859,14 @@ def get_all_locations_status(df):
             try:
                 verification_result = verify_city_postal_code_match(country, postal_code, city)
                 verification_status = "TAK" if verification_result.get('is_match', True) else "NIE"
-                print(f"Weryfikacja dla {country}, {postal_code}, {city}: {verification_status}")
+                geo_logger.debug("Weryfikacja dla %s, %s, %s: %s", country, postal_code, city, verification_status)
             except Exception as e:
-                print(f"Błąd weryfikacji dla {country}, {postal_code}, {city}: {e}")
+                geo_logger.warning("Błąd weryfikacji dla %s, %s, %s: %s", country, postal_code, city, e)
                 verification_status = "BŁĄD"
         elif is_geocoded and not is_city_valid:
             # Lokalizacja jest zgeokodowana ale nie ma prawidłowego miasta
             verification_status = "N/A"
-            print(f"Lokalizacja {country}, {postal_code} jest zgeokodowana, ale miasto ('{city}') nie jest prawidłowe - pomijam weryfikację")
+            geo_logger.debug("Lokalizacja %s, %s jest zgeokodowana, ale miasto ('%s') nie jest prawidłowe - pomijam weryfikację", country, postal_code, city)
 
         # Dodaj lokalizację do odpowiedniej listy
         location_data = {
@@ -1567,8 +1890,8 @@ def get_all_locations_status(df):
         # Aktualizuj postęp
         GEOCODING_CURRENT += 1
 
-    print(f"Znaleziono {len(ungeocoded_locations)} nierozpoznanych lokalizacji")
-    print(f"Znaleziono {len(geocoded_locations)} rozpoznanych lokalizacji")
+    geo_logger.debug("Znaleziono %s nierozpoznanych lokalizacji", len(ungeocoded_locations))
+    geo_logger.debug("Znaleziono %s rozpoznanych lokalizacji", len(geocoded_locations))
 
     return {
         'correct_locations': geocoded_locations,
@@ -1611,61 +1934,71 @@ def get_podlot(rates, region_rates=None):
     return 200, 'domyślny'
 
 
-# Globalna zmienna dla macierzy marży
-MARGIN_MATRIX = None
+# Macierze marży (NumPy) według pliku - wczytywane raz, ponownie tylko po zmianie pliku
+MARGIN_MATRIX_FILES = {'klient': 'Matrix.xlsx', 'targi': 'Matrix_Targi.xlsx'}
+region_index = RegionIndex()
+MARGIN_MATRICES = {}  # plik -> (wersja pliku, MarginMatrix)
+MARGIN_MATRIX_VERSIONS = {}  # plik -> WorkbookVersion (skrót liczony tylko po zmianie pliku)
+MARGIN_MATRIX = None  # Aktywna macierz marży
 CURRENT_MATRIX_FILE = 'Matrix.xlsx'  # Domyślny plik matrixa
+margin_matrix_lock = threading.Lock()
 
 
 def load_margin_matrix(matrix_file='Matrix.xlsx'):
     """
-    Wczytuje macierz marży z podanego pliku
-    
+    Zwraca macierz marży z podanego pliku (bez zmiany aktywnej macierzy).
+
+    Plik wczytywany jest tylko przy pierwszym użyciu i po zmianie jego zawartości -
+    przełączenie typu matrycy nie czyta pliku ponownie.
+
     Args:
         matrix_file (str): Nazwa pliku Excel z macierzą marży
-    
+
     Returns:
-        pandas.DataFrame: Macierz marży z regionami jako indeksy (załadunek) i kolumny (rozładunek)
+        MarginMatrix: Macierz marży indeksowana ID regionów (region_index) lub None
     """
-    global MARGIN_MATRIX, CURRENT_MATRIX_FILE
-    
     try:
-        # Wczytaj plik Excel bez nagłówków
-        df = pd.read_excel(matrix_file, sheet_name='Sheet1', header=None)
-        
-        if df.empty or df.shape[0] < 3 or df.shape[1] < 3:
-            logger.error(f"Macierz marży z pliku {matrix_file} jest pusta lub ma nieprawidłowe wymiary")
-            return None
-            
-        # Wyodrębnij nazwy regionów z pierwszego wiersza (rozładunek - kolumny)
-        regions_columns = df.iloc[0, 2:].dropna().tolist()
-        
-        # Wyodrębnij nazwy regionów z pierwszej kolumny (załadunek - wiersze)  
-        regions_rows = df.iloc[2:, 0].dropna().tolist()
-        
-        # Utwórz macierz marży z danymi liczbowymi
-        margin_data = df.iloc[2:len(regions_rows)+2, 2:len(regions_columns)+2]
-        
-        # Ustaw indeksy i kolumny
-        MARGIN_MATRIX = pd.DataFrame(
-            margin_data.values,
-            index=regions_rows,
-            columns=regions_columns
-        )
-        
-        # Konwertuj wartości na liczby, zastępując NaN przez None
-        MARGIN_MATRIX = MARGIN_MATRIX.apply(pd.to_numeric, errors='coerce')
-        
-        # Zaktualizuj aktualny plik
-        CURRENT_MATRIX_FILE = matrix_file
-        
-        logger.info(f"Wczytano macierz marży z {matrix_file}: {MARGIN_MATRIX.shape[0]}x{MARGIN_MATRIX.shape[1]} regionów")
-        return MARGIN_MATRIX
-        
+        with margin_matrix_lock:
+            version = MARGIN_MATRIX_VERSIONS.get(matrix_file)
+            if version is None:
+                version = MARGIN_MATRIX_VERSIONS[matrix_file] = WorkbookVersion([matrix_file])
+            digest = version.current()
+            loaded = MARGIN_MATRICES.get(matrix_file)
+            if loaded is None or loaded[0] != digest:
+                matrix = MarginMatrix.from_excel(matrix_file, region_index)
+                if matrix is None:
+                    return None
+                MARGIN_MATRICES[matrix_file] = loaded = (digest, matrix)
+                logger.info(f"Wczytano macierz marży z {matrix_file}: {matrix.shape[0]}x{matrix.shape[1]} regionów")
+            return loaded[1]
+
     except Exception as e:
         logger.error(f"Błąd podczas wczytywania macierzy marży z {matrix_file}: {e}")
         return None
 
 
+def preload_margin_matrices():
+    """Wczytuje wszystkie macierze marży przy starcie i ustawia domyślną (Matrix.xlsx)."""
+    for matrix_file in MARGIN_MATRIX_FILES.values():
+        load_margin_matrix(matrix_file)
+    set_margin_matrix('klient')
+
+
+def get_margin_matrix_file(matrix_type='klient'):
+    """Plik macierzy marży dla typu ('klient' - Matrix.xlsx, pozostałe - Matrix_Targi.xlsx)."""
+    return MARGIN_MATRIX_FILES['klient'] if matrix_type == 'klient' else MARGIN_MATRIX_FILES['targi']
+
+
+def get_margin_matrix(matrix_type='klient'):
+    """
+    Zwraca macierz marży dla typu bez zmiany aktywnej macierzy.
+
+    Zadania w kolejce wyceniane są równolegle z różnymi typami matrycy -
+    każde rozwiązuje swoją macierz raz i przekazuje ją do wyceny.
+    """
+    return load_margin_matrix(get_margin_matrix_file(matrix_type))
+
+
 def set_margin_matrix(matrix_type='klient'):
     """
     Ustawia macierz marży na podstawie typu
@@ -1673,61 +2006,89 @@ def set_margin_matrix(matrix_type='klient'):
     Args:
         matrix_type (str): 'klient' dla Matrix.xlsx lub 'targi' dla Matrix_Targi.xlsx
     """
-    matrix_file = 'Matrix.xlsx' if matrix_type == 'klient' else 'Matrix_Targi.xlsx'
-    return load_margin_matrix(matrix_file)
+    global MARGIN_MATRIX, CURRENT_MATRIX_FILE
 
+    matrix = get_margin_matrix(matrix_type)
+    if matrix is not None:
+        MARGIN_MATRIX = matrix
+        CURRENT_MATRIX_FILE = matrix.source
+    return matrix
 
-def get_margin_matrix_info():
+
+def get_margin_matrix_info(matrix_file=None):
     """
-    Zwraca informacje o aktualnie załadowanej macierzy marży
+    Zwraca informacje o macierzy marży z podanego pliku (domyślnie aktywnej)
     """
-    global CURRENT_MATRIX_FILE
-    matrix_name = "Matrix Klient" if CURRENT_MATRIX_FILE == 'Matrix.xlsx' else "Matrix Targi"
-    return matrix_name, CURRENT_MATRIX_FILE
+    matrix_file = matrix_file or CURRENT_MATRIX_FILE
+    matrix_name = "Matrix Klient" if matrix_file == 'Matrix.xlsx' else "Matrix Targi"
+    return matrix_name, matrix_file
+
 
+def get_active_margin_matrix():
+    """Zwraca aktywną macierz marży (wczytuje domyślną, jeśli żadna nie jest ustawiona)."""
+    return MARGIN_MATRIX if MARGIN_MATRIX is not None else set_margin_matrix()
 
-def get_margin_for_route(loading_region, unloading_region):
+
+def get_margin_for_route(loading_region, unloading_region, margin_matrix=None):
     """
     Pobiera marżę dla konkretnej relacji z macierzy marży
     
     Args:
-        loading_region (str): Region załadunku
-        unloading_region (str): Region rozładunku
+        loading_region (str or int): Region załadunku (nazwa lub ID z region_index)
+        unloading_region (str or int): Region rozładunku (nazwa lub ID z region_index)
+        margin_matrix (MarginMatrix): Macierz marży (None - aktywna macierz)
         
     Returns:
         float or None: Marża w Euro lub None jeśli nie znaleziono
     """
-    global MARGIN_MATRIX
-    
-    # Sprawdź czy macierz została wczytana
-    if MARGIN_MATRIX is None:
-        load_margin_matrix()
-        
-    if MARGIN_MATRIX is None:
+    matrix = margin_matrix if margin_matrix is not None else get_active_margin_matrix()
+    if matrix is None:
         return None
-        
-    try:
-        # Sprawdź czy regiony istnieją w macierzy
-        if loading_region not in MARGIN_MATRIX.index:
-            logger.warning(f"Region załadunku '{loading_region}' nie znajduje się w macierzy marży")
-            return None
-            
-        if unloading_region not in MARGIN_MATRIX.columns:
-            logger.warning(f"Region rozładunku '{unloading_region}' nie znajduje się w macierzy marży")
-            return None
-            
-        # Pobierz marżę
-        margin = MARGIN_MATRIX.loc[loading_region, unloading_region]
-        
-        # Sprawdź czy wartość nie jest NaN
-        if pd.isna(margin):
-            return None
-            
-        return float(margin)
-        
-    except Exception as e:
-        logger.error(f"Błąd podczas pobierania marży dla relacji {loading_region} -> {unloading_region}: {e}")
+
+    loading_id = loading_region if isinstance(loading_region, (int, np.integer)) else region_index.get(loading_region)
+    unloading_id = (unloading_region if isinstance(unloading_region, (int, np.integer))
+                    else region_index.get(unloading_region))
+    return matrix.margin(loading_id, unloading_id)
+
+
+def get_margins_for_routes(loading_ids, unloading_ids, margin_matrix=None):
+    """
+    Marże wielu relacji (np. całego przetargu) jednym indeksowaniem tablicy.
+
+    Args:
+        loading_ids: ID regionów załadunku (region_index)
+        unloading_ids: ID regionów rozładunku (region_index)
+        margin_matrix (MarginMatrix): Macierz marży (None - aktywna macierz)
+
+    Returns:
+        numpy.ndarray: Marże (NaN - brak marży) lub None, gdy brak macierzy
+    """
+    matrix = margin_matrix if margin_matrix is not None else get_active_margin_matrix()
+    if matrix is None:
         return None
+    return matrix.margins(loading_ids, unloading_ids)
+
+
+def get_route_margins(region_pairs, margin_matrix=None):
+    """
+    Marże unikalnych par regionów (np. całego przetargu) jednym wywołaniem get_margins_for_routes.
+
+    Args:
+        region_pairs: Pary (region załadunku, region rozładunku), mogą się powtarzać
+        margin_matrix (MarginMatrix): Macierz marży (None - aktywna macierz)
+
+    Returns:
+        dict: (region załadunku, region rozładunku) -> marża w Euro lub None
+    """
+    lanes = list(dict.fromkeys(region_pairs))
+    margins = get_margins_for_routes(
+        [region_index.get(loading) for loading, _ in lanes],
+        [region_index.get(unloading) for _, unloading in lanes],
+        margin_matrix
+    )
+    if margins is None:
+        return {lane: None for lane in lanes}
+    return {lane: None if np.isnan(margin) else float(margin) for lane, margin in zip(lanes, margins)}
 
 
 def get_transit_time_from_row(row):
@@ -1755,10 +2116,10 @@ def get_transit_time_from_row(row):
             if 0.1 <= transit_time <= 30:
                 return transit_time
             else:
-                print(f"UWAGA: Wartość transit time poza zakresem (0.1-30): {transit_time}")
+                logger.warning("UWAGA: Wartość transit time poza zakresem (0.1-30): %s", transit_time)
                 return None
         except (ValueError, TypeError):
-            print(f"UWAGA: Nie można skonwertować transit time na liczbę: {value}")
+            logger.warning("UWAGA: Nie można skonwertować transit time na liczbę: %s", value)
             return None
     
     return None
@@ -1798,7 +2159,8 @@ def calculate_driver_days(distance):
         return math.ceil(distance / 600)  # Średnio 600 km dziennie dla długich tras
 
 
-def calculate_expected_profit(loading_region, unloading_region, driver_days):
+def calculate_expected_profit(loading_region, unloading_region, driver_days, margin_matrix=None,
+                              route_margins=None):
     """
     Oblicza oczekiwany zysk na podstawie marży z macierzy i liczby dni kierowcy
     
@@ -1806,6 +2168,8 @@ def calculate_expected_profit(loading_region, unloading_region, driver_days):
         loading_region (str): Region załadunku
         unloading_region (str): Region rozładunku
         driver_days (float): Liczba dni kierowcy
+        margin_matrix (MarginMatrix): Macierz marży (None - aktywna macierz)
+        route_margins (dict): Marże par regionów wyznaczone wcześniej (get_route_margins)
         
     Returns:
         tuple: (oczekiwany_zysk, marża_jednostkowa, źródło_info)
@@ -1814,7 +2178,12 @@ def calculate_expected_profit(loading_region, unloading_region, driver_days):
         return None, None, "Brak danych regionalnych lub dni kierowcy"
         
     # Pobierz marżę jednostkową
-    unit_margin = get_margin_for_route(loading_region, unloading_region)
+    matrix = margin_matrix if margin_matrix is not None else get_active_margin_matrix()
+    lane = (loading_region, unloading_region)
+    if route_margins is not None and lane in route_margins:
+        unit_margin = route_margins[lane]
+    else:
+        unit_margin = get_margin_for_route(loading_region, unloading_region, matrix)
     
     if unit_margin is None:
         return None, None, f"Brak marży dla relacji {loading_region} -> {unloading_region}"
@@ -1823,7 +2192,7 @@ def calculate_expected_profit(loading_region, unloading_region, driver_days):
     expected_profit = unit_margin * driver_days
     
     # Dodaj informację o typie matrixa
-    matrix_name, _ = get_margin_matrix_info()
+    matrix_name, _ = get_margin_matrix_info(matrix.source)
     
     return expected_profit, unit_margin, f"{matrix_name}: {unit_margin}€ × {driver_days} dni"
 
@@ -1876,43 +2245,29 @@ def format_toll_details(toll_details, road_toll, other_toll, special_systems=Non
     Returns:
         str: Sformatowany tekst z szczegółami opłat
     """
-    print(f"DEBUG format_toll_details: toll_details={toll_details}, road_toll={road_toll}, other_toll={other_toll}, special_systems={special_systems}")
-    
-    ##toll_text = "Opłaty drogowe według krajów:\n"
     toll_text = "\n".join([f"{country}: {format_currency(cost)}€" for country, cost in toll_details.items()])
-    ##toll_text += f"\n\nOpłaty drogowe: {format_currency(road_toll)}€"
-    
-
-    ##print(f"DEBUG format_toll_details: initial toll_text='{toll_text}'")
-
-    print(f"DEBUG format_toll_details: initial toll_text='{toll_text}'")
-
     
     if other_toll > 0:
-        print(f"DEBUG format_toll_details: other_toll > 0, checking special_systems")
         if special_systems and len(special_systems) > 0:
-            print(f"DEBUG format_toll_details: special_systems not empty: {special_systems}")
             # Wyświetl konkretne nazwy systemów
             systems_text = []
             for system in special_systems:
                 name = system.get('name')
                 cost = system.get('cost', 0)
-                print(f"DEBUG format_toll_details: processing system: name='{name}', cost={cost}")
                 # Dodaj tylko systemy z rzeczywistymi nazwami
                 if name:
                     systems_text.append(f"\n{name}: {format_currency(cost)}€")
             
-            print(f"DEBUG format_toll_details: systems_text={systems_text}")
             if systems_text:
                 toll_text += f"\n" + "\n".join(systems_text)
             else:
                 toll_text += f"\nDodatkowe opłaty (tunele/mosty/promy): {format_currency(other_toll)}€"
         else:
-            print(f"DEBUG format_toll_details: special_systems empty or None, using fallback")
             # Fallback do oryginalnego tekstu jeśli brak szczegółów
             toll_text += f"\nDodatkowe opłaty (tunele/mosty/promy): {format_currency(other_toll)}€"
     
-    print(f"DEBUG format_toll_details: final toll_text='{toll_text}'")
+    logger.debug("format_toll_details: toll_details=%s, other_toll=%s, special_systems=%s -> %r",
+                 toll_details, other_toll, special_systems, toll_text)
     return toll_text
 
 def get_best_rates(rates, region_rates):
@@ -1972,7 +2327,7 @@ def get_toll_cost(
 
 
 def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
-    print(f"Wywołano verify_city_postal_code_match z parametrami: kraj={country}, kod={postal_code}, miasto={city}")
+    geo_logger.debug("Wywołano verify_city_postal_code_match z parametrami: kraj=%s, kod=%s, miasto=%s", country, postal_code, city)
 
     result = {
         'is_match': True,
@@ -1993,12 +2348,12 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
         city.strip() == "" or 
         pd.isna(city) or 
         str(city).lower().strip() in ['nan', 'none', 'null']):
-        print(f"Miasto jest puste lub nieprawidłowe ('{city}'), zwracam wynik bez geokodowania")
+        geo_logger.debug("Miasto jest puste lub nieprawidłowe ('%s'), zwracam wynik bez geokodowania", city)
         result['error'] = "Brak miasta"
         return result
 
     if postal_code is None or str(postal_code).strip() == "" or pd.isna(postal_code):
-        print(f"Kod pocztowy jest pusty, zwracam wynik bez geokodowania")
+        geo_logger.debug("Kod pocztowy jest pusty, zwracam wynik bez geokodowania")
         result['error'] = "Brak kodu pocztowego"
         return result
 
@@ -2044,7 +2399,7 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
         postal_coords = geo_cache[postal_key][:2]
         postal_quality = geo_cache[postal_key][2] if len(geo_cache[postal_key]) > 2 else 'nieznane'
         postal_source = geo_cache[postal_key][3] if len(geo_cache[postal_key]) > 3 else 'cache'
-        print(f"Znaleziono współrzędne dla kodu {postal_code} w cache: {postal_coords}")
+        geo_logger.debug("Znaleziono współrzędne dla kodu %s w cache: %s", postal_code, postal_coords)
     else:
         # B. Sprawdzamy w LOOKUP_DICT
         if postal_key in LOOKUP_DICT:
@@ -2053,7 +2408,7 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
             postal_source = 'LOOKUP_DICT'
             # Zapisz do cache dla przyszłych zapytań
             geo_cache[postal_key] = (*postal_coords, postal_quality, postal_source)
-            print(f"Znaleziono współrzędne dla kodu {postal_code} w LOOKUP_DICT: {postal_coords}")
+            geo_logger.debug("Znaleziono współrzędne dla kodu %s w LOOKUP_DICT: %s", postal_code, postal_coords)
         else:
             # Sprawdź dla dwucyfrowego prefiksu
             postal_prefix = str(postal_code).strip()[:2].zfill(2)
@@ -2064,12 +2419,12 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
                 postal_source = 'LOOKUP_DICT'
                 # Zapisz do cache dla przyszłych zapytań
                 geo_cache[postal_key] = (*postal_coords, postal_quality, postal_source)
-                print(f"Znaleziono współrzędne dla prefiksu kodu {postal_prefix} w LOOKUP_DICT: {postal_coords}")
+                geo_logger.debug("Znaleziono współrzędne dla prefiksu kodu %s w LOOKUP_DICT: %s", postal_prefix, postal_coords)
             else:
                 # C. Próbujemy PTV API
                 try:
                     query_string = f"{postal_code}, {norm_country}"
-                    print(f"Zapytanie PTV API o kod pocztowy: {query_string}")
+                    geo_logger.debug("Zapytanie PTV API o kod pocztowy: %s", query_string)
                     ptv_result = ptv_geocode_by_text(query_string, PTV_API_KEY, language="pl", country_code=iso_code)
                     if ptv_result[0] is not None:
                         postal_coords = ptv_result[:2]
@@ -2077,11 +2432,11 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
                         postal_source = ptv_result[3] if len(ptv_result) > 3 else 'PTV API'
                         # Zapisz do cache
                         geo_cache[postal_key] = (*postal_coords, postal_quality, postal_source)
-                        print(f"Znaleziono współrzędne dla kodu {postal_code} w PTV API: {postal_coords}")
+                        geo_logger.debug("Znaleziono współrzędne dla kodu %s w PTV API: %s", postal_code, postal_coords)
                     else:
                         # D. Ostatnia próba - Nominatim
                         query_string = f"{postal_code}, {norm_country}"
-                        print(f"Zapytanie Nominatim o kod pocztowy: {query_string}")
+                        geo_logger.debug("Zapytanie Nominatim o kod pocztowy: %s", query_string)
                         location = geolocator.geocode(query_string, exactly_one=True, country_codes=iso_code)
                         time.sleep(0.1)
                         if location:
@@ -2089,13 +2444,13 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
                             postal_quality = 'Nominatim'
                             postal_source = 'Nominatim'
                             geo_cache[postal_key] = (*postal_coords, postal_quality, postal_source)
-                            print(f"Znaleziono współrzędne dla kodu {postal_code} w Nominatim: {postal_coords}")
+                            geo_logger.debug("Znaleziono współrzędne dla kodu %s w Nominatim: %s", postal_code, postal_coords)
                         else:
-                            print(f"Nie znaleziono lokalizacji dla kodu pocztowego {postal_code}")
+                            geo_logger.debug("Nie znaleziono lokalizacji dla kodu pocztowego %s", postal_code)
                             result['error'] = f"Nie znaleziono lokalizacji dla kodu pocztowego {postal_code}"
                             return result
                 except Exception as e:
-                    print(f"Błąd geokodowania kodu pocztowego: {str(e)}")
+                    geo_logger.warning("Błąd geokodowania kodu pocztowego: %s", str(e))
                     result['error'] = f"Błąd geokodowania kodu pocztowego: {str(e)}"
                     return result
 
@@ -2106,7 +2461,7 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
         city_coords = geo_cache[city_key][:2]
         city_quality = geo_cache[city_key][2] if len(geo_cache[city_key]) > 2 else 'nieznane'
         city_source = geo_cache[city_key][3] if len(geo_cache[city_key]) > 3 else 'cache'
-        print(f"Znaleziono współrzędne dla miasta {city} w cache: {city_coords}")
+        geo_logger.debug("Znaleziono współrzędne dla miasta %s w cache: %s", city, city_coords)
     else:
         # B. Sprawdzamy w LOOKUP_DICT (pełna nazwa miasta jako klucz)
         city_lookup_key = f"{norm_country}_{city.strip().lower()}"
@@ -2123,7 +2478,7 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
                 city_source = 'LOOKUP_DICT'
                 # Zapisz do cache dla przyszłych zapytań
                 geo_cache[city_key] = (*city_coords, city_quality, city_source)
-                print(f"Znaleziono współrzędne dla miasta {city} w LOOKUP_DICT: {city_coords}")
+                geo_logger.debug("Znaleziono współrzędne dla miasta %s w LOOKUP_DICT: %s", city, city_coords)
                 found_in_lookup = True
                 break
 
@@ -2137,7 +2492,7 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
                     city_source = 'LOOKUP_DICT'
                     # Zapisz do cache dla przyszłych zapytań
                     geo_cache[city_key] = (*city_coords, city_quality, city_source)
-                    print(f"Znaleziono częściowe dopasowanie dla miasta {city} w LOOKUP_DICT: {city_coords}")
+                    geo_logger.debug("Znaleziono częściowe dopasowanie dla miasta %s w LOOKUP_DICT: %s", city, city_coords)
                     found_in_lookup = True
                     break
 
@@ -2153,11 +2508,11 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
                     city_source = ptv_result[3] if len(ptv_result) > 3 else 'PTV API'
                     # Zapisz do cache
                     geo_cache[city_key] = (*city_coords, city_quality, city_source)
-                    print(f"Znaleziono współrzędne dla miasta {city} w PTV API: {city_coords}")
+                    geo_logger.debug("Znaleziono współrzędne dla miasta %s w PTV API: %s", city, city_coords)
                 else:
                     # D. Ostatnia próba - Nominatim
                     query_string = f"{city}, {norm_country}"
-                    print(f"Zapytanie Nominatim o miasto: {query_string} z country_codes={iso_code}")
+                    geo_logger.debug("Zapytanie Nominatim o miasto: %s z country_codes=%s", query_string, iso_code)
                     location = geolocator.geocode(query_string, exactly_one=True, country_codes=iso_code)
                     time.sleep(0.1)
                     if location:
@@ -2165,13 +2520,13 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
                         city_quality = 'Nominatim'
                         city_source = 'Nominatim'
                         geo_cache[city_key] = (*city_coords, city_quality, city_source)
-                        print(f"Znaleziono współrzędne dla miasta {city} w Nominatim: {city_coords}")
+                        geo_logger.debug("Znaleziono współrzędne dla miasta %s w Nominatim: %s", city, city_coords)
                     else:
-                        print(f"Nie znaleziono lokalizacji dla miasta {city}")
+                        geo_logger.debug("Nie znaleziono lokalizacji dla miasta %s", city)
                         result['error'] = f"Nie znaleziono lokalizacji dla miasta {city}"
                         return result
             except Exception as e:
-                print(f"Błąd geokodowania miasta: {str(e)}")
+                geo_logger.warning("Błąd geokodowania miasta: %s", str(e))
                 result['error'] = f"Błąd geokodowania miasta: {str(e)}"
                 return result
 
@@ -2181,7 +2536,7 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
     result['city_coords'] = city_coords
     result['distance_km'] = distance_km
     result['distance'] = distance_km  # Ustawiam również pole distance
-    print(f"Obliczona odległość między kodem pocztowym a miastem: {distance_km} km")
+    geo_logger.debug("Obliczona odległość między kodem pocztowym a miastem: %s km", distance_km)
 
     # DODATKOWE SPRAWDZENIE: Czy miasto z kodu pocztowego zgadza się z podanym miastem
     postal_city_name = None
@@ -2204,47 +2559,47 @@ def verify_city_postal_code_match(country, postal_code, city, threshold_km=100):
     # Sprawdź czy odległość przekracza próg
     if distance_km is not None and distance_km > threshold_km:
         result['is_match'] = False
-        print(f"Odległość przekracza próg {threshold_km} km - weryfikacja negatywna")
+        geo_logger.debug("Odległość przekracza próg %s km - weryfikacja negatywna", threshold_km)
         city_name_mismatch = True
     else:
-        print(f"Odległość {distance_km} km jest w granicach progu {threshold_km} km")
+        geo_logger.debug("Odległość %s km jest w granicach progu %s km", distance_km, threshold_km)
         
         # DODATKOWE SPRAWDZENIE: Czy to są różne miasta w tym samym kraju
         # Jeśli odległość jest mała (< 50km), ale to mogą być różne miejscowości
         if distance_km > 5:  # Jeśli odległość > 5km, sprawdź czy to mogą być różne miasta
-            print(f"Odległość {distance_km} km > 5km - sprawdzam czy to różne miejscowości")
+            geo_logger.debug("Odległość %s km > 5km - sprawdzam czy to różne miejscowości", distance_km)
             
             # Sprawdź czy nazwisko miasta pasuje do geokodowania kodu pocztowego
             # To jest uproszczone sprawdzenie - w przyszłości można to rozszerzyć
             # Na razie oznaczamy jako potencjalny problem jeśli odległość > 20km
             if distance_km > 20:
-                print(f"Odległość {distance_km} km > 20km - prawdopodobnie różne miejscowości")
+                geo_logger.debug("Odległość %s km > 20km - prawdopodobnie różne miejscowości", distance_km)
                 result['is_match'] = False
                 city_name_mismatch = True
             else:
-                print(f"Odległość {distance_km} km <= 20km - prawdopodobnie ta sama okolica")
+                geo_logger.debug("Odległość %s km <= 20km - prawdopodobnie ta sama okolica", distance_km)
         else:
-            print(f"Odległość {distance_km} km <= 5km - bardzo blisko, prawdopodobnie zgodne")
+            geo_logger.debug("Odległość %s km <= 5km - bardzo blisko, prawdopodobnie zgodne", distance_km)
 
     # Jeśli wystąpił problem z dopasowaniem, wykonaj dodatkowe sprawdzenie
     if not result['is_match'] or city_name_mismatch:
-        print(f"Wykonuję dodatkowe sprawdzenie wiarygodności")
+        geo_logger.debug("Wykonuję dodatkowe sprawdzenie wiarygodności")
 
         # Ocena jakości i wiarygodności geokodowania
         postal_reliability = evaluate_geocoding_reliability(postal_quality, postal_source)
         city_reliability = evaluate_geocoding_reliability(city_quality, city_source)
 
-        print(f"Wiarygodność kodu pocztowego: {postal_reliability}, Wiarygodność miasta: {city_reliability}")
+        geo_logger.debug("Wiarygodność kodu pocztowego: %s, Wiarygodność miasta: %s", postal_reliability, city_reliability)
 
         # Wybór najbardziej wiarygodnych współrzędnych
         if postal_reliability >= city_reliability:
             result['suggested_coords'] = postal_coords
-            print(f"Wybieram współrzędne kodu pocztowego jako sugerowane: {postal_coords}")
+            geo_logger.debug("Wybieram współrzędne kodu pocztowego jako sugerowane: %s", postal_coords)
         else:
             result['suggested_coords'] = city_coords
-            print(f"Wybieram współrzędne miasta jako sugerowane: {city_coords}")
+            geo_logger.debug("Wybieram współrzędne miasta jako sugerowane: %s", city_coords)
     else:
-        print(f"Weryfikacja pozytywna - miasto i kod pocztowy są zgodne")
+        geo_logger.debug("Weryfikacja pozytywna - miasto i kod pocztowy są zgodne")
 
     return result
 
@@ -2276,16 +2631,68 @@ def evaluate_geocoding_reliability(quality, source):
     return min(100, max(0, reliability))  # Wartość między 0 a 100
 
 
-def get_all_rates(lc, lp, uc, up, lc_coords, uc_coords):
+def rate_lane_key(lc, lp, uc, up):
+    """Relacja stawek jak w compute_all_rates: kraje i prefiksy kodów (2 cyfry lub 1 cyfra)."""
+    def postal_prefix(postal_code):
+        postal_code = str(postal_code).strip()
+        return postal_code[:2].zfill(2) if len(postal_code) >= 2 else postal_code[0]
+
+    return normalize_country(lc).strip(), postal_prefix(lp), normalize_country(uc).strip(), postal_prefix(up)
+
+
+def get_all_rates(lc, lp, uc, up, lc_coords=None, uc_coords=None):
+    """
+    Stawki historyczne (klient i giełda), podlot i odjazd relacji.
+
+    Wynik zależy tylko od relacji (rate_lane_key) i plików stawek - jest pamiętany
+    w rates_memo i współdzielony przez sesje i zadania. Współrzędne nie wpływają na wynik.
+    """
     try:
-        historical_rates_df = pd.read_excel("historical_rates.xlsx",
-                                            dtype={'kod pocztowy zaladunku': str, 'kod pocztowy rozladunku': str})
-        historical_rates_gielda_df = pd.read_excel("historical_rates_gielda.xlsx",
-                                                   dtype={'kod pocztowy zaladunku': str, 'kod pocztowy rozladunku': str})
-    except Exception as e:
-        print(f"Błąd wczytywania danych historycznych: {e}")
-        historical_rates_df = pd.DataFrame()
-        historical_rates_gielda_df = pd.DataFrame()
+        return rates_memo.get_or_compute(('lane',) + rate_lane_key(lc, lp, uc, up),
+                                         lambda: compute_all_rates(lc, lp, uc, up))
+    except RatesUnavailableException as e:
+        logger.warning("Błąd wczytywania danych historycznych: %s", e.error)
+        # Wynik bez danych stawek nie jest zapamiętywany - kolejny wiersz ponowi wczytanie
+        return compute_all_rates(lc, lp, uc, up, load_rates=False)
+
+
+def describe_postal_match(lp_has_two_digits, up_has_two_digits):
+    """Opis dopasowania kodów pocztowych relacji (2 cyfry lub 1 cyfra)."""
+    if lp_has_two_digits and up_has_two_digits:
+        return "2 cyfry"
+    if not lp_has_two_digits and up_has_two_digits:
+        return "Załadunek: 1 cyfra, Rozładunek: 2 cyfry"
+    if lp_has_two_digits and not up_has_two_digits:
+        return "Załadunek: 2 cyfry, Rozładunek: 1 cyfra"
+    return "Obie lokalizacje: 1 cyfra"
+
+
+def compute_all_rates(lc, lp, uc, up, load_rates=True):
+    """
+    Wylicza stawki relacji z plików stawek lub bazy stawek.
+
+    Args:
+        load_rates: False - wynik bez danych stawek (pliki stawek niedostępne)
+
+    Raises:
+        RatesUnavailableException: Nie udało się wczytać plików stawek
+    """
+    database = None
+    historical_rates_df = pd.DataFrame()
+    historical_rates_gielda_df = pd.DataFrame()
+    podlot_table, odjazd_table = {}, {}
+    if load_rates:
+        try:
+            database = get_rates_database()
+            if database is None:
+                historical_rates_df = rates_store.get(HISTORICAL_RATES_FILE)
+                historical_rates_gielda_df = rates_store.get(HISTORICAL_RATES_GIELDA_FILE)
+                podlot_table, odjazd_table = get_fallback_tables()
+        except Exception as e:
+            raise RatesUnavailableException(e) from e
+
+    if database is not None:
+        return compute_all_rates_db(database, lc, lp, uc, up)
 
     norm_lc = normalize_country(lc).strip()
     norm_uc = normalize_country(uc).strip()
@@ -2303,79 +2710,26 @@ def get_all_rates(lc, lp, uc, up, lc_coords, uc_coords):
     norm_up_1 = str(up).strip()[0]
 
     # Inicjalizujemy informacje o dopasowaniu
-    if lp_has_two_digits and up_has_two_digits:
-        dopasowanie_hist = "2 cyfry"
-        dopasowanie_gielda = "2 cyfry"
-    elif not lp_has_two_digits and up_has_two_digits:
-        dopasowanie_hist = "Załadunek: 1 cyfra, Rozładunek: 2 cyfry"
-        dopasowanie_gielda = "Załadunek: 1 cyfra, Rozładunek: 2 cyfry"
-    elif lp_has_two_digits and not up_has_two_digits:
-        dopasowanie_hist = "Załadunek: 2 cyfry, Rozładunek: 1 cyfra"
-        dopasowanie_gielda = "Załadunek: 2 cyfry, Rozładunek: 1 cyfra"
-    else:
-        dopasowanie_hist = "Obie lokalizacje: 1 cyfra"
-        dopasowanie_gielda = "Obie lokalizacje: 1 cyfra"
-
-    # Dla dwóch cyfr w obu kodach pocztowych
-    if lp_has_two_digits and up_has_two_digits:
-        exact_hist = historical_rates_df[
-            (historical_rates_df['kraj zaladunku'].apply(normalize_country) == norm_lc) &
-            (historical_rates_df['kraj rozladunku'].apply(normalize_country) == norm_uc) &
-            (historical_rates_df['kod pocztowy zaladunku'].astype(str).str.zfill(2) == norm_lp) &
-            (historical_rates_df['kod pocztowy rozladunku'].astype(str).str.zfill(2) == norm_up)
-            ]
-
-        exact_gielda = historical_rates_gielda_df[
-            (historical_rates_gielda_df['kraj zaladunku'].apply(normalize_country) == norm_lc) &
-            (historical_rates_gielda_df['kraj rozladunku'].apply(normalize_country) == norm_uc) &
-            (historical_rates_gielda_df['kod pocztowy zaladunku'].astype(str).str.zfill(2) == norm_lp) &
-            (historical_rates_gielda_df['kod pocztowy rozladunku'].astype(str).str.zfill(2) == norm_up)
-            ]
-    # Dla jednej cyfry w kodzie załadunku, dwóch cyfr w kodzie rozładunku
-    elif not lp_has_two_digits and up_has_two_digits:
-        exact_hist = historical_rates_df[
-            (historical_rates_df['kraj zaladunku'].apply(normalize_country) == norm_lc) &
-            (historical_rates_df['kraj rozladunku'].apply(normalize_country) == norm_uc) &
-            (historical_rates_df['kod pocztowy zaladunku'].astype(str).str[0] == norm_lp) &
-            (historical_rates_df['kod pocztowy rozladunku'].astype(str).str.zfill(2) == norm_up)
-            ]
-
-        exact_gielda = historical_rates_gielda_df[
-            (historical_rates_gielda_df['kraj zaladunku'].apply(normalize_country) == norm_lc) &
-            (historical_rates_gielda_df['kraj rozladunku'].apply(normalize_country) == norm_uc) &
-            (historical_rates_gielda_df['kod pocztowy zaladunku'].astype(str).str[0] == norm_lp) &
-            (historical_rates_gielda_df['kod pocztowy rozladunku'].astype(str).str.zfill(2) == norm_up)
-            ]
-    # Dla dwóch cyfr w kodzie załadunku, jednej cyfry w kodzie rozładunku
-    elif lp_has_two_digits and not up_has_two_digits:
-        exact_hist = historical_rates_df[
-            (historical_rates_df['kraj zaladunku'].apply(normalize_country) == norm_lc) &
-            (historical_rates_df['kraj rozladunku'].apply(normalize_country) == norm_uc) &
-            (historical_rates_df['kod pocztowy zaladunku'].astype(str).str.zfill(2) == norm_lp) &
-            (historical_rates_df['kod pocztowy rozladunku'].astype(str).str[0] == norm_up)
+    dopasowanie_hist = describe_postal_match(lp_has_two_digits, up_has_two_digits)
+    dopasowanie_gielda = dopasowanie_hist
+
+    # Kody dopasowywane po 2 cyfrach (zfill) lub po pierwszej cyfrze - kolumny znormalizowane przy wczytaniu
+    load_postal_column = COL_LOAD_POSTAL_2 if lp_has_two_digits else COL_LOAD_POSTAL_1
+    unload_postal_column = COL_UNLOAD_POSTAL_2 if up_has_two_digits else COL_UNLOAD_POSTAL_1
+
+    def lane_matches(rates_df):
+        # Pusta tabela (błąd wczytania pliku) nie ma kolumn relacji
+        if rates_df.empty:
+            return rates_df
+        return rates_df[
+            (rates_df[COL_LOAD_COUNTRY] == norm_lc) &
+            (rates_df[COL_UNLOAD_COUNTRY] == norm_uc) &
+            (rates_df[load_postal_column] == norm_lp) &
+            (rates_df[unload_postal_column] == norm_up)
             ]
 
-        exact_gielda = historical_rates_gielda_df[
-            (historical_rates_gielda_df['kraj zaladunku'].apply(normalize_country) == norm_lc) &
-            (historical_rates_gielda_df['kraj rozladunku'].apply(normalize_country) == norm_uc) &
-            (historical_rates_gielda_df['kod pocztowy zaladunku'].astype(str).str.zfill(2) == norm_lp) &
-            (historical_rates_gielda_df['kod pocztowy rozladunku'].astype(str).str[0] == norm_up)
-            ]
-    # Dla jednej cyfry w obu kodach
-    else:
-        exact_hist = historical_rates_df[
-            (historical_rates_df['kraj zaladunku'].apply(normalize_country) == norm_lc) &
-            (historical_rates_df['kraj rozladunku'].apply(normalize_country) == norm_uc) &
-            (historical_rates_df['kod pocztowy zaladunku'].astype(str).str[0] == norm_lp) &
-            (historical_rates_df['kod pocztowy rozladunku'].astype(str).str[0] == norm_up)
-            ]
-
-        exact_gielda = historical_rates_gielda_df[
-            (historical_rates_gielda_df['kraj zaladunku'].apply(normalize_country) == norm_lc) &
-            (historical_rates_gielda_df['kraj rozladunku'].apply(normalize_country) == norm_uc) &
-            (historical_rates_gielda_df['kod pocztowy zaladunku'].astype(str).str[0] == norm_lp) &
-            (historical_rates_gielda_df['kod pocztowy rozladunku'].astype(str).str[0] == norm_up)
-            ]
+    exact_hist = lane_matches(historical_rates_df)
+    exact_gielda = lane_matches(historical_rates_gielda_df)
 
     # Inicjalizacja wyników
     podlot_hist, z_hist = None, 0
@@ -2402,18 +2756,13 @@ def get_all_rates(lc, lp, uc, up, lc_coords, uc_coords):
         'dopasowanie_gielda': dopasowanie_gielda
     }
     
-    # Oblicz podlot historyczny z fallbackiem do grupy koordynatów
-    podlot_hist, podlot_source = calculate_podlot_with_group_fallback(
-        historical_rates_df, norm_lc, norm_lp, min_orders=20
-    )
+    # Podlot i odjazd historyczny z fallbackiem do grupy koordynatów - tablice według (kraj, prefiks kodu)
+    podlot_hist, podlot_source = podlot_table.get(fallback_key(norm_lc, norm_lp), (None, None))
     if podlot_hist is not None:
         result['podlot_historyczny'] = podlot_hist
         result['podlot_zrodlo'] = podlot_source
-    
-    # Oblicz odjazd historyczny z fallbackiem do grupy koordynatów
-    odjazd_hist, odjazd_source = calculate_odjazd_with_group_fallback(
-        historical_rates_df, norm_uc, norm_up, min_orders=20
-    )
+
+    odjazd_hist, odjazd_source = odjazd_table.get(fallback_key(norm_uc, norm_up), (None, None))
     if odjazd_hist is not None:
         result['odjazd_historyczny'] = odjazd_hist
         result['odjazd_zrodlo'] = odjazd_source
@@ -2495,7 +2844,7 @@ def get_all_rates(lc, lp, uc, up, lc_coords, uc_coords):
                     'hist_fracht_3m': row.get('fracht_3m') if not pd.isna(row.get('fracht_3m')) else None,
                 })
         except Exception as e:
-            print(f"Błąd przetwarzania danych historycznych: {e}")
+            logger.warning("Błąd przetwarzania danych historycznych: %s", e)
 
     # Przetwarzanie wyników z giełdy (średnia ważona, jeśli jest wiele rekordów)
     if not exact_gielda.empty:
@@ -2593,7 +2942,7 @@ def get_all_rates(lc, lp, uc, up, lc_coords, uc_coords):
                 if result['podlot_historyczny'] is None:
                     result['podlot_historyczny'] = podlot_gielda
         except Exception as e:
-            print(f"Błąd przetwarzania danych z giełdy: {e}")
+            logger.warning("Błąd przetwarzania danych z giełdy: %s", e)
 
     # Obliczenie średniego podlotu ważonego liczbą zleceń
     weighted_podlot = calculate_weighted_podlot(podlot_hist, z_hist, podlot_gielda, z_gielda)
@@ -2611,11 +2960,153 @@ def get_all_rates(lc, lp, uc, up, lc_coords, uc_coords):
     return result
 
 
+def apply_lane_stats(result, stats, prefix, dopasowanie, with_podlot=False):
+    """
+    Uzupełnia wynik compute_all_rates_db stawkami jednego źródła (jak gałęzie compute_all_rates).
+
+    Args:
+        result: Wynik relacji (modyfikowany)
+        stats: LaneStats źródła z co najmniej jednym dopasowaniem
+        prefix: 'hist' lub 'gielda'
+        dopasowanie: Opis dopasowania kodów pocztowych
+        with_podlot: Czy wyliczyć podlot z dystansów źródła (giełda)
+
+    Returns:
+        tuple: (liczba zleceń do średniego podlotu, podlot źródła lub None)
+    """
+    podlot = None
+    if stats.rows == 1:
+        # Jeden rekord - wartości wprost
+        z = float(stats.single_orders) if stats.single_orders is not None else 0
+        for column in RATE_COLUMNS:
+            result[f'{prefix}_{WORKBOOK_COLUMNS[column]}'] = stats.columns[column].value
+        if with_podlot:
+            podlot = stats.columns['distance'].distance()
+            if result['podlot_historyczny'] is None:
+                result['podlot_historyczny'] = podlot
+        return z, podlot
+
+    # Wiele rekordów - średnie ważone liczbą zleceń z rekordów z niepustą wartością
+    z = 0
+    used_records_count = {}
+    for column in RATE_COLUMNS:
+        column_stats = stats.columns[column]
+        if not column_stats.count:
+            continue
+        result_key = f'{prefix}_{WORKBOOK_COLUMNS[column]}'
+        used_records_count[result_key] = column_stats.count
+        if column_stats.orders > 0:
+            result[result_key] = column_stats.weighted
+            if column == 'rate_3m':
+                z = column_stats.orders
+
+    if with_podlot and result['podlot_historyczny'] is None:
+        podlot = stats.columns['distance'].distance()
+        if podlot is not None:
+            result['podlot_historyczny'] = podlot
+            used_records_count['podlot_historyczny'] = stats.columns['distance'].count
+
+    if any(count < stats.rows for count in used_records_count.values()):
+        non_empty_counts = ", ".join([f"{key.split('_')[1]}: {count}/{stats.rows}"
+                                      for key, count in used_records_count.items()])
+        dopasowanie += f" (tylko niepuste: {non_empty_counts})"
+    else:
+        dopasowanie += f" (średnia ważona z {stats.rows} dopasowań)"
+    result[f'dopasowanie_{prefix}'] = dopasowanie
+    return z, podlot
+
+
+def compute_all_rates_db(database, lc, lp, uc, up):
+    """
+    compute_all_rates na agregatach z bazy stawek SQLite (RATES_BACKEND='sqlite').
+
+    Średnie ważone liczbą zleceń liczone są w zapytaniach; wynik i opisy
+    dopasowania są takie jak dla tabel z plików xlsx.
+    """
+    norm_lc, norm_lp, norm_uc, norm_up = rate_lane_key(lc, lp, uc, up)
+    dopasowanie = describe_postal_match(len(norm_lp) >= 2, len(norm_up) >= 2)
+    result = {
+        'hist_stawka_3m': None,
+        'hist_stawka_6m': None,
+        'hist_stawka_12m': None,
+        'hist_stawka_48m': None,
+        'hist_fracht_3m': None,
+        'gielda_stawka_3m': None,
+        'gielda_stawka_6m': None,
+        'gielda_stawka_12m': None,
+        'gielda_stawka_48m': None,
+        'gielda_fracht_3m': None,
+        'podlot_historyczny': None,
+        'podlot_zrodlo': None,
+        'odjazd_historyczny': None,
+        'odjazd_zrodlo': None,
+        'relacja': f"{norm_lc} {norm_lp} - {norm_uc} {norm_up}",
+        'dopasowanie_hist': dopasowanie,
+        'dopasowanie_gielda': dopasowanie
+    }
+
+    podlot_hist, podlot_source = database.podlot_with_group_fallback(norm_lc, norm_lp, min_orders=20)
+    if podlot_hist is not None:
+        result['podlot_historyczny'] = podlot_hist
+        result['podlot_zrodlo'] = podlot_source
+
+    odjazd_hist, odjazd_source = database.odjazd_with_group_fallback(norm_uc, norm_up, min_orders=20)
+    if odjazd_hist is not None:
+        result['odjazd_historyczny'] = odjazd_hist
+        result['odjazd_zrodlo'] = odjazd_source
+
+    z_hist, z_gielda, podlot_gielda = 0, 0, None
+    try:
+        hist_stats = database.lane_stats(SOURCE_CLIENT, norm_lc, norm_lp, norm_uc, norm_up)
+        if hist_stats.rows:
+            z_hist, _ = apply_lane_stats(result, hist_stats, 'hist', dopasowanie)
+    except Exception as e:
+        logger.warning("Błąd przetwarzania danych historycznych: %s", e)
+
+    try:
+        gielda_stats = database.lane_stats(SOURCE_EXCHANGE, norm_lc, norm_lp, norm_uc, norm_up)
+        if gielda_stats.rows:
+            z_gielda, podlot_gielda = apply_lane_stats(result, gielda_stats, 'gielda', dopasowanie,
+                                                       with_podlot=True)
+    except Exception as e:
+        logger.warning("Błąd przetwarzania danych z giełdy: %s", e)
+
+    # Obliczenie średniego podlotu ważonego liczbą zleceń
+    weighted_podlot = calculate_weighted_podlot(podlot_hist, z_hist, podlot_gielda, z_gielda)
+    if weighted_podlot is not None:
+        result['podlot_sredni_wazony'] = weighted_podlot
+
+    # Fallback: brak podlotu lub odjazdu - domyślne 200 km
+    if result['podlot_historyczny'] is None:
+        result['podlot_historyczny'] = 200
+    if result['odjazd_historyczny'] is None:
+        result['odjazd_historyczny'] = 200
+
+    return result
+
+
+def is_session_job(user_data, job_id):
+    """
+    Czy zadanie nadal jest bieżącym zadaniem sesji (job_id None - przetwarzanie poza kolejką).
+
+    Nowszy upload w tej samej sesji zastępuje zadanie - zastąpione zadanie
+    nie zapisuje już postępu, podglądu ani wyniku sesji.
+    """
+    return job_id is None or user_data.job_id == job_id
+
+
+def check_session_job(user_data, job_id):
+    """Rzuca JobCancelledException, jeśli sesja przetwarza już nowsze zadanie."""
+    if user_data is not None and not is_session_job(user_data, job_id):
+        raise JobCancelledException(job_id)
+
+
 def modify_process_przetargi(process_func):
     @wraps(process_func)
     def wrapper(*args, **kwargs):
         # Pobierz session_id z kwargs lub None dla legacy mode
         session_id = kwargs.get('session_id', None)
+        job_id = kwargs.get('job_id', None)
         
         # Pobierz user_data jeśli session_id istnieje
         if session_id:
@@ -2650,6 +3141,7 @@ def modify_process_przetargi(process_func):
         logger.info(f"[{session_id_short}] Geokodowanie {len(unique_locations)} unikalnych lokalizacji")
         
         # Ustaw geocoding total
+        check_session_job(user_data, job_id)
         if user_data:
             user_data.geocoding_total = len(unique_locations)
             user_data.geocoding_current = 0
@@ -2665,6 +3157,7 @@ def modify_process_przetargi(process_func):
             get_coordinates(*loc)
             
             # Aktualizuj postęp
+            check_session_job(user_data, job_id)
             if user_data:
                 user_data.geocoding_current += 1
             else:
@@ -2692,69 +3185,24 @@ def modify_process_przetargi(process_func):
     return wrapper
 
 
-def sample_route_points(points, num_points=15):
-    """
-    Wybiera reprezentatywne punkty z trasy
+def route_link_points(points, num_points=15):
     """
-    if not points or len(points) <= num_points:
-        return points
-    
-    # Wybierz punkty w równych odstępach
-    step = len(points) // (num_points - 1)  # -1 bo chcemy zachować punkt końcowy
-    sampled_points = points[::step]
+    Wybiera punkty trasy do linku mapy (uproszczenie Douglasa-Peuckera)
     
-    # Dodaj ostatni punkt jeśli nie został uwzględniony
-    if points[-1] not in sampled_points:
-        sampled_points = sampled_points[:num_points-1] + [points[-1]]
+    Args:
+        points: Tablica (N, 2) punktów [lat, lng]
+        num_points: Maksymalna liczba punktów
     
-    return sampled_points[:num_points]
-
-def decode_polyline(polyline_str):
-    """
-    Dekoduje polyline z API PTV do listy punktów [lat, lng]
+    Returns:
+        Lista punktów [lat, lng]
     """
-    try:
-        if not polyline_str or not isinstance(polyline_str, str):
-            return []
-            
-        # Sprawdź czy mamy do czynienia z formatem GeoJSON
-        if 'coordinates' in polyline_str:
-            try:
-                # Znajdź początek i koniec koordynatów
-                start = polyline_str.find('[[') + 2
-                end = polyline_str.rfind(']]')
-                if start == -1 or end == -1:
-                    return []
-                    
-                # Wyciągnij tylko koordynaty
-                coords_str = polyline_str[start:end]
-                points = []
-                
-                # Podziel na pary współrzędnych
-                coords = coords_str.split('],[')
-                for coord in coords:
-                    coord = coord.strip('[]')
-                    if ',' in coord:
-                        try:
-                            lng, lat = map(float, coord.split(','))
-                            points.append([lat, lng])
-                        except (ValueError, TypeError):
-                            continue
-                
-                return points
-            except Exception:
-                return []
-        else:
-            # Spróbuj standardowego dekodowania polyline
-            try:
-                return polyline.decode(polyline_str)
-            except Exception:
-                return []
-            
-    except Exception:
+    if len(points) == 0:
         return []
+    points = simplify_points(points, num_points)
+    # float32 z dekodera → 5 miejsc po przecinku (~1 m) w linku
+    return np.round(points.astype(np.float64), 5).tolist()
 
-def create_google_maps_link(coord_from, coord_to, polyline_str, ferry_ports=None):
+def create_google_maps_link(coord_from, coord_to, polyline_str, ferry_ports=None, simplified_polyline=None):
     """
     Tworzy link do Google Maps z trasą używając punktów pośrednich
     
@@ -2763,24 +3211,27 @@ def create_google_maps_link(coord_from, coord_to, polyline_str, ferry_ports=None
         coord_to: Punkt końcowy (lat, lng)
         polyline_str: Zakodowany polyline (może być z separatorem '|' dla tras z promem)
         ferry_ports: Dict z kluczami 'start' i 'end' zawierającymi współrzędne portów promowych
+        simplified_polyline: Uproszczona trasa zapisana z wynikiem trasy - gdy jest,
+                             pełny polyline nie jest dekodowany
     """
-    if not polyline_str:
+    simple_link = f"https://www.google.com/maps/dir/{coord_from[0]},{coord_from[1]}/{coord_to[0]},{coord_to[1]}"
+    if not polyline_str and not simplified_polyline:
         route_logger.info("Brak polyline - tworzę prosty link punkt-punkt")
-        return f"https://www.google.com/maps/dir/{coord_from[0]},{coord_from[1]}/{coord_to[0]},{coord_to[1]}"
+        return simple_link
     
     try:
-        # Sprawdź czy mamy trasę z promem (polyline rozdzielony przez '|')
-        if '|' in polyline_str and ferry_ports:
-            route_logger.info("🚢 Wykryto trasę z promem - dzielę polyline na segmenty")
-            polyline_parts = polyline_str.split('|')
-            
-            # Dekoduj oba segmenty
-            segment1_points = decode_polyline(polyline_parts[0])
-            segment2_points = decode_polyline(polyline_parts[1])
+        if simplified_polyline:
+            parts = decode_simplified_polyline(simplified_polyline)
+        else:
+            parts = [decode_polyline(part) for part in split_polyline_parts(polyline_str)]
+        
+        # Trasa z promem - segmenty przed i po przeprawie
+        if len(parts) > 1 and ferry_ports:
+            route_logger.info("🚢 Wykryto trasę z promem - dzielę trasę na segmenty")
             
-            # Pobierz próbki z każdego segmentu (po 7 punktów)
-            sampled_segment1 = sample_route_points(segment1_points, 7)
-            sampled_segment2 = sample_route_points(segment2_points, 7)
+            # Pobierz punkty z każdego segmentu (po 7 punktów)
+            sampled_segment1 = route_link_points(parts[0], 7)
+            sampled_segment2 = route_link_points(parts[1], 7)
             
             if sampled_segment1 and sampled_segment2:
                 # Połącz: segment1 + port_start + port_end + segment2
@@ -2798,13 +3249,12 @@ def create_google_maps_link(coord_from, coord_to, polyline_str, ferry_ports=None
                 link = f"https://www.google.com/maps/dir/{coord_from[0]},{coord_from[1]}/{waypoints}/{coord_to[0]},{coord_to[1]}"
                 return link
         
-        # Standardowa trasa bez promu
-        route_points = decode_polyline(polyline_str.split('|')[0])  # Weź pierwszy segment jeśli jest '|'
-        sampled_points = sample_route_points(route_points, 15)
+        # Standardowa trasa bez promu (pierwszy segment jeśli trasa ma kilka)
+        sampled_points = route_link_points(parts[0], 15) if parts else []
         
         if not sampled_points:
             route_logger.info("Nie udało się wybrać punktów pośrednich - tworzę prosty link punkt-punkt")
-            return f"https://www.google.com/maps/dir/{coord_from[0]},{coord_from[1]}/{coord_to[0]},{coord_to[1]}"
+            return simple_link
         
         # Twórz link z punktami pośrednimi
         waypoints = "/".join(f"{lat},{lng}" for lat, lng in sampled_points[1:-1])
@@ -2814,10 +3264,223 @@ def create_google_maps_link(coord_from, coord_to, polyline_str, ferry_ports=None
         
     except Exception as e:
         route_logger.warning(f"Błąd podczas generowania linku: {str(e)} - tworzę prosty link punkt-punkt")
-        return f"https://www.google.com/maps/dir/{coord_from[0]},{coord_from[1]}/{coord_to[0]},{coord_to[1]}"
+        return simple_link
+
+def build_result_excel(results):
+    """
+    Tworzy plik Excel z wynikami wyceny (arkusz 'Wycena' z formatowaniem grup kolumn i linkami do map).
+    
+    Args:
+        results: Lista słowników wyników wierszy
+    
+    Returns:
+        bytes: Zawartość pliku .xlsx
+    """
+    # Tworzenie DataFrame z wyników
+    result_df = pd.DataFrame(results)
+    
+    # Usuń ukrytą kolumnę przed zapisaniem do Excela
+    if '_original_map_link' in result_df.columns:
+        # Zapisz wartości do zmiennej tymczasowej, aby można było ich użyć później
+        original_map_links = result_df['_original_map_link'].copy()
+        # Usuń kolumnę z DataFrame
+        result_df = result_df.drop(columns=['_original_map_link'])
+    else:
+        original_map_links = None
+    
+    # Zapisz do bufora w pamięci
+    excel_buffer = io.BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+        result_df.to_excel(writer, index=False, sheet_name='Wycena')
+        
+        # Pobierz worksheet do formatowania
+        worksheet = writer.sheets['Wycena']
+        
+        # Funkcja do konwersji numeru kolumny na nazwę kolumny Excel
+        def get_column_letter(n):
+            string = ""
+            while n > 0:
+                n, remainder = divmod(n - 1, 26)
+                string = chr(65 + remainder) + string
+            return string
+
+        # Definicje kolorów dla różnych typów kolumn
+        COLORS = {
+            'podstawowe': 'E6E6E6',  # Szary
+            'geokodowanie': 'FFE699',  # Jasny żółty
+            'dystans': 'BDD7EE',  # Jasny niebieski
+            'gielda': 'C6E0B4',  # Jasny zielony
+            'klient': 'F8CBAD',  # Jasny pomarańczowy
+            'koszty': 'D9D9D9',  # Jaśniejszy szary
+            'region': 'E2EFDA',  # Bardzo jasny zielony
+            'weryfikacja': 'FCE4D6',  # Bardzo jasny pomarańczowy
+            'marza': 'FFD700'  # Złoty dla kolumn z marżą
+        }
+
+        # Dynamiczne mapowanie kolumn do typów na podstawie nazw
+        # Tworzymy słownik nazwa_kolumny -> indeks (1-based)
+        column_name_to_idx = {col: idx+1 for idx, col in enumerate(result_df.columns)}
+        
+        # Definicje grup kolumn po nazwach
+        COLUMN_GROUPS = {
+            'podstawowe': ['Kraj zaladunku', 'Kod zaladunku', 'Miasto zaladunku', 'Region załadunku', 
+                          'Współrzędne zaladunku', 'Kraj rozladunku', 'Kod rozładunku', 'Miasto rozładunku',
+                          'Region rozładunku', 'Współrzędne rozładunku'],
+            'dystans': ['km PTV (tylko ładowne)', 'km całkowite z podlotem i odjazdem', 'podlot', 'odjazd',
+                       'km w linii prostej'],
+            'gielda': ['Dopasowanie giełda', 'Giełda stawka 3m', 'Giełda stawka 6m', 'Giełda stawka 12m',
+                      'Giełda fracht 3m', 'Giełda sugerowany fracht/km (z promem)', 
+                      'Giełda sugerowany fracht/km z podlotem i odjazdem'],
+            'klient': ['Dopasowanie klient', 'Klient stawka 3m', 'Klient stawka 6m', 'Klient stawka 12m',
+                      'Klient fracht 3m', 'Klient sugerowany fracht/km (z promem)',
+                      'Klient sugerowany fracht/km z podlotem i odjazdem', 'Suma kosztów (bez podlotu i odjazdu)',
+                      'Stawka minimalna (€/km)'],
+            'koszty': ['Koszt paliwa', 'Koszt kierowcy + leasing', 'Opłaty drogowe', 'Opłaty specjalne',
+                      'Koszt podlotu (opłaty + paliwo)', 'Koszt odjazdu (opłaty + paliwo)', 
+                      'Opłaty drogowe/km', 'Suma kosztów'],
+            'region': ['Region - Dopasowanie giełda', 'Region - Giełda stawka 3m', 'Region - Giełda stawka 6m',
+                      'Region - Giełda stawka 12m', 'Region - Dopasowanie klient', 'Region - Klient stawka 3m',
+                      'Region - Klient stawka 6m', 'Region - Klient stawka 12m', 'Region - Podlot (km)'],
+            'weryfikacja': ['Weryfikacja załadunku - miasto', 'Weryfikacja załadunku - kod pocztowy',
+                           'Weryfikacja załadunku - współrzędne miasta', 'Weryfikacja załadunku - współrzędne kodu',
+                           'Weryfikacja załadunku - odległość (km)', 'Weryfikacja załadunku - poprawna',
+                           'Weryfikacja rozładunku - miasto', 'Weryfikacja rozładunku - kod pocztowy',
+                           'Weryfikacja rozładunku - współrzędne miasta', 'Weryfikacja rozładunku - współrzędne kodu',
+                           'Weryfikacja rozładunku - odległość (km)', 'Weryfikacja rozładunku - poprawna',
+                           'Uwagi do geokodowania'],
+            'marza': ['Oczekiwany zysk', 'Źródło marży'],
+            'geokodowanie': ['Jakość geokodowania (zał.)', 'Źródło geokodowania (zał.)',
+                            'Jakość geokodowania (rozł.)', 'Źródło geokodowania (rozł.)']
+        }
+        
+        # Konwertuj nazwy kolumn na indeksy
+        COLUMN_TYPES = {}
+        for group_name, column_names in COLUMN_GROUPS.items():
+            COLUMN_TYPES[group_name] = [column_name_to_idx[col] for col in column_names if col in column_name_to_idx]
+        
+        # Zamień długie linki do map na krótki tekst "Mapa" przed ustawieniem szerokości kolumn
+        if "Link do mapy" in result_df.columns:
+            # Dodajemy więcej informacji diagnostycznych
+            logger.debug("Zamieniam linki na tekst 'Mapa'. Liczba linków do zamiany: %s",
+                         LazyPayload(lambda: result_df['Link do mapy'].str.startswith('http', na=False).sum()))
+            # Nie musimy już tworzyć tymczasowej kolumny, bo mamy już _original_map_link
+            # Upewnij się, że wszystkie linki są zamienione na "Mapa"
+            result_df.loc[result_df['Link do mapy'].str.startswith('http', na=False), 'Link do mapy'] = "Mapa"
+            logger.debug("Po zamianie, liczba komórek z tekstem 'Mapa': %s",
+                         LazyPayload(lambda: (result_df['Link do mapy'] == 'Mapa').sum()))
+            
+        # Ustaw szerokość kolumn i formatowanie
+        for idx, col in enumerate(result_df.columns, start=1):
+            column_letter = get_column_letter(idx)
+            
+            # Ustaw szerokość
+            max_length = max(
+                result_df.iloc[:, idx-1].map(lambda value: len(str(value))).max(),
+                len(str(col))
+            )
+            adjusted_width = min(max(max_length + 2, 10), 50)
+            worksheet.column_dimensions[column_letter].width = adjusted_width
+
+            # Ustaw kolor tła dla całej kolumny
+            for col_type, columns in COLUMN_TYPES.items():
+                if idx in columns:
+                    for cell in worksheet[column_letter]:
+                        cell.fill = openpyxl.styles.PatternFill(
+                            start_color=COLORS[col_type],
+                            end_color=COLORS[col_type],
+                            fill_type='solid'
+                        )
+        
+        # Formatowanie nagłówków
+        for cell in worksheet[1]:
+            cell.font = openpyxl.styles.Font(bold=True)
+            cell.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center', wrap_text=True)
+        
+        # Dynamiczne mapowanie kolumn formatowania na podstawie nazw
+        distance_column_names = ['km PTV (tylko ładowne)', 'km całkowite z podlotem i odjazdem', 'podlot', 'odjazd',
+                                'km w linii prostej', 'Weryfikacja załadunku - odległość (km)', 
+                                'Weryfikacja rozładunku - odległość (km)', 'Region - Podlot (km)']
+        currency_column_names = ['Suma kosztów (bez podlotu i odjazdu)', 'Stawka minimalna (€/km)',
+                                'Klient sugerowany fracht/km z podlotem i odjazdem',
+                                'Giełda sugerowany fracht/km z podlotem i odjazdem', 'Koszt paliwa', 
+                                'Koszt kierowcy + leasing', 'Opłaty drogowe', 'Opłaty specjalne',
+                                'Koszt podlotu (opłaty + paliwo)', 'Koszt odjazdu (opłaty + paliwo)', 
+                                'Opłaty drogowe/km', 'Suma kosztów',
+                                'Giełda stawka 3m', 'Giełda stawka 6m', 'Giełda stawka 12m', 'Giełda fracht 3m',
+                                'Giełda sugerowany fracht/km (z promem)',
+                                'Klient stawka 3m', 'Klient stawka 6m', 'Klient stawka 12m', 'Klient fracht 3m',
+                                'Klient sugerowany fracht/km (z promem)',
+                                'Region - Giełda stawka 3m', 'Region - Giełda stawka 6m', 'Region - Giełda stawka 12m',
+                                'Region - Klient stawka 3m', 'Region - Klient stawka 6m', 'Region - Klient stawka 12m',
+                                'Oczekiwany zysk']
+        
+        distance_columns = [column_name_to_idx[col] for col in distance_column_names if col in column_name_to_idx]
+        currency_columns = [column_name_to_idx[col] for col in currency_column_names if col in column_name_to_idx]
+        
+        # Formatowanie komórek z danymi
+        for row_idx, row in enumerate(worksheet.iter_rows(min_row=2)):
+            for cell in row:
+                cell.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center')
+                
+                # Formatowanie liczb
+                if isinstance(cell.value, (int, float)):
+                    if cell.column in distance_columns:  # Kolumny z kilometrami
+                        cell.number_format = '#,##0'
+                    elif cell.column in currency_columns:  # Kolumny z walutą
+                        cell.number_format = '#,##0.00 €'
+                    else:  # Pozostałe kolumny liczbowe
+                        cell.number_format = '#,##0'
+                
+                # Dodaj hiperłącza do komórek z tekstem "Mapa" lub linkami
+                # Dynamiczne wyszukiwanie kolumny "Link do mapy" po nazwie
+                column_name = list(result_df.columns)[cell.column-1] if cell.column <= len(result_df.columns) else None
+                if column_name == "Link do mapy":
+                    # Sprawdź czy komórka zawiera link lub tekst "Mapa"
+                    if cell.value == "Mapa" and original_map_links is not None:
+                        # Pobierz oryginalny link z zapisanej zmiennej
+                        original_link = original_map_links.iloc[row_idx] if row_idx < len(original_map_links) else None
+                        if isinstance(original_link, str) and original_link.startswith('http'):
+                            # Dodaj hiperłącze
+                            cell.hyperlink = original_link
+                            # Ustaw styl hiperłącza
+                            cell.font = openpyxl.styles.Font(color="0000FF", underline="single")
+                    # Dodatkowe sprawdzenie dla linków, które nie zostały zamienione
+                    elif isinstance(cell.value, str) and cell.value.startswith('http'):
+                        # Zapisz oryginalny link
+                        link_url = cell.value
+                        # Zamień wartość komórki na krótki tekst
+                        cell.value = "Mapa"
+                        # Dodaj hiperłącze
+                        cell.hyperlink = link_url
+                        # Ustaw styl hiperłącza
+                        cell.font = openpyxl.styles.Font(color="0000FF", underline="single")
+                        logger.debug("Zamieniono link na 'Mapa' w komórce Excel (wiersz %s, kolumna %s)", row_idx+1, cell.column)
+        
+        # Dodaj obramowanie do wszystkich komórek
+        thin_border = openpyxl.styles.Border(
+            left=openpyxl.styles.Side(style='thin'),
+            right=openpyxl.styles.Side(style='thin'),
+            top=openpyxl.styles.Side(style='thin'),
+            bottom=openpyxl.styles.Side(style='thin')
+        )
+        
+        for row in worksheet.iter_rows():
+            for cell in row:
+                cell.border = thin_border
+        
+        # Zamrożenie pierwszego wiersza
+        worksheet.freeze_panes = 'A2'
+    
+    # Pobierz zawartość bufora
+    excel_buffer.seek(0)
+    excel_data = excel_buffer.getvalue()
+    return excel_data
+
 
 @modify_process_przetargi
-def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVER_COST, session_id=None):
+def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVER_COST, session_id=None, job_id=None,
+                      mode=PRICING_MODE_PRECISE, rows=None, on_row=None, export=True,
+                      checkpoint_id=None, refined_checkpoint_id=None, margin_matrix=None):
     """
     Główna funkcja przetwarzająca dane z pliku Excel.
     
@@ -2826,6 +3489,17 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
         fuel_cost: Koszt paliwa EUR/km
         driver_cost: Koszt kierowcy EUR/dzień
         session_id: ID sesji użytkownika (None dla kompatybilności wstecznej)
+        job_id: ID zadania w kolejce - pozwala przerwać przetwarzanie po anulowaniu
+        mode: PRICING_MODE_PRECISE (trasy z PTV) lub PRICING_MODE_ESTIMATE (trasy z cache
+              albo szacunek haversine × współczynnik objazdu, bez zapytań o trasy)
+        rows: Pozycje wierszy do wyceny w podanej kolejności (None - wszystkie wiersze)
+        on_row: Funkcja on_row(i, result_dict, preview_row) wołana po każdym wierszu
+                zamiast dopisywania wiersza do podglądu
+        export: Czy wygenerować plik Excel z wynikami
+        checkpoint_id: Przestrzeń checkpointów wierszy (None - job_id)
+        refined_checkpoint_id: Checkpointy dokładnej wyceny sprawdzane przed własnymi -
+                               wiersze już wycenione przez PTV nie są szacowane ponownie
+        margin_matrix: Macierz marży zadania (None - aktywna macierz)
     """
     # Pobierz dane sesji jeśli podano session_id
     if session_id:
@@ -2840,17 +3514,20 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
         session_id_short = "LEGACY"
     
     results = []
+    rows = None if rows is None else list(rows)
+    row_count = len(df) if rows is None else len(rows)
 
     # Inicjalizacja danych sesji
+    check_session_job(user_data, job_id)
     if user_data:
-        user_data.total_rows = len(df)
+        user_data.total_rows = row_count
         user_data.progress = 0
-        user_data.preview_data['total_count'] = user_data.total_rows
+        user_data.preview_data['total_count'] = len(df)
     else:
         # Legacy mode - użyj globalnych zmiennych
         global PROGRESS, TOTAL_ROWS, PREVIEW_DATA, CURRENT_ROW, GEOCODING_TOTAL, RESULT_EXCEL
         with progress_lock:
-            TOTAL_ROWS = len(df)
+            TOTAL_ROWS = row_count
             PROGRESS = 0
             PREVIEW_DATA = {
                 'headers': [
@@ -2877,7 +3554,7 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
                     'Transit time (dni)'
                 ],
                 'rows': [],
-                'total_count': TOTAL_ROWS
+                'total_count': len(df)
             }
 
     # Przypisanie nazw kolumn - obsługa różnych formatów
@@ -2894,7 +3571,7 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
             'Kraj rozladunku', 'Kod rozładunku', 'Miasto rozładunku',
             'transit time'
         ]
-        print(f"Nowy format pliku - {len(df.columns)} kolumn z 'Punkty_posrednie' i 'transit time'")
+        logger.debug("Nowy format pliku - %s kolumn z 'Punkty_posrednie' i 'transit time'", len(df.columns))
     elif len(df.columns) == 7:
         # Stary format: 6 podstawowych + transit time
         df.columns = [
@@ -2902,33 +3579,114 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
             'Kraj rozladunku', 'Kod rozładunku', 'Miasto rozładunku',
             'transit time'
         ]
-        print(f"Standardowy format pliku - {len(df.columns)} kolumn z 'transit time'")
+        logger.debug("Standardowy format pliku - %s kolumn z 'transit time'", len(df.columns))
     elif len(df.columns) == 6:
         # Stary format - tylko 6 kolumn bez transit time
         df.columns = [
             'Kraj zaladunku', 'Kod zaladunku', 'Miasto zaladunku',
             'Kraj rozladunku', 'Kod rozładunku', 'Miasto rozładunku'
         ]
-        print(f"Stary format pliku - {len(df.columns)} kolumn bez 'transit time'")
+        logger.debug("Stary format pliku - %s kolumn bez 'transit time'", len(df.columns))
     else:
-        print(f"UWAGA: Nieoczekiwana liczba kolumn: {len(df.columns)}")
+        logger.warning("UWAGA: Nieoczekiwana liczba kolumn: %s", len(df.columns))
         # Fallback - przypisz co się da
         expected_columns_base = ['Kraj zaladunku', 'Kod zaladunku', 'Miasto zaladunku',
                                  'Kraj rozladunku', 'Kod rozładunku', 'Miasto rozładunku']
         df.columns = expected_columns_base[:len(df.columns)]
     
-    print(f"Nazwy kolumn: {list(df.columns)}")
+    logger.debug("Nazwy kolumn: %s", list(df.columns))
+    selected = df if rows is None else df.iloc[rows]
+
+    # Checkpointy wierszy - wznowione zadanie pomija wiersze już wycenione
+    checkpoint = JobCheckpoint(checkpoint_store, checkpoint_id or job_id)
+    refined_checkpoint = JobCheckpoint(checkpoint_store, refined_checkpoint_id) if refined_checkpoint_id else None
+
+    def publish_row(i, result_row, preview_row):
+        """Dodaje wynik wiersza i przekazuje podgląd do on_row lub na koniec podglądu."""
+        results.append(result_row)
+        if user_data is not None and not is_session_job(user_data, job_id):
+            return
+        if on_row is not None:
+            on_row(i, result_row, preview_row)
+            return
+        preview_rows = user_data.preview_data['rows'] if user_data else PREVIEW_DATA['rows']
+        preview_rows.append(preview_row)
+        if len(preview_rows) > 1000:
+            preview_rows.pop(0)
+
+    # Szybka wycena korzysta ze współczynników objazdu i stawek opłat z aktualnego cache tras
+    if mode == PRICING_MODE_ESTIMATE:
+        refit_estimate_models()
+
+    # Macierz marży ustalana raz na cały przetarg - jej plik trafia do odcisków wierszy
+    if margin_matrix is None:
+        margin_matrix = get_active_margin_matrix()
+    matrix_file = margin_matrix.source if margin_matrix is not None else CURRENT_MATRIX_FILE
+
+    # Deduplikacja relacji - wiersze o identycznych danych (załadunek, rozładunek, punkty pośrednie,
+    # transit time) wyceniane są raz, a wynik pierwszego wystąpienia kopiowany jest do pozostałych
+    fingerprints = [
+        row_fingerprint(values, fuel_cost, driver_cost, matrix_file, mode) for values in selected.values
+    ]
+    unique_lanes = len(set(fingerprints))
+    if rows is None and fingerprints:
+        dedupe_ratio = round(1 - unique_lanes / len(fingerprints), 4)
+        metrics.set_gauge('tender_rows', len(fingerprints), job_id=job_id)
+        metrics.set_gauge('tender_unique_lanes', unique_lanes, job_id=job_id)
+        metrics.set_gauge('lane_dedupe_ratio', dedupe_ratio, job_id=job_id)
+        logger.info(f"[{session_id_short}] {len(fingerprints)} wierszy, {unique_lanes} unikalnych relacji "
+                    f"(duplikaty: {dedupe_ratio:.1%})")
+    # Regiony wierszy i marże unikalnych par regionów - macierz marży indeksowana raz na przetarg
+    row_regions = [
+        (get_region(normalize_country(lc), lp), get_region(normalize_country(uc), up))
+        for lc, lp, uc, up in selected[
+            ["Kraj zaladunku", "Kod zaladunku", "Kraj rozladunku", "Kod rozładunku"]
+        ].itertuples(index=False)
+    ]
+    route_margins = get_route_margins(row_regions, margin_matrix)
+
+    # Odciski, pod którymi etap dokładnej wyceny zapisał swoje checkpointy
+    refined_fingerprints = [
+        row_fingerprint(values, fuel_cost, driver_cost, matrix_file, PRICING_MODE_PRECISE)
+        for values in selected.values
+    ] if refined_checkpoint is not None else []
+    # odcisk wiersza -> (wynik, podgląd) wycenionej relacji
+    priced_lanes = {}
+
+    for row_number, (i, row) in enumerate(selected.iterrows(), start=1):
+        # Anulowanie i limit zapytań PTV sprawdzamy poza blokiem try - nie mogą trafić do wiersza z błędem
+        job_queue.check_cancelled(job_id)
+        check_session_job(user_data, job_id)
+        api_usage.check_job_limit(job_id)
+
+        fingerprint = fingerprints[row_number - 1]
+        saved_row = None
+        if refined_checkpoint is not None:
+            saved_row = refined_checkpoint.restore(i, refined_fingerprints[row_number - 1])
+            if saved_row is not None:
+                saved_row.result["Wycena trasy"] = saved_row.preview['Wycena trasy'] = 'PTV'
+        if saved_row is None:
+            saved_row = checkpoint.restore(i, fingerprint)
+        if saved_row is not None:
+            lane_row = priced_lanes.setdefault(fingerprint, (saved_row.result, saved_row.preview))
+        else:
+            lane_row = priced_lanes.get(fingerprint)
+        if lane_row is not None:
+            if user_data:
+                user_data.current_row = row_number
+                user_data.progress = int((user_data.current_row / user_data.total_rows) * 100)
+            publish_row(i, dict(lane_row[0]), dict(lane_row[1]))
+            continue
 
-    for i, row in df.iterrows():
         try:
             # Aktualizacja postępu
             if user_data:
-                user_data.current_row = i + 1
+                user_data.current_row = row_number
                 user_data.progress = int((user_data.current_row / user_data.total_rows) * 100)
             else:
                 # Legacy mode
                 with progress_lock:
-                    CURRENT_ROW = i + 1
+                    CURRENT_ROW = row_number
                     PROGRESS = int((CURRENT_ROW / TOTAL_ROWS) * 100)
             
             lc = normalize_country(row["Kraj zaladunku"])
@@ -2939,8 +3697,11 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
             uc_city = row["Miasto rozładunku"]
 
             # Weryfikacja lokalizacji
-            verify_load = verify_city_postal_code_match(lc, lp, lc_city)
-            verify_unload = verify_city_postal_code_match(uc, up, uc_city)
+            with metrics.span('verification'):
+                verify_load = verify_city_postal_code_match(lc, lp, lc_city)
+                verify_unload = verify_city_postal_code_match(uc, up, uc_city)
+
+            route_result = None
 
             # ========== NOWE: Parsuj punkty pośrednie z Excel ==========
             waypoints = parse_waypoints_from_excel_row(row)
@@ -2959,10 +3720,19 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
                 )
                 
                 # Użyj nowej funkcji dla tras z waypoints
-                route_result_wp = calculate_multi_waypoint_route(route_req)
+                if mode == PRICING_MODE_ESTIMATE:
+                    route_result_wp = estimate_multi_waypoint_route(route_req)
+                else:
+                    route_result_wp = calculate_multi_waypoint_route(route_req)
+                # Link do mapy korzysta z route_result jak w trasie bez punktów pośrednich
+                route_result = route_result_wp
                 
                 if route_result_wp['success']:
                     dist_ptv = route_result_wp['distance']
+                    total_distance_km = route_result_wp['total_distance_km']
+                    road_distance_km = route_result_wp['road_distance_km']
+                    ferry_distance_km = route_result_wp['ferry_distance_km']
+                    ferry_segments = route_result_wp['ferry_segments']
                     polyline = route_result_wp['polyline']
                     road_toll = route_result_wp['road_toll']
                     other_toll = route_result_wp['other_toll']
@@ -2973,6 +3743,10 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
                     # Geokodowanie się nie powiodło
                     logger.warning(f"[{session_id_short}] Wiersz {i}: Błąd waypoints - {route_result_wp.get('error_message')}")
                     dist_ptv = None
+                    total_distance_km = None
+                    road_distance_km = None
+                    ferry_distance_km = 0
+                    ferry_segments = []
                     polyline = ''
                     road_toll = 0
                     other_toll = 0
@@ -3009,9 +3783,14 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
                     loading_country_code = COUNTRY_TO_ISO.get(lc.upper()) if lc else None
                     unloading_country_code = COUNTRY_TO_ISO.get(uc.upper()) if uc else None
                     
-                    route_result = get_route_distance(coords_zl[:2], coords_roz[:2], 
-                                              loading_country=loading_country_code, unloading_country=unloading_country_code,
-                                              avoid_switzerland=False, avoid_serbia=True, routing_mode=DEFAULT_ROUTING_MODE)
+                    if mode == PRICING_MODE_ESTIMATE:
+                        route_result = estimate_route_distance(coords_zl[:2], coords_roz[:2],
+                                                               loading_country=loading_country_code,
+                                                               unloading_country=unloading_country_code)
+                    else:
+                        route_result = get_route_distance(coords_zl[:2], coords_roz[:2], 
+                                                  loading_country=loading_country_code, unloading_country=unloading_country_code,
+                                                  avoid_switzerland=False, avoid_serbia=True, routing_mode=DEFAULT_ROUTING_MODE)
                     if isinstance(route_result, dict):
                         dist_ptv = route_result.get('distance')  # Zgodność wsteczna
                         total_distance_km = route_result.get('total_distance_km', dist_ptv)
@@ -3052,7 +3831,9 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
             # Tworzenie linku do mapy
             if coords_zl and coords_roz and None not in coords_zl[:2] and None not in coords_roz[:2] and polyline:
                 ferry_ports = route_result.get('ferry_ports') if isinstance(route_result, dict) else None
-                map_link = create_google_maps_link(coords_zl[:2], coords_roz[:2], polyline, ferry_ports=ferry_ports)
+                simplified_polyline = route_result.get('simplified_polyline') if isinstance(route_result, dict) else None
+                map_link = create_google_maps_link(coords_zl[:2], coords_roz[:2], polyline, ferry_ports=ferry_ports,
+                                                   simplified_polyline=simplified_polyline)
             else:
                 if coords_zl and coords_roz and None not in coords_zl[:2] and None not in coords_roz[:2]:
                     # Jeśli mamy współrzędne, ale nie mamy polyline, stwórz prosty link
@@ -3069,23 +3850,26 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
             if transit_time_from_file is not None:
                 # Użyj wartości z pliku
                 driver_days = transit_time_from_file
-                print(f"Wiersz {i+1}: Użyto transit time z pliku: {driver_days} dni")
+                logger.debug("Wiersz %s: Użyto transit time z pliku: %s dni", i+1, driver_days)
             else:
                 # Oblicz standardowo na podstawie CAŁKOWITEGO dystansu (z promem)
                 driver_days = calculate_driver_days(total_distance_km)
                 if 'transit time' in row.index:
-                    print(f"Wiersz {i+1}: Kolumna transit time pusta - obliczono z dystansu: {driver_days} dni")
+                    logger.debug("Wiersz %s: Kolumna transit time pusta - obliczono z dystansu: %s dni", i+1, driver_days)
                 else:
-                    print(f"Wiersz {i+1}: Brak kolumny transit time - obliczono z dystansu: {driver_days} dni")
+                    logger.debug("Wiersz %s: Brak kolumny transit time - obliczono z dystansu: %s dni", i+1, driver_days)
 
             driver_cost_value = driver_days * driver_cost if driver_days is not None else None
 
-            # Pobierz standardowe stawki
-            rates = get_all_rates(lc, lp, uc, up, coords_zl, coords_roz)
+            with metrics.span('rate_lookup'):
+                # Pobierz standardowe stawki
+                rates = get_all_rates(lc, lp, uc, up, coords_zl, coords_roz)
 
-            # Pobierz stawki bazujące na regionach
-            region_rates = get_region_based_rates(lc, lp, uc, up)
+                # Pobierz stawki bazujące na regionach
+                region_rates = get_region_based_rates(lc, lp, uc, up)
 
+            # Wycena: podlot/odjazd, koszty, marża i frachty (do wyliczenia sumy kosztów)
+            pricing_span = metrics.span('pricing')
             # Zmiana: podlot jest już bezpośrednio dostępny z historycznych danych z fallbackiem do regionów
             podlot, podlot_source = get_podlot(rates, region_rates)
             
@@ -3101,21 +3885,20 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
             # Obliczenie całkowitego kosztu podlotu (opłaty drogowe + paliwo)
             # Stawka: 0.30 EUR/km (opłaty) + fuel_cost EUR/km (paliwo)
             oplaty_drogowe_podlot = calculate_podlot_toll(podlot, fuel_cost_per_km=fuel_cost)
-            print(f"Koszt podlotu: {podlot} km × (0.30 + {fuel_cost}) EUR/km = {oplaty_drogowe_podlot} EUR")
+            logger.debug("Koszt podlotu: %s km × (0.30 + %s) EUR/km = %s EUR", podlot, fuel_cost, oplaty_drogowe_podlot)
             
             # Obliczenie całkowitego kosztu odjazdu (opłaty drogowe + paliwo)
             oplaty_drogowe_odjazd = calculate_odjazd_toll(odjazd, fuel_cost_per_km=fuel_cost)
-            print(f"Koszt odjazdu: {odjazd} km × (0.30 + {fuel_cost}) EUR/km = {oplaty_drogowe_odjazd} EUR")
+            logger.debug("Koszt odjazdu: %s km × (0.30 + %s) EUR/km = %s EUR", odjazd, fuel_cost, oplaty_drogowe_odjazd)
 
             suma_kosztow = calculate_total_costs([road_toll, fuel_cost_value, driver_cost_value, oplaty_drogowe_podlot, oplaty_drogowe_odjazd, other_toll])
 
-            # Pobierz regiony dla obliczenia oczekiwanego zysku
-            loading_region = get_region(lc, lp)
-            unloading_region = get_region(uc, up)
+            # Regiony i marża relacji wyznaczone dla całego przetargu przed pętlą
+            loading_region, unloading_region = row_regions[row_number - 1]
             
             # Oblicz oczekiwany zysk na podstawie macierzy marży
             expected_profit, unit_margin, margin_source = calculate_expected_profit(
-                loading_region, unloading_region, driver_days
+                loading_region, unloading_region, driver_days, margin_matrix, route_margins
             )
             
             # Oblicz sumę kosztów bez podlotu i odjazdu
@@ -3177,30 +3960,19 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
 
             # Przygotuj informacje o opłatach drogowych dla poszczególnych krajów
             # Przygotuj tekst z opisem opłat drogowych
-            print(f"\nDEBUG special_systems dla wiersza {i+1}: {special_systems}")
-            print(f"DEBUG other_toll dla wiersza {i+1}: {other_toll}")
             toll_text = format_toll_details(toll_details, road_toll, other_toll, special_systems)
-            print(f"DEBUG toll_text dla wiersza {i+1}: {toll_text}")
 
             # Oblicz koszt opłat na kilometr (tylko standardowe opłaty drogowe)
             toll_per_km = calculate_toll_per_km(road_toll, total_distance_km)
-            print(f"\nDEBUG - Wartości przed sumowaniem dla wiersza:")
-            print(f"fuel_cost_value: {fuel_cost_value} ({type(fuel_cost_value).__name__})")
-            print(f"driver_cost_value: {driver_cost_value} ({type(driver_cost_value).__name__})")
-            print(f"road_toll: {road_toll} ({type(road_toll).__name__})")
-            print(f"other_toll: {other_toll} ({type(other_toll).__name__})")
-            print(f"oplaty_drogowe_podlot: {oplaty_drogowe_podlot} ({type(oplaty_drogowe_podlot)})")
-    
-            # Oblicz sumę kosztów (dodaj opłaty specjalne)
-            print("\nDEBUG - Wartości kosztów:")
-            print(f"fuel_cost_value: {fuel_cost_value} ({type(fuel_cost_value).__name__})")
-            print(f"driver_cost_value: {driver_cost_value} ({type(driver_cost_value).__name__})")
-            print(f"road_toll: {road_toll} ({type(road_toll).__name__})")
-            print(f"other_toll: {other_toll} ({type(other_toll).__name__})")
-            print(f"oplaty_drogowe_podlot: {oplaty_drogowe_podlot} ({type(oplaty_drogowe_podlot).__name__})")
-            print(f"oplaty_drogowe_odjazd: {oplaty_drogowe_odjazd} ({type(oplaty_drogowe_odjazd).__name__})")
+            logger.debug(
+                "[%s] Wiersz %d - koszty: paliwo=%s, kierowca=%s, opłaty drogowe=%s, opłaty specjalne=%s, "
+                "podlot=%s, odjazd=%s, systemy specjalne=%s",
+                session_id_short, i + 1, fuel_cost_value, driver_cost_value, road_toll, other_toll,
+                oplaty_drogowe_podlot, oplaty_drogowe_odjazd, special_systems
+            )
             
             suma_kosztow = calculate_total_costs([fuel_cost_value, driver_cost_value, road_toll, other_toll, oplaty_drogowe_podlot, oplaty_drogowe_odjazd])
+            pricing_span.stop()
 
             # Tworzenie preview_row dla udanego przetwarzania
             # Konwertuj wartości NaN na None przed utworzeniem słownika
@@ -3240,17 +4012,6 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
                 'Transit time (dni)': driver_days
             }
 
-            # Dodawanie do podglądu niezależnie od tego czy był błąd czy nie
-            if user_data:
-                user_data.preview_data['rows'].append(preview_row)
-                if len(user_data.preview_data['rows']) > 1000:
-                    user_data.preview_data['rows'].pop(0)
-            else:
-                # Legacy mode
-                PREVIEW_DATA['rows'].append(preview_row)
-                if len(PREVIEW_DATA['rows']) > 1000:
-                    PREVIEW_DATA['rows'].pop(0)
-
             # Przygotuj wyniki z dodanymi kolumnami regionalnymi
             result_dict = {
                 "Kraj zaladunku": None if pd.isna(lc) else str(lc),
@@ -3330,7 +4091,18 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
                 "Źródło marży": margin_source
             }
 
-            results.append(result_dict)
+            # Tryb szybkiej wyceny - wiersze z szacowaną trasą do dokładnej wyceny wybranych relacji
+            if mode == PRICING_MODE_ESTIMATE:
+                result_dict["Wycena trasy"] = preview_row['Wycena trasy'] = describe_route_source(route_result)
+
+            # Dodawanie do wyników i podglądu niezależnie od tego czy był błąd czy nie
+            publish_row(i, result_dict, preview_row)
+
+            # Zapisz wynik - wiersze bez wyznaczonej trasy zostaną ponowione przy wznowieniu
+            # (i wycenione ponownie przy kolejnym wystąpieniu relacji)
+            if road_distance_km is not None:
+                checkpoint.save(i, fingerprint, result_dict, preview_row)
+                priced_lanes[fingerprint] = (result_dict, preview_row)
 
         except Exception as e:
             current_row_num = user_data.current_row if user_data else (CURRENT_ROW if 'CURRENT_ROW' in globals() else i+1)
@@ -3351,7 +4123,6 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
                "Miasto rozładunku": uc_city,
                "Błąd przetwarzania": str(e)
             }
-            results.append(basic_result)
             
             # Dodanie wiersza do podglądu z informacją o błędzie
             preview_row = {
@@ -3383,225 +4154,29 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
                 'Oczekiwany zysk': None,
                 'Transit time (dni)': None
             }
-            
-            # Dodawanie do podglądu niezależnie od tego czy był błąd czy nie
-            if user_data:
-                user_data.preview_data['rows'].append(preview_row)
-                if len(user_data.preview_data['rows']) > 1000:
-                    user_data.preview_data['rows'].pop(0)
-            else:
-                # Legacy mode
-                PREVIEW_DATA['rows'].append(preview_row)
-                if len(PREVIEW_DATA['rows']) > 1000:
-                    PREVIEW_DATA['rows'].pop(0)
+            publish_row(i, basic_result, preview_row)
 
         finally:
             pass
 
     # Log końcowy przetwarzania
+    restored_count = checkpoint.restored_count + (refined_checkpoint.restored_count if refined_checkpoint else 0)
+    if restored_count:
+        logger.info(f"[{session_id_short}] Odtworzono {restored_count} wierszy z checkpointów")
     if user_data:
         logger.info(f"[{session_id_short}] Przetworzono {user_data.current_row} z {user_data.total_rows} wierszy")
     else:
-        print(f"\nPrzetworzono {CURRENT_ROW} z {TOTAL_ROWS} wierszy")
+        logger.debug("Przetworzono %s z %s wierszy", CURRENT_ROW, TOTAL_ROWS)
     
-    print("\nGenerowanie pliku Excel...")
-    try:
-        # Tworzenie DataFrame z wyników
-        result_df = pd.DataFrame(results)
-        
-        # Usuń ukrytą kolumnę przed zapisaniem do Excela
-        if '_original_map_link' in result_df.columns:
-            # Zapisz wartości do zmiennej tymczasowej, aby można było ich użyć później
-            original_map_links = result_df['_original_map_link'].copy()
-            # Usuń kolumnę z DataFrame
-            result_df = result_df.drop(columns=['_original_map_link'])
-        else:
-            original_map_links = None
-        
-        # Zapisz do bufora w pamięci
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            result_df.to_excel(writer, index=False, sheet_name='Wycena')
-            
-            # Pobierz worksheet do formatowania
-            worksheet = writer.sheets['Wycena']
-            
-            # Funkcja do konwersji numeru kolumny na nazwę kolumny Excel
-            def get_column_letter(n):
-                string = ""
-                while n > 0:
-                    n, remainder = divmod(n - 1, 26)
-                    string = chr(65 + remainder) + string
-                return string
-
-            # Definicje kolorów dla różnych typów kolumn
-            COLORS = {
-                'podstawowe': 'E6E6E6',  # Szary
-                'geokodowanie': 'FFE699',  # Jasny żółty
-                'dystans': 'BDD7EE',  # Jasny niebieski
-                'gielda': 'C6E0B4',  # Jasny zielony
-                'klient': 'F8CBAD',  # Jasny pomarańczowy
-                'koszty': 'D9D9D9',  # Jaśniejszy szary
-                'region': 'E2EFDA',  # Bardzo jasny zielony
-                'weryfikacja': 'FCE4D6',  # Bardzo jasny pomarańczowy
-                'marza': 'FFD700'  # Złoty dla kolumn z marżą
-            }
+    if not export:
+        return results
 
-            # Dynamiczne mapowanie kolumn do typów na podstawie nazw
-            # Tworzymy słownik nazwa_kolumny -> indeks (1-based)
-            column_name_to_idx = {col: idx+1 for idx, col in enumerate(result_df.columns)}
-            
-            # Definicje grup kolumn po nazwach
-            COLUMN_GROUPS = {
-                'podstawowe': ['Kraj zaladunku', 'Kod zaladunku', 'Miasto zaladunku', 'Region załadunku', 
-                              'Współrzędne zaladunku', 'Kraj rozladunku', 'Kod rozładunku', 'Miasto rozładunku',
-                              'Region rozładunku', 'Współrzędne rozładunku'],
-                'dystans': ['km PTV (tylko ładowne)', 'km całkowite z podlotem i odjazdem', 'podlot', 'odjazd',
-                           'km w linii prostej'],
-                'gielda': ['Dopasowanie giełda', 'Giełda stawka 3m', 'Giełda stawka 6m', 'Giełda stawka 12m',
-                          'Giełda fracht 3m', 'Giełda sugerowany fracht/km (z promem)', 
-                          'Giełda sugerowany fracht/km z podlotem i odjazdem'],
-                'klient': ['Dopasowanie klient', 'Klient stawka 3m', 'Klient stawka 6m', 'Klient stawka 12m',
-                          'Klient fracht 3m', 'Klient sugerowany fracht/km (z promem)',
-                          'Klient sugerowany fracht/km z podlotem i odjazdem', 'Suma kosztów (bez podlotu i odjazdu)',
-                          'Stawka minimalna (€/km)'],
-                'koszty': ['Koszt paliwa', 'Koszt kierowcy + leasing', 'Opłaty drogowe', 'Opłaty specjalne',
-                          'Koszt podlotu (opłaty + paliwo)', 'Koszt odjazdu (opłaty + paliwo)', 
-                          'Opłaty drogowe/km', 'Suma kosztów'],
-                'region': ['Region - Dopasowanie giełda', 'Region - Giełda stawka 3m', 'Region - Giełda stawka 6m',
-                          'Region - Giełda stawka 12m', 'Region - Dopasowanie klient', 'Region - Klient stawka 3m',
-                          'Region - Klient stawka 6m', 'Region - Klient stawka 12m', 'Region - Podlot (km)'],
-                'weryfikacja': ['Weryfikacja załadunku - miasto', 'Weryfikacja załadunku - kod pocztowy',
-                               'Weryfikacja załadunku - współrzędne miasta', 'Weryfikacja załadunku - współrzędne kodu',
-                               'Weryfikacja załadunku - odległość (km)', 'Weryfikacja załadunku - poprawna',
-                               'Weryfikacja rozładunku - miasto', 'Weryfikacja rozładunku - kod pocztowy',
-                               'Weryfikacja rozładunku - współrzędne miasta', 'Weryfikacja rozładunku - współrzędne kodu',
-                               'Weryfikacja rozładunku - odległość (km)', 'Weryfikacja rozładunku - poprawna',
-                               'Uwagi do geokodowania'],
-                'marza': ['Oczekiwany zysk', 'Źródło marży'],
-                'geokodowanie': ['Jakość geokodowania (zał.)', 'Źródło geokodowania (zał.)',
-                                'Jakość geokodowania (rozł.)', 'Źródło geokodowania (rozł.)']
-            }
-            
-            # Konwertuj nazwy kolumn na indeksy
-            COLUMN_TYPES = {}
-            for group_name, column_names in COLUMN_GROUPS.items():
-                COLUMN_TYPES[group_name] = [column_name_to_idx[col] for col in column_names if col in column_name_to_idx]
-            
-            # Zamień długie linki do map na krótki tekst "Mapa" przed ustawieniem szerokości kolumn
-            if "Link do mapy" in result_df.columns:
-                # Dodajemy więcej informacji diagnostycznych
-                print(f"Zamieniam linki na tekst 'Mapa'. Liczba linków do zamiany: {result_df['Link do mapy'].str.startswith('http', na=False).sum()}")
-                # Nie musimy już tworzyć tymczasowej kolumny, bo mamy już _original_map_link
-                # Upewnij się, że wszystkie linki są zamienione na "Mapa"
-                result_df.loc[result_df['Link do mapy'].str.startswith('http', na=False), 'Link do mapy'] = "Mapa"
-                print(f"Po zamianie, liczba komórek z tekstem 'Mapa': {(result_df['Link do mapy'] == 'Mapa').sum()}")
-                
-            # Ustaw szerokość kolumn i formatowanie
-            for idx, col in enumerate(result_df.columns, start=1):
-                column_letter = get_column_letter(idx)
-                
-                # Ustaw szerokość
-                max_length = max(
-                    result_df.iloc[:, idx-1].astype(str).apply(len).max(),
-                    len(str(col))
-                )
-                adjusted_width = min(max(max_length + 2, 10), 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-
-                # Ustaw kolor tła dla całej kolumny
-                for col_type, columns in COLUMN_TYPES.items():
-                    if idx in columns:
-                        for cell in worksheet[column_letter]:
-                            cell.fill = openpyxl.styles.PatternFill(
-                                start_color=COLORS[col_type],
-                                end_color=COLORS[col_type],
-                                fill_type='solid'
-                            )
-            
-            # Formatowanie nagłówków
-            for cell in worksheet[1]:
-                cell.font = openpyxl.styles.Font(bold=True)
-                cell.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center', wrap_text=True)
-            
-            # Dynamiczne mapowanie kolumn formatowania na podstawie nazw
-            distance_column_names = ['km PTV (tylko ładowne)', 'km całkowite z podlotem i odjazdem', 'podlot', 'odjazd',
-                                    'km w linii prostej', 'Weryfikacja załadunku - odległość (km)', 
-                                    'Weryfikacja rozładunku - odległość (km)', 'Region - Podlot (km)']
-            currency_column_names = ['Suma kosztów (bez podlotu i odjazdu)', 'Stawka minimalna (€/km)',
-                                    'Klient sugerowany fracht/km z podlotem i odjazdem',
-                                    'Giełda sugerowany fracht/km z podlotem i odjazdem', 'Koszt paliwa', 
-                                    'Koszt kierowcy + leasing', 'Opłaty drogowe', 'Opłaty specjalne',
-                                    'Koszt podlotu (opłaty + paliwo)', 'Koszt odjazdu (opłaty + paliwo)', 
-                                    'Opłaty drogowe/km', 'Suma kosztów',
-                                    'Giełda stawka 3m', 'Giełda stawka 6m', 'Giełda stawka 12m', 'Giełda fracht 3m',
-                                    'Giełda sugerowany fracht/km (z promem)',
-                                    'Klient stawka 3m', 'Klient stawka 6m', 'Klient stawka 12m', 'Klient fracht 3m',
-                                    'Klient sugerowany fracht/km (z promem)',
-                                    'Region - Giełda stawka 3m', 'Region - Giełda stawka 6m', 'Region - Giełda stawka 12m',
-                                    'Region - Klient stawka 3m', 'Region - Klient stawka 6m', 'Region - Klient stawka 12m',
-                                    'Oczekiwany zysk']
-            
-            distance_columns = [column_name_to_idx[col] for col in distance_column_names if col in column_name_to_idx]
-            currency_columns = [column_name_to_idx[col] for col in currency_column_names if col in column_name_to_idx]
-            
-            # Formatowanie komórek z danymi
-            for row_idx, row in enumerate(worksheet.iter_rows(min_row=2)):
-                for cell in row:
-                    cell.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center')
-                    
-                    # Formatowanie liczb
-                    if isinstance(cell.value, (int, float)):
-                        if cell.column in distance_columns:  # Kolumny z kilometrami
-                            cell.number_format = '#,##0'
-                        elif cell.column in currency_columns:  # Kolumny z walutą
-                            cell.number_format = '#,##0.00 €'
-                        else:  # Pozostałe kolumny liczbowe
-                            cell.number_format = '#,##0'
-                    
-                    # Dodaj hiperłącza do komórek z tekstem "Mapa" lub linkami
-                    # Dynamiczne wyszukiwanie kolumny "Link do mapy" po nazwie
-                    column_name = list(result_df.columns)[cell.column-1] if cell.column <= len(result_df.columns) else None
-                    if column_name == "Link do mapy":
-                        # Sprawdź czy komórka zawiera link lub tekst "Mapa"
-                        if cell.value == "Mapa" and original_map_links is not None:
-                            # Pobierz oryginalny link z zapisanej zmiennej
-                            original_link = original_map_links.iloc[row_idx] if row_idx < len(original_map_links) else None
-                            if isinstance(original_link, str) and original_link.startswith('http'):
-                                # Dodaj hiperłącze
-                                cell.hyperlink = original_link
-                                # Ustaw styl hiperłącza
-                                cell.font = openpyxl.styles.Font(color="0000FF", underline="single")
-                        # Dodatkowe sprawdzenie dla linków, które nie zostały zamienione
-                        elif isinstance(cell.value, str) and cell.value.startswith('http'):
-                            # Zapisz oryginalny link
-                            link_url = cell.value
-                            # Zamień wartość komórki na krótki tekst
-                            cell.value = "Mapa"
-                            # Dodaj hiperłącze
-                            cell.hyperlink = link_url
-                            # Ustaw styl hiperłącza
-                            cell.font = openpyxl.styles.Font(color="0000FF", underline="single")
-                            print(f"Zamieniono link na 'Mapa' w komórce Excel (wiersz {row_idx+1}, kolumna {cell.column})")
-            
-            # Dodaj obramowanie do wszystkich komórek
-            thin_border = openpyxl.styles.Border(
-                left=openpyxl.styles.Side(style='thin'),
-                right=openpyxl.styles.Side(style='thin'),
-                top=openpyxl.styles.Side(style='thin'),
-                bottom=openpyxl.styles.Side(style='thin')
-            )
-            
-            for row in worksheet.iter_rows():
-                for cell in row:
-                    cell.border = thin_border
-            
-            # Zamrożenie pierwszego wiersza
-            worksheet.freeze_panes = 'A2'
-        
-        # Pobierz zawartość bufora
-        excel_buffer.seek(0)
-        excel_data = excel_buffer.getvalue()
+    check_session_job(user_data, job_id)
+    logger.debug("Generowanie pliku Excel...")
+    export_span = metrics.span('excel_export')
+    try:
+        excel_data = build_result_excel(results)
+        export_span.stop()
         
         # Aktualizuj dane sesji lub zmienną globalną
         if user_data:
@@ -3610,7 +4185,7 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
         else:
             # Legacy mode
             with progress_lock:
-                print(f"[process_przetargi] Ustawiam RESULT_EXCEL, rozmiar danych: {len(excel_data)} bajtów")
+                logger.debug("[process_przetargi] Ustawiam RESULT_EXCEL, rozmiar danych: %s bajtów", len(excel_data))
                 RESULT_EXCEL = excel_data
         
         logger.info(f"[{session_id_short}] Plik Excel został wygenerowany pomyślnie")
@@ -3618,25 +4193,141 @@ def process_przetargi(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVE
     except Exception as e:
         logger.error(f"[{session_id_short}] Błąd podczas generowania pliku Excel: {e}", exc_info=True)
         if user_data:
-            user_data.result_excel = None
-            user_data.progress = -1
+            if is_session_job(user_data, job_id):
+                user_data.result_excel = None
+                user_data.progress = -1
         else:
             # Legacy mode
             with progress_lock:
-                print("[process_przetargi] Błąd, ustawiam RESULT_EXCEL=None")
+                logger.error("[process_przetargi] Błąd, ustawiam RESULT_EXCEL=None")
                 RESULT_EXCEL = None
                 PROGRESS = -1
 
     return results
 
 
+
+def process_przetargi_two_phase(df, fuel_cost=DEFAULT_FUEL_COST, driver_cost=DEFAULT_DRIVER_COST, session_id=None,
+                                job_id=None, margin_matrix=None):
+    """
+    Wycena dwuetapowa (tryb 'two_phase').
+
+    Etap 1: cały przetarg wyceniany jest szybko (trasy z cache albo szacunek) - plik
+    wynikowy i podgląd są dostępne od razu, a przetwarzanie oznaczane jest jako
+    zakończone z flagą user_data.refining.
+    Etap 2: wiersze z szacowaną trasą (najpierw te o niskiej pewności) wyceniane są
+    dokładnie przez PTV. Każdy dokładny wynik zastępuje szacunek w wynikach i podglądzie,
+    a plik Excel jest odbudowywany co TWO_PHASE_EXPORT_SECONDS sekund i na końcu.
+
+    Args:
+        df: DataFrame pandas z danymi do przetworzenia (znormalizowane nagłówki)
+        fuel_cost: Koszt paliwa EUR/km
+        driver_cost: Koszt kierowcy EUR/dzień
+        session_id: ID sesji użytkownika
+        job_id: ID zadania w kolejce
+        margin_matrix: Macierz marży zadania (None - aktywna macierz)
+
+    Returns:
+        Lista wyników wierszy (po doprecyzowaniu)
+    """
+    user_data = session_manager.get_session(session_id, create_if_missing=False) if session_id else None
+    if user_data is None:
+        # Bez sesji nie ma gdzie pokazać wstępnego wyniku - wycena jednoetapowa
+        return process_przetargi(df, fuel_cost, driver_cost, session_id=session_id, job_id=job_id,
+                                 margin_matrix=margin_matrix)
+    session_id_short = session_id[:8]
+
+    # process_przetargi nadpisuje nazwy kolumn - każdy etap dostaje własną kopię
+    df = df.reset_index(drop=True)
+    # Etapy zapisują checkpointy w osobnych przestrzeniach - etap 1 pomija wiersze
+    # wycenione już dokładnie, więc wznowienie nie powtarza zapytań PTV
+    precise_checkpoint_id = f"{job_id}:precise" if job_id else None
+    results = process_przetargi(df.copy(), fuel_cost, driver_cost, session_id=session_id, job_id=job_id,
+                                mode=PRICING_MODE_ESTIMATE, refined_checkpoint_id=precise_checkpoint_id,
+                                margin_matrix=margin_matrix)
+    if not results or user_data.result_excel is None:
+        return results
+
+    refine_rows = [
+        position for position, result_row in enumerate(results)
+        if str(result_row.get('Wycena trasy', '')).startswith('szacunek')
+    ]
+    # Najpierw szacunki o niskiej pewności - największa szansa na istotną zmianę ceny
+    refine_rows.sort(key=lambda position: results[position]['Wycena trasy'] == 'szacunek')
+    logger.info(f"[{session_id_short}] Wstępna wycena gotowa, {len(refine_rows)} wierszy do wyceny dokładnej")
+    if not refine_rows:
+        return results
+
+    check_session_job(user_data, job_id)
+    user_data.refining = True
+    user_data.processing_complete = True
+    preview_rows = user_data.preview_data['rows']
+    # Podgląd trzyma ostatnie wiersze etapu 1 - pozycja wiersza w podglądzie
+    preview_offset = len(results) - len(preview_rows)
+    last_export = time.time()
+
+    def publish_excel():
+        check_session_job(user_data, job_id)
+        with metrics.span('excel_export'):
+            user_data.result_excel = io.BytesIO(build_result_excel(results))
+
+    def merge_row(position, result_row, preview_row):
+        nonlocal last_export
+        # Dokładna wycena bez trasy (np. błąd PTV) nie zastępuje szacunku
+        if preview_row.get('Dystans (km)') is None:
+            return
+        result_row["Wycena trasy"] = preview_row['Wycena trasy'] = 'PTV'
+        results[position] = result_row
+        if position >= preview_offset:
+            preview_rows[position - preview_offset] = preview_row
+        if time.time() - last_export >= TWO_PHASE_EXPORT_SECONDS:
+            publish_excel()
+            last_export = time.time()
+
+    try:
+        process_przetargi(df.copy(), fuel_cost, driver_cost, session_id=session_id, job_id=job_id,
+                          mode=PRICING_MODE_PRECISE, rows=refine_rows, on_row=merge_row, export=False,
+                          checkpoint_id=precise_checkpoint_id, margin_matrix=margin_matrix)
+    except JobCancelledException:
+        raise
+    except Exception as e:
+        # Np. przekroczony limit zapytań PTV - użytkownik zachowuje wycenę wstępną z doprecyzowanymi wierszami
+        logger.warning(f"[{session_id_short}] Wycena dokładna przerwana: {e}")
+    finally:
+        if is_session_job(user_data, job_id):
+            user_data.refining = False
+
+    try:
+        publish_excel()
+    except JobCancelledException:
+        raise
+    except Exception as e:
+        logger.error(f"[{session_id_short}] Błąd podczas generowania pliku Excel: {e}", exc_info=True)
+    return results
+
+# Stawki opłat EUR/km według krajów i współczynniki objazdu par krajów wyliczane z tras w cache PTV
+# (szybka wycena bez zapytań o trasy - tryb 'estimate')
+toll_model = TollRateModel(min_samples=TOLL_MODEL_MIN_SAMPLES, max_cv=TOLL_MODEL_MAX_CV)
+detour_model = DetourFactorModel(min_samples=TOLL_MODEL_MIN_SAMPLES)
+quick_quote = QuickQuoteEstimator(detour_model, toll_model)
+
+
+def refit_estimate_models():
+    """Przelicza model stawek opłat i współczynniki objazdu z tras zapisanych w cache PTV."""
+    try:
+        quick_quote.refit(ptv_manager.cache_manager.route_endpoints())
+    except Exception as e:
+        logger.error(f"Błąd wyliczania modeli szybkiej wyceny: {e}", exc_info=True)
+
+
 def save_caches():
     try:
         geo_dict = {key: geo_cache[key] for key in geo_cache}
         route_dict = {key: route_cache[key] for key in route_cache}
         joblib.dump(geo_dict, 'geo_cache_backup.joblib')
         joblib.dump(route_dict, 'route_cache_backup.joblib')
-        print("Zapisano pamięć podręczną.")
+        saved_routes = ptv_manager.cache_manager.save_to_disk(PTV_ROUTE_CACHE_FILE)
+        print(f"Zapisano pamięć podręczną ({saved_routes} tras PTV).")
     except Exception as e:
         print(f"Błąd zapisywania pamięci podręcznej: {e}")
 
@@ -3653,6 +4344,10 @@ def load_caches():
             for k, v in route_cache_data.items():
                 route_cache[k] = v
             print(f"Wczytano {len(route_cache_data)} elementów route_cache.")
+        loaded_routes = ptv_manager.cache_manager.load_from_disk(PTV_ROUTE_CACHE_FILE)
+        if loaded_routes:
+            print(f"Wczytano {loaded_routes} tras PTV.")
+            refit_estimate_models()
     except Exception as e:
         print(f"Błąd wczytywania pamięci podręcznej: {e}")
 
@@ -3686,16 +4381,6 @@ app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['SESSION_REFRESH_EACH_REQUEST'] = True
 
-# Konfiguracja logowania
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
-
 # === DUPLIKACJA ZMIENNYCH GLOBALNYCH USUNIĘTA ===
 # Wszystkie dane sesji znajdują się teraz w SessionManager
 # === KONIEC ===
@@ -3731,6 +4416,19 @@ def get_user_session() -> UserSessionData:
     return session_manager.get_session(session_id)
 
 
+@app.before_request
+def bind_usage_session():
+    """Przypisuje zapytania PTV wykonywane w żądaniu do sesji użytkownika."""
+    g.usage_token = current_session_id.set(session.get('session_id'))
+
+
+@app.teardown_request
+def unbind_usage_session(exc=None):
+    token = g.pop('usage_token', None)
+    if token is not None:
+        current_session_id.reset(token)
+
+
 # Inicjalizacja i uruchomienie schedulera czyszczenia sesji
 cleanup_scheduler = SessionCleanupScheduler(session_manager, interval_hours=1)
 cleanup_scheduler.start()
@@ -3738,6 +4436,68 @@ cleanup_scheduler.start()
 # Zatrzymaj scheduler przy zamykaniu aplikacji
 atexit.register(lambda: cleanup_scheduler.stop())
 
+# Kolejka zadań przetwarzania przetargów - ograniczona pula wątków zamiast
+# osobnego wątku na każdy upload. Handler rejestrowany jest niżej, po
+# definicji background_processing; wątki startują w start_job_queue().
+job_queue = create_job_queue(
+    backend=JOB_QUEUE_BACKEND,
+    db_path=JOB_DB_PATH,
+    max_workers=JOB_WORKERS
+)
+atexit.register(lambda: job_queue.stop())
+
+# Wyniki wierszy zapisywane na bieżąco - wznowione zadanie pomija wycenione wiersze
+checkpoint_store = create_checkpoint_store(backend=JOB_QUEUE_BACKEND, db_path=CHECKPOINT_DB_PATH)
+
+
+def warm_route_cache_lane(lane):
+    """
+    Geokoduje relację historyczną i pobiera jej trasę do cache.
+
+    Parametry trasy są takie same jak przy wycenie wiersza bez punktów
+    pośrednich, więc wycena tej relacji trafi w cache.
+    """
+    lc = normalize_country(lane.loading_country)
+    uc = normalize_country(lane.unloading_country)
+    coords_zl = get_coordinates(lc, lane.loading_postal)
+    coords_roz = get_coordinates(uc, lane.unloading_postal)
+    if not coords_zl or not coords_roz or None in coords_zl[:2] or None in coords_roz[:2]:
+        return WARMUP_FAILED
+
+    loading_country_code = COUNTRY_TO_ISO.get(lc.upper()) if lc else None
+    unloading_country_code = COUNTRY_TO_ISO.get(uc.upper()) if uc else None
+    # Trasy do/z Szwajcarii i tak nie unikają Szwajcarii (get_route_distance)
+    if ptv_manager.cache_manager.contains(coords_zl[:2], coords_roz[:2], avoid_switzerland=False,
+                                          avoid_eurotunnel=True, routing_mode=DEFAULT_ROUTING_MODE,
+                                          avoid_serbia=True):
+        return WARMUP_CACHED
+
+    route_result = get_route_distance(coords_zl[:2], coords_roz[:2],
+                                      loading_country=loading_country_code, unloading_country=unloading_country_code,
+                                      avoid_switzerland=False, avoid_serbia=True, routing_mode=DEFAULT_ROUTING_MODE)
+    return WARMUP_FETCHED if route_result is not None else WARMUP_FAILED
+
+
+def after_cache_warmup():
+    """Zapisuje rozgrzany cache na dysk i przelicza modele szybkiej wyceny."""
+    save_caches()
+    refit_estimate_models()
+
+
+# Rozgrzewanie cache tras dla najczęstszych relacji historycznych (poza godzinami pracy)
+cache_warmup = CacheWarmup(
+    warm_lane=warm_route_cache_lane,
+    lanes_source=lambda limit: load_top_lanes("historical_rates.xlsx", limit),
+    usage_tracker=api_usage,
+    top_lanes=CACHE_WARMUP_TOP_LANES,
+    api_budget=CACHE_WARMUP_API_BUDGET,
+    on_complete=after_cache_warmup,
+)
+warmup_scheduler = CacheWarmupScheduler(cache_warmup, hour=CACHE_WARMUP_HOUR)
+if CACHE_WARMUP_ENABLED:
+    warmup_scheduler.start()
+    atexit.register(lambda: warmup_scheduler.stop())
+
 logger.info("System zarządzania sesjami zainicjalizowany pomyślnie")
 
 
@@ -3792,24 +4552,18 @@ def upload_file():
             user_data.fuel_cost = float(request.form.get("fuel_cost", DEFAULT_FUEL_COST))
             user_data.driver_cost = float(request.form.get("driver_cost", DEFAULT_DRIVER_COST))
             user_data.matrix_type = request.form.get("matrix_type", "klient")
-
-            # Ustaw odpowiednią macierz marży
-            set_margin_matrix(user_data.matrix_type)
+            user_data.pricing_mode = request.form.get("mode", PRICING_MODE_PRECISE)
+            if user_data.pricing_mode not in PRICING_MODES:
+                return render_template("error.html", message=f"Nieznany tryb wyceny: {user_data.pricing_mode}")
 
             # Czytaj plik w kontekście żądania
             user_data.file_bytes = file.read()
+            priority = int(request.form.get("priority", 0))
             
-            logger.info(f"[{user_data.session_id[:8]}] Rozpoczynam przetwarzanie (fuel={user_data.fuel_cost}, driver={user_data.driver_cost}, matrix={user_data.matrix_type})")
-
-            # Uruchom przetwarzanie w tle z session_id
-            thread = threading.Thread(
-                target=background_processing,
-                args=(user_data.session_id,),
-                daemon=True,
-                name=f"BgProcess-{user_data.session_id[:8]}"
-            )
-            thread.start()
-            user_data.thread = thread
+            logger.info(f"[{user_data.session_id[:8]}] Rozpoczynam przetwarzanie (fuel={user_data.fuel_cost}, driver={user_data.driver_cost}, matrix={user_data.matrix_type}, mode={user_data.pricing_mode})")
+
+            # Dodaj zadanie do kolejki zamiast uruchamiać osobny wątek
+            submit_tender_job(user_data, priority)
             
             return render_template("processing.html")
             
@@ -3885,8 +4639,8 @@ def progress():
                 100
             )
         
-        # Dodaj informację o używanej macierzy
-        matrix_name, matrix_file = get_margin_matrix_info()
+        # Dodaj informację o macierzy używanej przez zadanie sesji
+        matrix_name, matrix_file = get_margin_matrix_info(get_margin_matrix_file(user_data.matrix_type))
         
         response_data = {
             'progress': user_data.progress,
@@ -3896,9 +4650,12 @@ def progress():
             'error': user_data.progress == -1 or user_data.progress == -2,
             'preview_data': user_data.preview_data,
             'processing_complete': user_data.processing_complete,
+            'refining': user_data.refining,
             'matrix_name': matrix_name,
             'matrix_file': matrix_file,
-            'session_id': user_data.session_id[:8]  # Dla debugowania
+            'session_id': user_data.session_id[:8],  # Dla debugowania
+            'job_id': user_data.job_id,
+            'api_usage': api_usage.get_usage(job_id=user_data.job_id) if user_data.job_id else None
         }
         return jsonify(response_data)
         
@@ -3931,6 +4688,182 @@ def admin_sessions():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """
+    Endpoint zwracający status zadania z kolejki.
+    Zadanie identyfikowane jest niezależnie od sesji przeglądarki.
+    """
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Nie znaleziono zadania'}), 404
+    
+    job_info = job.to_dict()
+    job_info['checkpointed_rows'] = checkpoint_store.count(job_id)
+    job_info['timings'] = metrics.get_job_summary(job_id)
+    job_info['gauges'] = metrics.get_job_gauges(job_id)
+    job_info['api_usage'] = api_usage.get_usage(job_id=job_id)
+    # Dołącz postęp z sesji, jeśli zadanie jest w niej aktywne
+    user_data = session_manager.get_session(job.session_id, create_if_missing=False) if job.session_id else None
+    if user_data is not None and user_data.job_id == job_id:
+        job_info['progress'] = user_data.progress
+        job_info['current'] = user_data.current_row
+        job_info['total'] = user_data.total_rows
+    return jsonify(job_info)
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Endpoint anulujący zadanie oczekujące lub w trakcie przetwarzania."""
+    if not job_queue.cancel(job_id):
+        return jsonify({'success': False, 'error': 'Zadanie nie istnieje lub jest zakończone'}), 404
+    return jsonify({'success': True, 'job_id': job_id})
+
+
+@app.route("/jobs/<job_id>/resume", methods=["POST"])
+def resume_job(job_id):
+    """
+    Endpoint wznawiający zakończone zadanie.
+    Wiersze zapisane w checkpointach są pomijane - ponawiane są tylko nieudane.
+    """
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Nie znaleziono zadania'}), 404
+    
+    if job.status not in JobStatus.FINISHED:
+        return jsonify({'success': False, 'error': 'Zadanie jest w trakcie przetwarzania'}), 409
+
+    # Sesja zadania ponownie wskazuje na to zadanie i zaczyna postęp od zera -
+    # przed ponownym zakolejkowaniem, bo worker pomija zadania innej sesji
+    user_data = session_manager.get_session(job.session_id, create_if_missing=False) if job.session_id else None
+    if user_data is not None:
+        user_data.reset_progress()
+        user_data.job_id = job_id
+
+    if not job_queue.resume(job_id):
+        return jsonify({'success': False, 'error': 'Zadanie jest w trakcie przetwarzania'}), 409
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'checkpointed_rows': checkpoint_store.count(job_id)
+    })
+
+
+@app.route("/admin/jobs")
+def admin_jobs():
+    """
+    Endpoint administracyjny z listą ostatnich zadań i statystykami kolejki.
+    """
+    try:
+        limit = int(request.args.get('limit', 100))
+        return jsonify({
+            'statistics': job_queue.get_stats(),
+            'jobs': [job.to_dict() for job in job_queue.list_jobs(limit)],
+            'timestamp': time.time()
+        })
+    except Exception as e:
+        logger.error(f"Błąd w /admin/jobs: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/admin/api_usage")
+def admin_api_usage():
+    """
+    Endpoint administracyjny z liczbą zapytań PTV.
+    Dzienne sumy według endpointu i wyniku oraz zapytania poszczególnych zadań.
+    """
+    try:
+        days = int(request.args.get('days', 30))
+        return jsonify({
+            'total': api_usage.get_usage(),
+            'daily': api_usage.get_daily(days),
+            'jobs': api_usage.get_jobs(days),
+            'job_limit': api_usage.job_limit,
+            'timestamp': time.time()
+        })
+    except Exception as e:
+        logger.error(f"Błąd w /admin/api_usage: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/admin/cache_warmup", methods=['GET', 'POST'])
+def admin_cache_warmup():
+    """
+    Endpoint administracyjny rozgrzewania cache tras.
+    GET zwraca harmonogram i wynik ostatniego rozgrzewania, POST uruchamia je natychmiast w tle.
+    """
+    try:
+        if request.method == 'POST':
+            started = warmup_scheduler.trigger_now()
+            status = warmup_scheduler.get_status()
+            status['started'] = started
+            return jsonify(status), 202 if started else 409
+        return jsonify(warmup_scheduler.get_status())
+    except Exception as e:
+        logger.error(f"Błąd w /admin/cache_warmup: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/admin/toll_model", methods=['GET', 'POST'])
+def admin_toll_model():
+    """
+    Endpoint administracyjny modeli szybkiej wyceny.
+    GET zwraca stawki EUR/km krajów, korytarze i współczynniki objazdu, POST przelicza modele z bieżącego cache tras.
+    """
+    try:
+        if request.method == 'POST':
+            refit_estimate_models()
+        stats = toll_model.get_stats()
+        stats['detour_factors'] = detour_model.get_stats()
+        return jsonify(stats)
+    except Exception as e:
+        logger.error(f"Błąd w /admin/toll_model: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/admin/route_cache/countries")
+def admin_route_cache_countries():
+    """
+    Endpoint administracyjny z liczbą tras w cache PTV przejeżdżających przez każdy kraj.
+    """
+    try:
+        return jsonify({
+            'countries': ptv_manager.cache_manager.get_country_counts(),
+            'cache_size': len(ptv_manager.cache_manager.cache),
+        })
+    except Exception as e:
+        logger.error(f"Błąd w /admin/route_cache/countries: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/admin/route_cache/invalidate", methods=['POST'])
+def admin_route_cache_invalidate():
+    """
+    Endpoint administracyjny do unieważnienia tras przez kraje po zmianie taryf opłat drogowych.
+    Body JSON: {"countries": ["DE", "AT"]} (kody ISO). Po unieważnieniu zapisuje kopię cache na dysk.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        countries = data.get('countries') or request.args.getlist('country')
+        if isinstance(countries, str):
+            countries = [countries]
+        if not countries:
+            return jsonify({'error': 'Podaj kraje do unieważnienia (countries)'}), 400
+        removed = ptv_manager.cache_manager.invalidate_countries(countries)
+        logger.info(f"Unieważniono trasy w cache PTV dla krajów: {removed}")
+        save_caches()
+        # Stawki unieważnionych krajów wyliczane są tylko z nowych tras
+        refit_estimate_models()
+        return jsonify({
+            'removed': removed,
+            'total_removed': sum(removed.values()),
+            'cache_size': len(ptv_manager.cache_manager.cache),
+        })
+    except Exception as e:
+        logger.error(f"Błąd w /admin/route_cache/invalidate: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route("/admin/cleanup_sessions")
 def admin_cleanup_sessions():
     """
@@ -3975,9 +4908,25 @@ def clear_locations_cache_endpoint():
 @app.route("/ptv_stats")
 def ptv_stats():
     stats = ptv_manager.get_stats()
+    stats['single_flight']['geocoding'] = geocode_flight.get_stats()
+    stats['single_flight']['structured_geocoding'] = structured_geocode_flight.get_stats()
+    stats['polyline_cache'] = polyline_cache.get_stats()
+    stats['rates_memo'] = rates_memo.get_stats()
+    stats['historical_rates'] = rates_store.get_stats()
+    if rates_db is not None:
+        stats['rates_db'] = rates_db.get_stats()
     return jsonify(stats)
 
 
+@app.route("/admin/metrics")
+def admin_metrics():
+    """
+    Endpoint z czasami etapów przetwarzania w formacie tekstowym Prometheusa.
+    Histogramy dla całego procesu oraz sumy czasów ostatnich zadań.
+    """
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route("/upload_for_geocoding")
 def upload_for_geocoding():
     return render_template("upload_for_geocoding.html")
@@ -4492,7 +5441,8 @@ def test_truck_route():
                     coord_from_tuple, 
                     coord_to_tuple, 
                     result.get('polyline', ''),
-                    ferry_ports=result.get('ferry_ports')
+                    ferry_ports=result.get('ferry_ports'),
+                    simplified_polyline=result.get('simplified_polyline')
                 ),
                 # Regionalne stawki (jak w starym flow - POPRAWIONE KLUCZE)
                 'region_klient_stawka_3m': format_currency(region_rates.get('region_klient_stawka_3m')),
@@ -4580,7 +5530,8 @@ def test_truck_route():
             
         # Stwórz link do mapy
         ferry_ports = result.get('ferry_ports')
-        map_link = create_google_maps_link(coord_from, coord_to, polyline, ferry_ports=ferry_ports)
+        map_link = create_google_maps_link(coord_from, coord_to, polyline, ferry_ports=ferry_ports,
+                                           simplified_polyline=result.get('simplified_polyline'))
         
         # Pobierz stawki regionalne najpierw
         # Jeśli mamy przekazane kody pocztowe i kraje, użyj ich
@@ -4756,12 +5707,14 @@ def test_truck_route_map():
                                         loading_country=load_country, unloading_country=unload_country,
                                         avoid_switzerland=False, avoid_serbia=True, routing_mode=DEFAULT_ROUTING_MODE)
         
-        # Wyciągnij polyline i ferry_ports z wyniku
+        # Wyciągnij polyline, uproszczoną trasę i ferry_ports z wyniku
         polyline = route_result.get('polyline', '') if isinstance(route_result, dict) else ''
+        simplified_polyline = route_result.get('simplified_polyline') if isinstance(route_result, dict) else None
         ferry_ports = route_result.get('ferry_ports') if isinstance(route_result, dict) else None
         
-        # Stwórz link do mapy
-        map_link = create_google_maps_link(from_coords, to_coords, polyline, ferry_ports=ferry_ports)
+        # Stwórz link do mapy (z uproszczonej trasy - bez dekodowania pełnego polyline)
+        map_link = create_google_maps_link(from_coords, to_coords, polyline, ferry_ports=ferry_ports,
+                                           simplified_polyline=simplified_polyline)
         
         # Przekieruj do Google Maps
         return redirect(map_link)
@@ -4770,17 +5723,18 @@ def test_truck_route_map():
         route_logger.error(f"Błąd podczas generowania linku do mapy: {str(e)}")
         return f"Błąd: {str(e)}", 500
 
-def background_processing(session_id: str):
+def background_processing(session_id: str, file_bytes: Optional[bytes] = None, job_id: Optional[str] = None):
     """
     Przetwarza plik Excel w tle dla danej sesji użytkownika.
     
     Args:
         session_id: Unikalny identyfikator sesji użytkownika
+        file_bytes: Bajty pliku Excel (domyślnie plik zapisany w sesji)
+        job_id: Identyfikator zadania w kolejce (opcjonalny)
     """
     user_data = session_manager.get_session(session_id, create_if_missing=False)
     
     if user_data is None:
-        print(f"[{session_id[:8]}] BŁĄD: Nie znaleziono sesji użytkownika!")
         logger.error(f"[{session_id[:8]}] Nie znaleziono sesji użytkownika!")
         return
     
@@ -4789,18 +5743,26 @@ def background_processing(session_id: str):
     try:
         logger.info(f"[{session_id_short}] Rozpoczynam przetwarzanie pliku...")
         
-        # Użyj bezpośrednio bajtów pliku z sesji użytkownika
-        file_stream = io.BytesIO(user_data.file_bytes)
-        df = pd.read_excel(file_stream, dtype=str)
+        # Użyj bajtów pliku z zadania lub z sesji użytkownika
+        file_stream = io.BytesIO(file_bytes if file_bytes is not None else user_data.file_bytes)
+        with metrics.span('workbook_load'):
+            df = pd.read_excel(file_stream, dtype=str)
         df.columns = df.columns.str.lower().str.replace(" ", "_").str.strip()
         logger.info(f"[{session_id_short}] Przekształcone kolumny: {list(df.columns)}")
         
         try:
-            # Wywołaj process_przetargi z session_id
-            process_przetargi(df, user_data.fuel_cost, user_data.driver_cost, session_id)
+            # Macierz marży typu wybranego w sesji - niezależna od zadań wycenianych równolegle
+            margin_matrix = get_margin_matrix(user_data.matrix_type)
+            if user_data.pricing_mode == PRICING_MODE_TWO_PHASE:
+                process_przetargi_two_phase(df, user_data.fuel_cost, user_data.driver_cost, session_id=session_id,
+                                            job_id=job_id, margin_matrix=margin_matrix)
+            else:
+                process_przetargi(df, user_data.fuel_cost, user_data.driver_cost, session_id=session_id,
+                                  job_id=job_id, mode=user_data.pricing_mode, margin_matrix=margin_matrix)
             save_caches()
             
             logger.info(f"[{session_id_short}] Przetwarzanie zakończone pomyślnie")
+            check_session_job(user_data, job_id)
             user_data.processing_complete = True
             if user_data.progress not in [-1, -2]:  # Nie zmieniaj progress jeśli wystąpił błąd
                 user_data.progress = 100
@@ -4810,22 +5772,116 @@ def background_processing(session_id: str):
                 f"[{session_id_short}] GeocodeException: "
                 f"Znaleziono {len(ge.ungeocoded_locations)} nierozpoznanych lokalizacji"
             )
+            check_session_job(user_data, job_id)
             user_data.progress = -2
             user_data.processing_complete = True
             user_data.locations_to_verify = ge.ungeocoded_locations
         
+        except JobCancelledException:
+            # Zadanie zastąpione nowszym uploadem nie zmienia stanu sesji nowego zadania
+            if not is_session_job(user_data, job_id):
+                logger.info(f"[{session_id_short}] Przetwarzanie przerwane - sesja przetwarza nowsze zadanie")
+                raise
+            logger.info(f"[{session_id_short}] Przetwarzanie anulowane")
+            user_data.progress = -1
+            user_data.processing_complete = True
+            user_data.result_excel = None
+            raise
+        
         except Exception as e:
             logger.error(f"[{session_id_short}] Błąd w process_przetargi: {e}", exc_info=True)
+            check_session_job(user_data, job_id)
             user_data.progress = -1
             user_data.processing_complete = True
             user_data.result_excel = None
             
+    except JobCancelledException:
+        raise
     except Exception as e:
         logger.error(f"[{session_id_short}] Krytyczny błąd przetwarzania: {e}", exc_info=True)
+        check_session_job(user_data, job_id)
         user_data.progress = -1
         user_data.processing_complete = True
         user_data.result_excel = None
 
+
+# Typ zadania przetwarzania przetargu w kolejce zadań
+TENDER_JOB_KIND = 'tender'
+
+
+def run_tender_job(job):
+    """
+    Handler kolejki zadań dla przetwarzania przetargu.
+    
+    Po restarcie procesu sesja w pamięci nie istnieje - jest wtedy odtwarzana
+    pod tym samym identyfikatorem, więc użytkownik z tym samym ciasteczkiem
+    zobaczy postęp wznowionego zadania.
+    
+    Args:
+        job: Zadanie z kolejki (payload: fuel_cost, driver_cost, matrix_type, mode; data: plik Excel)
+    """
+    session_id = job.session_id or job.job_id
+    user_data = session_manager.get_session(session_id, create_if_missing=True)
+    
+    # Zadanie mogło zostać zastąpione nowszym uploadem w tej samej sesji
+    if user_data.job_id not in (None, job.job_id):
+        logger.info(f"[job {job.job_id[:8]}] Sesja przetwarza już nowsze zadanie - pomijam")
+        return
+    
+    user_data.job_id = job.job_id
+    user_data.fuel_cost = job.payload.get('fuel_cost', DEFAULT_FUEL_COST)
+    user_data.driver_cost = job.payload.get('driver_cost', DEFAULT_DRIVER_COST)
+    user_data.matrix_type = job.payload.get('matrix_type', 'klient')
+    user_data.pricing_mode = job.payload.get('mode', PRICING_MODE_PRECISE)
+    
+    # Zapytania PTV zadania przypisywane są do sesji użytkownika
+    with usage_scope(session_id):
+        background_processing(session_id, file_bytes=job.data, job_id=job.job_id)
+    
+    # Błąd przetwarzania oznacza zadanie jako nieudane
+    check_session_job(user_data, job.job_id)
+    if user_data.progress == -1:
+        raise RuntimeError("Przetwarzanie przetargu zakończone błędem")
+
+
+def submit_tender_job(user_data: UserSessionData, priority: int = 0) -> str:
+    """
+    Dodaje przetwarzanie przetargu z sesji do kolejki zadań.
+    
+    Parametry i bajty pliku zapisywane są razem z zadaniem, więc może ono
+    zostać wznowione po restarcie procesu. Poprzednie, niezakończone zadanie
+    tej samej sesji jest anulowane.
+    
+    Args:
+        user_data: Sesja z wczytanym plikiem i parametrami kosztów
+        priority: Priorytet zadania (wyższy - obsługiwany wcześniej)
+    
+    Returns:
+        Identyfikator zadania
+    """
+    if user_data.job_id:
+        job_queue.cancel(user_data.job_id)
+    
+    user_data.job_id = job_queue.submit(
+        TENDER_JOB_KIND,
+        payload={
+            'fuel_cost': user_data.fuel_cost,
+            'driver_cost': user_data.driver_cost,
+            'matrix_type': user_data.matrix_type,
+            'mode': user_data.pricing_mode,
+        },
+        data=user_data.file_bytes,
+        priority=priority,
+        session_id=user_data.session_id
+    )
+    return user_data.job_id
+
+
+job_queue.register_handler(TENDER_JOB_KIND, run_tender_job)
+job_queue.purge_finished(JOB_RETENTION_HOURS)
+checkpoint_store.purge(JOB_RETENTION_HOURS * 3600)
+job_queue.start()
+
 @app.route("/check_locations", methods=["POST"])
 def check_locations():
     try:
@@ -4962,6 +6018,33 @@ def get_route_distance(coord_from, coord_to, loading_country=None, unloading_cou
     )
     return result
 
+
+def estimate_route_distance(coord_from, coord_to, loading_country=None, unloading_country=None):
+    """
+    Trasa w trybie szybkiej wyceny: z cache PTV, a gdy jej brak - szacunek bez zapytania do PTV.
+    
+    Parametry cache jak w get_route_distance dla wiersza bez punktów pośrednich
+    (trasy z obowiązkowym promem zapisywane są jako trasy z waypoints).
+    """
+    cached = ptv_manager.cache_manager.get(coord_from, coord_to, False, True, DEFAULT_ROUTING_MODE, True)
+    if cached is None:
+        cached = ptv_manager.cache_manager.get_waypoints_route([coord_from, coord_to], False, True,
+                                                               DEFAULT_ROUTING_MODE, True)
+    if cached is not None:
+        api_usage.record(ENDPOINT_ROUTING, OUTCOME_CACHE)
+        return cached
+    return quick_quote.estimate_route([coord_from, coord_to], [loading_country, unloading_country])
+
+
+def describe_route_source(route_result):
+    """Opis źródła trasy wiersza w trybie szybkiej wyceny (kolumna 'Wycena trasy')."""
+    if not isinstance(route_result, dict) or route_result.get('success') is False:
+        return 'brak trasy'
+    if not route_result.get('estimated'):
+        return 'PTV (cache)'
+    return 'szacunek' if route_result.get('estimate_confident') else 'szacunek - niska pewność'
+
+
 def calculate_podlot_from_data(df, description="podlot"):
     """
     Centralna funkcja do obliczania podlotu (dystansu) z DataFrame
@@ -5004,127 +6087,6 @@ def calculate_podlot_from_data(df, description="podlot"):
         return None
 
 
-def calculate_podlot_with_group_fallback(df_full, norm_lc, norm_lp, min_orders=20):
-    """
-    Oblicza podlot historyczny z fallbackiem do grupy koordynatów.
-    
-    Logika:
-    1. Znajdź rekordy dla kraju + kodu pocztowego załadunku (2 cyfry)
-    2. Jeśli suma zleceń > min_orders: użyj średniej ważonej z tych rekordów
-    3. Jeśli suma zleceń <= min_orders: oblicz średnią ważoną dla całej grupy koordynatów
-    
-    Args:
-        df_full: pełny DataFrame z danymi historycznymi
-        norm_lc: znormalizowany kraj załadunku
-        norm_lp: znormalizowany kod pocztowy załadunku (2 cyfry)
-        min_orders: minimalny próg liczby zleceń (domyślnie 20)
-    
-    Returns:
-        tuple: (podlot_value, source_info) lub (None, None) jeśli brak danych
-    """
-    if df_full.empty or 'dystans' not in df_full.columns:
-        return None, None
-    
-    # Normalizuj kod pocztowy do 2 cyfr
-    norm_lp_2digit = str(norm_lp).zfill(2)[:2]
-    
-    # Krok 1: Znajdź rekordy dla kraju + kodu pocztowego załadunku
-    exact_matches = df_full[
-        (df_full['kraj zaladunku'].apply(normalize_country) == norm_lc) &
-        (df_full['kod pocztowy zaladunku'].astype(str).str.zfill(2).str[:2] == norm_lp_2digit)
-    ]
-    
-    # Filtruj rekordy z niepustymi wartościami dystansu
-    valid_exact = exact_matches.dropna(subset=['dystans'])
-    
-    if valid_exact.empty:
-        return None, None
-    
-    try:
-        # Oblicz sumę zleceń dla dopasowanych rekordów
-        total_orders = 0
-        if 'Liczba zlecen' in valid_exact.columns:
-            total_orders = valid_exact['Liczba zlecen'].fillna(0).sum()
-        
-        # Krok 2: Jeśli suma zleceń > min_orders, użyj tych rekordów
-        if total_orders > min_orders:
-            if total_orders > 0:
-                weights = valid_exact['Liczba zlecen'].fillna(0) / total_orders
-                podlot = (valid_exact['dystans'] * weights).sum()
-            else:
-                podlot = valid_exact['dystans'].mean()
-            
-            source = f"kod pocztowy {norm_lc} {norm_lp_2digit} (n={len(valid_exact)}, zlecenia={int(total_orders)})"
-            return podlot, source
-        
-        # Krok 3: Fallback do grupy koordynatów
-        if 'grupa_koordynatow' not in df_full.columns:
-            # Jeśli brak kolumny grupa_koordynatow, użyj dostępnych danych
-            if total_orders > 0:
-                weights = valid_exact['Liczba zlecen'].fillna(0) / total_orders
-                podlot = (valid_exact['dystans'] * weights).sum()
-            else:
-                podlot = valid_exact['dystans'].mean()
-            source = f"kod pocztowy {norm_lc} {norm_lp_2digit} (n={len(valid_exact)}, zlecenia={int(total_orders)}, brak grupy)"
-            return podlot, source
-        
-        # Znajdź grupę koordynatów dla tego kodu pocztowego
-        grupa = valid_exact['grupa_koordynatow'].dropna().iloc[0] if not valid_exact['grupa_koordynatow'].dropna().empty else None
-        
-        if grupa is None:
-            # Brak przypisanej grupy - użyj dostępnych danych
-            if total_orders > 0:
-                weights = valid_exact['Liczba zlecen'].fillna(0) / total_orders
-                podlot = (valid_exact['dystans'] * weights).sum()
-            else:
-                podlot = valid_exact['dystans'].mean()
-            source = f"kod pocztowy {norm_lc} {norm_lp_2digit} (n={len(valid_exact)}, brak grupy)"
-            return podlot, source
-        
-        # Pobierz wszystkie rekordy z tej samej grupy koordynatów
-        group_matches = df_full[df_full['grupa_koordynatow'] == grupa]
-        valid_group = group_matches.dropna(subset=['dystans'])
-        
-        if valid_group.empty:
-            # Fallback do oryginalnych danych jeśli grupa pusta
-            if total_orders > 0:
-                weights = valid_exact['Liczba zlecen'].fillna(0) / total_orders
-                podlot = (valid_exact['dystans'] * weights).sum()
-            else:
-                podlot = valid_exact['dystans'].mean()
-            source = f"kod pocztowy {norm_lc} {norm_lp_2digit} (n={len(valid_exact)}, grupa pusta)"
-            return podlot, source
-        
-        # Oblicz średnią ważoną dla całej grupy
-        group_total_orders = 0
-        if 'Liczba zlecen' in valid_group.columns:
-            group_total_orders = valid_group['Liczba zlecen'].fillna(0).sum()
-        
-        # Wartość domyślna do uzupełnienia
-        default_value = 200
-        
-        if group_total_orders > 0:
-            weights = valid_group['Liczba zlecen'].fillna(0) / group_total_orders
-            podlot_from_data = (valid_group['dystans'] * weights).sum()
-        else:
-            podlot_from_data = valid_group['dystans'].mean()
-        
-        # Jeśli grupa ma mniej niż min_orders zleceń, uzupełnij brakujące wartością domyślną
-        if group_total_orders < min_orders:
-            missing_orders = min_orders - group_total_orders
-            # Średnia ważona: (dane z grupy * liczba zleceń + domyślna * brakujące) / min_orders
-            podlot = (podlot_from_data * group_total_orders + default_value * missing_orders) / min_orders
-            source = f"grupa {grupa} (n={len(valid_group)}, zlecenia={int(group_total_orders)}, uzupełniono {int(missing_orders)} do {min_orders}, fallback z {norm_lc} {norm_lp_2digit})"
-        else:
-            podlot = podlot_from_data
-            source = f"grupa {grupa} (n={len(valid_group)}, zlecenia={int(group_total_orders)}, fallback z {norm_lc} {norm_lp_2digit})"
-        
-        return podlot, source
-        
-    except Exception as e:
-        print(f"Błąd obliczania podlotu z grupą: {e}")
-        return None, None
-
 def calculate_weighted_podlot(podlot_hist, z_hist, podlot_gielda, z_gielda):
     """
     Oblicza średni podlot ważony liczbą zleceń z różnych źródeł
@@ -5151,130 +6113,6 @@ def calculate_weighted_podlot(podlot_hist, z_hist, podlot_gielda, z_gielda):
     return None
 
 
-def calculate_odjazd_with_group_fallback(df_full, norm_uc, norm_up, min_orders=20):
-    """
-    Oblicza odjazd historyczny z fallbackiem do grupy koordynatów.
-    
-    Odjazd to dystans od rozładunku do kolejnego załadunku.
-    
-    Logika:
-    1. Znajdź rekordy dla kraju + kodu pocztowego rozładunku (2 cyfry)
-    2. Jeśli suma zleceń (LICZBA_ZLECEN_ODJAZD) > min_orders: użyj średniej ważonej z tych rekordów
-    3. Jeśli suma zleceń <= min_orders: oblicz średnią ważoną dla całej grupy koordynatów (_KOORDYNATY_ODJAZD)
-    
-    Args:
-        df_full: pełny DataFrame z danymi historycznymi
-        norm_uc: znormalizowany kraj rozładunku
-        norm_up: znormalizowany kod pocztowy rozładunku (2 cyfry)
-        min_orders: minimalny próg liczby zleceń (domyślnie 20)
-    
-    Returns:
-        tuple: (odjazd_value, source_info) lub (None, None) jeśli brak danych
-    """
-    if df_full.empty or 'ODJAZD' not in df_full.columns:
-        return None, None
-    
-    # Normalizuj kod pocztowy do 2 cyfr
-    norm_up_2digit = str(norm_up).zfill(2)[:2]
-    
-    # Krok 1: Znajdź rekordy dla kraju + kodu pocztowego rozładunku
-    exact_matches = df_full[
-        (df_full['kraj rozladunku'].apply(normalize_country) == norm_uc) &
-        (df_full['kod pocztowy rozladunku'].astype(str).str.zfill(2).str[:2] == norm_up_2digit)
-    ]
-    
-    # Filtruj rekordy z niepustymi wartościami odjazdu
-    valid_exact = exact_matches.dropna(subset=['ODJAZD'])
-    
-    if valid_exact.empty:
-        return None, None
-    
-    try:
-        # Oblicz sumę zleceń dla dopasowanych rekordów
-        total_orders = 0
-        if 'LICZBA_ZLECEN_ODJAZD' in valid_exact.columns:
-            total_orders = valid_exact['LICZBA_ZLECEN_ODJAZD'].fillna(0).sum()
-        
-        # Krok 2: Jeśli suma zleceń > min_orders, użyj tych rekordów
-        if total_orders > min_orders:
-            if total_orders > 0:
-                weights = valid_exact['LICZBA_ZLECEN_ODJAZD'].fillna(0) / total_orders
-                odjazd = (valid_exact['ODJAZD'] * weights).sum()
-            else:
-                odjazd = valid_exact['ODJAZD'].mean()
-            
-            source = f"kod pocztowy {norm_uc} {norm_up_2digit} (n={len(valid_exact)}, zlecenia={int(total_orders)})"
-            return odjazd, source
-        
-        # Krok 3: Fallback do grupy koordynatów odjazdu
-        if '_KOORDYNATY_ODJAZD' not in df_full.columns:
-            # Jeśli brak kolumny _KOORDYNATY_ODJAZD, użyj dostępnych danych
-            if total_orders > 0:
-                weights = valid_exact['LICZBA_ZLECEN_ODJAZD'].fillna(0) / total_orders
-                odjazd = (valid_exact['ODJAZD'] * weights).sum()
-            else:
-                odjazd = valid_exact['ODJAZD'].mean()
-            source = f"kod pocztowy {norm_uc} {norm_up_2digit} (n={len(valid_exact)}, zlecenia={int(total_orders)}, brak grupy)"
-            return odjazd, source
-        
-        # Znajdź grupę koordynatów dla tego kodu pocztowego
-        grupa = valid_exact['_KOORDYNATY_ODJAZD'].dropna().iloc[0] if not valid_exact['_KOORDYNATY_ODJAZD'].dropna().empty else None
-        
-        if grupa is None:
-            # Brak przypisanej grupy - użyj dostępnych danych
-            if total_orders > 0:
-                weights = valid_exact['LICZBA_ZLECEN_ODJAZD'].fillna(0) / total_orders
-                odjazd = (valid_exact['ODJAZD'] * weights).sum()
-            else:
-                odjazd = valid_exact['ODJAZD'].mean()
-            source = f"kod pocztowy {norm_uc} {norm_up_2digit} (n={len(valid_exact)}, brak grupy)"
-            return odjazd, source
-        
-        # Pobierz wszystkie rekordy z tej samej grupy koordynatów odjazdu
-        group_matches = df_full[df_full['_KOORDYNATY_ODJAZD'] == grupa]
-        valid_group = group_matches.dropna(subset=['ODJAZD'])
-        
-        if valid_group.empty:
-            # Fallback do oryginalnych danych jeśli grupa pusta
-            if total_orders > 0:
-                weights = valid_exact['LICZBA_ZLECEN_ODJAZD'].fillna(0) / total_orders
-                odjazd = (valid_exact['ODJAZD'] * weights).sum()
-            else:
-                odjazd = valid_exact['ODJAZD'].mean()
-            source = f"kod pocztowy {norm_uc} {norm_up_2digit} (n={len(valid_exact)}, grupa pusta)"
-            return odjazd, source
-        
-        # Oblicz średnią ważoną dla całej grupy
-        group_total_orders = 0
-        if 'LICZBA_ZLECEN_ODJAZD' in valid_group.columns:
-            group_total_orders = valid_group['LICZBA_ZLECEN_ODJAZD'].fillna(0).sum()
-        
-        # Wartość domyślna do uzupełnienia
-        default_value = 200
-        
-        if group_total_orders > 0:
-            weights = valid_group['LICZBA_ZLECEN_ODJAZD'].fillna(0) / group_total_orders
-            odjazd_from_data = (valid_group['ODJAZD'] * weights).sum()
-        else:
-            odjazd_from_data = valid_group['ODJAZD'].mean()
-        
-        # Jeśli grupa ma mniej niż min_orders zleceń, uzupełnij brakujące wartością domyślną
-        if group_total_orders < min_orders:
-            missing_orders = min_orders - group_total_orders
-            # Średnia ważona: (dane z grupy * liczba zleceń + domyślna * brakujące) / min_orders
-            odjazd = (odjazd_from_data * group_total_orders + default_value * missing_orders) / min_orders
-            source = f"grupa {grupa} (n={len(valid_group)}, zlecenia={int(group_total_orders)}, uzupełniono {int(missing_orders)} do {min_orders}, fallback z {norm_uc} {norm_up_2digit})"
-        else:
-            odjazd = odjazd_from_data
-            source = f"grupa {grupa} (n={len(valid_group)}, zlecenia={int(group_total_orders)}, fallback z {norm_uc} {norm_up_2digit})"
-        
-        return odjazd, source
-        
-    except Exception as e:
-        print(f"Błąd obliczania odjazdu z grupą: {e}")
-        return None, None
-
-
 def get_odjazd(rates, region_rates=None):
     """
     Pobiera odjazd z danych historycznych z fallbackiem do regionów lub zwraca wartość domyślną 200 km
@@ -5353,7 +6191,8 @@ def geocoding_progress():
 
 if __name__ == '__main__':
     load_caches()
-    load_margin_matrix()  # Wczytaj domyślną macierz marży (Matrix.xlsx)
+    preload_margin_matrices()  # Wczytaj obie macierze marży, aktywna domyślna (Matrix.xlsx)
+    preload_historical_rates()
     log = logging.getLogger('werkzeug')
 
 
@@ -0,0 +1,79 @@
+"""
+Benchmark narzutu logowania na wiersz w ścieżce opłat drogowych.
+
+Mierzy czas PTVRouteManager.process_toll_costs dla syntetycznej odpowiedzi
+PTV (kilkanaście krajów, sekcje i systemy opłat) w profilach logowania
+'quiet' (produkcja) i 'debug'. Logi trafiają do os.devnull, więc wynik
+pokazuje koszt przygotowania komunikatów, a nie zapisu na konsolę.
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python -m benchmarks.bench_logging [liczba_wierszy]
+"""
+
+import logging
+import os
+import sys
+import time
+
+from app.utils.logging_config import configure_logging
+from ptv_api_manager import PTVRouteManager
+
+COUNTRIES = ['PL', 'DE', 'NL', 'BE', 'FR', 'ES', 'PT', 'IT', 'AT', 'CZ', 'SK', 'HU', 'SI', 'HR']
+
+
+def build_toll_data():
+    """Tworzy syntetyczne toll_data o strukturze odpowiedzi PTV."""
+    countries = [
+        {'countryCode': code, 'convertedPrice': {'price': 10.0 + i, 'currency': 'EUR'}}
+        for i, code in enumerate(COUNTRIES)
+    ]
+    sections = [
+        {'tollRoadType': 'GENERAL', 'displayName': f'Sekcja {i}',
+         'costs': [{'convertedPrice': {'price': 2.5, 'currency': 'EUR'}}]}
+        for i in range(60)
+    ]
+    sections.append({'tollRoadType': 'TUNNEL', 'displayName': 'Tunnel du Mont-Blanc',
+                     'operatorName': 'ATMB', 'costs': [{'convertedPrice': {'price': 350.0}}]})
+    systems = [
+        {'name': f'System {code}', 'type': 'DISTANCE_BASED', 'operatorName': f'Operator {code}',
+         'costs': {'convertedPrice': {'price': 10.0 + i}}}
+        for i, code in enumerate(COUNTRIES)
+    ]
+    return {
+        'costs': {'convertedPrice': {'price': sum(c['convertedPrice']['price'] for c in countries)},
+                  'countries': countries},
+        'sections': sections,
+        'systems': systems,
+    }
+
+
+def run(manager, toll_data, rows):
+    """Zwraca średni czas process_toll_costs na wiersz [µs]."""
+    start = time.perf_counter()
+    for _ in range(rows):
+        manager.process_toll_costs(toll_data)
+    return (time.perf_counter() - start) / rows * 1e6
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    manager = PTVRouteManager('benchmark')
+    toll_data = build_toll_data()
+
+    results = {}
+    for profile in ('quiet', 'debug'):
+        configure_logging(profile, level='', module_levels='', log_file=None)
+        for handler in logging.getLogger().handlers:
+            if isinstance(handler, logging.StreamHandler):
+                handler.setStream(open(os.devnull, 'w'))
+        run(manager, toll_data, min(rows, 100))
+        results[profile] = run(manager, toll_data, rows)
+
+    configure_logging('quiet', level='', module_levels='', log_file=None)
+    print(f"process_toll_costs, {rows} wierszy:")
+    for profile, per_row in results.items():
+        print(f"  profil {profile:<6} {per_row:9.1f} µs/wiersz")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Benchmark end-to-end wyceny przetargów na lokalnym serwerze-zaślepce.
+
+Dla każdego rozmiaru pliku (domyślnie 100, 1000 i 10000 wierszy) w osobnym
+procesie:
+- uruchamia serwer-zaślepkę PTV/Nominatim (benchmarks.stub_server),
+- kieruje aplikację na zaślepkę i tymczasowe katalogi cache przez zmienne
+  środowiskowe (przed importem appGPT),
+- generuje syntetyczny przetarg (benchmarks.tender_generator) i wywołuje
+  process_przetargi,
+- raportuje wiersze/s, zapytania do zaślepki według endpointów, płatne
+  i zaoszczędzone zapytania PTV (api_usage), skuteczność cache oraz
+  szczytowe zużycie pamięci.
+
+Osobny proces na rozmiar oznacza zimne cache i niezależny pomiar pamięci.
+
+Bramka regresji: --save zapisuje wyniki, --baseline porównuje z zapisanymi
+i kończy się kodem 1, gdy przepustowość spadła o więcej niż --tolerance
+albo wzrosła liczba płatnych zapytań.
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python -m benchmarks.bench_tenders
+    python -m benchmarks.bench_tenders --rows 100 1000 --latency-ms 20 --save baseline.json
+    python -m benchmarks.bench_tenders --rows 1000 --columns 8 --repeat-ratio 0.3
+    python -m benchmarks.bench_tenders --rows 5000 --mode estimate
+    python -m benchmarks.bench_tenders --baseline baseline.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_ROWS = (100, 1000, 10000)
+
+
+def _hit_rate(saved: int, calls: int) -> float:
+    total = saved + calls
+    return round(saved / total * 100, 2) if total else 0.0
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_one(args) -> dict:
+    """Pojedynczy pomiar (w procesie potomnym)."""
+    # Ustawienia czytane są przy pierwszym imporcie pakietu app - środowisko
+    # musi być gotowe przed importem zaślepki i aplikacji
+    port = _free_port()
+    host = f'127.0.0.1:{port}'
+    workdir = tempfile.mkdtemp(prefix='bench_tenders_')
+    os.environ.update({
+        'PTV_API_BASE_URL': f'http://{host}',
+        'NOMINATIM_DOMAIN': host,
+        'NOMINATIM_SCHEME': 'http',
+        'JOB_QUEUE_BACKEND': 'memory',
+        'GEO_CACHE_DIR': os.path.join(workdir, 'geo_cache'),
+        'ROUTE_CACHE_DIR': os.path.join(workdir, 'route_cache'),
+        'LOCATIONS_CACHE_DIR': os.path.join(workdir, 'locations_cache'),
+        'PTV_ROUTE_CACHE_FILE': os.path.join(workdir, 'ptv_route_cache.bin'),
+        'API_USAGE_DB_PATH': os.path.join(workdir, 'api_usage.db'),
+        'LOG_PROFILE': 'quiet',
+        'LOG_FILE': '',
+        'CACHE_WARMUP_ENABLED': 'false',
+    })
+    # Pliki stawek i matryc wczytywane są ze ścieżek względnych
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, REPO_ROOT)
+
+    from benchmarks.stub_server import StubConfig, StubServer
+
+    stub = StubServer(StubConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, recordings_dir=args.recordings,
+    ), port=port).start()
+
+    import appGPT
+
+    from benchmarks.tender_generator import TenderProfile, generate_tender
+
+    df = generate_tender(args.run_one, TenderProfile(
+        repeat_ratio=args.repeat_ratio, waypoint_rate=args.waypoint_rate, columns=args.columns, seed=args.seed,
+    ))
+    # Normalizacja nagłówków jak w background_processing
+    df.columns = df.columns.str.lower().str.replace(" ", "_").str.strip()
+    start = time.perf_counter()
+    appGPT.process_przetargi(df, mode=args.mode)
+    elapsed = time.perf_counter() - start
+
+    usage = appGPT.api_usage.get_usage()
+    route_stats = appGPT.ptv_manager.get_stats()
+    stub_stats = stub.get_stats()
+    stub.stop()
+
+    geocoding_calls = sum(n for e, n in usage['calls'].items() if e.startswith('geocoding'))
+    geocoding_saved = sum(n for e, n in usage['saved'].items() if e.startswith('geocoding'))
+    routing_calls = sum(n for e, n in usage['calls'].items() if not e.startswith('geocoding'))
+    routing_saved = sum(n for e, n in usage['saved'].items() if not e.startswith('geocoding'))
+    return {
+        'rows': args.run_one,
+        'seconds': round(elapsed, 3),
+        'rows_per_s': round(args.run_one / elapsed, 2) if elapsed else 0.0,
+        'stub_requests': stub_stats['requests'],
+        'stub_errors': sum(stub_stats['errors'].values()),
+        'stub_throttled': sum(stub_stats['throttled'].values()),
+        'ptv_calls': usage['total_calls'],
+        'ptv_saved': usage['total_saved'],
+        'geocoding_hit_rate': _hit_rate(geocoding_saved, geocoding_calls),
+        'route_hit_rate': _hit_rate(routing_saved, routing_calls),
+        'route_cache': {k: route_stats[k] for k in ('hit_rate', 'cache_size', 'route_bytes')},
+        'polyline_cache': appGPT.polyline_cache.get_stats(),
+        # ru_maxrss w Linuksie podawane jest w KiB
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_size(rows: int, args) -> dict:
+    """Uruchamia pomiar jednego rozmiaru w osobnym procesie."""
+    command = [
+        sys.executable, '-m', 'benchmarks.bench_tenders', '--run-one', str(rows),
+        '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+        '--error-rate', str(args.error_rate), '--rate-limit', str(args.rate_limit),
+        '--repeat-ratio', str(args.repeat_ratio), '--waypoint-rate', str(args.waypoint_rate),
+        '--columns', str(args.columns), '--seed', str(args.seed), '--mode', args.mode,
+    ]
+    if args.recordings:
+        command += ['--recordings', args.recordings]
+    completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark {rows} wierszy zakończony błędem:\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_table(results) -> None:
+    header = f"{'wiersze':>8} {'czas [s]':>9} {'wiersze/s':>10} {'PTV':>7} {'cache':>7} " \
+             f"{'geo hit%':>9} {'trasy hit%':>10} {'pamięć MB':>10}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['rows']:>8} {r['seconds']:>9} {r['rows_per_s']:>10} {r['ptv_calls']:>7} {r['ptv_saved']:>7} "
+              f"{r['geocoding_hit_rate']:>9} {r['route_hit_rate']:>10} {r['peak_rss_mb']:>10}")
+
+
+def compare(results, baseline, tolerance: float):
+    """
+    Porównuje wyniki z zapisanymi.
+
+    Returns:
+        Lista opisów regresji (pusta - brak regresji)
+    """
+    previous = {r['rows']: r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get(r['rows'])
+        if base is None:
+            continue
+        if r['rows_per_s'] < base['rows_per_s'] * (1 - tolerance):
+            regressions.append(f"{r['rows']} wierszy: {r['rows_per_s']} wierszy/s (było {base['rows_per_s']})")
+        if r['ptv_calls'] > base['ptv_calls']:
+            regressions.append(f"{r['rows']} wierszy: {r['ptv_calls']} zapytań PTV (było {base['ptv_calls']})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark wyceny przetargów na serwerze-zaślepce')
+    parser.add_argument('--rows', type=int, nargs='+', default=list(DEFAULT_ROWS))
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0)
+    parser.add_argument('--recordings', default=None, help='Katalog nagranych odpowiedzi')
+    parser.add_argument('--repeat-ratio', type=float, default=0.7, help='Udział powtórzonych relacji')
+    parser.add_argument('--waypoint-rate', type=float, default=0.1, help='Udział wierszy z punktami pośrednimi')
+    parser.add_argument('--columns', type=int, choices=(6, 7, 8), default=6, help='Układ pliku')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mode', choices=('precise', 'estimate'), default='precise', help='Tryb wyceny')
+    parser.add_argument('--save', default=None, help='Zapisz wyniki do pliku JSON')
+    parser.add_argument('--baseline', default=None, help='Porównaj z wynikami z pliku JSON')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Dopuszczalny spadek wierszy/s')
+    parser.add_argument('--run-one', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one is not None:
+        print(json.dumps(run_one(args)))
+        return
+
+    results = [run_size(rows, args) for rows in args.rows]
+    print_table(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESJA: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
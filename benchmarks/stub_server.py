@@ -0,0 +1,407 @@
+"""
+Lokalny serwer-zaślepka PTV API i Nominatim do benchmarków.
+
+Emuluje endpointy używane przez aplikację:
+- GET  /routing/v1/routes                    - trasa (legs, polyline, opłaty)
+- POST /routing/v1/routes/batch              - wiele tras naraz
+- GET  /geocoding/v1/locations/by-address    - geokodowanie strukturyzowane
+- GET  /geocoding/v1/locations/by-text       - geokodowanie tekstowe
+- GET  /search                               - Nominatim
+
+Odpowiedzi są syntetyczne i deterministyczne: współrzędne wynikają z kraju
+i kodu pocztowego, trasa to odcinek wielkiego koła z dystansem drogowym
+~1.25 x dystans w linii prostej, a opłaty naliczane są od kilometrów w
+krajach wyliczonych lokalnie z geometrii trasy (RouteGeometry).
+
+Nagrane odpowiedzi: jeśli katalog recordings_dir zawiera plik
+<endpoint>/<recording_key>.json, zwracana jest jego zawartość zamiast
+odpowiedzi syntetycznej (recording_key - skrót ścieżki, parametrów bez
+apiKey i treści zapytania).
+
+Serwer symuluje opóźnienie (latency_ms +/- jitter_ms), losowe błędy 503
+(error_rate) i limit zapytań na sekundę (rate_limit - odpowiedź 429).
+
+Uruchomienie samodzielne:
+    python -m benchmarks.stub_server --port 8765 --latency-ms 50
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+
+from app.config.countries import ISO_CODES
+from app.utils.route_geometry import OFFSHORE_KEY, RouteGeometry
+
+# Przybliżone środki krajów [lat, lon] - punkt odniesienia syntetycznego geokodowania
+COUNTRY_CENTERS = {
+    'PL': (52.0, 19.5), 'DE': (51.0, 10.3), 'FR': (46.6, 2.4), 'IT': (43.0, 12.5),
+    'ES': (40.3, -3.7), 'NL': (52.2, 5.5), 'BE': (50.6, 4.6), 'CZ': (49.8, 15.5),
+    'AT': (47.6, 14.1), 'SK': (48.7, 19.5), 'SI': (46.1, 14.8), 'HU': (47.1, 19.4),
+    'PT': (39.7, -8.1), 'GR': (39.3, 22.0), 'CH': (46.8, 8.2), 'DK': (56.0, 9.3),
+    'SE': (59.5, 15.5), 'LT': (55.3, 23.9), 'LV': (56.9, 24.6), 'EE': (58.7, 25.5),
+    'RO': (45.9, 24.9), 'BG': (42.7, 25.3), 'HR': (45.3, 16.0), 'LU': (49.8, 6.1),
+    'GB': (52.5, -1.5), 'IE': (53.2, -7.9), 'NO': (60.5, 9.0), 'FI': (62.0, 25.5),
+}
+
+# Nazwa kraju (jak w aplikacji) -> kod ISO
+COUNTRY_NAME_TO_ISO = {name.upper(): iso.upper() for name, iso in ISO_CODES.items()}
+
+# Stawka opłat drogowych w odpowiedzi syntetycznej [EUR/km]
+TOLL_RATE_EUR_KM = 0.18
+ROAD_FACTOR = 1.25
+POLYLINE_POINTS = 60
+
+
+@dataclass
+class StubConfig:
+    """
+    Parametry serwera-zaślepki.
+
+    Attributes:
+        latency_ms: Średnie opóźnienie odpowiedzi [ms]
+        jitter_ms: Maksymalne odchylenie opóźnienia [ms]
+        error_rate: Udział odpowiedzi 503 (0.0 - 1.0)
+        rate_limit: Limit zapytań na sekundę (0 - bez limitu)
+        recordings_dir: Katalog nagranych odpowiedzi (opcjonalny)
+        seed: Ziarno generatora (powtarzalne błędy i opóźnienia)
+    """
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit: float = 0.0
+    recordings_dir: Optional[str] = None
+    seed: int = 42
+
+
+def recording_key(path: str, params: List[Tuple[str, str]], body: bytes = b'') -> str:
+    """
+    Klucz nagranej odpowiedzi.
+
+    Args:
+        path: Ścieżka zapytania
+        params: Parametry zapytania (apiKey jest pomijany)
+        body: Treść zapytania POST
+
+    Returns:
+        Skrót SHA-1 w postaci heksadecymalnej
+    """
+    query = sorted((k, v) for k, v in params if k != 'apiKey')
+    payload = json.dumps([path, query], ensure_ascii=False).encode('utf-8') + body
+    return hashlib.sha1(payload).hexdigest()
+
+
+def synthetic_position(country: str, postal_code: str = '', locality: str = '') -> Tuple[float, float]:
+    """Deterministyczne współrzędne dla kraju i kodu pocztowego / miejscowości."""
+    iso = COUNTRY_NAME_TO_ISO.get(str(country).upper(), str(country).upper()[:2])
+    lat, lon = COUNTRY_CENTERS.get(iso, (50.0, 10.0))
+    digest = hashlib.md5(f"{iso}|{postal_code}|{locality}".encode('utf-8')).digest()
+    # Przesunięcie do +/- 1.5 stopnia od środka kraju
+    lat += (digest[0] / 255.0 - 0.5) * 3.0
+    lon += (digest[1] / 255.0 - 0.5) * 3.0
+    return round(lat, 5), round(lon, 5)
+
+
+def synthetic_route(points: List[Tuple[float, float]]) -> Dict:
+    """
+    Trasa przez podane punkty w formacie odpowiedzi PTV routing.
+
+    Args:
+        points: Punkty trasy [(lat, lon), ...]
+
+    Returns:
+        Słownik z legs, distance, travelTime, polyline, toll i events
+    """
+    track = []
+    legs = []
+    for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+        t = np.linspace(0.0, 1.0, POLYLINE_POINTS)
+        segment = np.column_stack([lat1 + (lat2 - lat1) * t, lon1 + (lon2 - lon1) * t])
+        track.append(segment if not track else segment[1:])
+        km = RouteGeometry(segment).total_km * ROAD_FACTOR
+        legs.append({'distance': int(km * 1000), 'travelTime': int(km / 70.0 * 3600)})
+    path = np.vstack(track) if track else np.empty((0, 2))
+
+    geometry = RouteGeometry(path)
+    country_km = {
+        code: km * ROAD_FACTOR for code, km in geometry.distance_by_country().items()
+        if code != OFFSHORE_KEY and km > 0
+    }
+    countries = [
+        {'countryCode': code, 'convertedPrice': {'price': round(km * TOLL_RATE_EUR_KM, 2), 'currency': 'EUR'}}
+        for code, km in country_km.items()
+    ]
+    total_toll = round(sum(c['convertedPrice']['price'] for c in countries), 2)
+    polyline = json.dumps({'type': 'LineString', 'coordinates': [[round(lon, 5), round(lat, 5)] for lat, lon in path]})
+    distance = sum(leg['distance'] for leg in legs)
+    return {
+        'distance': distance,
+        'travelTime': sum(leg['travelTime'] for leg in legs),
+        'legs': legs,
+        'polyline': polyline,
+        'toll': {
+            'costs': {'convertedPrice': {'price': total_toll, 'currency': 'EUR'}, 'countries': countries},
+            'sections': [],
+            'systems': [
+                {'name': f'Toll {c["countryCode"]}', 'type': 'DISTANCE_BASED',
+                 'costs': {'convertedPrice': c['convertedPrice']}}
+                for c in countries
+            ],
+        },
+        'events': [],
+    }
+
+
+def _parse_waypoints(values: List[str]) -> List[Tuple[float, float]]:
+    points = []
+    for value in values:
+        lat, lon = value.split(',')[:2]
+        points.append((float(lat), float(lon)))
+    return points
+
+
+class StubState:
+    """Konfiguracja i liczniki serwera (współdzielone przez wątki obsługi)."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.throttled: Dict[str, int] = defaultdict(int)
+        self.replayed = 0
+        self._recent = deque()
+
+    def admit(self, endpoint: str) -> Tuple[bool, bool, float]:
+        """Zwraca (przepuścić, zwrócić błąd, opóźnienie [s]) dla zapytania."""
+        config = self.config
+        with self.lock:
+            self.requests[endpoint] += 1
+            now = time.monotonic()
+            if config.rate_limit > 0:
+                while self._recent and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= config.rate_limit:
+                    self.throttled[endpoint] += 1
+                    return False, False, 0.0
+                self._recent.append(now)
+            fail = self.random.random() < config.error_rate
+            if fail:
+                self.errors[endpoint] += 1
+            jitter = self.random.uniform(-config.jitter_ms, config.jitter_ms) if config.jitter_ms else 0.0
+        return True, fail, max(config.latency_ms + jitter, 0.0) / 1000.0
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'total_requests': sum(self.requests.values()),
+                'errors': dict(self.errors),
+                'throttled': dict(self.throttled),
+                'replayed': self.replayed,
+            }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Obsługa zapytań - endpoint wybierany po ścieżce."""
+
+    server_version = 'PTVStub/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    ROUTES = {
+        ('GET', '/routing/v1/routes'): 'routing',
+        ('POST', '/routing/v1/routes/batch'): 'batch',
+        ('GET', '/geocoding/v1/locations/by-address'): 'geocoding_by_address',
+        ('GET', '/geocoding/v1/locations/by-text'): 'geocoding_by_text',
+        ('GET', '/search'): 'nominatim',
+    }
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method: str) -> None:
+        state: StubState = self.server.state
+        url = urlparse(self.path)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)) if method == 'POST' else b''
+
+        endpoint = self.ROUTES.get((method, url.path))
+        if endpoint is None:
+            self._send(404, {'description': f'Nieznany endpoint {url.path}'})
+            return
+
+        admitted, fail, delay = state.admit(endpoint)
+        if not admitted:
+            self._send(429, {'description': 'Too Many Requests'})
+            return
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self._send(503, {'description': 'Service Unavailable'})
+            return
+
+        recorded = self._recorded(state, endpoint, url.path, params, body)
+        if recorded is not None:
+            self._send(200, recorded)
+            return
+
+        handler = getattr(self, f'_{endpoint}')
+        self._send(200, handler(params, body))
+
+    def _recorded(self, state: StubState, endpoint: str, path: str,
+                  params: List[Tuple[str, str]], body: bytes) -> Optional[object]:
+        recordings_dir = state.config.recordings_dir
+        if not recordings_dir:
+            return None
+        file_path = os.path.join(recordings_dir, endpoint, recording_key(path, params, body) + '.json')
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, encoding='utf-8') as f:
+            data = json.load(f)
+        with state.lock:
+            state.replayed += 1
+        return data
+
+    def _send(self, status: int, payload: object) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # --- Endpointy ---
+
+    def _routing(self, params, body):
+        return synthetic_route(_parse_waypoints([v for k, v in params if k == 'waypoints']))
+
+    def _batch(self, params, body):
+        request = json.loads(body or b'{}')
+        points = _parse_waypoints(request.get('waypoints', []))
+        return {'routes': [synthetic_route(points[i:i + 2]) for i in range(0, len(points) - 1, 2)]}
+
+    def _geocoding_by_address(self, params, body):
+        query = dict(params)
+        country = query.get('country', '')
+        postal_code = query.get('postalCode', '')
+        locality = query.get('locality', '')
+        return {'locations': [self._location(country, postal_code, locality)]}
+
+    def _geocoding_by_text(self, params, body):
+        query = dict(params)
+        text = query.get('searchText', '')
+        country = query.get('countryFilter', '')
+        postal_code = ''.join(ch for ch in text if ch.isdigit())
+        return {'locations': [self._location(country, postal_code, text)]}
+
+    @staticmethod
+    def _location(country: str, postal_code: str, locality: str) -> Dict:
+        iso = COUNTRY_NAME_TO_ISO.get(str(country).upper(), str(country).upper()[:2])
+        lat, lon = synthetic_position(iso, postal_code, '' if postal_code else locality)
+        return {
+            'referencePosition': {'latitude': lat, 'longitude': lon},
+            'locationType': 'LOCALITY',
+            'address': {'countryCode': iso, 'postalCode': postal_code, 'city': locality},
+            'formattedAddress': f'{postal_code} {locality}, {iso}'.strip(),
+            'quality': {'totalScore': 90},
+        }
+
+    def _nominatim(self, params, body):
+        query = dict(params)
+        text = query.get('q', '')
+        iso = query.get('countrycodes', '').upper()[:2]
+        postal_code = ''.join(ch for ch in text if ch.isdigit())
+        lat, lon = synthetic_position(iso, postal_code, text)
+        return [{
+            'lat': str(lat), 'lon': str(lon),
+            'display_name': text,
+            'osm_type': 'relation',
+            'boundingbox': [str(lat - 0.05), str(lat + 0.05), str(lon - 0.05), str(lon + 0.05)],
+            'address': {'postcode': postal_code or '00', 'country_code': iso.lower()},
+        }]
+
+
+class StubServer:
+    """
+    Serwer-zaślepka uruchamiany w wątku w tle.
+
+    Example:
+        >>> with StubServer(StubConfig(latency_ms=50)) as stub:
+        ...     os.environ['PTV_API_BASE_URL'] = stub.url
+    """
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.config = config or StubConfig()
+        self.state = StubState(self.config)
+        self.httpd = ThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        return f'{self.httpd.server_address[0]}:{self.httpd.server_address[1]}'
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}'
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name='PTVStubServer')
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get_stats(self) -> Dict:
+        return self.state.get_stats()
+
+    def __enter__(self) -> 'StubServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serwer-zaślepka PTV API i Nominatim')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0)
+    parser.add_argument('--recordings', default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.recordings)
+    stub = StubServer(config, port=args.port).start()
+    print(f"Serwer-zaślepka: {stub.url} (PTV_API_BASE_URL={stub.url}, NOMINATIM_DOMAIN={stub.host}, NOMINATIM_SCHEME=http)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""
+Generator syntetycznych przetargów do testów obciążeniowych i skalowania.
+
+Lokalizacje losowane są z prefiksów kodów pocztowych global_data.csv
+(z miastem) oraz z mapowania regionów app/config/regions.py (prefiksy,
+których nie ma w global_data.csv) - tylko z krajów obsługiwanych przez
+ISO_CODES i ze znanym regionem, więc wiersze przechodzą pełną ścieżkę
+geokodowania, stawek i marży.
+
+Parametry profilu (TenderProfile):
+- udział krajów (country_mix),
+- udział powtórzonych relacji (repeat_ratio) - popularne relacje
+  powtarzają się częściej,
+- szum w miastach: brak miasta, literówki, wielkość liter, brak polskich
+  znaków; nazwy krajów jako kod ISO, nazwa angielska lub polska,
+- punkty pośrednie (kolumna Punkty_posrednie) i transit time,
+- układ pliku: 6, 7 lub 8 kolumn (jak akceptuje process_przetargi).
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python -m benchmarks.tender_generator --rows 1000 --columns 8 --repeat-ratio 0.7 -o przetarg.xlsx
+"""
+
+import argparse
+import random
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.config.countries import COUNTRY_MAPPING, ISO_CODES, normalize_country
+from app.config.regions import REGION_DATA_RAW, get_region_for_location, parse_region_data
+
+GLOBAL_DATA_FILE = 'global_data.csv'
+
+# Domyślny udział krajów (kody ISO) - zbliżony do typowych przetargów
+DEFAULT_COUNTRY_MIX = {
+    'PL': 20, 'DE': 25, 'FR': 10, 'IT': 8, 'NL': 7, 'BE': 5, 'ES': 5, 'CZ': 5,
+    'AT': 4, 'HU': 3, 'SK': 2, 'RO': 2, 'DK': 2,
+}
+
+# Liczba cyfr pełnego kodu pocztowego (kraje spoza listy - tylko prefiks)
+POSTAL_CODE_DIGITS = {
+    'PL': 5, 'DE': 5, 'FR': 5, 'IT': 5, 'ES': 5, 'CZ': 5, 'SK': 5, 'LT': 5, 'EE': 5, 'HR': 5,
+    'RO': 6, 'NL': 4, 'BE': 4, 'AT': 4, 'CH': 4, 'DK': 4, 'HU': 4, 'LU': 4, 'SI': 4,
+    'BG': 4, 'PT': 4, 'LV': 4,
+}
+
+# Nagłówki jak we wzorze pliku (Wzor_do_przetargow.xlsx)
+LOADING_COLUMNS = ['kraj zaladunku', 'kod pocztowy zaladunku', 'miasto zaladunku']
+UNLOADING_COLUMNS = ['kraj rozladunku', 'kod pocztowy rozladunku', 'miasto rozladunku']
+WAYPOINTS_COLUMN = 'Punkty_posrednie'
+TRANSIT_TIME_COLUMN = 'transit time'
+
+# (kod ISO, prefiks kodu pocztowego, miasto)
+Location = Tuple[str, str, str]
+
+
+@dataclass
+class TenderProfile:
+    """
+    Parametry generowanego przetargu.
+
+    Attributes:
+        country_mix: Wagi krajów (kod ISO -> waga)
+        repeat_ratio: Udział wierszy powtarzających wcześniejszą relację
+        full_postal_rate: Udział pełnych kodów pocztowych (reszta - prefiks)
+        city_rate: Udział lokalizacji z podanym miastem
+        typo_rate: Udział miast z literówką
+        case_noise_rate: Udział miast z losową wielkością liter lub bez polskich znaków
+        country_alias_rate: Udział krajów podanych nazwą zamiast kodem ISO
+        waypoint_rate: Udział wierszy z punktami pośrednimi (układ 8 kolumn)
+        max_waypoints: Maksymalna liczba punktów pośrednich
+        transit_rate: Udział wierszy z transit time (układ 7 i 8 kolumn)
+        columns: Układ pliku: 6, 7 lub 8 kolumn
+        seed: Ziarno generatora
+    """
+
+    country_mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_COUNTRY_MIX))
+    repeat_ratio: float = 0.7
+    full_postal_rate: float = 0.6
+    city_rate: float = 0.5
+    typo_rate: float = 0.05
+    case_noise_rate: float = 0.1
+    country_alias_rate: float = 0.2
+    waypoint_rate: float = 0.1
+    max_waypoints: int = 2
+    transit_rate: float = 0.5
+    columns: int = 6
+    seed: int = 42
+
+
+def load_location_pool(global_data_file: str = GLOBAL_DATA_FILE) -> Dict[str, List[Location]]:
+    """
+    Zwraca lokalizacje ze znanym regionem, pogrupowane według kraju.
+
+    Args:
+        global_data_file: Ścieżka do global_data.csv
+
+    Returns:
+        Słownik kod ISO -> lista (kod ISO, prefiks, miasto)
+    """
+    region_mapping = parse_region_data(REGION_DATA_RAW, normalize_country)
+    pool: Dict[str, List[Location]] = {}
+    seen = set()
+
+    global_data = pd.read_csv(global_data_file, dtype=str, keep_default_na=False)
+    for iso, prefix, city in zip(global_data['country'], global_data['prefix'], global_data['city']):
+        if get_region_for_location(region_mapping, iso, prefix, normalize_country) == 'NIEZNANY':
+            continue
+        if not ISO_CODES.get(normalize_country(iso)):
+            continue
+        pool.setdefault(iso, []).append((iso, prefix, city))
+        seen.add((iso, prefix))
+
+    # Prefiksy z mapowania regionów bez odpowiednika w global_data.csv (bez miasta)
+    for country, prefix in region_mapping:
+        iso = ISO_CODES.get(country, '').upper()
+        if iso and prefix and (iso, prefix) not in seen:
+            pool.setdefault(iso, []).append((iso, prefix, ''))
+            seen.add((iso, prefix))
+    return pool
+
+
+def _country_aliases() -> Dict[str, List[str]]:
+    """Kod ISO -> nazwy kraju (angielska i polskie), którymi może być podany."""
+    aliases: Dict[str, List[str]] = {}
+    for alias, english in COUNTRY_MAPPING.items():
+        iso = ISO_CODES.get(english, '').upper()
+        if iso and len(alias) > 2:
+            aliases.setdefault(iso, []).append(alias)
+    return aliases
+
+
+def _strip_diacritics(text: str) -> str:
+    text = text.replace('ł', 'l').replace('Ł', 'L')
+    return ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch))
+
+
+class TenderGenerator:
+    """Generator wierszy przetargu według profilu."""
+
+    def __init__(self, profile: Optional[TenderProfile] = None, pool: Optional[Dict[str, List[Location]]] = None):
+        """
+        Args:
+            profile: Parametry przetargu (domyślnie TenderProfile())
+            pool: Pula lokalizacji (domyślnie load_location_pool())
+        """
+        self.profile = profile or TenderProfile()
+        if self.profile.columns not in (6, 7, 8):
+            raise ValueError(f"Nieobsługiwany układ pliku: {self.profile.columns} kolumn")
+        self.pool = pool if pool is not None else load_location_pool()
+        self.rng = random.Random(self.profile.seed)
+        self.countries = [iso for iso in self.profile.country_mix if self.pool.get(iso)]
+        if not self.countries:
+            raise ValueError("Żaden kraj z country_mix nie ma lokalizacji w puli")
+        self.weights = [self.profile.country_mix[iso] for iso in self.countries]
+        self.aliases = _country_aliases()
+
+    def _location(self) -> Location:
+        iso = self.rng.choices(self.countries, self.weights)[0]
+        return self.rng.choice(self.pool[iso])
+
+    def _postal_code(self, iso: str, prefix: str) -> str:
+        digits = POSTAL_CODE_DIGITS.get(iso)
+        if not digits or not prefix.isdigit() or self.rng.random() >= self.profile.full_postal_rate:
+            return prefix
+        code = prefix + ''.join(str(self.rng.randint(0, 9)) for _ in range(digits - len(prefix)))
+        if iso == 'PL':
+            code = f'{code[:2]}-{code[2:]}'
+        return code
+
+    def _country(self, iso: str) -> str:
+        aliases = self.aliases.get(iso)
+        if aliases and self.rng.random() < self.profile.country_alias_rate:
+            return self.rng.choice(aliases)
+        return iso
+
+    def _typo(self, city: str) -> str:
+        if len(city) < 4:
+            return city
+        i = self.rng.randint(1, len(city) - 2)
+        kind = self.rng.randint(0, 2)
+        if kind == 0:
+            return city[:i] + city[i + 1] + city[i] + city[i + 2:]
+        if kind == 1:
+            return city[:i] + city[i + 1:]
+        return city[:i] + city[i] + city[i:]
+
+    def _city(self, city: str) -> str:
+        profile = self.profile
+        if not city or self.rng.random() >= profile.city_rate:
+            return ''
+        if self.rng.random() < profile.typo_rate:
+            city = self._typo(city)
+        if self.rng.random() < profile.case_noise_rate:
+            city = self.rng.choice([city.upper(), city.lower(), _strip_diacritics(city)])
+        return city
+
+    def _endpoint(self, location: Location) -> List[str]:
+        iso, prefix, city = location
+        return [self._country(iso), self._postal_code(iso, prefix), self._city(city)]
+
+    def _waypoints(self) -> str:
+        if self.rng.random() >= self.profile.waypoint_rate:
+            return ''
+        points = []
+        for _ in range(self.rng.randint(1, max(1, self.profile.max_waypoints))):
+            iso, prefix, city = self._location()
+            point = f'{iso}:{self._postal_code(iso, prefix)}'
+            points.append(f'{point}:{city}' if city and self.rng.random() < 0.5 else point)
+        return ';'.join(points)
+
+    def _transit_time(self) -> str:
+        if self.rng.random() >= self.profile.transit_rate:
+            return ''
+        return str(self.rng.choice([1, 1.5, 2, 2.5, 3, 4, 5]))
+
+    def generate(self, rows: int) -> pd.DataFrame:
+        """
+        Generuje przetarg.
+
+        Args:
+            rows: Liczba wierszy
+
+        Returns:
+            DataFrame z nagłówkami jak we wzorze pliku (6, 7 lub 8 kolumn)
+        """
+        profile = self.profile
+        # Relacja zapisana w postaci tekstowej - powtórzenie daje identyczne komórki
+        lanes: List[List[str]] = []
+        data = []
+        for _ in range(rows):
+            if lanes and self.rng.random() < profile.repeat_ratio:
+                # Rozkład skośny - najwcześniejsze (najpopularniejsze) relacje powtarzają się najczęściej
+                lane = lanes[int(len(lanes) * self.rng.random() ** 2)]
+            else:
+                lane = self._endpoint(self._location())
+                if profile.columns == 8:
+                    lane.append(self._waypoints())
+                lane += self._endpoint(self._location())
+                lanes.append(lane)
+
+            row = list(lane)
+            if profile.columns >= 7:
+                row.append(self._transit_time())
+            data.append(row)
+
+        columns = list(LOADING_COLUMNS)
+        if profile.columns == 8:
+            columns.append(WAYPOINTS_COLUMN)
+        columns += UNLOADING_COLUMNS
+        if profile.columns >= 7:
+            columns.append(TRANSIT_TIME_COLUMN)
+        return pd.DataFrame(data, columns=columns)
+
+
+def generate_tender(rows: int, profile: Optional[TenderProfile] = None) -> pd.DataFrame:
+    """
+    Generuje syntetyczny przetarg.
+
+    Args:
+        rows: Liczba wierszy
+        profile: Parametry przetargu (domyślnie TenderProfile())
+
+    Returns:
+        DataFrame z nagłówkami jak we wzorze pliku
+    """
+    return TenderGenerator(profile).generate(rows)
+
+
+def parse_country_mix(spec: str) -> Dict[str, float]:
+    """
+    Parsuje udział krajów w formacie 'PL=20,DE=25,FR=10'.
+
+    Returns:
+        Słownik kod ISO -> waga
+    """
+    mix = {}
+    for item in spec.split(','):
+        if '=' in item:
+            iso, weight = item.split('=', 1)
+            mix[iso.strip().upper()] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generator syntetycznych przetargów')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--columns', type=int, choices=(6, 7, 8), default=6)
+    parser.add_argument('--repeat-ratio', type=float, default=0.7)
+    parser.add_argument('--countries', default=None, help="Udział krajów, np. 'PL=20,DE=25,FR=10'")
+    parser.add_argument('--city-rate', type=float, default=0.5)
+    parser.add_argument('--typo-rate', type=float, default=0.05)
+    parser.add_argument('--waypoint-rate', type=float, default=0.1)
+    parser.add_argument('--transit-rate', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output', default='przetarg_syntetyczny.xlsx')
+    args = parser.parse_args()
+
+    profile = TenderProfile(
+        repeat_ratio=args.repeat_ratio, city_rate=args.city_rate, typo_rate=args.typo_rate,
+        waypoint_rate=args.waypoint_rate, transit_rate=args.transit_rate,
+        columns=args.columns, seed=args.seed,
+    )
+    if args.countries:
+        profile.country_mix = parse_country_mix(args.countries)
+
+    df = generate_tender(args.rows, profile)
+    df.to_excel(args.output, index=False)
+    print(f"Zapisano {len(df)} wierszy ({args.columns} kolumn) do {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,16 @@
+from collections import deque
 from queue import Queue
-from threading import Thread, Lock
+import contextvars
+from threading import Thread, Lock, current_thread
 import time
 import math
 from datetime import datetime, timedelta
 import requests
 import logging
 import traceback
+import uuid
+import os
+import pickle
 
 # =============================================================================
 # Import danych promów z modułu konfiguracji
@@ -21,13 +26,48 @@ from app.config.ferry_data import (
     get_ferry_cost,
     get_ferry_sea_distance,
 )
+from app.config.settings import (
+    PTV_API_BASE_URL,
+    ROUTE_CACHE_REFRESH_AHEAD_HOURS,
+    ROUTE_CACHE_STALE_DAYS,
+    ROUTE_CACHE_REFRESH_BUDGET_PER_HOUR,
+    ROUTE_CACHE_REFRESH_MAX_PENDING,
+)
+from app.services.job_queue import current_job_id
+from app.utils.single_flight import SingleFlight
+from app.services.metrics import metrics
+from app.services.api_usage import (
+    create_api_usage_tracker,
+    ENDPOINT_ROUTING,
+    ENDPOINT_BATCH,
+    ENDPOINT_GB_SUBROUTE,
+    OUTCOME_CACHE,
+    OUTCOME_SHARED,
+    OUTCOME_LOCAL,
+)
+from app.utils.logging_config import lazy_json
+from app.models.route_record import RouteRecord, serialize_route_record, deserialize_route_record
+from app.utils.route_geometry import RouteGeometry, OFFSHORE_KEY, SIMPLIFIED_PART_SEPARATOR, simplify_polyline
 
-# Konfiguracja loggera - zmiana poziomu na DEBUG aby pokazać wszystkie logi
-logging.basicConfig(level=logging.DEBUG)
+# Poziom logowania ustawiany centralnie (app/utils/logging_config.py, LOG_MODULE_LEVELS)
 logger = logging.getLogger(__name__)
 
 DEFAULT_ROUTING_MODE = "FAST"
 
+# Dover - główny port promowy GB (punkt docelowy zapytania o dystans w GB)
+DOVER_COORDS = (51.1279, 1.3134)
+
+# Siatka przyciągania punktu w GB do klucza cache [stopnie, ~1 km]
+GB_POINT_SNAP_DECIMALS = 2
+
+# Stan wpisu cache tras (RouteCacheManager.lookup)
+CACHE_FRESH = 'fresh'      # ważny
+CACHE_REFRESH = 'refresh'  # ważny, bliski wygaśnięcia - do odświeżenia w tle
+CACHE_STALE = 'stale'      # wygasły, zwracany z flagą 'stale' i odświeżany w tle
+
+# Zadanie, pod którym liczone są zapytania odświeżania tras w tle (/admin/api_usage)
+ROUTE_REFRESH_JOB_ID = 'route-refresh'
+
 # =============================================================================
 # UWAGA: Poniższe definicje są NADPISANE przez import z app/config/ferry_data.py
 # Pozostawione jako backup/dokumentacja. Docelowo do usunięcia.
@@ -1000,23 +1040,59 @@ class PTVRequestQueue:
         self.max_requests_per_second = max_requests_per_second
         self.last_request_time = 0
         self.api_key = api_key
+        self.worker_thread = None
         self._start_worker()
 
+    def in_worker(self):
+        """Czy bieżący kod wykonuje się w wątku roboczym kolejki"""
+        return current_thread() is self.worker_thread
+
+    def call(self, func, *args, max_wait=30, **kwargs):
+        """
+        Wykonuje zapytanie z zachowaniem limitu zapytań kolejki.
+        
+        Wywołane z wątku roboczego (np. z process_toll_costs) wykonuje funkcję
+        od razu po odczekaniu limitu - dodanie do kolejki zablokowałoby jedyny
+        wątek roboczy. W pozostałych wątkach zapytanie trafia do kolejki.
+        """
+        if self.in_worker():
+            self._rate_limit()
+            return func(*args, **kwargs)
+        
+        request_id = f"call_{uuid.uuid4().hex}"
+        self.add_request(request_id, func, *args, **kwargs)
+        start_time = time.time()
+        while time.time() - start_time < max_wait:
+            result = self.get_result(request_id)
+            if result is not None:
+                with self.lock:
+                    self.results.pop(request_id, None)
+                return result['data'] if result['status'] == 'success' else None
+            time.sleep(0.1)
+        logger.warning(f"Timeout oczekiwania na wynik zapytania ({max_wait}s)")
+        return None
+
     def _start_worker(self):
         def worker():
             while True:
-                request_id, func, args, kwargs = self.queue.get()
+                request_id, context, func, args, kwargs = self.queue.get()
                 self._rate_limit()
                 try:
-                    result = func(*args, **kwargs)
-                    with self.lock:
-                        self.results[request_id] = {'status': 'success', 'data': result}
+                    # Kontekst zlecającego (zadanie, sesja) - liczniki i metryki trafiają do właściwego zadania
+                    result = context.run(func, *args, **kwargs)
+                    if request_id is not None:
+                        with self.lock:
+                            self.results[request_id] = {'status': 'success', 'data': result}
                 except Exception as e:
-                    with self.lock:
-                        self.results[request_id] = {'status': 'error', 'error': str(e)}
+                    if request_id is not None:
+                        with self.lock:
+                            self.results[request_id] = {'status': 'error', 'error': str(e)}
+                    else:
+                        logger.warning(f"Zapytanie w tle zakończone błędem: {e}")
                 self.queue.task_done()
 
-        Thread(target=worker, daemon=True).start()
+        self.worker_thread = Thread(target=worker, daemon=True, name="PTVRequestWorker")
+        self.worker_thread.start()
 
     def _rate_limit(self):
         current_time = time.time()
@@ -1026,7 +1102,11 @@ class PTVRequestQueue:
         self.last_request_time = time.time()
 
     def add_request(self, request_id, func, *args, **kwargs):
-        self.queue.put((request_id, func, args, kwargs))
+        self.queue.put((request_id, contextvars.copy_context(), func, args, kwargs))
+
+    def add_background_request(self, func, *args, **kwargs):
+        """Dodaje zapytanie bez oczekiwania na wynik (wynik nie jest przechowywany)"""
+        self.add_request(None, func, *args, **kwargs)
 
     def get_result(self, request_id):
         with self.lock:
@@ -1040,12 +1120,39 @@ class PTVRequestQueue:
                           current_time - v._creation_time < max_age}
 
 class RouteCacheManager:
-    def __init__(self, cache_duration=timedelta(days=7)):
+    """
+    Cache wyników tras w pamięci (domyślnie 7 dni).
+
+    Trasy przechowywane są jako zwarte RouteRecord, a słownik wyniku
+    odtwarzany jest przy odczycie. Wpis to krotka (dane, timestamp).
+
+    Wpis przechodzi przez stany (lookup):
+    - CACHE_FRESH - młodszy niż cache_duration - refresh_ahead,
+    - CACHE_REFRESH - ważny, ale bliski wygaśnięcia,
+    - CACHE_STALE - wygasły, lecz młodszy niż cache_duration + stale_duration.
+    Starsze wpisy są usuwane. get/peek/contains zwracają tylko ważne wpisy.
+
+    Indeks krajów (kod ISO -> klucze tras przejeżdżających przez kraj,
+    z toll_details i country_distances_km) pozwala unieważnić trasy przez
+    kraj, w którym zmieniła się taryfa opłat drogowych (invalidate_countries).
+    """
+
+    def __init__(self, cache_duration=timedelta(days=7),
+                 refresh_ahead=timedelta(hours=ROUTE_CACHE_REFRESH_AHEAD_HOURS),
+                 stale_duration=timedelta(days=ROUTE_CACHE_STALE_DAYS)):
         self.cache = {}
         self.cache_duration = cache_duration
-        self.stats = {'hits': 0, 'misses': 0}
+        self.refresh_ahead = refresh_ahead
+        self.stale_duration = stale_duration
+        self.stats = {'hits': 0, 'misses': 0, 'stale_hits': 0, 'invalidated': 0}
+        self.country_index = {}
         self.lock = Lock()
 
+    @property
+    def max_age(self):
+        """Wiek, po którym wpis jest usuwany (ważność + okres zwracania nieaktualnych tras)"""
+        return self.cache_duration + self.stale_duration
+
     def _generate_key(self, coord_from, coord_to, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia=True):
         return (
             tuple(coord_from),
@@ -1056,37 +1163,240 @@ class RouteCacheManager:
             routing_mode,
         )
 
+    def _get_entry(self, key, count_stats=True):
+        """Zwraca ważne dane wpisu (usuwa starsze niż max_age). Wywoływać pod self.lock."""
+        data, state = self._lookup_entry(key, count_stats=False)
+        if state == CACHE_STALE:
+            data = None
+        if count_stats:
+            self.stats['hits' if data is not None else 'misses'] += 1
+        return data
+
+    def _lookup_entry(self, key, count_stats=True):
+        """Zwraca (dane, stan) wpisu lub (None, None). Wywoływać pod self.lock."""
+        cache_entry = self.cache.get(key)
+        if cache_entry is not None:
+            data, timestamp = cache_entry
+            age = datetime.now() - timestamp
+            if age < self.max_age:
+                if age < self.cache_duration - self.refresh_ahead:
+                    state = CACHE_FRESH
+                elif age < self.cache_duration:
+                    state = CACHE_REFRESH
+                else:
+                    state = CACHE_STALE
+                if count_stats:
+                    self.stats['hits'] += 1
+                    if state == CACHE_STALE:
+                        self.stats['stale_hits'] += 1
+                return data, state
+            self._remove(key)
+        if count_stats:
+            self.stats['misses'] += 1
+        return None, None
+
+    @staticmethod
+    def _route_countries(data):
+        """Kody krajów przejazdu trasy (puste dla wpisów innych niż RouteRecord)"""
+        if not isinstance(data, RouteRecord):
+            return set()
+        countries = {country for country, _ in data.toll_details}
+        countries.update(country for country, _ in data.country_distances_km if country != OFFSHORE_KEY)
+        return countries
+
+    def _store(self, key, data, timestamp):
+        """Zapisuje wpis i aktualizuje indeks krajów. Wywoływać pod self.lock."""
+        self._remove(key)
+        self.cache[key] = (data, timestamp)
+        for country in self._route_countries(data):
+            self.country_index.setdefault(country, set()).add(key)
+
+    def _remove(self, key):
+        """Usuwa wpis i jego klucz z indeksu krajów. Wywoływać pod self.lock."""
+        cache_entry = self.cache.pop(key, None)
+        if cache_entry is None:
+            return
+        for country in self._route_countries(cache_entry[0]):
+            keys = self.country_index.get(country)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.country_index[country]
+
+    def invalidate_countries(self, countries):
+        """
+        Usuwa z cache wszystkie trasy przejeżdżające przez podane kraje.
+
+        Args:
+            countries: Kody ISO krajów (np. ['DE', 'AT'])
+
+        Returns:
+            dict: Kod kraju -> liczba usuniętych tras
+        """
+        removed = {}
+        with self.lock:
+            for country in countries:
+                country = country.strip().upper()
+                keys = list(self.country_index.get(country, ()))
+                for key in keys:
+                    self._remove(key)
+                removed[country] = len(keys)
+                self.stats['invalidated'] += len(keys)
+        return removed
+
+    def route_endpoints(self):
+        """
+        Zwraca trasy z cache jako (start, koniec, RouteRecord).
+
+        Trasy z punktami pośrednimi są pomijane - tylko trasy dwupunktowe
+        (w tym zapisane jako waypoints trasy z obowiązkowym promem).
+        """
+        with self.lock:
+            entries = [(key, data) for key, (data, _) in self.cache.items() if isinstance(data, RouteRecord)]
+        routes = []
+        for key, record in entries:
+            points = key[:2] if len(key) == 6 else key[0]
+            if len(points) == 2:
+                routes.append((points[0], points[1], record))
+        return routes
+
+    def get_country_counts(self):
+        """Zwraca liczbę tras w cache przejeżdżających przez każdy kraj"""
+        with self.lock:
+            return {country: len(keys) for country, keys in sorted(self.country_index.items())}
+
+    def _lookup_result(self, key):
+        with self.lock:
+            data, state = self._lookup_entry(key)
+        result = self._to_result(data)
+        if state == CACHE_STALE:
+            result['stale'] = True
+        return result, state
+
+    @staticmethod
+    def _to_result(data):
+        return data.to_dict() if isinstance(data, RouteRecord) else data
+
     def get(self, coord_from, coord_to, avoid_switzerland=False, avoid_eurotunnel=False, routing_mode=DEFAULT_ROUTING_MODE, avoid_serbia=True):
         with self.lock:
             key = self._generate_key(coord_from, coord_to, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia)
-            if key in self.cache:
-                cache_entry = self.cache[key]
-                if datetime.now() - cache_entry['timestamp'] < self.cache_duration:
-                    self.stats['hits'] += 1
-                    return cache_entry['data']
-                else:
-                    del self.cache[key]
-            self.stats['misses'] += 1
-            return None
+            data = self._get_entry(key)
+        return self._to_result(data)
+
+    def lookup(self, coord_from, coord_to, avoid_switzerland=False, avoid_eurotunnel=False, routing_mode=DEFAULT_ROUTING_MODE, avoid_serbia=True):
+        """
+        Pobiera trasę z cache razem ze stanem wpisu.
+
+        Returns:
+            (wynik, stan) - stan CACHE_FRESH / CACHE_REFRESH / CACHE_STALE,
+            (None, None) gdy trasy nie ma w cache
+        """
+        key = self._generate_key(coord_from, coord_to, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia)
+        return self._lookup_result(key)
+
+    def contains(self, coord_from, coord_to, avoid_switzerland=False, avoid_eurotunnel=False, routing_mode=DEFAULT_ROUTING_MODE, avoid_serbia=True):
+        """Sprawdza, czy ważna trasa jest w cache (bez aktualizacji statystyk)"""
+        with self.lock:
+            key = self._generate_key(coord_from, coord_to, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia)
+            return self._get_entry(key, count_stats=False) is not None
+
+    def peek(self, key):
+        """Zwraca ważny wpis dla gotowego klucza bez aktualizacji statystyk"""
+        with self.lock:
+            data = self._get_entry(key, count_stats=False)
+        return self._to_result(data)
 
     def set(self, coord_from, coord_to, data, avoid_switzerland=False, avoid_eurotunnel=False, routing_mode=DEFAULT_ROUTING_MODE, avoid_serbia=True):
+        record = RouteRecord.from_dict(data)
         with self.lock:
             key = self._generate_key(coord_from, coord_to, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia)
-            self.cache[key] = {
-                'data': data,
-                'timestamp': datetime.now()
-            }
+            self._store(key, record, datetime.now())
 
     def get_stats(self):
         with self.lock:
             total = self.stats['hits'] + self.stats['misses']
             hit_rate = (self.stats['hits'] / total * 100) if total > 0 else 0
-            return {
-                'hit_rate': f"{hit_rate:.2f}%",
-                'total_requests': total,
-                'cache_size': len(self.cache)
-            }
+            records = [data for data, _ in self.cache.values() if isinstance(data, RouteRecord)]
+        route_bytes = sum(record.nbytes() for record in records)
+        return {
+            'hit_rate': f"{hit_rate:.2f}%",
+            'total_requests': total,
+            'stale_hits': self.stats['stale_hits'],
+            'invalidated': self.stats['invalidated'],
+            'countries_indexed': len(self.country_index),
+            'cache_size': len(self.cache),
+            'routes': len(records),
+            'route_bytes': route_bytes,
+            'avg_route_bytes': route_bytes // len(records) if records else 0,
+        }
+
+    def save_to_disk(self, path):
+        """
+        Zapisuje trasy młodsze niż max_age na dysk (RouteRecord serializowane i kompresowane).
+
+        Args:
+            path: Ścieżka pliku kopii zapasowej
+
+        Returns:
+            int: Liczba zapisanych tras
+        """
+        with self.lock:
+            entries = [
+                (key, data, timestamp) for key, (data, timestamp) in self.cache.items()
+                if isinstance(data, RouteRecord) and datetime.now() - timestamp < self.max_age
+            ]
+        payload = [(key, serialize_route_record(data), timestamp) for key, data, timestamp in entries]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return len(payload)
+
+    def load_from_disk(self, path):
+        """
+        Wczytuje trasy zapisane przez save_to_disk (pomija starsze niż max_age).
+
+        Args:
+            path: Ścieżka pliku kopii zapasowej
+
+        Returns:
+            int: Liczba wczytanych tras
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+        loaded = 0
+        with self.lock:
+            for key, blob, timestamp in payload:
+                if datetime.now() - timestamp >= self.max_age:
+                    continue
+                record = deserialize_route_record(blob)
+                if record is not None:
+                    self._store(key, record, timestamp)
+                    loaded += 1
+        return loaded
     
+    def _generate_gb_distance_key(self, gb_point, gb_at_start):
+        return (
+            'gb_distance',
+            round(gb_point[0], GB_POINT_SNAP_DECIMALS),
+            round(gb_point[1], GB_POINT_SNAP_DECIMALS),
+            gb_at_start,
+        )
+
+    def get_gb_distance(self, gb_point, gb_at_start):
+        """Pobiera z cache dystans w GB (w metrach) dla przyciągniętego punktu w GB"""
+        with self.lock:
+            key = self._generate_gb_distance_key(gb_point, gb_at_start)
+            return self._get_entry(key)
+
+    def set_gb_distance(self, gb_point, gb_at_start, distance_m):
+        """Zapisuje w cache dystans w GB (w metrach) dla przyciągniętego punktu w GB"""
+        with self.lock:
+            key = self._generate_gb_distance_key(gb_point, gb_at_start)
+            self._store(key, distance_m, datetime.now())
+
     def _generate_waypoints_key(self, waypoints, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia=True):
         """
         Generuje klucz cache dla trasy z waypoints.
@@ -1099,36 +1409,90 @@ class RouteCacheManager:
         """Pobiera trasę z cache dla waypoints"""
         with self.lock:
             key = self._generate_waypoints_key(waypoints, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia)
-            
-            if key in self.cache:
-                cache_entry = self.cache[key]
-                
-                # Sprawdź ważność
-                if datetime.now() - cache_entry['timestamp'] < self.cache_duration:
-                    self.stats['hits'] += 1
-                    return cache_entry['data']
-                else:
-                    # Wygasł - usuń
-                    del self.cache[key]
-            
-            self.stats['misses'] += 1
-            return None
+            data = self._get_entry(key)
+        return self._to_result(data)
     
+    def lookup_waypoints_route(self, waypoints, avoid_switzerland=False, avoid_eurotunnel=False, routing_mode=DEFAULT_ROUTING_MODE, avoid_serbia=True):
+        """Pobiera trasę z cache dla waypoints razem ze stanem wpisu (jak lookup)"""
+        key = self._generate_waypoints_key(waypoints, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia)
+        return self._lookup_result(key)
+
     def set_waypoints_route(self, waypoints, data, avoid_switzerland=False, avoid_eurotunnel=False, routing_mode=DEFAULT_ROUTING_MODE, avoid_serbia=True):
         """Zapisuje trasę do cache dla waypoints"""
+        record = RouteRecord.from_dict(data)
         with self.lock:
             key = self._generate_waypoints_key(waypoints, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia)
-            self.cache[key] = {
-                'data': data,
-                'timestamp': datetime.now()
-            }
-            logger.debug(f"Cache zapisany dla {len(waypoints)} waypoints")
+            self._store(key, record, datetime.now())
+            logger.debug("Cache zapisany dla %s waypoints", len(waypoints))
 
 class PTVRouteManager:
-    def __init__(self, api_key, cache_duration=timedelta(days=7), max_requests_per_second=10):
+    def __init__(self, api_key, cache_duration=timedelta(days=7), max_requests_per_second=10, usage_tracker=None,
+                 refresh_budget_per_hour=ROUTE_CACHE_REFRESH_BUDGET_PER_HOUR,
+                 refresh_max_pending=ROUTE_CACHE_REFRESH_MAX_PENDING):
         self.api_key = api_key
+        # Licznik zapytań PTV (płatnych i zaoszczędzonych przez cache)
+        self.usage = usage_tracker or create_api_usage_tracker('memory')
         self.request_queue = PTVRequestQueue(api_key, max_requests_per_second)
         self.cache_manager = RouteCacheManager(cache_duration)
+        # Wspólne połączenie HTTP dla zapytań pomocniczych (keep-alive)
+        self.http = requests.Session()
+        # Równoczesne zapytania o tę samą trasę współdzielą jedno wywołanie API
+        self.route_flight = SingleFlight('routing', on_shared=lambda: self.usage.record(ENDPOINT_ROUTING, OUTCOME_SHARED))
+        self.gb_distance_flight = SingleFlight(
+            'gb_distance', on_shared=lambda: self.usage.record(ENDPOINT_GB_SUBROUTE, OUTCOME_SHARED))
+        # Odświeżanie tras w tle (refresh-ahead / stale-while-revalidate)
+        self.refresh_budget_per_hour = refresh_budget_per_hour
+        self.refresh_max_pending = refresh_max_pending
+        self._refresh_lock = Lock()
+        self._refreshing = set()
+        self._refresh_times = deque()
+        self.refresh_stats = {'scheduled': 0, 'completed': 0, 'failed': 0, 'skipped_budget': 0, 'skipped_busy': 0}
+
+    def _refresh_in_background(self, cache_key, make_request):
+        """
+        Odświeża wpis cache w tle przez kolejkę PTV (bez czekania na wynik).
+
+        Pomija odświeżenie, gdy ten klucz jest już odświeżany, w kolejce czeka
+        refresh_max_pending odświeżeń albo wyczerpano godzinny budżet. Wpis
+        pominięty zostanie odświeżony przy kolejnym odczycie.
+
+        Args:
+            cache_key: Klucz wpisu w cache tras
+            make_request: Funkcja pobierająca trasę z PTV i zapisująca ją w cache
+
+        Returns:
+            bool: Czy odświeżenie zostało zlecone
+        """
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return False
+            if self.refresh_max_pending and len(self._refreshing) >= self.refresh_max_pending:
+                self.refresh_stats['skipped_busy'] += 1
+                return False
+            now = time.monotonic()
+            while self._refresh_times and now - self._refresh_times[0] >= 3600:
+                self._refresh_times.popleft()
+            if self.refresh_budget_per_hour and len(self._refresh_times) >= self.refresh_budget_per_hour:
+                self.refresh_stats['skipped_budget'] += 1
+                return False
+            self._refresh_times.append(now)
+            self._refreshing.add(cache_key)
+            self.refresh_stats['scheduled'] += 1
+
+        def _refresh():
+            # Zapytania odświeżania liczone są pod osobnym zadaniem, nie zadaniem użytkownika
+            current_job_id.set(ROUTE_REFRESH_JOB_ID)
+            result = None
+            try:
+                result = make_request()
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+                    self.refresh_stats['completed' if result is not None else 'failed'] += 1
+            return result
+
+        self.request_queue.add_background_request(_refresh)
+        return True
 
     def get_routes_batch(self, routes, avoid_switzerland=False, avoid_serbia=True, routing_mode=DEFAULT_ROUTING_MODE):
         """Przetwarza wiele tras w jednym wywołaniu"""
@@ -1141,7 +1505,7 @@ class PTVRouteManager:
             for coord_from, coord_to in batch:
                 waypoints.extend([f"{coord_from[0]},{coord_from[1]}", f"{coord_to[0]},{coord_to[1]}"])
             
-            base_url = "https://api.myptv.com/routing/v1/routes/batch"
+            base_url = f"{PTV_API_BASE_URL}/routing/v1/routes/batch"
             headers = {"apiKey": self.api_key}
             params = {
                 "waypoints": waypoints,
@@ -1161,6 +1525,7 @@ class PTVRouteManager:
                 params["options[prohibitedCountries]"] = ",".join(prohibited_countries)
             
             try:
+                self.usage.record(ENDPOINT_BATCH)
                 response = requests.post(base_url, json=params, headers=headers, timeout=40)
                 
                 if response.status_code == 200:
@@ -1175,6 +1540,7 @@ class PTVRouteManager:
                         result = {
                             'distance': distance_km,
                             'polyline': route_data.get('polyline', ''),
+                            'simplified_polyline': simplify_polyline(route_data.get('polyline', '')),
                             'toll_cost': toll_info['total_cost'],
                             'road_toll': (toll_info['costs_by_type']['ROAD']['EUR'] +
                                          toll_info['costs_by_type']['TUNNEL']['EUR'] +
@@ -1185,7 +1551,7 @@ class PTVRouteManager:
                         }
                         
                         # DEBUG: logowanie dla analizy rozbieżności toll
-                        logger.info(f"🔍 DEBUG BATCH route_key={route_key}: toll_cost={result['toll_cost']:.2f}, road_toll={result['road_toll']:.2f}, toll_details={result['toll_details']}, special_systems={result['special_systems']}")
+                        logger.debug("🔍 DEBUG BATCH route_key=%s: toll_cost=%.2f, road_toll=%.2f, toll_details=%s, special_systems=%s", route_key, result['toll_cost'], result['road_toll'], result['toll_details'], result['special_systems'])
                         
                         results[route_key] = result
                         # Zapisz w cache
@@ -1203,11 +1569,11 @@ class PTVRouteManager:
                           routing_mode=DEFAULT_ROUTING_MODE, country_from=None, country_to=None, avoid_serbia=True):
         # Sprawdź czy prom jest obowiązkowy
         ferry_route = None
-        logger.info(f"🔍 get_route_distance: Sprawdzam promy dla {country_from} -> {country_to}")
+        logger.info("🔍 get_route_distance: Sprawdzam promy dla %s -> %s", country_from, country_to)
         if country_from and country_to and is_ferry_mandatory(country_from, country_to):
             ferry_route = get_best_ferry_for_countries(country_from, country_to)
             if ferry_route:
-                logger.info(f"🚢 OBOWIĄZKOWY PROM (get_route_distance): {ferry_route['name']} dla {country_from} -> {country_to}")
+                logger.info("🚢 OBOWIĄZKOWY PROM (get_route_distance): %s dla %s -> %s", ferry_route['name'], country_from, country_to)
                 # Jeśli jest prom, użyj get_route_with_waypoints zamiast prostego zapytania
                 waypoints = [coord_from, coord_to]
                 return self.get_route_with_waypoints(
@@ -1221,15 +1587,19 @@ class PTVRouteManager:
                 )
         
         # Sprawdź cache (dodajemy avoid_serbia do klucza cache)
-        cached_result = self.cache_manager.get(coord_from, coord_to, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia)
-        if cached_result is not None:
+        with metrics.span('route_cache', kind='route'):
+            cached_result, cache_state = self.cache_manager.lookup(
+                coord_from, coord_to, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia
+            )
+        if cache_state == CACHE_FRESH:
+            self.usage.record(ENDPOINT_ROUTING, OUTCOME_CACHE)
             return cached_result
 
         # Generuj unikalny ID dla requestu
         request_id = f"route_{coord_from}_{coord_to}_{int(time.time())}"
         
         def _make_request():
-            base_url = "https://api.myptv.com/routing/v1/routes"
+            base_url = f"{PTV_API_BASE_URL}/routing/v1/routes"
             headers = {"apiKey": self.api_key}
             
             params = [
@@ -1258,39 +1628,29 @@ class PTVRouteManager:
             retry_delay = 2  # sekundy między próbami
             
             # Log parametrów zapytania
-            logger.info(f"""
-=== Rozpoczynam zapytanie do PTV API ===
-URL: {base_url}
-Trasa: {coord_from} -> {coord_to}
-Parametry:
-- Unikanie Szwajcarii: {avoid_switzerland}
-- Unikanie Serbii: {avoid_serbia}
-- Unikanie Eurotunelu: {avoid_eurotunnel}
-- Tryb routingu: {routing_mode}
-- Timeout połączenia: 5s
-- Timeout odczytu: 35s
-""")
+            logger.info("=== Rozpoczynam zapytanie do PTV API ===\nURL: %s\nTrasa: %s -> %s\nParametry:\n- Unikanie Szwajcarii: %s\n- Unikanie Serbii: %s\n- Unikanie Eurotunelu: %s\n- Tryb routingu: %s\n- Timeout połączenia: 5s\n- Timeout odczytu: 35s", base_url, coord_from, coord_to, avoid_switzerland, avoid_serbia, avoid_eurotunnel, routing_mode)
             
             for attempt in range(max_retries):
                 start_time = time.time()
                 try:
-                    logger.info(f"Próba {attempt + 1}/{max_retries} - Start")
+                    logger.info("Próba %s/%s - Start", attempt + 1, max_retries)
                     
                     # Rozdzielamy timeout na połączenie (5s) i odczyt (35s)
+                    self.usage.record(ENDPOINT_ROUTING)
                     response = requests.get(base_url, params=params, headers=headers, 
                                          timeout=(5, 35))
                     
                     request_time = time.time() - start_time
-                    logger.info(f"Czas odpowiedzi: {request_time:.2f}s")
+                    logger.info("Czas odpowiedzi: %.2fs", request_time)
                     
                     if response.status_code == 200:
-                        logger.info(f"Sukces - Otrzymano odpowiedź 200 OK w {request_time:.2f}s")
+                        logger.info("Sukces - Otrzymano odpowiedź 200 OK w %.2fs", request_time)
                         data = response.json()
                         
                         # Sprawdź czy są eventy z promami
                         events = data.get('events', [])
                         if events:
-                            logger.info(f"📦 Otrzymano {len(events)} eventów z API (w tym potencjalne promy)")
+                            logger.info("📦 Otrzymano %s eventów z API (w tym potencjalne promy)", len(events))
                         
                         # Wyciągnij informacje o promach z eventów
                         ferry_info = self._extract_combined_transport_info(events)
@@ -1308,11 +1668,12 @@ Parametry:
                         distance = None
                         if 'legs' in data and isinstance(data['legs'], list):
                             distance = sum(leg.get('distance', 0) for leg in data['legs'])
-                            logger.info(f"Obliczony dystans: {distance/1000:.2f}km")
+                            logger.info("Obliczony dystans: %.2fkm", distance/1000)
                         
                         if distance is not None:
                             # Oblicz dystans drogowy vs promowy
-                            distance_analysis = self._calculate_road_distance(distance, ferry_info)
+                            geometry = RouteGeometry(data.get('polyline', ''))
+                            distance_analysis = self._calculate_road_distance(distance, ferry_info, geometry)
                             
                             result = {
                                 'distance': distance / 1000,  # Całkowity dystans (zgodność wsteczna)
@@ -1320,7 +1681,9 @@ Parametry:
                                 'road_distance_km': distance_analysis['road_distance_km'],
                                 'ferry_distance_km': distance_analysis['ferry_distance_km'],
                                 'ferry_segments': distance_analysis['ferry_segments'],
+                                'country_distances_km': distance_analysis['country_distances_km'],
                                 'polyline': data.get('polyline', ''),
+                                'simplified_polyline': simplify_polyline(data.get('polyline', '')),
                                 'toll_cost': toll_info['total_cost'],
                                 'road_toll': (toll_info['costs_by_type']['ROAD']['EUR'] +
                                              toll_info['costs_by_type']['TUNNEL']['EUR'] +
@@ -1338,22 +1701,19 @@ Parametry:
                             logger.warning(f"Brak danych o dystansie w odpowiedzi API dla trasy {coord_from} -> {coord_to}")
                             return None
                     elif response.status_code == 400 and avoid_switzerland:
-                        logger.info(f"""
-=== Otrzymano błąd 400 z avoid_switzerland=True ===
-Czas odpowiedzi: {request_time:.2f}s
-Próbuję bez unikania Szwajcarii...
-""")
+                        logger.info("=== Otrzymano błąd 400 z avoid_switzerland=True ===\nCzas odpowiedzi: %.2fs\nPróbuję bez unikania Szwajcarii...", request_time)
                         
                         # Usuń parametr avoid_switzerland
                         retry_params = [p for p in params if p[0] != "options[prohibitedCountries]"]
                         
                         # Spróbuj ponownie
                         retry_start_time = time.time()
+                        self.usage.record(ENDPOINT_ROUTING)
                         retry_response = requests.get(base_url, params=retry_params, headers=headers, 
                                                    timeout=(5, 35))
                         retry_time = time.time() - retry_start_time
                         
-                        logger.info(f"Czas odpowiedzi bez unikania Szwajcarii: {retry_time:.2f}s")
+                        logger.info("Czas odpowiedzi bez unikania Szwajcarii: %.2fs", retry_time)
                         
                         if retry_response.status_code == 200:
                             retry_data = retry_response.json()
@@ -1374,11 +1734,12 @@ Próbuję bez unikania Szwajcarii...
                             distance = None
                             if 'legs' in retry_data and isinstance(retry_data['legs'], list):
                                 distance = sum(leg.get('distance', 0) for leg in retry_data['legs'])
-                                logger.info(f"Obliczony dystans (bez unikania CH): {distance/1000:.2f}km")
+                                logger.info("Obliczony dystans (bez unikania CH): %.2fkm", distance/1000)
                             
                             if distance is not None:
                                 # Oblicz dystans drogowy vs promowy
-                                distance_analysis = self._calculate_road_distance(distance, ferry_info)
+                                geometry = RouteGeometry(retry_data.get('polyline', ''))
+                                distance_analysis = self._calculate_road_distance(distance, ferry_info, geometry)
                                 
                                 result = {
                                     'distance': distance / 1000,
@@ -1386,7 +1747,9 @@ Próbuję bez unikania Szwajcarii...
                                     'road_distance_km': distance_analysis['road_distance_km'],
                                     'ferry_distance_km': distance_analysis['ferry_distance_km'],
                                     'ferry_segments': distance_analysis['ferry_segments'],
+                                    'country_distances_km': distance_analysis['country_distances_km'],
                                     'polyline': retry_data.get('polyline', ''),
+                                    'simplified_polyline': simplify_polyline(retry_data.get('polyline', '')),
                                     'toll_cost': toll_info['total_cost'],
                                     'road_toll': (toll_info['costs_by_type']['ROAD']['EUR'] +
                                                  toll_info['costs_by_type']['TUNNEL']['EUR'] +
@@ -1470,23 +1833,42 @@ Parametry: {params}
 """)
             return None  # Jeśli wszystkie próby się nie powiodły
 
-        # Dodaj request do kolejki
-        self.request_queue.add_request(request_id, _make_request)
-        
-        # Czekaj na wynik (z timeout)
-        max_wait = 30  # sekundy
-        start_time = time.time()
-        while time.time() - start_time < max_wait:
-            result = self.request_queue.get_result(request_id)
-            if result is not None:
-                if result['status'] == 'success':
-                    return result['data']
-                else:
-                    return None
-            time.sleep(0.1)
+        def _enqueue_and_wait():
+            # Poprzedni lider mógł zapisać trasę między sprawdzeniem cache a tym wywołaniem
+            cached = self.cache_manager.peek(cache_key)
+            if cached is not None:
+                self.usage.record(ENDPOINT_ROUTING, OUTCOME_CACHE)
+                return cached
+            
+            # Dodaj request do kolejki
+            self.request_queue.add_request(request_id, _make_request)
+            
+            # Czekaj na wynik (z timeout)
+            max_wait = 30  # sekundy
+            start_time = time.time()
+            while time.time() - start_time < max_wait:
+                result = self.request_queue.get_result(request_id)
+                if result is not None:
+                    if result['status'] == 'success':
+                        return result['data']
+                    else:
+                        return None
+                time.sleep(0.1)
+            
+            logger.warning("Timeout")
+            return None
         
-        logger.warning("Timeout")
-        return None
+        cache_key = self.cache_manager._generate_key(coord_from, coord_to, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia)
+
+        # Trasa bliska wygaśnięcia lub nieaktualna - zwracamy ją od razu, nową pobieramy w tle
+        if cached_result is not None:
+            self.usage.record(ENDPOINT_ROUTING, OUTCOME_CACHE)
+            self._refresh_in_background(cache_key, _make_request)
+            return cached_result
+
+        # Równoczesne zapytania o tę samą trasę czekają na jedno wywołanie API
+        with metrics.span('ptv_request', kind='route'):
+            return self.route_flight.do(cache_key, _enqueue_and_wait)
 
     def get_route_with_waypoints(self, waypoints, avoid_switzerland=False, avoid_eurotunnel=False, 
                                    routing_mode=DEFAULT_ROUTING_MODE, country_from=None, country_to=None, avoid_serbia=True):
@@ -1519,7 +1901,7 @@ Parametry: {params}
         if country_from and country_to and is_ferry_mandatory(country_from, country_to):
             ferry_route = get_best_ferry_for_countries(country_from, country_to)
             if ferry_route:
-                logger.info(f"🚢 OBOWIĄZKOWY PROM wykryty: {ferry_route['name']} dla trasy {country_from} -> {country_to}")
+                logger.info("🚢 OBOWIĄZKOWY PROM wykryty: %s dla trasy %s -> %s", ferry_route['name'], country_from, country_to)
                 logger.info("🔧 Dzielę trasę na 2 segmenty: [start→port_A] + [prom_A→B] + [port_B→end]")
                 
                 ferry_start = ferry_route['start']
@@ -1527,11 +1909,11 @@ Parametry: {params}
                 
                 # Segment 1: wszystkie waypoints przed promem + port startowy
                 segment1_waypoints = waypoints[:-1] + [ferry_start]
-                logger.info(f"Segment 1: {len(segment1_waypoints)} waypoints (do portu {ferry_route['name'].split('-')[0]})")
+                logger.info("Segment 1: %s waypoints (do portu %s)", len(segment1_waypoints), ferry_route['name'].split('-')[0])
                 
                 # Segment 2: port docelowy + wszystkie waypoints po promie
                 segment2_waypoints = [ferry_end] + [waypoints[-1]]
-                logger.info(f"Segment 2: {len(segment2_waypoints)} waypoints (od portu {ferry_route['name'].split('-')[1]})")
+                logger.info("Segment 2: %s waypoints (od portu %s)", len(segment2_waypoints), ferry_route['name'].split('-')[1])
                 
                 # Oblicz segment 1
                 result1 = self.get_route_with_waypoints(
@@ -1564,13 +1946,13 @@ Parametry: {params}
                     return None
                 
                 # Połącz wyniki
-                logger.info(f"✅ Segment 1: {result1['distance']:.2f} km, toll_cost={result1['toll_cost']:.2f} EUR, road_toll={result1.get('road_toll', 0):.2f} EUR")
-                logger.info(f"   Segment 1 toll_details: {result1.get('toll_details', {})}")
-                logger.info(f"   Segment 1 special_systems: {result1.get('special_systems', [])}")
-                logger.info(f"✅ Segment 2: {result2['distance']:.2f} km, toll_cost={result2['toll_cost']:.2f} EUR, road_toll={result2.get('road_toll', 0):.2f} EUR")
-                logger.info(f"   Segment 2 toll_details: {result2.get('toll_details', {})}")
-                logger.info(f"   Segment 2 special_systems: {result2.get('special_systems', [])}")
-                logger.info(f"🚢 Prom: {ferry_route['duration_hours']}h, {ferry_route['cost']} EUR")
+                logger.info("✅ Segment 1: %.2f km, toll_cost=%.2f EUR, road_toll=%.2f EUR", result1['distance'], result1['toll_cost'], result1.get('road_toll', 0))
+                logger.info("Segment 1 toll_details: %s", result1.get('toll_details', {}))
+                logger.info("Segment 1 special_systems: %s", result1.get('special_systems', []))
+                logger.info("✅ Segment 2: %.2f km, toll_cost=%.2f EUR, road_toll=%.2f EUR", result2['distance'], result2['toll_cost'], result2.get('road_toll', 0))
+                logger.info("Segment 2 toll_details: %s", result2.get('toll_details', {}))
+                logger.info("Segment 2 special_systems: %s", result2.get('special_systems', []))
+                logger.info("🚢 Prom: %sh, %s EUR", ferry_route['duration_hours'], ferry_route['cost'])
                 
                 # Pobierz dystans promu ze słownika
                 ferry_name = ferry_route['name']
@@ -1613,6 +1995,9 @@ Parametry: {params}
                     }],
                     'legs': result1.get('legs', []) + result2.get('legs', []),
                     'polyline': result1.get('polyline', '') + '|' + result2.get('polyline', ''),
+                    'simplified_polyline': SIMPLIFIED_PART_SEPARATOR.join(
+                        part for part in (result1.get('simplified_polyline'), result2.get('simplified_polyline')) if part
+                    ),
                     'toll_cost': result1['toll_cost'] + result2['toll_cost'] + ferry_route['cost'],
                     'road_toll': result1.get('road_toll', 0) + result2.get('road_toll', 0),
                     'other_toll': result1.get('other_toll', 0) + result2.get('other_toll', 0) + ferry_route['cost'],
@@ -1624,10 +2009,7 @@ Parametry: {params}
                     }
                 }
                 
-                logger.info(
-                    f"📏 Połączone dystanse: total={total_distance_km:.2f}km, "
-                    f"road={total_road_km:.2f}km, ferry={total_ferry_km:.2f}km"
-                )
+                logger.info("📏 Połączone dystanse: total=%.2fkm, road=%.2fkm, ferry=%.2fkm", total_distance_km, total_road_km, total_ferry_km)
                 
                 # Połącz toll_details
                 for country, cost in result1.get('toll_details', {}).items():
@@ -1635,6 +2017,14 @@ Parametry: {params}
                 for country, cost in result2.get('toll_details', {}).items():
                     combined_result['toll_details'][country] = combined_result['toll_details'].get(country, 0) + cost
                 
+                # Połącz dystanse w krajach (przeprawa obowiązkowa liczona jako morze)
+                country_distances = {}
+                for part in (result1.get('country_distances_km', {}), result2.get('country_distances_km', {}),
+                             {OFFSHORE_KEY: ferry_sea_distance_km}):
+                    for country, km in part.items():
+                        country_distances[country] = round(country_distances.get(country, 0) + km, 1)
+                combined_result['country_distances_km'] = country_distances
+                
                 # Połącz special_systems
                 combined_result['special_systems'].extend(result1.get('special_systems', []))
                 combined_result['special_systems'].extend(result2.get('special_systems', []))
@@ -1649,27 +2039,30 @@ Parametry: {params}
                 
                 combined_result['ferry_used'] = ferry_route['name']
                 
-                logger.info(f"📊 ŁĄCZNIE: {combined_result['distance']:.2f} km, toll_cost={combined_result['toll_cost']:.2f} EUR, road_toll={combined_result['road_toll']:.2f} EUR")
-                logger.info(f"   ŁĄCZNIE toll_details: {combined_result['toll_details']}")
-                logger.info(f"   ŁĄCZNIE special_systems: {combined_result['special_systems']}")
+                logger.info("📊 ŁĄCZNIE: %.2f km, toll_cost=%.2f EUR, road_toll=%.2f EUR", combined_result['distance'], combined_result['toll_cost'], combined_result['road_toll'])
+                logger.info("ŁĄCZNIE toll_details: %s", combined_result['toll_details'])
+                logger.info("ŁĄCZNIE special_systems: %s", combined_result['special_systems'])
                 
                 return combined_result
         
         # Sprawdź cache
-        cached_result = self.cache_manager.get_waypoints_route(
-            waypoints, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia
-        )
-        if cached_result is not None:
-            logger.info(f"Cache HIT dla trasy z {len(waypoints)} waypoints")
+        with metrics.span('route_cache', kind='waypoints'):
+            cached_result, cache_state = self.cache_manager.lookup_waypoints_route(
+                waypoints, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia
+            )
+        if cache_state == CACHE_FRESH:
+            logger.info("Cache HIT dla trasy z %s waypoints", len(waypoints))
+            self.usage.record(ENDPOINT_ROUTING, OUTCOME_CACHE)
             return cached_result
         
-        logger.info(f"Cache MISS - wywołanie PTV API dla {len(waypoints)} waypoints")
+        if cached_result is None:
+            logger.info("Cache MISS - wywołanie PTV API dla %s waypoints", len(waypoints))
         
         # Generuj unikalny ID dla requestu
         request_id = f"route_waypoints_{hash(tuple(waypoints))}_{int(time.time())}"
         
         def _make_request():
-            base_url = "https://api.myptv.com/routing/v1/routes"
+            base_url = f"{PTV_API_BASE_URL}/routing/v1/routes"
             headers = {"apiKey": self.api_key}
             
             # Budowanie parametrów - każdy waypoint jako osobny parametr
@@ -1697,7 +2090,7 @@ Parametry: {params}
             if avoid_eurotunnel:
                 params.append(("options[avoid]", "RAIL_SHUTTLES"))
             
-            logger.info(f"PTV API request: {len(waypoints)} waypoints, avoid_CH={avoid_switzerland}, avoid_RS={avoid_serbia}, avoid_eurotunnel={avoid_eurotunnel}")
+            logger.info("PTV API request: %s waypoints, avoid_CH=%s, avoid_RS=%s, avoid_eurotunnel=%s", len(waypoints), avoid_switzerland, avoid_serbia, avoid_eurotunnel)
             
             # Retry logic
             max_retries = 3
@@ -1707,8 +2100,9 @@ Parametry: {params}
                 start_time = time.time()
                 
                 try:
-                    logger.debug(f"Próba {attempt + 1}/{max_retries}")
+                    logger.debug("Próba %s/%s", attempt + 1, max_retries)
                     
+                    self.usage.record(ENDPOINT_ROUTING)
                     response = requests.get(
                         base_url, 
                         params=params, 
@@ -1717,7 +2111,7 @@ Parametry: {params}
                     )
                     
                     request_time = time.time() - start_time
-                    logger.info(f"PTV API response: {response.status_code} w {request_time:.2f}s")
+                    logger.info("PTV API response: %s w %.2fs", response.status_code, request_time)
                     
                     if response.status_code == 200:
                         data = response.json()
@@ -1725,7 +2119,7 @@ Parametry: {params}
                         # Sprawdź czy są eventy z promami
                         events = data.get('events', [])
                         if events:
-                            logger.info(f"📦 Otrzymano {len(events)} eventów z API dla trasy z {len(waypoints)} waypoints")
+                            logger.info("📦 Otrzymano %s eventów z API dla trasy z %s waypoints", len(events), len(waypoints))
                         
                         # Wyciągnij informacje o promach
                         ferry_info = self._extract_combined_transport_info(events)
@@ -1745,10 +2139,11 @@ Parametry: {params}
                             total_distance = sum(
                                 leg.get('distance', 0) for leg in data['legs']
                             )
-                            logger.debug(f"Obliczony dystans: {total_distance/1000:.2f}km z {len(data['legs'])} segmentów")
+                            logger.debug("Obliczony dystans: %.2fkm z %s segmentów", total_distance/1000, len(data['legs']))
                         
                         # Oblicz dystans drogowy vs promowy
-                        distance_analysis = self._calculate_road_distance(total_distance, ferry_info)
+                        geometry = RouteGeometry(data.get('polyline', ''))
+                        distance_analysis = self._calculate_road_distance(total_distance, ferry_info, geometry)
                         
                         result = {
                             'distance': total_distance / 1000,  # m → km (zgodność wsteczna)
@@ -1756,8 +2151,10 @@ Parametry: {params}
                             'road_distance_km': distance_analysis['road_distance_km'],
                             'ferry_distance_km': distance_analysis['ferry_distance_km'],
                             'ferry_segments': distance_analysis['ferry_segments'],
+                            'country_distances_km': distance_analysis['country_distances_km'],
                             'legs': data.get('legs', []),
                             'polyline': data.get('polyline', ''),
+                            'simplified_polyline': simplify_polyline(data.get('polyline', '')),
                             'toll_cost': toll_info['total_cost'],
                             'road_toll': (
                                 toll_info['costs_by_type']['ROAD']['EUR'] +
@@ -1782,6 +2179,7 @@ Parametry: {params}
                         logger.warning("Błąd 400 z avoid_switzerland=True - próbuję bez unikania Szwajcarii")
                         
                         retry_params = [p for p in params if p[0] != "options[prohibitedCountries]"]
+                        self.usage.record(ENDPOINT_ROUTING)
                         retry_response = requests.get(
                             base_url, params=retry_params, headers=headers, timeout=(5, 35)
                         )
@@ -1806,7 +2204,8 @@ Parametry: {params}
                                 total_distance = sum(leg.get('distance', 0) for leg in data['legs'])
                             
                             # Oblicz dystans drogowy vs promowy
-                            distance_analysis = self._calculate_road_distance(total_distance, ferry_info)
+                            geometry = RouteGeometry(data.get('polyline', ''))
+                            distance_analysis = self._calculate_road_distance(total_distance, ferry_info, geometry)
                             
                             result = {
                                 'distance': total_distance / 1000,
@@ -1814,8 +2213,10 @@ Parametry: {params}
                                 'road_distance_km': distance_analysis['road_distance_km'],
                                 'ferry_distance_km': distance_analysis['ferry_distance_km'],
                                 'ferry_segments': distance_analysis['ferry_segments'],
+                                'country_distances_km': distance_analysis['country_distances_km'],
                                 'legs': data.get('legs', []),
                                 'polyline': data.get('polyline', ''),
+                                'simplified_polyline': simplify_polyline(data.get('polyline', '')),
                                 'toll_cost': toll_info['total_cost'],
                                 'road_toll': (
                                     toll_info['costs_by_type']['ROAD']['EUR'] +
@@ -1863,28 +2264,57 @@ Parametry: {params}
             logger.error("Wszystkie próby nieudane")
             return None
         
-        # Dodaj request do kolejki
-        self.request_queue.add_request(request_id, _make_request)
-        
-        # Czekaj na wynik (dłuższy timeout dla tras z waypoints)
-        max_wait = 40
-        start_time = time.time()
-        
-        while time.time() - start_time < max_wait:
-            result = self.request_queue.get_result(request_id)
-            if result is not None:
-                if result['status'] == 'success':
-                    return result['data']
-                else:
-                    logger.error(f"Request zakończony błędem: {result.get('error')}")
-                    return None
-            time.sleep(0.1)
+        def _enqueue_and_wait():
+            # Poprzedni lider mógł zapisać trasę między sprawdzeniem cache a tym wywołaniem
+            cached = self.cache_manager.peek(cache_key)
+            if cached is not None:
+                self.usage.record(ENDPOINT_ROUTING, OUTCOME_CACHE)
+                return cached
+            
+            # Dodaj request do kolejki
+            self.request_queue.add_request(request_id, _make_request)
+            
+            # Czekaj na wynik (dłuższy timeout dla tras z waypoints)
+            max_wait = 40
+            start_time = time.time()
+            
+            while time.time() - start_time < max_wait:
+                result = self.request_queue.get_result(request_id)
+                if result is not None:
+                    if result['status'] == 'success':
+                        return result['data']
+                    else:
+                        logger.error(f"Request zakończony błędem: {result.get('error')}")
+                        return None
+                time.sleep(0.1)
+            
+            logger.warning(f"Timeout oczekiwania na wynik ({max_wait}s)")
+            return None
         
-        logger.warning(f"Timeout oczekiwania na wynik ({max_wait}s)")
-        return None
+        cache_key = self.cache_manager._generate_waypoints_key(
+            waypoints, avoid_switzerland, avoid_eurotunnel, routing_mode, avoid_serbia
+        )
+
+        # Trasa bliska wygaśnięcia lub nieaktualna - zwracamy ją od razu, nową pobieramy w tle
+        if cached_result is not None:
+            logger.info("Cache %s dla trasy z %s waypoints - odświeżenie w tle", cache_state, len(waypoints))
+            self.usage.record(ENDPOINT_ROUTING, OUTCOME_CACHE)
+            self._refresh_in_background(cache_key, _make_request)
+            return cached_result
+
+        # Równoczesne zapytania o tę samą trasę czekają na jedno wywołanie API
+        with metrics.span('ptv_request', kind='waypoints'):
+            return self.route_flight.do(cache_key, _enqueue_and_wait)
 
     def get_stats(self):
-        return self.cache_manager.get_stats()
+        stats = self.cache_manager.get_stats()
+        stats['single_flight'] = {
+            'routing': self.route_flight.get_stats(),
+            'gb_distance': self.gb_distance_flight.get_stats(),
+        }
+        with self._refresh_lock:
+            stats['refresh'] = dict(self.refresh_stats, pending=len(self._refreshing))
+        return stats
 
     def separate_toll_costs_by_type(self, toll_data):
         """Separates toll costs by type (road, tunnel, bridge, ferry)"""
@@ -1921,60 +2351,17 @@ Parametry: {params}
         
         return result
 
-    def _decode_polyline(self, polyline_str):
-        """
-        Dekoduje polyline z API PTV do listy punktów [lat, lng].
-        Obsługuje zarówno format GeoJSON jak i standardowy encoded polyline.
-        """
-        import polyline as pl
-        
-        try:
-            if not polyline_str or not isinstance(polyline_str, str):
-                return []
-            
-            # Sprawdź czy mamy do czynienia z formatem GeoJSON
-            if 'coordinates' in polyline_str:
-                try:
-                    # Znajdź początek i koniec koordynatów
-                    start = polyline_str.find('[[') + 2
-                    end = polyline_str.rfind(']]')
-                    if start == -1 or end == -1:
-                        return []
-                    
-                    # Wyciągnij tylko koordynaty
-                    coords_str = polyline_str[start:end]
-                    points = []
-                    
-                    # Podziel na pary współrzędnych
-                    coords = coords_str.split('],[')
-                    for coord in coords:
-                        coord = coord.strip('[]')
-                        if ',' in coord:
-                            try:
-                                lng, lat = map(float, coord.split(','))
-                                points.append((lat, lng))  # tuple zamiast list
-                            except (ValueError, TypeError):
-                                continue
-                    
-                    return points
-                except Exception:
-                    return []
-            else:
-                # Spróbuj standardowego dekodowania polyline
-                try:
-                    return pl.decode(polyline_str)
-                except Exception:
-                    return []
-        except Exception:
-            return []
-
     def _calculate_distance_in_gb(self, polyline_str, toll_data):
         """
-        Oblicza dystans w GB używając dodatkowego zapytania do PTV API.
+        Oblicza dystans w GB dla trasy przechodzącej przez Wielką Brytanię.
         
         1. Dekoduje polyline i bierze pierwszy/ostatni punkt
         2. Sprawdza czy GB jest na początku czy końcu trasy
-        3. Robi zapytanie do PTV API: punkt_w_GB → Dover lub Dover → punkt_w_GB
+        3. Liczy dystans w GB lokalnie z polyline, dzieląc trasę na kraje
+           według granic z app/config/country_boundaries.py (bez zapytania)
+        4. Jeśli podział się nie powiódł (np. brak punktów w GB) używa cache (klucz: przyciągnięty punkt w GB)
+           lub zapytania do PTV API: punkt_w_GB → Dover lub Dover → punkt_w_GB,
+           wysyłanego z zachowaniem limitu kolejki zapytań
         
         Args:
             polyline_str: Zakodowany polyline z odpowiedzi API
@@ -1983,29 +2370,24 @@ Parametry: {params}
         Returns:
             float: Dystans w GB w metrach
         """
-        # Dover - główny port promowy GB
-        DOVER_COORDS = (51.1279, 1.3134)
-        
         if not polyline_str:
             logger.warning("_calculate_distance_in_gb: brak polyline_str")
             return 0
         
         try:
-            import polyline as pl
-            
-            # Dekoduj polyline (ten sam sposób co w appGPT.py)
-            coords = self._decode_polyline(polyline_str)
+            geometry = RouteGeometry(polyline_str)
+            coords = geometry.points
             
-            logger.info(f"_calculate_distance_in_gb: zdekodowano {len(coords)} punktów")
+            logger.info("_calculate_distance_in_gb: zdekodowano %s punktów", len(coords))
             
             if len(coords) < 2:
                 return 0
             
             # Pierwszy i ostatni punkt trasy
-            first_point = coords[0]
-            last_point = coords[-1]
+            first_point = tuple(coords[0].tolist())
+            last_point = tuple(coords[-1].tolist())
             
-            logger.info(f"_calculate_distance_in_gb: pierwszy punkt {first_point}, ostatni punkt {last_point}")
+            logger.info("_calculate_distance_in_gb: pierwszy punkt %s, ostatni punkt %s", first_point, last_point)
             
             # Sprawdź kolejność krajów w toll_data
             countries_order = []
@@ -2015,7 +2397,7 @@ Parametry: {params}
                     if code:
                         countries_order.append(code)
             
-            logger.info(f"_calculate_distance_in_gb: kolejność krajów: {countries_order}")
+            logger.info("_calculate_distance_in_gb: kolejność krajów: %s", countries_order)
             
             if 'GB' not in countries_order:
                 return 0
@@ -2024,21 +2406,34 @@ Parametry: {params}
             gb_at_start = countries_order[0] == 'GB' if countries_order else False
             gb_at_end = countries_order[-1] == 'GB' if countries_order else False
             
-            # Wybierz punkty do zapytania API
+            # Wybierz punkt w GB
             if gb_at_start:
                 # Trasa zaczyna się w GB - oblicz dystans od startu do Dover
                 gb_point = first_point
-                logger.info(f"GB na początku trasy - obliczam dystans {gb_point} → Dover")
+                logger.info("GB na początku trasy - obliczam dystans %s → Dover", gb_point)
             elif gb_at_end:
                 # Trasa kończy się w GB - oblicz dystans od Dover do końca
                 gb_point = last_point
-                logger.info(f"GB na końcu trasy - obliczam dystans Dover → {gb_point}")
+                logger.info("GB na końcu trasy - obliczam dystans Dover → %s", gb_point)
             else:
                 logger.warning("GB nie jest ani na początku ani na końcu trasy")
                 return 0
             
+            # Dystans z polyline głównej trasy - bez dodatkowego zapytania
+            derived_km = geometry.distance_in_country('GB')
+            if derived_km > 0:
+                logger.info("_calculate_distance_in_gb: dystans w GB z polyline = %.0fkm", derived_km)
+                self.usage.record(ENDPOINT_GB_SUBROUTE, OUTCOME_LOCAL)
+                return derived_km * 1000
+            
+            cached_distance = self.cache_manager.get_gb_distance(gb_point, gb_at_start)
+            if cached_distance is not None:
+                logger.info("_calculate_distance_in_gb: dystans w GB z cache = %.0fkm", cached_distance/1000)
+                self.usage.record(ENDPOINT_GB_SUBROUTE, OUTCOME_CACHE)
+                return cached_distance
+            
             # Zapytanie do PTV API o dystans w GB
-            base_url = "https://api.myptv.com/routing/v1/routes"
+            base_url = f"{PTV_API_BASE_URL}/routing/v1/routes"
             headers = {"apiKey": self.api_key}
             
             if gb_at_start:
@@ -2056,17 +2451,25 @@ Parametry: {params}
             
             # Nie dodajemy prohibitedCountries dla tras w GB (zawsze jesteśmy w UK)
             
-            logger.info(f"_calculate_distance_in_gb: wysyłam zapytanie do PTV API: {params}")
-            response = requests.get(base_url, params=params, headers=headers, timeout=(5, 30))
+            def _request_gb_distance():
+                logger.info("_calculate_distance_in_gb: wysyłam zapytanie do PTV API: %s", params)
+                self.usage.record(ENDPOINT_GB_SUBROUTE)
+                response = self.http.get(base_url, params=params, headers=headers, timeout=(5, 30))
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    gb_distance = data.get('distance', 0)
+                    logger.info("_calculate_distance_in_gb: PTV API zwróciło dystans w GB = %.0fkm", gb_distance/1000)
+                    if gb_distance > 0:
+                        self.cache_manager.set_gb_distance(gb_point, gb_at_start, gb_distance)
+                    return gb_distance
+                else:
+                    logger.warning(f"_calculate_distance_in_gb: błąd API {response.status_code}: {response.text[:500]}")
+                    return 0
             
-            if response.status_code == 200:
-                data = response.json()
-                gb_distance = data.get('distance', 0)
-                logger.info(f"_calculate_distance_in_gb: PTV API zwróciło dystans w GB = {gb_distance/1000:.0f}km")
-                return gb_distance
-            else:
-                logger.warning(f"_calculate_distance_in_gb: błąd API {response.status_code}: {response.text[:500]}")
-                return 0
+            # Równoczesne zapytania dla tego samego punktu w GB współdzielą jedno wywołanie
+            flight_key = self.cache_manager._generate_gb_distance_key(gb_point, gb_at_start)
+            return self.gb_distance_flight.do(flight_key, self.request_queue.call, _request_gb_distance) or 0
             
         except Exception as e:
             logger.warning(f"Błąd podczas obliczania dystansu w GB: {e}")
@@ -2093,7 +2496,7 @@ Parametry: {params}
         Returns:
             int: Liczba dni winiety (0 jeśli nie można obliczyć lub trasa nie przechodzi przez GB)
         """
-        logger.info(f"_calculate_uk_levy_days: START, polyline_str len={len(polyline_str) if polyline_str else 0}")
+        logger.info("_calculate_uk_levy_days: START, polyline_str len=%s", len(polyline_str) if polyline_str else 0)
         
         if not toll_data:
             logger.info("_calculate_uk_levy_days: brak toll_data")
@@ -2107,14 +2510,14 @@ Parametry: {params}
                     has_gb = True
                     break
         
-        logger.info(f"_calculate_uk_levy_days: has_gb={has_gb}")
+        logger.info("_calculate_uk_levy_days: has_gb=%s", has_gb)
         
         if not has_gb:
             return 0
         
         # Oblicz dystans w GB - dodatkowe zapytanie do PTV API
         gb_distance_m = self._calculate_distance_in_gb(polyline_str, toll_data)
-        logger.info(f"_calculate_uk_levy_days: gb_distance_m={gb_distance_m}")
+        logger.info("_calculate_uk_levy_days: gb_distance_m=%s", gb_distance_m)
         
         if gb_distance_m <= 0:
             logger.warning(f"UK HGV Levy: nie można obliczyć dystansu w GB - brak polyline lub brak punktów w GB")
@@ -2146,7 +2549,7 @@ Parametry: {params}
         # Zaokrąglij w górę - każdy rozpoczęty dzień = opłata winiety
         levy_days = math.ceil(transit_days)
         
-        logger.info(f"UK HGV Levy: dystans w GB = {gb_distance_km:.0f}km, transit_days = {transit_days}, levy_days = {levy_days}")
+        logger.info("UK HGV Levy: dystans w GB = %.0fkm, transit_days = %s, levy_days = %s", gb_distance_km, transit_days, levy_days)
         return levy_days
 
     def _extract_combined_transport_info(self, events_data):
@@ -2177,7 +2580,7 @@ Parametry: {params}
         if not events_data or not isinstance(events_data, list):
             return result
         
-        logger.info(f"🔍 Analizuję {len(events_data)} eventów z API PTV...")
+        logger.info("🔍 Analizuję %s eventów z API PTV...", len(events_data))
         
         # Najpierw znajdź wszystkie pary ENTER/EXIT
         ferry_pairs = []
@@ -2201,11 +2604,7 @@ Parametry: {params}
             if not is_ferry:
                 continue
             
-            logger.debug(
-                f"Event {i}: {access_type} - {ct.get('name')} "
-                f"at {event.get('distanceFromStart', 0)}m, "
-                f"time={event.get('travelTimeFromStart', 0)}s"
-            )
+            logger.debug("Event %s: %s - %s at %sm, time=%ss", i, access_type, ct.get('name'), event.get('distanceFromStart', 0), event.get('travelTimeFromStart', 0))
             
             if access_type == 'ENTER':
                 enter_events[i] = event
@@ -2256,34 +2655,20 @@ Parametry: {params}
             duration_mins = (ferry_duration % 3600) / 60
             distance_from_start_km = enter_distance / 1000
             
-            logger.info(
-                f"🚢 PROM #{ferry_count}: {ferry_info['name']}\n"
-                f"   ├─ ENTER: ({enter_event.get('latitude'):.4f}, {enter_event.get('longitude'):.4f})\n"
-                f"   ├─ EXIT:  ({exit_event.get('latitude'):.4f}, {exit_event.get('longitude'):.4f})\n"
-                f"   ├─ Czas przeprawy: {int(duration_hours)}h {int(duration_mins)}min ({ferry_duration}s)\n"
-                f"   ├─ Dystans z API: 0 km (celowo - żeby nie dublować)\n"
-                f"   └─ Pozycja na trasie: {distance_from_start_km:.1f} km od startu"
-            )
+            logger.info("🚢 PROM #%s: %s\n   ├─ ENTER: (%.4f, %.4f)\n   ├─ EXIT:  (%.4f, %.4f)\n   ├─ Czas przeprawy: %sh %smin (%ss)\n   ├─ Dystans z API: 0 km (celowo - żeby nie dublować)\n   └─ Pozycja na trasie: %.1f km od startu", ferry_count, ferry_info['name'], enter_event.get('latitude'), enter_event.get('longitude'), exit_event.get('latitude'), exit_event.get('longitude'), int(duration_hours), int(duration_mins), ferry_duration, distance_from_start_km)
         
         result['has_ferry'] = len(result['ferries']) > 0
         
         if result['has_ferry']:
             total_hours = result['total_ferry_duration'] / 3600
             total_mins = (result['total_ferry_duration'] % 3600) / 60
-            logger.info(
-                f"{'='*70}\n"
-                f"📊 PODSUMOWANIE PROMÓW:\n"
-                f"   ├─ Liczba promów: {len(result['ferries'])}\n"
-                f"   ├─ Łączny czas przepraw: {int(total_hours)}h {int(total_mins)}min\n"
-                f"   └─ Użyte promy: {', '.join(result['ferry_names'])}\n"
-                f"{'='*70}"
-            )
+            logger.info("%s\n📊 PODSUMOWANIE PROMÓW:\n   ├─ Liczba promów: %s\n   ├─ Łączny czas przepraw: %sh %smin\n   └─ Użyte promy: %s\n%s", '='*70, len(result['ferries']), int(total_hours), int(total_mins), ', '.join(result['ferry_names']), '='*70)
         else:
             logger.info("ℹ️  Brak przepraw promowych na tej trasie")
         
         return result
 
-    def _calculate_road_distance(self, total_distance_m, ferry_info):
+    def _calculate_road_distance(self, total_distance_m, ferry_info, geometry=None):
         """
         Oblicza dystans drogowy (na kołach) odejmując dystans promowy.
         
@@ -2293,24 +2678,51 @@ Parametry: {params}
         Args:
             total_distance_m: Całkowity dystans trasy w metrach (z API)
             ferry_info: Dict z informacjami o promach z _extract_combined_transport_info()
+            geometry: RouteGeometry trasy (podział dystansu na kraje i odcinki morskie)
         
         Returns:
             dict: {
                 'total_distance_km': float,     # Całkowity dystans [km]
                 'road_distance_km': float,      # Dystans na drogach [km]
                 'ferry_distance_km': float,     # Dystans na promach [km]
-                'ferry_segments': list          # Lista segmentów promowych z szczegółami
+                'ferry_segments': list,         # Lista segmentów promowych z szczegółami
+                'country_distances_km': dict    # Dystans w krajach z polyline [km]
             }
         """
         result = {
             'total_distance_km': total_distance_m / 1000.0,
             'road_distance_km': total_distance_m / 1000.0,
             'ferry_distance_km': 0.0,
-            'ferry_segments': []
+            'ferry_segments': [],
+            'country_distances_km': {}
         }
         
+        if geometry is not None:
+            try:
+                result['country_distances_km'] = {
+                    country: round(km, 1) for country, km in geometry.distance_by_country().items()
+                }
+            except Exception as e:
+                logger.warning(f"Nie udało się podzielić dystansu trasy na kraje: {e}")
+        
+        # Odcinki morskie zmierzone na polyline - dla promów bez znanego dystansu
+        measured_sea_km = result['country_distances_km'].get(OFFSHORE_KEY, 0.0)
+        unresolved_ferries = [
+            ferry for ferry in (ferry_info or {}).get('ferries', [])
+            if FERRY_SEA_DISTANCES.get(ferry.get('name', 'Unknown Ferry'), 0) <= 0
+            and ferry.get('distance', 0) <= 0
+        ]
+        if unresolved_ferries and measured_sea_km > 0:
+            known_sea_km = sum(
+                FERRY_SEA_DISTANCES.get(ferry.get('name', 'Unknown Ferry'), 0) or ferry.get('distance', 0) / 1000.0
+                for ferry in ferry_info.get('ferries', []) if ferry not in unresolved_ferries
+            )
+            measured_sea_km = max(measured_sea_km - known_sea_km, 0.0) / len(unresolved_ferries)
+        else:
+            measured_sea_km = 0.0
+        
         if not ferry_info or not ferry_info.get('has_ferry'):
-            logger.debug(f"📏 Dystans drogowy = dystans całkowity = {result['total_distance_km']:.2f} km (brak promów)")
+            logger.debug("📏 Dystans drogowy = dystans całkowity = %.2f km (brak promów)", result['total_distance_km'])
             return result
         
         # Oblicz dystans promowy z FERRY_SEA_DISTANCES
@@ -2323,7 +2735,7 @@ Parametry: {params}
             sea_distance_km = FERRY_SEA_DISTANCES.get(ferry_name, 0)
             
             if sea_distance_km > 0:
-                logger.info(f"🌊 Prom '{ferry_name}': dystans morski = {sea_distance_km} km (ze słownika)")
+                logger.info("🌊 Prom '%s': dystans morski = %s km (ze słownika)", ferry_name, sea_distance_km)
             else:
                 # Fallback: użyj dystansu z API (może być 0)
                 api_distance_km = ferry.get('distance', 0) / 1000.0
@@ -2333,6 +2745,12 @@ Parametry: {params}
                         f"⚠️  Prom '{ferry_name}': brak w słowniku FERRY_SEA_DISTANCES, "
                         f"używam dystansu z API = {sea_distance_km:.2f} km"
                     )
+                elif measured_sea_km > 0:
+                    sea_distance_km = measured_sea_km
+                    logger.warning(
+                        f"⚠️  Prom '{ferry_name}': brak w słowniku FERRY_SEA_DISTANCES, "
+                        f"używam dystansu zmierzonego na polyline = {sea_distance_km:.1f} km"
+                    )
                 else:
                     # Estimate z czasu przeprawy (średnia prędkość promu ≈ 30 km/h)
                     duration_hours = ferry.get('duration', 0) / 3600.0
@@ -2368,15 +2786,7 @@ Parametry: {params}
             result['road_distance_km'] = result['total_distance_km']
             result['ferry_distance_km'] = 0
         
-        logger.info(
-            f"\n{'='*70}\n"
-            f"📏 ANALIZA DYSTANSU:\n"
-            f"   ├─ Dystans CAŁKOWITY: {result['total_distance_km']:.2f} km\n"
-            f"   ├─ Dystans DROGOWY (na kołach): {result['road_distance_km']:.2f} km\n"
-            f"   ├─ Dystans PROMOWY (morski): {result['ferry_distance_km']:.2f} km\n"
-            f"   └─ Liczba promów: {len(result['ferry_segments'])}\n"
-            f"{'='*70}"
-        )
+        logger.info("%s\n📏 ANALIZA DYSTANSU:\n   ├─ Dystans CAŁKOWITY: %.2f km\n   ├─ Dystans DROGOWY (na kołach): %.2f km\n   ├─ Dystans PROMOWY (morski): %.2f km\n   └─ Liczba promów: %s\n%s", '='*70, result['total_distance_km'], result['road_distance_km'], result['ferry_distance_km'], len(result['ferry_segments']), '='*70)
         
         return result
 
@@ -2411,10 +2821,7 @@ Parametry: {params}
         if events_data:
             ct_info = self._extract_combined_transport_info(events_data)
             if ct_info['has_ferry']:
-                logger.info(
-                    f"Wykryto przeprawę promową OFICJALNIE przez COMBINED_TRANSPORT_EVENTS: "
-                    f"{ct_info['ferry_names']}"
-                )
+                logger.info("Wykryto przeprawę promową OFICJALNIE przez COMBINED_TRANSPORT_EVENTS: %s", ct_info['ferry_names'])
                 result['detected'] = True
                 result['method'] = 'official'
                 result['ferry_info'] = ct_info
@@ -2442,16 +2849,13 @@ Parametry: {params}
             # Trasa GB <-> kontynent
             # Jeśli unikamy Eurotunelu, to MUSI być prom!
             if avoid_eurotunnel:
-                logger.info(
-                    f"Wykryto przeprawę promową HEURYSTYCZNIE przez analizę krajów "
-                    f"(kraje: {countries}, avoid_eurotunnel={avoid_eurotunnel})"
-                )
+                logger.info("Wykryto przeprawę promową HEURYSTYCZNIE przez analizę krajów (kraje: %s, avoid_eurotunnel=%s)", countries, avoid_eurotunnel)
                 result['detected'] = True
                 result['method'] = 'heuristic'
                 return result
             else:
                 # Eurotunel dozwolony - nie wiemy czy to prom czy tunel
-                logger.info(f"Trasa GB-kontynent, ale Eurotunel dozwolony - nie dodajemy kosztu promu")
+                logger.info("Trasa GB-kontynent, ale Eurotunel dozwolony - nie dodajemy kosztu promu")
                 return result
         
         return result
@@ -2483,9 +2887,8 @@ Parametry: {params}
         if not toll_data:
             return result
         
-        # DEBUG: Pełna struktura toll_data
-        import json
-        logger.info(f"🔍 DEBUG TOLL_DATA FULL STRUCTURE:\n{json.dumps(toll_data, indent=2, default=str)[:5000]}")
+        # DEBUG: Pełna struktura toll_data (zrzut JSON tylko przy włączonym poziomie DEBUG)
+        logger.debug("🔍 DEBUG TOLL_DATA FULL STRUCTURE:\n%s", lazy_json(toll_data))
             
         total_cost = 0
 
@@ -2512,10 +2915,10 @@ Parametry: {params}
 
         # Najpierw sprawdź sekcje
         all_sections = toll_data.get('sections', [])
-        logger.debug(f"📋 Liczba sekcji TOLL: {len(all_sections)}")
+        logger.debug("📋 Liczba sekcji TOLL: %s", len(all_sections))
         ferry_sections_found = [s for s in all_sections if s.get('tollRoadType') == 'FERRY']
         if ferry_sections_found:
-            logger.info(f"🚢 Znaleziono {len(ferry_sections_found)} sekcji typu FERRY w toll_data")
+            logger.info("🚢 Znaleziono %s sekcji typu FERRY w toll_data", len(ferry_sections_found))
         
         for section in all_sections:
             section_cost = section.get('costs', [{}])[0].get('convertedPrice', {}).get('price', 0)
@@ -2568,12 +2971,7 @@ Parametry: {params}
                 
                 # Loguj koszt promu
                 if section_cost > 0:
-                    logger.info(
-                        f"💰 KOSZT PROMU (z TOLL_COSTS):\n"
-                        f"   ├─ Nazwa: {section_name or 'Unnamed Ferry'}\n"
-                        f"   ├─ Operator: {operator}\n"
-                        f"   └─ Koszt: {section_cost:.2f} EUR"
-                    )
+                    logger.info("💰 KOSZT PROMU (z TOLL_COSTS):\n   ├─ Nazwa: %s\n   ├─ Operator: %s\n   └─ Koszt: %.2f EUR", section_name or 'Unnamed Ferry', operator, section_cost)
                 
                 # Zapisz koszt dla promów, nawet jeśli nie ma nazwy sekcji
                 if section_cost > 0:
@@ -2602,8 +3000,7 @@ Parametry: {params}
                 system_name = system.get('name', '').upper()
                 system_type = system.get('type', '').upper()
                 operator_name = system.get('operatorName', '').upper()
-                ##print(f"DEBUG system: name='{system.get('name')}', type='{system_type}', cost={system_cost}")
-                print(f"DEBUG system: name='{system.get('name')}', type='{system_type}', cost={system_cost}")
+                logger.debug("DEBUG system: name='%s', type='%s', cost=%s", system.get('name'), system_type, system_cost)
 
                 # Sprawdź czy system już został dodany z sekcji
                 system_real_name = system.get('name')
@@ -2617,7 +3014,8 @@ Parametry: {params}
                     if system_real_name and not already_added:
                         # Użyj kosztu z mapowania jeśli dostępny, w przeciwnym razie koszt systemowy
                         display_cost = system_name_to_cost.get(system_real_name, system_cost)
-                        print(f"DEBUG mapping: system_real_name='{system_real_name}', mapped_cost={system_name_to_cost.get(system_real_name)}, system_cost={system_cost}, display_cost={display_cost}")
+                        logger.debug("DEBUG mapping: system_real_name='%s', mapped_cost=%s, system_cost=%s, display_cost=%s",
+                                     system_real_name, system_name_to_cost.get(system_real_name), system_cost, display_cost)
                         result['special_systems'].append({
                             'name': system_real_name,
                             'type': 'TUNNEL',
@@ -2671,9 +3069,9 @@ Parametry: {params}
                             road_toll += system_cost
 
         # Jeśli wciąż nie mamy kosztów, ale mamy całkowity koszt, spróbuj oszacować
-        logger.info(f"🔍 DEBUG FALLBACK CHECK: road_toll={road_toll}, tunnel_toll={tunnel_toll}, bridge_toll={bridge_toll}, ferry_toll={ferry_toll}, total_cost={total_cost}")
+        logger.debug("🔍 DEBUG FALLBACK CHECK: road_toll=%s, tunnel_toll=%s, bridge_toll=%s, ferry_toll=%s, total_cost=%s", road_toll, tunnel_toll, bridge_toll, ferry_toll, total_cost)
         if (road_toll + tunnel_toll + bridge_toll + ferry_toll) == 0 and total_cost > 0:
-            logger.info(f"🔍 DEBUG FALLBACK: Wchodzę do fallback, ustawiam road_toll={total_cost}")
+            logger.debug("🔍 DEBUG FALLBACK: Wchodzę do fallback, ustawiam road_toll=%s", total_cost)
             # Sprawdź znane systemy w danych
             for system in toll_data.get('systems', []):
                 system_name = system.get('name', '').upper()
@@ -2684,7 +3082,7 @@ Parametry: {params}
             else:
                 # Jeśli nie znaleziono znanych systemów, wszystko idzie do opłat drogowych
                 road_toll = total_cost
-                logger.info(f"🔍 DEBUG FALLBACK: road_toll ustawione na total_cost={total_cost}")
+                logger.debug("🔍 DEBUG FALLBACK: road_toll ustawione na total_cost=%s", total_cost)
 
         # Wykryj przeprawę promową i dodaj koszt TYLKO gdy PTV API nie zwróciło żadnego (ferry_toll == 0)
         ferry_detection = self._detect_channel_ferry(toll_data, legs_data, avoid_eurotunnel, events_data)
@@ -2724,10 +3122,7 @@ Parametry: {params}
                     'duration_minutes': ferry_duration_min,
                     'source': cost_source
                 })
-                logger.info(
-                    f"Dodano koszt przeprawy promowej '{ferry_name}': {ferry_cost}€ "
-                    f"(wykrycie: COMBINED_TRANSPORT_EVENTS, źródło ceny: {cost_source}, czas: {ferry_duration_min:.0f} min)"
-                )
+                logger.info("Dodano koszt przeprawy promowej '%s': %s€ (wykrycie: COMBINED_TRANSPORT_EVENTS, źródło ceny: %s, czas: %.0f min)", ferry_name, ferry_cost, cost_source, ferry_duration_min)
             else:
                 # Heurystyczne wykrycie - zakładamy Dover-Calais dla GB↔FR/BE
                 ferry_name = 'Dover-Calais'
@@ -2745,15 +3140,9 @@ Parametry: {params}
                     'detection_method': 'heuristic',
                     'source': 'FERRY_COSTS (heuristic)'
                 })
-                logger.info(
-                    f"Dodano koszt przeprawy promowej '{ferry_name}': {ferry_cost}€ "
-                    f"(wykrycie: HEURYSTYCZNE przez analizę krajów GB↔FR/BE, źródło ceny: FERRY_COSTS)"
-                )
+                logger.info("Dodano koszt przeprawy promowej '%s': %s€ (wykrycie: HEURYSTYCZNE przez analizę krajów GB↔FR/BE, źródło ceny: FERRY_COSTS)", ferry_name, ferry_cost)
         elif ferry_detection['detected'] and ferry_toll > 0:
-            logger.info(
-                f"ℹ️  Prom wykryty przez COMBINED_TRANSPORT_EVENTS, "
-                f"ale PTV API już zwróciło koszt promu ({ferry_toll:.2f}€), więc nie dodajemy własnego"
-            )
+            logger.info("ℹ️  Prom wykryty przez COMBINED_TRANSPORT_EVENTS, ale PTV API już zwróciło koszt promu (%.2f€), więc nie dodajemy własnego", ferry_toll)
         
         # Dodaj UK HGV Levy (dzienna winieta) jeśli trasa przechodzi przez GB
         uk_levy_days = self._calculate_uk_levy_days(toll_data, legs_data, polyline_str)
@@ -2776,7 +3165,7 @@ Parametry: {params}
                 'cost': uk_levy_cost,
                 'operator': 'UK Government'
             })
-            logger.info(f"Dodano UK HGV Levy: {uk_levy_days} dzień/dni × {UK_HGV_LEVY_DAILY_EUR}€ = {uk_levy_cost}€")
+            logger.info("Dodano UK HGV Levy: %s dzień/dni × %s€ = %s€", uk_levy_days, UK_HGV_LEVY_DAILY_EUR, uk_levy_cost)
         
         # Zapisz wyniki
         result['costs_by_type']['ROAD']['EUR'] = road_toll
@@ -2787,22 +3176,14 @@ Parametry: {params}
         # Podsumowanie promów (jeśli są jakieś na trasie)
         ferry_systems = [s for s in result['special_systems'] if s['type'] == 'FERRY']
         if ferry_systems:
-            logger.info(
-                f"\n{'='*70}\n"
-                f"💰 PODSUMOWANIE KOSZTÓW PROMÓW:\n"
-                f"   ├─ Liczba promów: {len(ferry_systems)}\n"
-                f"   ├─ Łączny koszt: {ferry_toll:.2f} EUR\n"
-                f"   └─ Szczegóły:"
-            )
+            logger.info("%s\n💰 PODSUMOWANIE KOSZTÓW PROMÓW:\n   ├─ Liczba promów: %s\n   ├─ Łączny koszt: %.2f EUR\n   └─ Szczegóły:", '='*70, len(ferry_systems), ferry_toll)
             for i, ferry in enumerate(ferry_systems, 1):
                 operator = ferry.get('operator', 'Unknown')
                 cost = ferry.get('cost', 0)
                 duration = ferry.get('duration_minutes')
                 duration_str = f", czas: {duration:.0f} min" if duration else ""
-                logger.info(
-                    f"      {i}. {ferry['name']} ({operator}): {cost:.2f} EUR{duration_str}"
-                )
-            logger.info(f"{'='*70}")
+                logger.info("%s. %s (%s): %.2f EUR%s", i, ferry['name'], operator, cost, duration_str)
+            logger.info("%s", '='*70)
         
         return result
 
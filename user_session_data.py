@@ -32,9 +32,13 @@ class UserSessionData:
         fuel_cost: Koszt paliwa (EUR/km)
         driver_cost: Koszt kierowcy (EUR/dzień)
         matrix_type: Typ matrycy marży ('klient' lub 'targi')
+        pricing_mode: Tryb wyceny ('precise' - trasy z PTV, 'estimate' - szybki szacunek,
+                      'two_phase' - szacunek, potem trasy PTV w tle)
+        refining: Czy trwa dokładna wycena po udostępnieniu wyniku wstępnego (tryb 'two_phase')
         created_at: Timestamp utworzenia sesji
         last_activity: Timestamp ostatniej aktywności
         thread: Referencja do wątku przetwarzającego (opcjonalna)
+        job_id: Identyfikator ostatniego zadania w kolejce zadań (opcjonalny)
     """
     
     session_id: str
@@ -77,9 +81,12 @@ class UserSessionData:
     fuel_cost: float = 0.40
     driver_cost: float = 210.0
     matrix_type: str = 'klient'
+    pricing_mode: str = 'precise'
+    refining: bool = False
     created_at: float = field(default_factory=time.time)
     last_activity: float = field(default_factory=time.time)
     thread: Optional[Any] = None
+    job_id: Optional[str] = None
     
     def update_activity(self) -> None:
         """Aktualizuje timestamp ostatniej aktywności."""
@@ -117,6 +124,7 @@ class UserSessionData:
         }
         self.result_excel = None
         self.processing_complete = False
+        self.refining = False
         self.locations_to_verify = []
         self.update_activity()
     
@@ -133,6 +141,7 @@ class UserSessionData:
             'current_row': self.current_row,
             'total_rows': self.total_rows,
             'processing_complete': self.processing_complete,
+            'refining': self.refining,
             'geocoding_current': self.geocoding_current,
             'geocoding_total': self.geocoding_total,
             'preview_data': self.preview_data,
@@ -141,6 +150,7 @@ class UserSessionData:
             'matrix_type': self.matrix_type,
             'age_minutes': self.get_age_minutes(),
             'inactivity_minutes': self.get_inactivity_minutes(),
-            'has_result': self.result_excel is not None
+            'has_result': self.result_excel is not None,
+            'job_id': self.job_id
         }
 